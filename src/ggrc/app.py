@@ -75,6 +75,11 @@ def init_views(app_):
   ggrc.views.init_all_views(app_)
 
 
+def init_url_prefixes(app_):
+  from ggrc.utils import init_url_prefixes
+  init_url_prefixes(app_)
+
+
 def init_extension_blueprints(app_):
   for extension_module in extensions.get_extension_modules():
     if hasattr(extension_module, 'blueprint'):
@@ -163,12 +168,21 @@ def _display_sql_queries():
       app.logger.info("Total queries: {}".format(len(queries)))
       return response
 
+
+def _audit_sql_queries():
+  """Set up auditing of repeated queries and lazy loads if it's enabled."""
+  if getattr(settings, "SQLALCHEMY_AUDIT_QUERIES", False):
+    from ggrc.utils import query_audit
+    query_audit.add_handler(query_audit.log_handler(app))
+    query_audit.init_app(app)
+
 init_models(app)
 configure_flask_login(app)
 configure_webassets(app)
 configure_jinja(app)
 init_services(app)
 init_views(app)
+init_url_prefixes(app)
 init_extension_blueprints(app)
 init_indexer()
 init_permissions_provider()
@@ -178,3 +192,4 @@ notifications.register_notification_listeners()
 _enable_debug_toolbar()
 _enable_jasmine()
 _display_sql_queries()
+_audit_sql_queries()
@@ -0,0 +1,374 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Bulk generation of assessments from an assessment template.
+
+Assessments generated with one POST per object run the assessment hook for
+each of them, which looks up the template, the audit and the object by id,
+resolves default people one person at a time and adds custom attribute
+definitions and relationships one by one. AssessmentGenerator builds all
+assessments of a request together:
+
+  - the audit, the template with its custom attribute definitions and all
+    target objects are loaded once, with one query per object type,
+  - default people that do not depend on the object (auditors, the audit
+    lead, people listed in the template and the current user) are resolved
+    once per request,
+  - assessments are flushed together and get their slugs with one lookup,
+  - custom attribute definitions, relationships and assignee types are
+    flushed together, so they get revisions and invalidate memcache like
+    objects posted one by one,
+  - notifications are written with one multi-row insert.
+
+Every requested object gets its own result, so missing, unreadable or
+repeated objects do not prevent the others from being generated.
+"""
+
+import collections
+from datetime import date
+from datetime import datetime
+
+from sqlalchemy import inspect
+from sqlalchemy import orm
+from werkzeug.exceptions import BadRequest
+from werkzeug.exceptions import Forbidden
+from werkzeug.exceptions import NotFound
+
+from ggrc import db
+from ggrc.login import get_current_user_id
+from ggrc.models import all_models
+from ggrc.rbac import permissions
+from ggrc.services.common import CACHE_EXPIRY_COLLECTION
+from ggrc.services.common import get_modified_objects
+from ggrc.services.common import log_event
+from ggrc.services.common import update_index
+from ggrc.services.common import update_memcache_after_commit
+from ggrc.services.common import update_memcache_before_commit
+from ggrc.utils import benchmark
+
+
+MAX_OBJECTS = 1000
+
+# Default people groups of a template and the assignee types they get.
+PEOPLE_TYPES = (
+    ("assessors", "Assessor"),
+    ("verifiers", "Verifier"),
+    ("creator", "Creator"),
+)
+
+# Template default people values that name a person attribute of the object.
+OBJECT_PEOPLE = {
+    "Primary Contact": "contact",
+    "Secondary Contact": "secondary_contact",
+    "Primary Assessor": "principal_assessor",
+    "Secondary Assessor": "secondary_assessor",
+}
+
+
+def _object_options(model):
+  """Get load options for everything needed to build an assessment."""
+  relationships = inspect(model).relationships.keys()
+  options = [orm.undefer_group("{}_complete".format(model.__name__))]
+  options.extend(orm.joinedload(name) for name in OBJECT_PEOPLE.values()
+                 if name in relationships)
+  if "object_owners" in relationships:
+    options.append(orm.subqueryload("object_owners").joinedload("person"))
+  return options
+
+
+class AssessmentGenerator(object):
+  """Generate assessments of an audit for many objects at once."""
+
+  def __init__(self, audit_id, template_id=None):
+    # get_current_user returns a proxy, the person itself is needed for
+    # relationships and as a key of assignee maps.
+    self.current_user = all_models.Person.query.get(get_current_user_id())
+    self.audit = self._load_audit(audit_id)
+    self.template = None
+    self.definitions = []
+    if template_id is not None:
+      self._load_template(template_id)
+    self.auditors = [
+        user_role.person for user_role in self.audit.context.user_roles
+        if user_role.role.name == u"Auditor"
+    ] if self.audit.context else []
+    self.listed_people = self._load_listed_people()
+    self.cache_manager = None
+
+  @staticmethod
+  def _load_audit(audit_id):
+    """Load the audit with its lead and auditors."""
+    user_roles = orm.joinedload("context").subqueryload("user_roles")
+    audit = all_models.Audit.query.options(
+        orm.undefer_group("Audit_complete"),
+        orm.joinedload("contact"),
+        user_roles.joinedload("role"),
+        user_roles.joinedload("person"),
+    ).get(audit_id)
+    if audit is None:
+      raise NotFound("Audit {} not found".format(audit_id))
+    if not permissions.is_allowed_create("Assessment", None,
+                                         audit.context_id):
+      raise Forbidden()
+    return audit
+
+  def _load_template(self, template_id):
+    """Load the template and its custom attribute definitions."""
+    self.template = all_models.AssessmentTemplate.query.get(template_id)
+    if self.template is None:
+      raise NotFound("Assessment template {} not found".format(template_id))
+    cad = all_models.CustomAttributeDefinition
+    self.definitions = cad.query.filter_by(
+        definition_id=self.template.id,
+        definition_type="assessment_template",
+    ).order_by(cad.id).all()
+
+  def _load_listed_people(self):
+    """Load people listed by id in the template with one query."""
+    if not self.template:
+      return {}
+    person_ids = set()
+    for people in self.template.default_people.values():
+      if isinstance(people, list):
+        person_ids.update(people)
+    if not person_ids:
+      return {}
+    return {person.id: person for person in all_models.Person.query.filter(
+        all_models.Person.id.in_(person_ids))}
+
+  @staticmethod
+  def _load_objects(stubs):
+    """Load requested objects with one query per type.
+
+    Returns:
+      dict of objects by (type, id).
+    """
+    ids_by_type = collections.defaultdict(set)
+    for stub in stubs:
+      ids_by_type[stub.get("type")].add(stub.get("id"))
+    objects = {}
+    for type_, ids in ids_by_type.iteritems():
+      model = getattr(all_models, type_ or "", None)
+      if model is None:
+        continue
+      query = model.query.options(*_object_options(model)).filter(
+          model.id.in_(ids))
+      objects.update(((obj.type, obj.id), obj) for obj in query)
+    return objects
+
+  def _people(self, group, obj):
+    """Get people of a default people group for an object.
+
+    This is get_value of the assessment hook with request wide values
+    resolved in advance.
+    """
+    if not self.template:
+      if group == "creator":
+        return self.current_user
+      elif group == "assessors":
+        return self.auditors
+      return None
+
+    people = self.template.default_people.get(group)
+    if not people:
+      return None
+    if isinstance(people, list):
+      return [self.listed_people.get(person_id) for person_id in people]
+    if people == u"Auditors":
+      return self.auditors
+    if people == u"Audit Lead":
+      return self.audit.contact
+    if people == u"Object Owners":
+      return [owner.person for owner in getattr(obj, "object_owners", ())]
+    attr = OBJECT_PEOPLE.get(people)
+    return getattr(obj, attr, None) if attr else None
+
+  def _assignees(self, obj):
+    """Get assignee types of people assigned to an assessment of obj.
+
+    Returns:
+      dict of sets of assignee types by person.
+    """
+    assignees = collections.OrderedDict()
+    for group, assignee_type in PEOPLE_TYPES:
+      people = self._people(group, obj)
+      people = people if isinstance(people, list) else [people]
+      people = [person for person in people if person is not None]
+      if not people and assignee_type != "Verifier":
+        people = [self.current_user]
+      for person in people:
+        assignees.setdefault(person, set()).add(assignee_type)
+    return assignees
+
+  def _test_plan(self, obj):
+    if not self.template:
+      return None
+    if self.template.test_plan_procedure and getattr(obj, "test_plan", None):
+      return obj.test_plan
+    return self.template.procedure_description or None
+
+  def _build_assessment(self, obj):
+    assessment = all_models.Assessment(
+        title=u"{} assessment for {}".format(obj.title, self.audit.title),
+        context=self.audit.context,
+        test_plan=self._test_plan(obj),
+        modified_by=self.current_user,
+    )
+    assessment.owners.append(self.current_user)
+    db.session.add(assessment)
+    return assessment
+
+  def _select_objects(self, stubs, results):
+    """Get objects to generate assessments for and their results."""
+    objects = self._load_objects(stubs)
+    selected = []
+    seen = set()
+    for stub in stubs:
+      key = (stub.get("type"), stub.get("id"))
+      result = {"object": {"type": key[0], "id": key[1]}}
+      results.append(result)
+      obj = objects.get(key)
+      if obj is None:
+        result.update(status=404, error="Object not found")
+      elif key in seen:
+        result.update(status=400, error="Object requested more than once")
+      elif not permissions.is_allowed_read_for(obj):
+        result.update(status=403, error="Object can not be read")
+      else:
+        seen.add(key)
+        selected.append((obj, result))
+    return selected
+
+  def generate(self, stubs):
+    """Generate and commit assessments for the given objects.
+
+    Args:
+      stubs: list of dicts with type and id of objects to assess.
+
+    Returns:
+      list of results in the order of stubs, each with the requested object,
+      the status and either the generated assessment or an error.
+    """
+    results = []
+    selected = self._select_objects(stubs, results)
+    if not selected:
+      return results
+    with benchmark("Generate assessments: build"):
+      pairs = [(obj, self._build_assessment(obj)) for obj, _ in selected]
+      db.session.flush()
+    with benchmark("Generate assessments: add related objects"):
+      self._add_definitions([assessment for _, assessment in pairs])
+      self._add_relationships(pairs)
+      db.session.flush()
+    with benchmark("Generate assessments: insert notifications"):
+      self._insert_notifications([assessment for _, assessment in pairs])
+    with benchmark("Generate assessments: commit"):
+      self._save()
+    for (_, result), (_, assessment) in zip(selected, pairs):
+      result.update(status=201, assessment={
+          "type": assessment.type,
+          "id": assessment.id,
+          "slug": assessment.slug,
+          "title": assessment.title,
+      })
+    return results
+
+  def _add_definitions(self, assessments):
+    """Copy custom attribute definitions of the template to assessments."""
+    if not self.definitions:
+      return
+    model = all_models.CustomAttributeDefinition
+    names = [attr.key for attr in inspect(model).column_attrs
+             if attr.key not in ("id", "definition_id", "definition_type",
+                                 "created_at", "updated_at",
+                                 "modified_by_id")]
+    for assessment in assessments:
+      for definition in self.definitions:
+        values = {name: getattr(definition, name) for name in names}
+        db.session.add(model(
+            definition_id=assessment.id,
+            # pylint: disable=protected-access
+            definition_type=assessment._inflector.table_singular,
+            modified_by=self.current_user,
+            **values
+        ))
+
+  def _add_relationships(self, pairs):
+    """Map assessments to their objects, the audit and assigned people.
+
+    Args:
+      pairs: list of (object, assessment) tuples.
+    """
+    for obj, assessment in pairs:
+      for destination in (obj, self.audit):
+        db.session.add(all_models.Relationship(
+            source=assessment,
+            destination=destination,
+            context=self.audit.context,
+            modified_by=self.current_user,
+        ))
+      for person, assignee_types in self._assignees(obj).iteritems():
+        relationship = all_models.Relationship(
+            source=person,
+            destination=assessment,
+            context=self.audit.context,
+            modified_by=self.current_user,
+        )
+        relationship.attrs = {"AssigneeType": ",".join(sorted(assignee_types))}
+        db.session.add(relationship)
+
+  @staticmethod
+  def _insert_notifications(assessments):
+    """Add the notifications sent when an assessment is opened."""
+    notif_type = all_models.NotificationType.query.filter_by(
+        name="assessment_open").first()
+    if not notif_type:
+      return
+    now = datetime.now()
+    db.session.execute(all_models.Notification.__table__.insert().values([{
+        "created_at": now,
+        "updated_at": now,
+        "object_id": assessment.id,
+        "object_type": assessment.type,
+        "notification_type_id": notif_type.id,
+        "send_on": date.today(),
+        "force_notifications": False,
+    } for assessment in assessments]))
+
+  def _save(self):
+    """Log revisions of the new objects and commit them."""
+    modified_objects = get_modified_objects(db.session)
+    log_event(db.session, self.audit, flush=False)
+    update_memcache_before_commit(
+        self, modified_objects, CACHE_EXPIRY_COLLECTION)
+    db.session.commit()
+    update_index(db.session, modified_objects)
+    update_memcache_after_commit(self)
+
+
+def generate_assessments(data):
+  """Generate assessments described by a request body.
+
+  Args:
+    data: dict with the audit, an optional template and the list of objects
+      to generate assessments for, all given as stubs with type and id.
+
+  Returns:
+    list of results, one for each object, see AssessmentGenerator.generate.
+  """
+  if not isinstance(data, dict):
+    raise BadRequest("Request body must be an object")
+  audit = data.get("audit") or {}
+  template = data.get("template") or {}
+  objects = data.get("objects")
+  if "id" not in audit:
+    raise BadRequest("audit is required")
+  if not isinstance(objects, list) or not objects:
+    raise BadRequest("objects must be a non empty list")
+  if len(objects) > MAX_OBJECTS:
+    raise BadRequest("At most {} objects can be generated at once".format(
+        MAX_OBJECTS))
+  if not all(isinstance(stub, dict) for stub in objects):
+    raise BadRequest("objects must be a list of stubs")
+  generator = AssessmentGenerator(audit["id"], template.get("id"))
+  return generator.generate(objects)
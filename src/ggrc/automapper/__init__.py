@@ -5,11 +5,14 @@ from datetime import datetime
 import collections
 import logging
 
+from sqlalchemy import orm
 from sqlalchemy.sql.expression import tuple_
 from ggrc import db
 from ggrc import models
 from ggrc.automapper.rules import rules
+from ggrc.fulltext import person_objects
 from ggrc.login import get_current_user
+from ggrc.models import relationship_adjacency
 from ggrc.models.audit import Audit
 from ggrc.models.relationship import Relationship
 from ggrc.models.request import Request
@@ -30,110 +33,251 @@ class Stub(collections.namedtuple("Stub", ["type", "id"])):
 
 
 class AutomapperGenerator(object):
+  """Generator of implied mappings for newly created relationships.
+
+  Implied mappings are computed as a breadth first expansion of the mapping
+  graph. Each level of the expansion is handled as a set: neighbourhoods of
+  all frontier objects are fetched with one query, instances needed for
+  attribute based rules are loaded with one query per type, permissions are
+  checked once per object and existing relationships for all candidates are
+  looked up with one query.
+  """
 
   def __init__(self, use_benchmark=True):
     self.processed = set()
-    self.queue = set()
     self.cache = collections.defaultdict(set)
     self.instance_cache = {}
-    self.auto_mappings = set()
+    self.permission_cache = {}
+    self.auto_mappings = collections.OrderedDict()
     if use_benchmark:
       self.benchmark = benchmark
     else:
       self.benchmark = with_nop
 
+  @staticmethod
+  def relate(src, dst):
+    if src < dst:
+      return (src, dst)
+    else:
+      return (dst, src)
+
   def related(self, obj):
-    if obj in self.cache:
-      return self.cache[obj]
-    # Pre-fetch neighborhood for enqueued object since we're gonna need that
-    # results in a few steps. This drastically reduces number of queries.
-    stubs = {s for rel in self.queue for s in rel}
-    stubs.add(obj)
+    """Get the neighbourhood of a single object."""
+    self._prefetch_related({obj})
+    return self.cache[obj]
+
+  def _prefetch_related(self, stubs):
+    """Fetch neighbourhoods of all given objects with a single query."""
+    stubs = {stub for stub in stubs if stub not in self.cache}
+    if not stubs:
+      return
     # Union is here to convince mysql to use two separate indices and
     # merge te results. Just using `or` results in a full-table scan
     # Manual column list avoids loading the full object which would also try to
     # load related objects
+    pairs = [(s.type, s.id) for s in stubs]
     cols = db.session.query(
         Relationship.source_type, Relationship.source_id,
         Relationship.destination_type, Relationship.destination_id)
     relationships = cols.filter(
-        tuple_(Relationship.source_type, Relationship.source_id).in_(
-            [(s.type, s.id) for s in stubs]
-        )
+        tuple_(Relationship.source_type, Relationship.source_id).in_(pairs)
     ).union_all(
         cols.filter(
             tuple_(Relationship.destination_type,
-                   Relationship.destination_id).in_(
-                       [(s.type, s.id) for s in stubs]))
+                   Relationship.destination_id).in_(pairs))
     ).all()
-    batch_requests = collections.defaultdict(set)
+    for stub in stubs:
+      self.cache[stub] = set()
+    # mappings created in this run are not in the database yet
+    for src, dst in self.auto_mappings:
+      if src == dst:
+        continue
+      if src in stubs:
+        self.cache[src].add(dst)
+      if dst in stubs:
+        self.cache[dst].add(src)
     for (src_type, src_id, dst_type, dst_id) in relationships:
       src = Stub(src_type, src_id)
       dst = Stub(dst_type, dst_id)
       # only store a neighbor if we queried for it since this way we know
       # we'll be storing complete neighborhood by the end of the loop
-      batch_requests[src_type].add(src_id)
-      batch_requests[dst_type].add(dst_id)
       if src in stubs:
         self.cache[src].add(dst)
       if dst in stubs:
         self.cache[dst].add(src)
 
-    for type_, ids in batch_requests.iteritems():
-      model = getattr(models.all_models, type_)
-      instances = model.query.filter(model.id.in_(ids))
+  def _prefetch_instances(self, attrs_by_stub):
+    """Load instances needed for implicit rules, one query per type.
+
+    Args:
+      attrs_by_stub: dict mapping a Stub to the set of attribute names that
+        will be read from its instance.
+    """
+    by_type = collections.defaultdict(dict)
+    for stub, attrs in attrs_by_stub.iteritems():
+      if stub not in self.instance_cache:
+        by_type[stub.type].setdefault("ids", set()).add(stub.id)
+        by_type[stub.type].setdefault("attrs", set()).update(attrs)
+    for type_, needed in by_type.iteritems():
+      model = getattr(models.all_models, type_, None)
+      if model is None:
+        continue  # reported in _step_implicit
+      options = [orm.subqueryload(name) for name in needed["attrs"]
+                 if self._is_relationship(model, name)]
+      instances = model.query.options(*options).filter(
+          model.id.in_(needed["ids"]))
       for instance in instances:
         self.instance_cache[Stub(type_, instance.id)] = instance
-    return self.cache[obj]
+      for id_ in needed["ids"]:
+        self.instance_cache.setdefault(Stub(type_, id_), None)
 
-  def relate(self, src, dst):
-    if src < dst:
-      return (src, dst)
-    else:
-      return (dst, src)
+  @staticmethod
+  def _is_relationship(model, name):
+    attr = getattr(model, name, None)
+    prop = getattr(attr, "property", None)
+    return isinstance(prop, orm.RelationshipProperty)
 
   def generate_automappings(self, relationship):
-    self.auto_mappings = set()
+    self.generate_automappings_for([relationship])
+
+  def generate_automappings_for(self, relationships):
+    """Generate and store implied mappings for the given relationships.
+
+    Args:
+      relationships: list of Relationship objects (or unsaved Relationship
+        objects describing direct mappings) that have just been created.
+    """
+    self.auto_mappings = collections.OrderedDict()
+    counts = collections.Counter()
     with self.benchmark("Automapping generate_automappings"):
-      # initial relationship is special since it is already created and
-      # processing it would abort the loop so we manually enqueue the
-      # neighborhood
-      src = Stub.from_source(relationship)
-      dst = Stub.from_destination(relationship)
-      self._step(src, dst)
-      self._step(dst, src)
-      count = 0
-      while len(self.queue) > 0:
-        if len(self.auto_mappings) > rules.count_limit:
-          break
-        count += 1
-        src, dst = entry = self.queue.pop()
-
-        if not (self._can_map_to(src, relationship) and
-                self._can_map_to(dst, relationship)):
-          continue
-
-        created = self._ensure_relationship(src, dst)
-        self.processed.add(entry)
-        if not created:
-          # If the edge already exists it means that auto mappings for it have
-          # already been processed and it is safe to cut here.
-          continue
-        self._step(src, dst)
-        self._step(dst, src)
-
-      if len(self.auto_mappings) <= rules.count_limit:
-        self._flush(relationship)
-      else:
+      frontier = []
+      for relationship in relationships:
+        src = Stub.from_source(relationship)
+        dst = Stub.from_destination(relationship)
+        # initial relationships are special since they are already created
+        # so we never create them again and manually enqueue their
+        # neighborhood
+        self.processed.add(self.relate(src, dst))
+        for stub, other in ((src, dst), (dst, src)):
+          if stub in self.cache:
+            self.cache[stub].add(other)
+        frontier.append((src, dst, relationship))
+        frontier.append((dst, src, relationship))
+
+      while frontier:
+        frontier = [step for step in frontier
+                    if counts[step[2]] <= rules.count_limit]
+        candidates = self._expand(frontier)
+        frontier = []
+        for entry, parent in self._filter_new(candidates):
+          self.auto_mappings[entry] = parent
+          counts[parent] += 1
+          src, dst = entry
+          for stub, other in ((src, dst), (dst, src)):
+            if stub in self.cache:
+              self.cache[stub].add(other)
+          frontier.append((src, dst, parent))
+          frontier.append((dst, src, parent))
+
+      exceeded = {relationship for relationship in relationships
+                  if counts[relationship] > rules.count_limit}
+      for relationship in exceeded:
         relationship._json_extras = {
             'automapping_limit_exceeded': True
         }
+      self._flush({entry: parent
+                   for entry, parent in self.auto_mappings.iteritems()
+                   if parent not in exceeded})
+
+  def _expand(self, frontier):
+    """Get candidate mappings implied by one level of the frontier.
+
+    Args:
+      frontier: list of (src, dst, parent relationship) steps.
+    Returns:
+      OrderedDict of candidate entries and the parent relationships that
+      imply them.
+    """
+    explicit_stubs = set()
+    implicit_attrs = collections.defaultdict(set)
+    for src, dst, _ in frontier:
+      explicit, implicit = rules[src.type, dst.type]
+      if explicit:
+        explicit_stubs.add(src)
+      if implicit:
+        implicit_attrs[src].update(attr.name for attr in implicit)
+    with self.benchmark("Automapping prefetch"):
+      self._prefetch_related(explicit_stubs)
+      self._prefetch_instances(implicit_attrs)
+
+    candidates = collections.OrderedDict()
+    for src, dst, parent in frontier:
+      explicit, implicit = rules[src.type, dst.type]
+      for entry in self._step_explicit(src, dst, explicit):
+        candidates.setdefault(entry, parent)
+      for entry in self._step_implicit(src, dst, implicit):
+        candidates.setdefault(entry, parent)
+    return candidates
+
+  def _filter_new(self, candidates):
+    """Get the candidates that can be mapped and are not mapped yet."""
+    candidates = [(entry, parent) for entry, parent in candidates.iteritems()
+                  if entry not in self.processed and
+                  entry not in self.auto_mappings]
+    allowed = [(entry, parent) for entry, parent in candidates
+               if self._can_map_to(entry[0], parent) and
+               self._can_map_to(entry[1], parent)]
+    existing = self._existing(entry for entry, _ in allowed)
+    result = []
+    for entry, parent in allowed:
+      self.processed.add(entry)
+      # If the edge already exists it means that auto mappings for it have
+      # already been processed and it is safe to cut here.
+      if entry not in existing:
+        result.append((entry, parent))
+    return result
+
+  def _existing(self, entries):
+    """Get the subset of entries that are already mapped."""
+    existing = set()
+    unknown = []
+    for src, dst in entries:
+      if src in self.cache or dst in self.cache:
+        if dst in self.cache.get(src, ()) or src in self.cache.get(dst, ()):
+          existing.add((src, dst))
+      else:
+        unknown.append((src, dst))
+    if unknown:
+      pairs = [(src.type, src.id, dst.type, dst.id) for src, dst in unknown]
+      pairs.extend([(dst.type, dst.id, src.type, src.id)
+                    for src, dst in unknown])
+      rows = db.session.query(
+          Relationship.source_type, Relationship.source_id,
+          Relationship.destination_type, Relationship.destination_id,
+      ).filter(tuple_(
+          Relationship.source_type, Relationship.source_id,
+          Relationship.destination_type, Relationship.destination_id,
+      ).in_(pairs))
+      for src_type, src_id, dst_type, dst_id in rows:
+        existing.add(self.relate(Stub(src_type, src_id),
+                                 Stub(dst_type, dst_id)))
+    return existing
 
   def _can_map_to(self, obj, parent_relationship):
-    return is_allowed_update(obj.type, obj.id, parent_relationship.context)
+    key = (obj, parent_relationship.context)
+    if key not in self.permission_cache:
+      self.permission_cache[key] = is_allowed_update(
+          obj.type, obj.id, parent_relationship.context)
+    return self.permission_cache[key]
+
+  def _flush(self, auto_mappings):
+    """Insert generated mappings with a single multi-row statement.
 
-  def _flush(self, parent_relationship):
-    if len(self.auto_mappings) == 0:
+    Args:
+      auto_mappings: dict of (src, dst) entries and the parent relationships
+        that implied them.
+    """
+    if len(auto_mappings) == 0:
       return
     with self.benchmark("Automapping flush"):
       current_user = get_current_user()
@@ -144,8 +288,6 @@ class AutomapperGenerator(object):
       # it means that the mapping was already created by another request
       # and we can safely ignore it.
       inserter = Relationship.__table__.insert().prefix_with("IGNORE")
-      original = self.relate(Stub.from_source(parent_relationship),
-                             Stub.from_destination(parent_relationship))
       db.session.execute(inserter.values([{
           "id": None,
           "modified_by_id": current_user.id,
@@ -157,33 +299,31 @@ class AutomapperGenerator(object):
           "destination_type": dst.type,
           "context_id": None,
           "status": None,
-          "automapping_id": parent_relationship.id}
-          for src, dst in self.auto_mappings
-          if (src, dst) != original]))  # (src, dst) is sorted
-
-  def _step(self, src, dst):
-    explicit, implicit = rules[src.type, dst.type]
-    self._step_explicit(src, dst, explicit)
-    self._step_implicit(src, dst, implicit)
+          "automapping_id": parent.id}
+          for (src, dst), parent in auto_mappings.iteritems()]))
+      # Raw inserts bypass the session flush hooks, so the adjacency index
+      # has to be updated explicitly.
+      relationship_adjacency.index_relationship_pairs(
+          db.session.connection(), auto_mappings.keys())
+      person_objects.update_for_relationship_pairs(
+          db.session.connection(), auto_mappings.keys())
 
   def _step_explicit(self, src, dst, explicit):
     if len(explicit) != 0:
-      src_related = (o for o in self.related(src)
+      src_related = (o for o in self.cache[src]
                      if o.type in explicit and o != dst)
       for r in src_related:
         entry = self.relate(r, dst)
         if entry not in self.processed:
-          self.queue.add(entry)
+          yield entry
 
   def _step_implicit(self, src, dst, implicit):
+    if len(implicit) == 0:
+      return
     if not hasattr(models.all_models, src.type):
       logging.warning('Automapping by attr: cannot find model %s', src.type)
       return
     instance = self.instance_cache.get(src)
-    if instance is None:
-      model = getattr(models.all_models, src.type)
-      instance = model.query.filter(model.id == src.id).first()
-      self.instance_cache[src] = instance
     if instance is None:
       logging.warning("Automapping by attr: cannot load model %s: %s",
                       src.type, str(src.id))
@@ -197,7 +337,7 @@ class AutomapperGenerator(object):
           if value is not None:
             entry = self.relate(Stub(value.type, value.id), dst)
             if entry not in self.processed:
-              self.queue.add(entry)
+              yield entry
           else:
             logging.warning('Automapping by attr: %s is None', attr.name)
       else:
@@ -206,21 +346,6 @@ class AutomapperGenerator(object):
             str(src), str(attr.name)
         )
 
-  def _ensure_relationship(self, src, dst):
-    if dst in self.cache.get(src, []):
-      return False
-    if src in self.cache.get(dst, []):
-      return False
-
-    self.auto_mappings.add((src, dst))
-
-    if src in self.cache:
-      self.cache[src].add(dst)
-    if dst in self.cache:
-      self.cache[dst].add(src)
-
-    return True
-
 
 def handle_relationship_post(source, destination):
   """Handle posting of special relationships.
@@ -263,12 +388,10 @@ def register_automapping_listeners():
     Args:
       objects: list of relationship Models.
     """
-    automapper = AutomapperGenerator()
-    for obj in objects:
-      if obj is None:
-        logging.warning("Automapping listener: no obj, no mappings created")
-        return
-      automapper.generate_automappings(obj)
+    if any(obj is None for obj in objects):
+      logging.warning("Automapping listener: no obj, no mappings created")
+      return
+    AutomapperGenerator().generate_automappings_for(objects)
 
   @Resource.model_posted_after_commit.connect_via(Request)
   @Resource.model_put_after_commit.connect_via(Request)
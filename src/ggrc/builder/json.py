@@ -6,10 +6,15 @@
 # pylint: disable=no-name-in-module
 # false positive for RelationshipProperty
 
+from collections import defaultdict
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime
 
 import iso8601
 import sqlalchemy
+from flask import has_request_context
+from flask import request
 from sqlalchemy.ext.associationproxy import AssociationProxy
 from sqlalchemy.orm.attributes import InstrumentedAttribute
 from sqlalchemy.orm.properties import RelationshipProperty
@@ -111,6 +116,62 @@ def create(obj, json_obj):
     creator.create(obj, json_obj)
 
 
+def _reference_key(value):
+  """Get the (type, id) of a JSON link, or None if it is not a link."""
+  if not isinstance(value, dict) or not value.get(u'type'):
+    return None
+  try:
+    return value[u'type'], int(value.get(u'id'))
+  except (TypeError, ValueError):
+    return None
+
+
+def load_references(srcs):
+  """Load all objects linked from the attributes of the JSON sources.
+
+  Args:
+    srcs: list of dicts with JSON representations of objects.
+
+  Returns:
+    dict with the linked objects by (type, id), loaded with one query per
+    type.
+  """
+  ids_by_type = defaultdict(set)
+  for src in srcs:
+    for value in src.itervalues():
+      values = value if isinstance(value, list) else [value]
+      for key in (_reference_key(item) for item in values):
+        if key is not None:
+          ids_by_type[key[0]].add(key[1])
+  references = {}
+  for type_, ids in ids_by_type.iteritems():
+    model = ggrc.models.get_model(type_)
+    if model is None or not hasattr(model, "id"):
+      continue
+    for obj in db.session.query(model).filter(model.id.in_(ids)):
+      references[(type_, obj.id)] = obj
+  return references
+
+
+@contextmanager
+def prefetched_references(srcs):
+  """Resolve links in the JSON sources from objects loaded in bulk.
+
+  While the context is active, create and update look up linked objects in
+  the objects loaded by load_references instead of querying them one by
+  one. Links that are not found there are still queried.
+  """
+  if not has_request_context():
+    yield
+    return
+  previous = getattr(request, "json_references", None)
+  request.json_references = load_references(srcs)
+  try:
+    yield
+  finally:
+    request.json_references = previous
+
+
 class UpdateAttrHandler(object):
   """Performs the translation of a JSON state representation into update
   actions performed on a model object instance.
@@ -235,6 +296,17 @@ class UpdateAttrHandler(object):
             'Error message was: {2}'.format(value, attr_name, error.message)
         )
 
+  @staticmethod
+  def prefetched(rel_class, value):
+    """Get the object linked by the JSON value if it was loaded in bulk."""
+    references = None
+    if has_request_context():
+      references = getattr(request, "json_references", None)
+    if not references:
+      return None
+    obj = references.get(_reference_key(value))
+    return obj if isinstance(obj, rel_class) else None
+
   @classmethod
   def query_for(cls, rel_class, json_obj, attr_name, uselist):
     """Resolve the model object instance referred to by the JSON value."""
@@ -244,6 +316,9 @@ class UpdateAttrHandler(object):
       rel_ids = [o[u'id'] for o in value] if value else []
 
       if rel_ids:
+        objs = [cls.prefetched(rel_class, o) for o in value]
+        if all(obj is not None for obj in objs):
+          return list(OrderedDict((id(obj), obj) for obj in objs).values())
         return db.session.query(rel_class).filter(
             rel_class.id.in_(rel_ids)).all()
       else:
@@ -251,6 +326,9 @@ class UpdateAttrHandler(object):
     else:
       rel_obj = json_obj.get(attr_name)
       if rel_obj:
+        obj = cls.prefetched(rel_class, rel_obj)
+        if obj is not None:
+          return obj
         try:
           # FIXME: Should this be .one() instead of .first() ?
           return db.session.query(rel_class).filter(
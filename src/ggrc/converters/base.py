@@ -11,7 +11,7 @@ from ggrc.cache.memcache import MemCache
 from ggrc.converters import get_exportables
 from ggrc.converters.base_block import BlockConverter
 from ggrc.converters.import_helper import extract_relevant_data
-from ggrc.converters.import_helper import split_array
+from ggrc.converters.import_helper import iter_blocks
 from ggrc.fulltext import get_indexer
 
 
@@ -86,6 +86,7 @@ class Converter(object):
 
   def import_csv(self):
     self.block_converters_from_csv()
+    self.csv_data = []
     self.row_converters_from_csv()
     self.handle_priority_columns()
     self.import_objects()
@@ -126,8 +127,7 @@ class Converter(object):
     """Prepare BlockConverters and order them like specified in
     self.CLASS_ORDER.
     """
-    offsets, data_blocks = split_array(self.csv_data)
-    for offset, data in zip(offsets, data_blocks):
+    for offset, data in iter_blocks(self.csv_data):
       if len(data) < 2:
         continue  # empty block
       class_name = data[1][0].strip().lower()
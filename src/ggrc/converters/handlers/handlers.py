@@ -415,12 +415,10 @@ class MappingColumnHandler(ColumnHandler):
       elif self.unmap and mapping:
         db.session.delete(mapping)
     db.session.flush()
-    # it is safe to reuse this automapper since no other objects will be
-    # created while creating automappings and cache reuse yields significant
-    # performance boost
+    # all mappings of this row are expanded together so that neighbourhood,
+    # instance and permission lookups are shared between them
     automapper = AutomapperGenerator(use_benchmark=False)
-    for relation in relationships:
-      automapper.generate_automappings(relation)
+    automapper.generate_automappings_for(relationships)
     self.dry_run = True
 
   def get_value(self):
@@ -604,10 +602,28 @@ class ObjectPersonColumnHandler(UserColumnHandler):
     emails = [user.email for user in users]
     return "\n".join(emails)
 
-  def remove_current_people(self):
-    ObjectPerson.query.filter_by(
+  def delete_object_people(self, people=None):
+    """Delete mappings of the current object through the session.
+
+    Bulk deletes would skip the flush hooks that keep the relationship
+    adjacency and person objects indexes up to date.
+
+    Args:
+      people: only delete mappings of these people, all by default.
+    """
+    object_people = ObjectPerson.query.filter_by(
         personable_id=self.row_converter.obj.id,
-        personable_type=self.row_converter.obj.__class__.__name__).delete()
+        personable_type=self.row_converter.obj.__class__.__name__)
+    if people is not None:
+      object_people = object_people.filter(
+          ObjectPerson.person_id.in_([person.id for person in people]))
+    for object_person in object_people:
+      db.session.delete(object_person)
+    # Flush the deletes before new mappings of the same people are added.
+    db.session.flush()
+
+  def remove_current_people(self):
+    self.delete_object_people()
 
   def insert_object(self):
     if self.dry_run or not self.value:
@@ -651,12 +667,7 @@ class PersonUnmappingColumnHandler(ObjectPersonColumnHandler):
   def insert_object(self):
     if self.dry_run or not self.value:
       return
-    for person in self.value:
-      ObjectPerson.query.filter_by(
-          personable_id=self.row_converter.obj.id,
-          personable_type=self.row_converter.obj.__class__.__name__,
-          person=person
-      ).delete()
+    self.delete_object_people(self.value)
     self.dry_run = True
 
 
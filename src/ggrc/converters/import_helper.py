@@ -2,6 +2,7 @@
 # Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
 
 import csv
+import itertools
 import chardet
 from StringIO import StringIO
 from ggrc.models.reflection import AttributeInfo
@@ -9,6 +10,9 @@ from ggrc.converters.column_handlers import COLUMN_HANDLERS
 from ggrc.converters.handlers import handlers
 from ggrc.converters.handlers import custom_attribute
 
+# Number of bytes at the start of an imported file used to detect its encoding
+ENCODING_PREFIX_SIZE = 64 * 1024
+
 
 def get_object_column_definitions(object_class):
   """Attach additional info to attribute definitions.
@@ -68,13 +72,18 @@ def generate_csv_string(csv_data):
 
 
 def extract_relevant_data(csv_data):
-  """ Split csv data into data and metadata """
-  striped_data = [map(unicode.strip, line) for line in csv_data]  # noqa
-  transpose_data = zip(*striped_data[1:])
-  non_empty = filter(any, transpose_data)
-  data = zip(*non_empty[1:])
-  column_definitions = list(data.pop(0))
-  data = map(list, data)
+  """ Split csv data into data and metadata
+
+  The first line of the block and the first non empty column are metadata,
+  empty columns are removed and all rows are cut to the shortest row.
+  """
+  rows = csv_data[1:]
+  width = min(len(row) for row in rows) if rows else 0
+  striped_data = [[cell.strip() for cell in row[:width]] for row in rows]
+  non_empty = [index for index in range(width)
+               if any(row[index] for row in striped_data)]
+  data = [[row[index] for index in non_empty[1:]] for row in striped_data]
+  column_definitions = data.pop(0)
   return column_definitions, data
 
 
@@ -89,21 +98,33 @@ def equalize_array(array):
   return array
 
 
+def iter_blocks(csv_data):
+  """ Generate (offset, lines) for every block of lines split by empty lines
+
+  Blocks are produced as soon as they end, so csv_data can be an iterator
+  over a file that is never read into memory as a whole.
+  """
+  block = None
+  block_offset = None
+  for offset, line in enumerate(csv_data):
+    if any(line):
+      if block is None:
+        block_offset, block = offset, []
+      block.append(line)
+    elif block is not None:
+      yield block_offset, block
+      block = None
+  if block is not None:
+    yield block_offset, block
+
+
 def split_array(csv_data):
   """ Split array by empty lines """
   data_blocks = []
   offsets = []
-  current_block = None
-  for ofset, line in enumerate(csv_data):
-    if sum(map(len, line)) > 0:
-      if current_block is None:
-        offsets.append(ofset)
-        data_blocks.append([])
-        current_block = len(data_blocks) - 1
-      data_blocks[current_block].append(line)
-    else:
-      current_block = None
-
+  for offset, block in iter_blocks(csv_data):
+    offsets.append(offset)
+    data_blocks.append(block)
   return offsets, data_blocks
 
 
@@ -112,18 +133,41 @@ def generate_2d_array(width, height, value=None):
   return [[value for _ in range(width)] for _ in range(height)]
 
 
-def csv_reader(csv_data, dialect=csv.excel, **kwargs):
+def csv_reader(csv_data, dialect=csv.excel, encoding="utf-8", **kwargs):
   """ Reader for csv files """
-  reader = csv.reader(utf_8_encoder(csv_data), dialect=dialect, **kwargs)
+  reader = csv.reader(utf_8_encoder(csv_data, encoding),
+                      dialect=dialect, **kwargs)
   for row in reader:
     yield [unicode(cell, 'utf-8') for cell in row]  # noqa
 
 
-def read_csv_file(csv_file):
-  """ Get full string representation of the csv file """
+def detect_encoding(prefix):
+  """ Guess the encoding of a file from its first lines """
+  try:
+    prefix.decode("utf-8")
+    return "utf-8"
+  except UnicodeDecodeError:
+    return chardet.detect(prefix)["encoding"] or "utf-8"
+
+
+def iter_csv_file(csv_file):
+  """ Generate rows of the csv file without reading all of it
+
+  The encoding is detected from the first ENCODING_PREFIX_SIZE bytes of the
+  file, extended to the end of the line.
+  """
   if isinstance(csv_file, basestring):  # noqa
     csv_file = open(csv_file, 'rbU')
-  return [row for row in csv_reader(csv_file)]
+  prefix = csv_file.read(ENCODING_PREFIX_SIZE)
+  if len(prefix) == ENCODING_PREFIX_SIZE:
+    prefix += csv_file.readline()
+  lines = itertools.chain(StringIO(prefix), csv_file)
+  return csv_reader(lines, encoding=detect_encoding(prefix))
+
+
+def read_csv_file(csv_file):
+  """ Get full string representation of the csv file """
+  return list(iter_csv_file(csv_file))
 
 
 def utf_8_encode_array(array):
@@ -131,18 +175,25 @@ def utf_8_encode_array(array):
   return [[val.encode("utf-8") for val in line] for line in array]
 
 
-def utf_8_encoder(csv_data):
+def utf_8_encoder(csv_data, encoding="utf-8"):
   """This function is a generator that attempts to encode the string as utf-8.
-  It is assumed that the data is likely to be encoded in ascii. If encoding
-  fails, however, the function will attempt to guess the encoding and convert
-  it to utf-8.
-  Guessing is only done when a line fails to encode as there may be characters
-  further in the stream that aren't valid ascii and encoding is performed per
-  line yielded; guessing is the fallback on a per-line basis.
+  It is assumed that the data is likely to be encoded in ascii or utf-8. If
+  decoding fails, the line is decoded with the given encoding, detected from
+  the start of the file, and if that fails too, the function will attempt to
+  guess the encoding of the line and convert it to utf-8.
+  Guessing is only done when a line fails to decode as there may be characters
+  further in the stream that aren't valid in the detected encoding and
+  encoding is performed per line yielded; guessing is the fallback on a
+  per-line basis.
   """
   for line in csv_data:
     try:
       yield line.decode('utf-8').encode('utf-8')
+      continue
+    except UnicodeDecodeError:
+      pass
+    try:
+      yield line.decode(encoding).encode('utf-8')
     except UnicodeDecodeError:
       encoding_guess = chardet.detect(line)['encoding']
       yield line.decode(encoding_guess).encode('utf-8')
@@ -0,0 +1,104 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Short-lived cache of fulltext search counts.
+
+The search box asks for counts on every keystroke, and each request runs a
+grouped LIKE query over the whole fulltext index. Counts are kept per process
+for FULLTEXT_COUNTS_CACHE_TIMEOUT seconds, keyed by the user and all the
+parameters of the count. Writes to the index made by this process drop all
+counts once their transaction ends, so counts computed from data that is not
+committed yet do not stay cached. Writes made by other processes are seen
+after the timeout.
+"""
+
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm.session import Session
+
+from ggrc import settings
+
+# Session info key of sessions that have written to the index.
+_INDEX_CHANGED_KEY = "ggrc_fulltext_index_changed"
+
+
+class CountsCache(object):
+  """Counts of search results by user and search parameters."""
+
+  MAX_ENTRIES = 1000
+
+  def __init__(self, timeout=None):
+    self._lock = threading.Lock()
+    self._entries = {}
+    self._timeout = timeout
+
+  @property
+  def timeout(self):
+    if self._timeout is not None:
+      return self._timeout
+    return getattr(settings, "FULLTEXT_COUNTS_CACHE_TIMEOUT", 0)
+
+  @staticmethod
+  def make_key(user_id, terms, types=None, contact_id=None,
+               extra_params=None, extra_columns=None):
+    """Make a hashable key from the parameters of a count."""
+    def freeze(params):
+      return tuple(sorted(
+          (key, tuple(sorted(value.items())) if isinstance(value, dict)
+           else value)
+          for key, value in (params or {}).iteritems()))
+
+    return (
+        user_id,
+        terms,
+        tuple(sorted(types)) if types is not None else None,
+        contact_id,
+        freeze(extra_params),
+        freeze(extra_columns),
+    )
+
+  def get(self, key, compute):
+    """Get cached counts, or compute and cache them."""
+    timeout = self.timeout
+    if not timeout:
+      return compute()
+    now = time.time()
+    with self._lock:
+      entry = self._entries.get(key)
+    if entry is not None and entry[0] > now:
+      return entry[1]
+    counts = compute()
+    with self._lock:
+      if len(self._entries) >= self.MAX_ENTRIES:
+        self._entries = {k: v for k, v in self._entries.iteritems()
+                         if v[0] > now}
+      if len(self._entries) < self.MAX_ENTRIES:
+        self._entries[key] = (now + timeout, counts)
+    return counts
+
+  def invalidate(self):
+    with self._lock:
+      self._entries = {}
+
+
+COUNTS_CACHE = CountsCache()
+
+
+def invalidate_after_commit(session):
+  """Drop all counts when the transaction of the session ends."""
+  session.info[_INDEX_CHANGED_KEY] = True
+
+
+def invalidate_changed(session, *_):
+  """Drop all counts if the ended transaction changed the index.
+
+  Rollbacks drop them too, as the fulltext table is not transactional.
+  """
+  if session.info.pop(_INDEX_CHANGED_KEY, False):
+    COUNTS_CACHE.invalidate()
+
+
+event.listen(Session, "after_commit", invalidate_changed)
+event.listen(Session, "after_rollback", invalidate_changed)
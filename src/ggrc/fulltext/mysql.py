@@ -1,7 +1,6 @@
 # Copyright (C) 2016 Google Inc.
 # Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
 
-from sqlalchemy import alias
 from sqlalchemy import and_
 from sqlalchemy import case
 from sqlalchemy import distinct
@@ -14,18 +13,16 @@ from sqlalchemy.sql import false
 from sqlalchemy.schema import DDL
 from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.orm import aliased
+from sqlalchemy.orm.session import Session
 from sqlalchemy.sql.expression import select
 from ggrc import db
 from ggrc.login import get_current_user
 from ggrc.models import all_models
-from ggrc.models.object_person import ObjectPerson
-from ggrc.models.object_owner import ObjectOwner
-from ggrc.models.relationship import Relationship
-from ggrc_basic_permissions.models import UserRole
-from ggrc_basic_permissions import objects_via_assignable_query
-from ggrc_basic_permissions import program_relationship_query
+from ggrc.models.relationship_adjacency import RelationshipAdjacency
 from ggrc_basic_permissions import backlog_workflows
 from ggrc.rbac import permissions, context_query_filter
+from . import person_objects
+from .counts_cache import COUNTS_CACHE
 from .sql import SqlIndexer
 
 
@@ -63,6 +60,9 @@ event.listen(
         '(content)'.format(tablename=MysqlRecordProperty.__tablename__))
 )
 
+event.listen(Session, 'before_flush', person_objects.collect_before_flush)
+event.listen(Session, 'after_flush', person_objects.update_after_flush)
+
 
 class MysqlIndexer(SqlIndexer):
   record_type = MysqlRecordProperty
@@ -164,7 +164,7 @@ class MysqlIndexer(SqlIndexer):
   def _add_owner_query(self, query, types=None, contact_id=None):  # noqa
     '''
     Finds all objects which might appear on a user's Profile or Dashboard
-    pages, including:
+    pages, using the person_objects table. These include:
 
       Objects mapped via ObjectPerson
       Objects owned via ObjectOwner
@@ -182,175 +182,38 @@ class MysqlIndexer(SqlIndexer):
     # Check if the user has Creator role
     current_user = get_current_user()
     my_objects = contact_id is not None
-    if current_user.system_wide_role == "Creator":
+    is_creator = current_user.system_wide_role == "Creator"
+    if is_creator:
       contact_id = current_user.id
 
     if not contact_id:
       return query
 
-    type_models = self._types_to_type_models(types)
-
-    model_names = [model.__name__ for model in type_models]
-
-    models = []
-    for model in type_models:
-      base_model = model._sa_class_manager.mapper.primary_base_mapper.class_
-      if base_model not in models:
-        models.append(base_model)
-
-    models = [(model, self._get_type_select_column(model)) for model in models]
-
-    type_union_queries = []
-
-    all_people = db.session.query(
-        all_models.Person.id.label('id'),
-        literal(all_models.Person.__name__).label('type'),
-        literal(None).label('context_id')
-    )
-    type_union_queries.append(all_people)
-
-    # Objects to which the user is "mapped"
+    sources = [person_objects.OWNED]
     # We don't return mapped objects for the Creator because being mapped
     # does not give the Creator necessary permissions to view the object.
-    if current_user.system_wide_role != "Creator":
-      object_people_query = db.session.query(
-          ObjectPerson.personable_id.label('id'),
-          ObjectPerson.personable_type.label('type'),
-          literal(None).label('context_id')
-      ).filter(
-          and_(
-              ObjectPerson.person_id == contact_id,
-              ObjectPerson.personable_type.in_(model_names)
-          )
-      )
-      type_union_queries.append(object_people_query)
-
-    # Objects for which the user is an "owner"
-    object_owners_query = db.session.query(
-        ObjectOwner.ownable_id.label('id'),
-        ObjectOwner.ownable_type.label('type'),
-        literal(None).label('context_id')
-    ).filter(
-        and_(
-            ObjectOwner.person_id == contact_id,
-            ObjectOwner.ownable_type.in_(model_names),
-        )
-    )
-    type_union_queries.append(object_owners_query)
-
-    # Objects to which the user is mapped via a custom attribute
-    ca_mapped_objects_query = db.session.query(
-        all_models.CustomAttributeValue.attributable_id.label('id'),
-        all_models.CustomAttributeValue.attributable_type.label('type'),
-        literal(None).label('context_id')
-    ).filter(
-        and_(
-            all_models.CustomAttributeValue.attribute_value == "Person",
-            all_models.CustomAttributeValue.attribute_object_id == contact_id
-        )
-    )
-    type_union_queries.append(ca_mapped_objects_query)
-
-    # Objects for which the user is assigned
-    model_assignee_query = db.session.query(
-        Relationship.destination_id.label('id'),
-        Relationship.destination_type.label('type'),
-        literal(None).label('context_id'),
-    ).filter(
-        and_(
-            Relationship.source_type == "Person",
-            Relationship.source_id == contact_id,
-        ),
-    )
-    type_union_queries.append(model_assignee_query)
-
-    model_assignee_query = db.session.query(
-        Relationship.source_id.label('id'),
-        Relationship.source_type.label('type'),
-        literal(None).label('context_id'),
-    ).filter(
-        and_(
-            Relationship.destination_type == "Person",
-            Relationship.destination_id == contact_id,
-        ),
-    )
-    type_union_queries.append(model_assignee_query)
-
+    if not is_creator:
+      sources.append(person_objects.MAPPED)
     if not my_objects:
-      type_union_queries.append(
-          program_relationship_query(contact_id, True))
-      type_union_queries.append(
-          objects_via_assignable_query(contact_id)
-      )
-    # also show backlog workflows
-    type_union_queries.append(backlog_workflows())
-
-    # FIXME The following line crashes if the Workflow extension is not enabled
-    for model in [all_models.Program, all_models.Audit, all_models.Workflow]:
-      context_query = db.session.query(
-          model.id.label('id'),
-          literal(model.__name__).label('type'),
-          literal(None).label('context_id'),
-      ).join(
-          UserRole,
-          and_(
-              UserRole.context_id == model.context_id,
-              UserRole.person_id == contact_id,
-          )
-      )
-      type_union_queries.append(context_query)
-
-    for model, type_column in models:
-      # Objects for which the user is the "contact" or "secondary contact"
-      if hasattr(model, 'contact_id'):
-        model_type_query = db.session.query(
-            model.id.label('id'),
-            type_column.label('type'),
-            literal(None).label('context_id')
-        ).filter(
-            model.contact_id == contact_id
-        ).distinct()
-        type_union_queries.append(model_type_query)
-      # Objects for which the user is the "contact"
-      if hasattr(model, 'secondary_contact_id'):
-        model_type_query = db.session.query(
-            model.id.label('id'),
-            type_column.label('type'),
-            literal(None).label('context_id')
-        ).filter(
-            model.secondary_contact_id == contact_id
-        ).distinct()
-        type_union_queries.append(model_type_query)
-
-      if model is all_models.Control:
-        # Control also has `principal_assessor` and `secondary_assessor`
-        assessor_queries = []
-        if hasattr(model, 'principal_assessor_id'):
-          assessor_queries.append(or_(
-              model.principal_assessor_id == contact_id))
-        if hasattr(model, 'secondary_assessor_id'):
-          assessor_queries.append(or_(
-              model.secondary_assessor_id == contact_id))
-
-        model_type_query = db.session.query(
-            model.id.label('id'),
-            type_column.label('type'),
-            literal(None).label('context_id')
-        ).filter(
-            or_(*assessor_queries)
-        ).distinct()
-        type_union_queries.append(model_type_query)
-
-    # Construct and JOIN to the UNIONed result set
-    type_union_query = alias(union(*type_union_queries))
-    query = query.join(
-        type_union_query,
+      sources.append(person_objects.RELATED)
+
+    backlog = backlog_workflows().subquery()
+    owned = aliased(person_objects.PersonObject)
+    query = query.outerjoin(
+        owned,
         and_(
-            type_union_query.c.id == MysqlRecordProperty.key,
-            type_union_query.c.type == MysqlRecordProperty.type),
+            owned.person_id == contact_id,
+            owned.object_type == MysqlRecordProperty.type,
+            owned.object_id == MysqlRecordProperty.key,
+            owned.source.in_(sources)),
     )
-
-    return query
+    return query.filter(or_(
+        owned.person_id.isnot(None),
+        # All people and backlog workflows are shown to everyone
+        MysqlRecordProperty.type == all_models.Person.__name__,
+        and_(MysqlRecordProperty.type == "Workflow",
+             MysqlRecordProperty.key.in_(select([backlog.c.id]))),
+    ))
 
   def _add_extra_params_query(self, query, type, extra_param):
     if not extra_param:
@@ -377,32 +240,49 @@ class MysqlIndexer(SqlIndexer):
       model_names = [m for m in model_names if m not in extra_params]
     return model_names
 
-  def search(self, terms, types=None, permission_type='read',
-             permission_model=None, contact_id=None, extra_params={}):
-    model_names = self._get_grouped_types(types, extra_params)
-    columns = (
-        self.record_type.key.label('key'),
-        self.record_type.type.label('type'),
-        self.record_type.property.label('property'),
-        self.record_type.content.label('content'),
-        case(
-            [(self.record_type.property == 'title', literal(0))],
-            else_=literal(1)).label('sort_key'))
-
-    query = db.session.query(*columns)
-    query = query.filter(
-        self._get_type_query(model_names, permission_type, permission_model))
-    query = query.filter(self._get_filter_query(terms))
-    query = self._add_owner_query(query, types, contact_id)
+  def _add_relevant_query(self, query, relevant_objects=None):
+    """Keep only records of objects related to all relevant objects."""
+    for relevant_type, relevant_id in relevant_objects or []:
+      adjacency = aliased(RelationshipAdjacency)
+      query = query.join(adjacency, and_(
+          adjacency.object_type == self.record_type.type,
+          adjacency.object_id == self.record_type.key,
+          adjacency.related_type == relevant_type,
+          adjacency.related_id == relevant_id,
+          adjacency.via == "relationship",
+      ))
+    return query
 
-    model_names = [model.__name__ for model in all_models.all_models]
+  def _search_queries(self, terms, model_names, types, columns,
+                      permission_type='read', permission_model=None,
+                      contact_id=None, extra_params=None,
+                      relevant_objects=None):
+    """Get queries whose union are search results for the given models.
+
+    Args:
+      model_names: names of searched models without extra_params.
+      types: names of all searched models.
+      columns: selected columns.
+    """
+    extra_params = extra_params or {}
+    queries = []
+    if model_names:
+      query = db.session.query(*columns)
+      query = query.filter(
+          self._get_type_query(model_names, permission_type,
+                               permission_model))
+      query = query.filter(self._get_filter_query(terms))
+      query = self._add_owner_query(query, types, contact_id)
+      query = self._add_relevant_query(query, relevant_objects)
+      queries.append(query)
+
+    all_names = [model.__name__ for model in all_models.all_models]
     if types is not None:
-      model_names = [m for m in model_names if m in types]
+      all_names = [m for m in all_names if m in types]
 
-    unions = [query]
     # Add extra_params and extra_colums:
     for k, v in extra_params.iteritems():
-      if k not in model_names:
+      if k not in all_names:
         continue
       q = db.session.query(*columns)
       q = q.filter(
@@ -410,15 +290,94 @@ class MysqlIndexer(SqlIndexer):
       q = q.filter(self._get_filter_query(terms))
       q = self._add_owner_query(q, [k], contact_id)
       q = self._add_extra_params_query(q, k, v)
-      unions.append(q)
-    all_queries = union(*unions)
+      q = self._add_relevant_query(q, relevant_objects)
+      queries.append(q)
+    return queries
+
+  def search(self, terms, types=None, permission_type='read',
+             permission_model=None, contact_id=None, extra_params={},
+             relevant_objects=None, limit=None, cursors=None):
+    """Get (key, type) of records matching the search.
+
+    Args:
+      relevant_objects: list of (type, id) pairs, results must be related to
+        all of them.
+      limit: if given, at most limit + 1 results of each type are returned,
+        ordered by key, so callers can tell if there are more.
+      cursors: dict with the last key returned for some types; only results
+        with a larger key are returned for these types. Used with limit.
+    """
+    if limit is not None:
+      return self._search_page(
+          terms, types, permission_type, permission_model, contact_id,
+          extra_params, relevant_objects, limit, cursors or {})
+    model_names = self._get_grouped_types(types, extra_params)
+    columns = (
+        self.record_type.key.label('key'),
+        self.record_type.type.label('type'),
+        self.record_type.property.label('property'),
+        self.record_type.content.label('content'),
+        case(
+            [(self.record_type.property == 'title', literal(0))],
+            else_=literal(1)).label('sort_key'))
+
+    queries = self._search_queries(
+        terms, model_names, types, columns, permission_type,
+        permission_model, contact_id, extra_params, relevant_objects)
+    if not queries:
+      return []
+    all_queries = union(*queries)
     all_queries = aliased(all_queries.order_by(
         all_queries.c.sort_key, all_queries.c.content))
     return db.session.execute(
         select([all_queries.c.key, all_queries.c.type]).distinct())
 
+  def _search_page(self, terms, types, permission_type, permission_model,
+                   contact_id, extra_params, relevant_objects, limit,
+                   cursors):
+    """Get one page of search results of each type with a single query."""
+    columns = (
+        self.record_type.key.label('key'),
+        self.record_type.type.label('type'),
+    )
+    grouped_names = self._get_grouped_types(types, extra_params)
+    all_names = self._get_grouped_types(types)
+    pages = []
+    for model_name in all_names:
+      params = {}
+      if model_name in extra_params:
+        params = {model_name: extra_params[model_name]}
+      queries = self._search_queries(
+          terms, [model_name] if model_name in grouped_names else [],
+          [model_name], columns, permission_type, permission_model,
+          contact_id, params, relevant_objects)
+      if not queries:
+        continue
+      if model_name in cursors:
+        queries = [query.filter(self.record_type.key > cursors[model_name])
+                   for query in queries]
+      page = queries[0].union(*queries[1:]).distinct()
+      page = page.order_by(self.record_type.key).limit(limit + 1)
+      pages.append(db.session.query(page.subquery()))
+    if not pages:
+      return []
+    return pages[0].union_all(*pages[1:]).all()
+
   def counts(self, terms, group_by_type=True, types=None, contact_id=None,
              extra_params={}, extra_columns={}):
+    """Get (type, count, extra column name) of search results.
+
+    Counts are cached in COUNTS_CACHE for the current user.
+    """
+    user = get_current_user()
+    key = COUNTS_CACHE.make_key(
+        getattr(user, "id", None), terms, types, contact_id, extra_params,
+        extra_columns)
+    return COUNTS_CACHE.get(key, lambda: [tuple(row) for row in self._counts(
+        terms, types, contact_id, extra_params, extra_columns)])
+
+  def _counts(self, terms, types=None, contact_id=None, extra_params={},
+              extra_columns={}):
     model_names = self._get_grouped_types(types, extra_params)
     query = db.session.query(
         self.record_type.type, func.count(distinct(
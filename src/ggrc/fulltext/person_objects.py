@@ -0,0 +1,639 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Materialized set of objects people own or are assigned to.
+
+Searches limited to a person ("my work" and all searches of creators) used to
+join the fulltext records to a large union over object owners, object people,
+custom attribute values, relationships, role assignments and contact columns
+of every model. The union is now stored in the person_objects table, so the
+search only needs a single indexed join. Rows follow the mappings that feed
+them: new mappings insert their rows and removed mappings recompute the rows
+of their objects only. Role and assignment changes recompute the rows of
+the affected people.
+
+Rows are grouped by source, because not all of them are used for all
+searches:
+
+  mapped: objects mapped through ObjectPerson, not used for creators.
+  owned: objects the person owns, is a contact or an assessor of, is mapped
+    to by a custom attribute or a relationship, and programs, audits and
+    workflows the person has a role in.
+  related: objects related to the person's programs and assignables, not used
+    for "my objects" searches.
+
+People are always matched, and backlog workflows are visible to everyone,
+so they are handled in the search itself.
+"""
+
+import collections
+
+from sqlalchemy import and_
+from sqlalchemy import literal
+from sqlalchemy import or_
+from sqlalchemy import tuple_
+from sqlalchemy import union
+from sqlalchemy.orm import attributes
+from sqlalchemy.sql.expression import select
+
+from ggrc import db
+from ggrc.models import all_models
+from ggrc.models.object_owner import ObjectOwner
+from ggrc.models.object_person import ObjectPerson
+from ggrc.models.relationship import Relationship
+from ggrc.models.relationship import RelationshipAttr
+from ggrc_basic_permissions.models import ContextImplication
+from ggrc_basic_permissions.models import Role
+from ggrc_basic_permissions.models import UserRole
+
+
+MAPPED = "mapped"
+OWNED = "owned"
+RELATED = "related"
+
+CONTACT_COLUMNS = ("contact_id", "secondary_contact_id",
+                   "principal_assessor_id", "secondary_assessor_id")
+
+CONTEXT_MODEL_NAMES = ("Program", "Audit", "Workflow")
+
+# Roles that make objects mapped to a program related to a person.
+PROGRAM_ROLES = ("ProgramEditor", "ProgramOwner", "ProgramReader")
+
+CHUNK_SIZE = 100
+
+# Session info key of people collected before a flush deletes objects.
+_DELETED_PEOPLE_KEY = "ggrc_person_objects_deleted_people"
+
+
+class PersonObject(db.Model):
+  """Object a person owns, is assigned to or is related to."""
+  # pylint: disable=too-few-public-methods
+
+  __tablename__ = 'person_objects'
+
+  person_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+  object_type = db.Column(db.String(250), primary_key=True)
+  object_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+  source = db.Column(db.String(16), primary_key=True)
+
+  __table_args__ = (
+      db.Index('ix_person_objects_object', 'object_type', 'object_id'),
+  )
+
+
+def _id_type(id_column, type_column):
+  return (id_column.label('id'), type_column.label('type'),
+          literal(None).label('context_id'))
+
+
+def _base_models():
+  models = []
+  for model in all_models.all_models:
+    base_model = model._sa_class_manager.mapper.primary_base_mapper.class_
+    if base_model not in models:
+      models.append(base_model)
+  return models
+
+
+def _type_column(model):
+  mapper = model._sa_class_manager.mapper
+  if mapper.polymorphic_on is None:
+    return literal(mapper.class_.__name__)
+  return db.case(
+      value=mapper.polymorphic_on,
+      whens={val: m.class_.__name__
+             for val, m in mapper.polymorphic_map.items()})
+
+
+def _mapped_queries(person_id):
+  return [db.session.query(*_id_type(
+      ObjectPerson.personable_id, ObjectPerson.personable_type,
+  )).filter(ObjectPerson.person_id == person_id)]
+
+
+def _owned_queries(person_id):
+  """Get queries for objects the person owns or is assigned to."""
+  queries = [
+      db.session.query(*_id_type(
+          ObjectOwner.ownable_id, ObjectOwner.ownable_type,
+      )).filter(ObjectOwner.person_id == person_id),
+      db.session.query(*_id_type(
+          all_models.CustomAttributeValue.attributable_id,
+          all_models.CustomAttributeValue.attributable_type,
+      )).filter(and_(
+          all_models.CustomAttributeValue.attribute_value == "Person",
+          all_models.CustomAttributeValue.attribute_object_id == person_id,
+      )),
+      db.session.query(*_id_type(
+          Relationship.destination_id, Relationship.destination_type,
+      )).filter(and_(
+          Relationship.source_type == "Person",
+          Relationship.source_id == person_id,
+      )),
+      db.session.query(*_id_type(
+          Relationship.source_id, Relationship.source_type,
+      )).filter(and_(
+          Relationship.destination_type == "Person",
+          Relationship.destination_id == person_id,
+      )),
+  ]
+  for model_name in CONTEXT_MODEL_NAMES:
+    model = getattr(all_models, model_name, None)
+    if model is None:
+      continue
+    queries.append(db.session.query(*_id_type(
+        model.id, literal(model.__name__),
+    )).join(UserRole, and_(
+        UserRole.context_id == model.context_id,
+        UserRole.person_id == person_id,
+    )))
+  for model in _base_models():
+    columns = [getattr(model, name) for name in CONTACT_COLUMNS
+               if hasattr(model, name)]
+    if columns:
+      queries.append(db.session.query(*_id_type(
+          model.id, _type_column(model),
+      )).filter(or_(*[column == person_id for column in columns])))
+  return queries
+
+
+def _related_queries(person_id):
+  # pylint: disable=cyclic-import
+  from ggrc_basic_permissions import objects_via_assignable_query
+  from ggrc_basic_permissions import program_relationship_query
+  return [
+      program_relationship_query(person_id, True),
+      objects_via_assignable_query(person_id),
+  ]
+
+
+SOURCE_QUERIES = collections.OrderedDict([
+    (MAPPED, _mapped_queries),
+    (OWNED, _owned_queries),
+    (RELATED, _related_queries),
+])
+
+
+def _select_person_objects(person_id, source, objects=None):
+  """Get a select of (person_id, source, type, id) rows for a source.
+
+  Args:
+    person_id: id of the person.
+    source: one of the SOURCE_QUERIES keys.
+    objects: optional list of (type, id) pairs the rows are limited to.
+  """
+  objects_query = union(*SOURCE_QUERIES[source](person_id)).alias("objects")
+  # Not all queries label their columns, they are (id, type, context) rows.
+  id_column, type_column = list(objects_query.c)[:2]
+  criteria = [type_column.isnot(None), id_column.isnot(None)]
+  if objects is not None:
+    criteria.append(tuple_(type_column, id_column).in_(objects))
+  return select([
+      literal(person_id),
+      literal(source),
+      type_column,
+      id_column,
+  ]).where(and_(*criteria))
+
+
+COLUMNS = ["person_id", "source", "object_type", "object_id"]
+
+
+def update_people(connection, person_ids, sources=None):
+  """Recompute all rows of the given people.
+
+  Args:
+    connection: connection to use for the queries.
+    person_ids: ids of people to recompute.
+    sources: sources to recompute, all of them by default.
+  """
+  person_ids = sorted(set(pid for pid in person_ids if pid is not None))
+  if not person_ids:
+    return
+  sources = [source for source in SOURCE_QUERIES
+             if sources is None or source in sources]
+  table = PersonObject.__table__
+  connection.execute(table.delete().where(and_(
+      table.c.person_id.in_(person_ids),
+      table.c.source.in_(sources),
+  )))
+  for person_id in person_ids:
+    for source in sources:
+      connection.execute(table.insert().prefix_with("IGNORE").from_select(
+          COLUMNS, _select_person_objects(person_id, source)))
+
+
+def update_objects(connection, person_id, source, objects):
+  """Recompute rows of a person and source for the given objects only."""
+  objects = sorted(objects)
+  if not objects:
+    return
+  table = PersonObject.__table__
+  connection.execute(table.delete().where(and_(
+      table.c.person_id == person_id,
+      table.c.source == source,
+      tuple_(table.c.object_type, table.c.object_id).in_(objects),
+  )))
+  connection.execute(table.insert().prefix_with("IGNORE").from_select(
+      COLUMNS, _select_person_objects(person_id, source, objects)))
+
+
+def get_people_for_objects(connection, objects):
+  """Get ids of people whose related objects depend on the given objects.
+
+  These are people with a role in the given programs and assignees of the
+  given assignables.
+  """
+  objects = set(objects)
+  if not objects:
+    return set()
+  people = set()
+  program_ids = [id_ for type_, id_ in objects if type_ == "Program"]
+  if program_ids:
+    people.update(row[0] for row in connection.execute(
+        select([UserRole.person_id]).select_from(
+            UserRole.__table__.join(
+                all_models.Program.__table__,
+                all_models.Program.context_id == UserRole.context_id)
+        ).where(all_models.Program.id.in_(program_ids))))
+  for this, other in (("source", "destination"), ("destination", "source")):
+    this_type = getattr(Relationship, this + "_type")
+    this_id = getattr(Relationship, this + "_id")
+    people.update(row[0] for row in connection.execute(
+        select([getattr(Relationship, other + "_id")]).select_from(
+            Relationship.__table__.join(
+                RelationshipAttr.__table__,
+                and_(RelationshipAttr.relationship_id == Relationship.id,
+                     RelationshipAttr.attr_name == "AssigneeType"))
+        ).where(and_(
+            tuple_(this_type, this_id).in_(list(objects)),
+            getattr(Relationship, other + "_type") == "Person",
+        ))))
+  return people
+
+
+def update_for_relationship_pairs(connection, pairs):
+  """Update people affected by relationships created with raw SQL.
+
+  Args:
+    connection: connection to use for the queries.
+    pairs: iterable of ((src_type, src_id), (dst_type, dst_id)) tuples.
+  """
+  people = set()
+  objects = set()
+  for pair in pairs:
+    _add_sides(pair, people, objects)
+  people.update(get_people_for_objects(connection, objects))
+  update_people(connection, people)
+
+
+def _values(obj, name, previous):
+  """Get current or previous value of an attribute during a flush."""
+  if previous:
+    history = attributes.get_history(obj, name)
+    if history.deleted:
+      return history.deleted[0]
+  return getattr(obj, name, None)
+
+
+def _add_sides(sides, people, objects):
+  """Add people and objects on the sides of a relationship."""
+  for type_, id_ in sides:
+    if type_ == "Person":
+      people.add(id_)
+    elif type_ is not None:
+      objects.add((type_, id_))
+
+
+def _versions(obj, names, status):
+  """Get (current, values) of attributes of an instance changed in a flush.
+
+  New instances only have current values and deleted ones only the values
+  they were deleted with. Modified instances have both previous and current
+  values, or none if none of the attributes changed.
+  """
+  current = {name: getattr(obj, name, None) for name in names}
+  if status == "new":
+    return [(True, current)]
+  if status == "deleted":
+    return [(False, current)]
+  previous = {name: _values(obj, name, True) for name in names}
+  if previous == current:
+    return []
+  return [(False, previous), (True, current)]
+
+
+RELATIONSHIP_COLUMNS = ("source_type", "source_id",
+                        "destination_type", "destination_id")
+
+MAPPING_MODELS = (ObjectPerson, ObjectOwner, all_models.CustomAttributeValue,
+                  Relationship)
+
+
+def _mapped_rows(obj):
+  """Get attributes and a function that maps their values to rows.
+
+  The rows are (person_id, source, type, id) tuples stored for an instance
+  on its own, without looking at other rows.
+  """
+  # pylint: disable=too-many-return-statements
+  if isinstance(obj, ObjectPerson):
+    return ("person_id", "personable_type", "personable_id"), lambda v: [
+        (v["person_id"], MAPPED, v["personable_type"], v["personable_id"])]
+  if isinstance(obj, ObjectOwner):
+    return ("person_id", "ownable_type", "ownable_id"), lambda v: [
+        (v["person_id"], OWNED, v["ownable_type"], v["ownable_id"])]
+  if isinstance(obj, all_models.CustomAttributeValue):
+    return ("attribute_value", "attribute_object_id", "attributable_type",
+            "attributable_id"), lambda v: [
+        (v["attribute_object_id"], OWNED, v["attributable_type"],
+         v["attributable_id"])] if v["attribute_value"] == "Person" else []
+  if isinstance(obj, Relationship):
+    return RELATIONSHIP_COLUMNS, lambda v: [
+        (v[this + "_id"], OWNED, v[other + "_type"], v[other + "_id"])
+        for this, other in (("source", "destination"),
+                            ("destination", "source"))
+        if v[this + "_type"] == "Person"]
+  names = tuple(name for name in CONTACT_COLUMNS if hasattr(obj, name))
+  if names:
+    return names, lambda v: [
+        (v[name], OWNED, obj.__class__.__name__, obj.id) for name in names]
+  return (), None
+
+
+class FlushChanges(object):
+  """Rows of people that have to change with the current flush."""
+
+  def __init__(self):
+    # rows that are valid on their own and can be inserted
+    self.added = set()
+    # objects of (person_id, source) that have to be recomputed
+    self.checked = collections.defaultdict(set)
+    # sources of people that have to be recomputed completely
+    self.rebuilt = collections.defaultdict(set)
+    # (current, id, values) of changed relationships
+    self.relationships = []
+    self.relationship_ids = set()
+    self.deleted = set()
+
+  def add_instance(self, obj, status):
+    """Collect changes of a new, modified or deleted instance."""
+    if status == "deleted" and getattr(obj, "id", None) is not None:
+      self.deleted.add((obj.__class__.__name__, obj.id))
+    if isinstance(obj, UserRole):
+      for _, values in _versions(obj, ("person_id", "context_id",
+                                       "role_id"), status):
+        self.rebuilt[values["person_id"]].update((OWNED, RELATED))
+      return
+    if isinstance(obj, RelationshipAttr):
+      if status != "dirty" or _versions(
+          obj, ("attr_name", "attr_value"), status):
+        self.relationship_ids.add(obj.relationship_id)
+      return
+    if status == "deleted" and not isinstance(obj, MAPPING_MODELS):
+      # rows of deleted objects are removed with the object
+      return
+    names, get_rows = _mapped_rows(obj)
+    if get_rows is None:
+      return
+    for current, values in _versions(obj, names, status):
+      if isinstance(obj, Relationship):
+        self.relationships.append((current, obj.id, values))
+        for type_, id_ in ((values["source_type"], values["source_id"]),
+                           (values["destination_type"],
+                            values["destination_id"])):
+          if type_ == "Person":
+            # the person can be an assignee through this relationship
+            self.rebuilt[id_].add(RELATED)
+      for person_id, source, type_, id_ in get_rows(values):
+        if current:
+          self.added.add((person_id, source, type_, id_))
+        else:
+          self.checked[person_id, source].add((type_, id_))
+
+  def add_assignment_changes(self, connection):
+    """Rebuild related objects of people with changed assignee types."""
+    self.relationship_ids.discard(None)
+    if not self.relationship_ids:
+      return
+    table = Relationship.__table__
+    for row in connection.execute(select([
+        table.c.source_type, table.c.source_id,
+        table.c.destination_type, table.c.destination_id,
+    ]).where(table.c.id.in_(self.relationship_ids))):
+      people = set()
+      _add_sides([row[:2], row[2:]], people, set())
+      for person_id in people:
+        self.rebuilt[person_id].add(RELATED)
+
+  def add_related_changes(self, connection):
+    """Collect related objects of changed relationships.
+
+    Objects mapped to programs are related to people with a program role,
+    and objects mapped to assigned objects are related to their assignees.
+    """
+    objects = set()
+    for _, _, values in self.relationships:
+      objects.add((values["source_type"], values["source_id"]))
+      objects.add((values["destination_type"], values["destination_id"]))
+    objects = {(type_, id_) for type_, id_ in objects
+               if type_ is not None and id_ is not None}
+    if not objects:
+      return
+    program_people = _get_program_people(
+        connection, [id_ for type_, id_ in objects if type_ == "Program"])
+    assignments = _get_assignments(connection, objects)
+    for current, relationship_id, values in self.relationships:
+      src = (values["source_type"], values["source_id"])
+      dst = (values["destination_type"], values["destination_id"])
+      related = []
+      for side in (src, dst):
+        if side[0] == "Program":
+          for person_id in program_people.get(side[1], ()):
+            related.append((person_id, src if dst[0] == "Program" else dst))
+            related.append((person_id, ("Relationship", relationship_id)))
+        for person_id, destination_type in assignments.get(side, ()):
+          related.append((person_id,
+                          src if dst[0] == destination_type else dst))
+      for person_id, (type_, id_) in related:
+        if current:
+          self.added.add((person_id, RELATED, type_, id_))
+        else:
+          self.checked[person_id, RELATED].update(
+              [src, dst, ("Relationship", relationship_id)])
+
+  def write(self, connection):
+    """Write the collected changes."""
+    table = PersonObject.__table__
+    rows = [dict(zip(COLUMNS, row)) for row in sorted(self.added)
+            if None not in row and
+            row[1] not in self.rebuilt.get(row[0], ())]
+    if rows:
+      connection.execute(table.insert().prefix_with("IGNORE"), rows)
+    for (person_id, source), objects in sorted(self.checked.iteritems()):
+      if person_id is not None and source not in self.rebuilt.get(
+          person_id, ()):
+        update_objects(connection, person_id, source,
+                       [obj for obj in objects if None not in obj])
+    by_sources = collections.defaultdict(list)
+    for person_id, sources in self.rebuilt.iteritems():
+      by_sources[tuple(sorted(sources))].append(person_id)
+    for sources, person_ids in by_sources.iteritems():
+      update_people(connection, person_ids, sources)
+    if self.deleted:
+      connection.execute(table.delete().where(
+          tuple_(table.c.object_type, table.c.object_id).in_(
+              list(self.deleted))))
+
+
+def _get_program_people(connection, program_ids):
+  """Get ids of people with a program role by program id."""
+  result = collections.defaultdict(set)
+  if not program_ids:
+    return result
+  program = all_models.Program.__table__
+  implication = ContextImplication.__table__
+  user_role = UserRole.__table__
+  role = Role.__table__
+  for program_context in (implication.c.source_context_id,
+                          implication.c.context_id):
+    query = select([program.c.id, user_role.c.person_id]).select_from(
+        program.join(
+            implication, program.c.context_id == program_context
+        ).join(
+            user_role, user_role.c.context_id == implication.c.context_id
+        ).join(
+            role, and_(role.c.id == user_role.c.role_id,
+                       role.c.name.in_(PROGRAM_ROLES)))
+    ).where(program.c.id.in_(program_ids))
+    for program_id, person_id in connection.execute(query):
+      result[program_id].add(person_id)
+  return result
+
+
+def _get_assignments(connection, objects):
+  """Get assignees of objects.
+
+  Returns:
+    dict of (person_id, destination type of the assignee relationship)
+    tuples by (type, id) of assigned objects.
+  """
+  result = collections.defaultdict(set)
+  table = Relationship.__table__
+  attrs = RelationshipAttr.__table__
+  joined = table.join(attrs, and_(
+      attrs.c.relationship_id == table.c.id,
+      attrs.c.attr_name == "AssigneeType",
+  ))
+  to_person = table.c.destination_type == "Person"
+  # Assignees are on the destination side when it is a person, otherwise on
+  # the source side, as in objects_via_assignable_query.
+  for this, other, criterion in (("source", "destination", to_person),
+                                 ("destination", "source", ~to_person)):
+    this_type = table.c[this + "_type"]
+    this_id = table.c[this + "_id"]
+    query = select([
+        this_type, this_id, table.c[other + "_id"],
+        table.c.destination_type.label("relationship_destination_type"),
+    ]).select_from(joined).where(and_(
+        criterion,
+        tuple_(this_type, this_id).in_(list(objects)),
+    ))
+    for type_, id_, person_id, destination_type in connection.execute(query):
+      result[type_, id_].add((person_id, destination_type))
+  return result
+
+
+def collect_before_flush(session, *_):
+  """Get people whose related objects depend on objects about to be deleted.
+
+  Role holders of deleted programs and assignees of deleted assignables can
+  only be found while the deleted rows still exist.
+  """
+  objects = {(obj.__class__.__name__, obj.id) for obj in session.deleted
+             if getattr(obj, "id", None) is not None}
+  if not objects:
+    return
+  people = get_people_for_objects(session.connection(), objects)
+  session.info.setdefault(_DELETED_PEOPLE_KEY, set()).update(people)
+
+
+def update_after_flush(session, _):
+  """Update rows of people affected by the current flush.
+
+  Only changes of columns that map people to objects are written. Rows that
+  are added are inserted directly, rows that might have lost their mapping
+  are recomputed for their objects only.
+  """
+  changes = FlushChanges()
+  for person_id in session.info.pop(_DELETED_PEOPLE_KEY, set()):
+    changes.rebuilt[person_id].add(RELATED)
+  for obj in session.new:
+    changes.add_instance(obj, "new")
+  for obj in session.dirty:
+    if session.is_modified(obj, include_collections=False):
+      changes.add_instance(obj, "dirty")
+  for obj in session.deleted:
+    changes.add_instance(obj, "deleted")
+  changes.rebuilt.pop(None, None)
+  if not (changes.added or changes.checked or changes.rebuilt or
+          changes.relationships or changes.relationship_ids or
+          changes.deleted):
+    return
+  connection = session.connection()
+  changes.add_assignment_changes(connection)
+  changes.add_related_changes(connection)
+  changes.write(connection)
+
+
+def get_stored(person_id):
+  return set(db.session.query(
+      PersonObject.source, PersonObject.object_type, PersonObject.object_id,
+  ).filter(PersonObject.person_id == person_id))
+
+
+def get_expected(person_id):
+  expected = set()
+  for source in SOURCE_QUERIES:
+    for _, _, type_, id_ in db.session.execute(
+        _select_person_objects(person_id, source)):
+      expected.add((source, type_, id_))
+  return expected
+
+
+def check_consistency(person_ids=None, repair=False):
+  """Compare stored rows with rows computed from the mappings.
+
+  Args:
+    person_ids: ids of people to check, all people by default.
+    repair: recompute rows of people with differences.
+
+  Returns:
+    dict with (missing rows, extra rows) for each person with differences.
+  """
+  if person_ids is None:
+    person_ids = [row[0] for row in db.session.query(all_models.Person.id)]
+  report = {}
+  for person_id in person_ids:
+    stored = get_stored(person_id)
+    expected = get_expected(person_id)
+    if stored != expected:
+      report[person_id] = (sorted(expected - stored),
+                           sorted(stored - expected))
+  if repair and report:
+    person_ids = sorted(report)
+    for start in range(0, len(person_ids), CHUNK_SIZE):
+      update_people(db.session.connection(),
+                    person_ids[start:start + CHUNK_SIZE])
+      db.session.commit()
+  return report
+
+
+def rebuild():
+  """Recompute rows of all people."""
+  db.session.execute(PersonObject.__table__.delete())
+  person_ids = [row[0] for row in db.session.query(all_models.Person.id)]
+  for start in range(0, len(person_ids), CHUNK_SIZE):
+    update_people(db.session.connection(),
+                  person_ids[start:start + CHUNK_SIZE])
+    db.session.commit()
@@ -3,6 +3,7 @@
 
 from ggrc import db
 from . import Indexer
+from .counts_cache import invalidate_after_commit
 
 class SqlIndexer(Indexer):
   def create_record(self, record, commit=True):
@@ -15,6 +16,7 @@ class SqlIndexer(Indexer):
         property=k,
         content=v,
         ))
+    invalidate_after_commit(db.session())
     if commit:
       db.session.commit()
 
@@ -26,16 +28,19 @@ class SqlIndexer(Indexer):
     db.session.query(self.record_type).filter(\
         self.record_type.key == key,
         self.record_type.type == type).delete()
+    invalidate_after_commit(db.session())
     if commit:
       db.session.commit()
 
   def delete_all_records(self, commit=True):
     db.session.query(self.record_type).delete()
+    invalidate_after_commit(db.session())
     if commit:
       db.session.commit()
 
   def delete_records_by_type(self, type, commit=True):
     db.session.query(self.record_type).filter(
       self.record_type.type == type).delete()
+    invalidate_after_commit(db.session())
     if commit:
       db.session.commit()
@@ -18,6 +18,7 @@ fileConfig(config.config_file_name)
 # with --autogenerate
 from ggrc.app import db, app
 from ggrc.models import all_models
+from ggrc.migrations.utils.batches import CHECKPOINT_TABLE
 
 target_metadata = db.metadata
 
@@ -53,6 +54,10 @@ def include_symbol(tablename, schema=None):
     if re.match(r'.*_alembic_version$', tablename):
         return False
 
+    # Exclude checkpoints of batched data migrations
+    if tablename == CHECKPOINT_TABLE:
+        return False
+
     # If the tablename didn't match any exclusion cases, return True
     return True
 
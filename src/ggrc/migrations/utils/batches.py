@@ -0,0 +1,278 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""
+Batched data migrations.
+
+Data migrations that update or copy a whole table in one statement hold row
+locks on all of it until they finish, and migrations that handle one row at a
+time take hours on big tables. These helpers split the work into keyset
+batches of consecutive ids, each committed on its own:
+
+* batched_update runs an UPDATE for each batch of a table;
+* batched_insert_from_select runs an INSERT ... SELECT for each batch of the
+  source table;
+* rename_duplicates renames rows with duplicate values with a few set based
+  queries.
+
+Progress is logged after every batch. Batched helpers given a checkpoint name
+store the last id of every batch in the migration_checkpoints table, in the
+same transaction as the batch, so a migration that was interrupted continues
+after the last committed batch when it is run again.
+
+Usage in a migration:
+
+  connection = op.get_bind()
+  batched_update(connection, controls_table, {"status": "Draft"},
+                 where=controls_table.c.status.is_(None),
+                 checkpoint="1a2b3c4d5e6f_control_status")
+"""
+
+import logging
+import time
+
+import sqlalchemy as sa
+from sqlalchemy import and_
+from sqlalchemy import bindparam
+from sqlalchemy import func
+from sqlalchemy import select
+
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 10000
+
+CHECKPOINT_TABLE = "migration_checkpoints"
+
+_metadata = sa.MetaData()
+
+checkpoints = sa.Table(
+    CHECKPOINT_TABLE, _metadata,
+    sa.Column("name", sa.String(length=250), primary_key=True),
+    sa.Column("last_id", sa.Integer(), nullable=False),
+    sa.Column("updated_at", sa.DateTime(), nullable=False),
+)
+
+
+def get_checkpoint(connection, name):
+  """Get the last id stored for a checkpoint, 0 if there is none."""
+  checkpoints.create(connection, checkfirst=True)
+  last_id = connection.execute(
+      select([checkpoints.c.last_id]).where(checkpoints.c.name == name)
+  ).scalar()
+  return last_id or 0
+
+
+def save_checkpoint(connection, name, last_id):
+  """Store the last id of a checkpoint."""
+  values = {"last_id": last_id, "updated_at": func.now()}
+  result = connection.execute(
+      checkpoints.update().where(checkpoints.c.name == name).values(values))
+  if not result.rowcount:
+    connection.execute(checkpoints.insert().values(name=name, **values))
+
+
+def clear_checkpoint(connection, name):
+  """Drop a checkpoint, so that the next run starts from the beginning."""
+  connection.execute(checkpoints.delete().where(checkpoints.c.name == name))
+
+
+def iter_id_batches(connection, table, batch_size=BATCH_SIZE, start_after=0,
+                    where=None):
+  """Get (exclusive lower id, inclusive upper id) of consecutive batches.
+
+  Every batch has batch_size rows of the table that match the where clause,
+  except the last one. Finding the upper id of a batch reads only the index
+  of the primary key and the where clause.
+  """
+  id_column = table.c.id
+  low = start_after
+  while True:
+    ids = select([id_column]).where(id_column > low)
+    if where is not None:
+      ids = ids.where(where)
+    ids = ids.order_by(id_column).limit(batch_size).alias("batch_ids")
+    high = connection.execute(select([func.max(ids.c.id)])).scalar()
+    if high is None:
+      return
+    yield low, high
+    low = high
+
+
+def _log_progress(name, rows, last_id, max_id, started):
+  elapsed = time.time() - started
+  logger.info(
+      "%s: %d rows in %.1fs, at id %d of %d (%.0f%%)",
+      name, rows, elapsed, last_id, max_id,
+      100.0 * last_id / max_id if max_id else 100.0)
+
+
+def run_batched(connection, table, make_statement, where=None,
+                batch_size=BATCH_SIZE, checkpoint=None, name=None):
+  """Run a statement for every batch of a table, committing each batch.
+
+  Args:
+    connection: connection to run the statements on, op.get_bind() in
+      migrations.
+    table: table with an integer id primary key that is split into batches.
+    make_statement: function that gets the id range condition of a batch and
+      returns the statement to run for it.
+    where: optional condition of rows of table to include in batches.
+    batch_size: number of rows in a batch.
+    checkpoint: optional name of the checkpoint used to resume the migration.
+    name: name used in progress logs, checkpoint or table name by default.
+
+  Returns:
+    number of rows changed by all statements run in this call.
+  """
+  name = name or checkpoint or table.name
+  start_after = get_checkpoint(connection, checkpoint) if checkpoint else 0
+  if start_after:
+    logger.info("%s: resuming after id %d", name, start_after)
+  max_id = connection.execute(select([func.max(table.c.id)])).scalar() or 0
+  rows = 0
+  started = time.time()
+  for low, high in iter_id_batches(connection, table, batch_size,
+                                   start_after, where):
+    id_range = and_(table.c.id > low, table.c.id <= high)
+    with connection.begin():
+      result = connection.execute(make_statement(id_range))
+      if checkpoint:
+        save_checkpoint(connection, checkpoint, high)
+    rows += max(result.rowcount, 0)
+    _log_progress(name, rows, high, max_id, started)
+  if checkpoint:
+    clear_checkpoint(connection, checkpoint)
+  return rows
+
+
+def batched_update(connection, table, values, where=None,
+                   batch_size=BATCH_SIZE, checkpoint=None):
+  """Update rows of a table in batches.
+
+  Args:
+    values: dict of column names and values or expressions to set.
+    Other arguments are the same as for run_batched.
+  """
+  def make_statement(id_range):
+    condition = id_range if where is None else and_(id_range, where)
+    return table.update().where(condition).values(values)
+  return run_batched(connection, table, make_statement, where, batch_size,
+                     checkpoint)
+
+
+def batched_insert_from_select(connection, target, columns, query, source,
+                               where=None, batch_size=BATCH_SIZE,
+                               checkpoint=None):
+  """Insert rows selected from a source table in batches of source ids.
+
+  Args:
+    target: table to insert rows into.
+    columns: names of target columns filled by the query.
+    query: select of rows to insert, it must select from the source table.
+    source: table the batches are made of.
+    Other arguments are the same as for run_batched.
+  """
+  def make_statement(id_range):
+    condition = id_range if where is None else and_(id_range, where)
+    return target.insert().from_select(columns, query.where(condition))
+  return run_batched(connection, source, make_statement, where, batch_size,
+                     checkpoint, name="{} from {}".format(target.name,
+                                                          source.name))
+
+
+def _normalized(value):
+  """Get the key values are compared by in the default MySQL collation.
+
+  The default collation ignores case and trailing spaces, so values that
+  differ only in those are duplicates for unique constraints.
+  """
+  return value.rstrip().lower()
+
+
+def _free_names(connection, column, pending, separator, taken):
+  """Find free names for duplicate rows.
+
+  Rows get their own value with a suffix, without trailing spaces, so that
+  names of rows with the same normalized value only differ in the suffix.
+
+  Args:
+    pending: list of (normalized value, list of (id, value) of rows to
+      rename) tuples.
+    taken: set of normalized names in use, updated with the assigned names.
+
+  Returns:
+    dict of new names by row id.
+  """
+  names = {}
+  next_index = {key: 1 for key, _ in pending}
+  while pending:
+    proposals = {}
+    for key, rows in pending:
+      start = next_index[key]
+      next_index[key] = start + len(rows)
+      proposals[key] = [u"{}{}{}".format(key, separator, index)
+                        for index in range(start, start + len(rows))]
+    all_proposals = [name for names_ in proposals.values() for name in names_]
+    for offset in range(0, len(all_proposals), BATCH_SIZE):
+      chunk = all_proposals[offset:offset + BATCH_SIZE]
+      taken.update(_normalized(row[0]) for row in connection.execute(
+          select([column]).where(column.in_(chunk))))
+    still_pending = []
+    for key, rows in pending:
+      free = [name for name in proposals[key]
+              if _normalized(name) not in taken]
+      for (id_, value), name in zip(rows, free):
+        # The proposal is built from the normalized value, only keep its
+        # suffix.
+        names[id_] = value.rstrip() + name[len(key):]
+        taken.add(_normalized(name))
+      if len(rows) > len(free):
+        still_pending.append((key, rows[len(free):]))
+    pending = still_pending
+  return names
+
+
+def rename_duplicates(connection, table, column_name, separator=u"-",
+                      batch_size=BATCH_SIZE):
+  """Make values of a column unique by adding a numeric suffix.
+
+  The row with the lowest id keeps its value, the other rows get their value
+  with the lowest free suffix, in the order of their ids. Values are compared
+  like MySQL does, ignoring case and trailing spaces. Duplicates are found
+  with one grouped query, names in use are checked with one query per batch of
+  proposed names and the renames are written with one executemany per batch.
+
+  Returns:
+    number of renamed rows.
+  """
+  column = table.c[column_name]
+  duplicated = select([
+      column.label("value"),
+      func.min(table.c.id).label("first_id"),
+  ]).group_by(column).having(func.count() > 1).alias("duplicated")
+  rows = connection.execute(
+      select([table.c.id, column]).select_from(
+          table.join(duplicated, column == duplicated.c.value)
+      ).where(table.c.id != duplicated.c.first_id).order_by(table.c.id))
+  rows_by_key = {}
+  for id_, value in rows:
+    rows_by_key.setdefault(_normalized(value), []).append((id_, value))
+  if not rows_by_key:
+    return 0
+  pending = sorted(rows_by_key.items())
+  names = _free_names(connection, column, pending, separator,
+                      set(rows_by_key))
+
+  update = table.update().where(table.c.id == bindparam("_id")).values(
+      {column_name: bindparam("_name")})
+  renames = [{"_id": id_, "_name": name}
+             for id_, name in sorted(names.items())]
+  started = time.time()
+  for start in range(0, len(renames), batch_size):
+    with connection.begin():
+      connection.execute(update, renames[start:start + batch_size])
+    done = min(start + batch_size, len(renames))
+    _log_progress("rename {}.{}".format(table.name, column_name), done,
+                  renames[done - 1]["_id"], renames[-1]["_id"], started)
+  return len(renames)
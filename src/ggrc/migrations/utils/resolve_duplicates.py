@@ -11,26 +11,11 @@ This helper is used by the following migrations:
 
 """
 
-from sqlalchemy import and_
-from sqlalchemy.orm import aliased
-
 from ggrc import db
+from ggrc.migrations.utils.batches import rename_duplicates
 
 
 def resolve_duplicates(model, attr, separator=u"-"):
-  v0, v1 = aliased(model, name="v0"), aliased(model, name="v1")
-  query = db.session.query(v0).join(v1, and_(
-      getattr(v0, attr) == getattr(v1, attr),
-      v0.id > v1.id
-  ))
-  for v in query:
-    i = 1
-    nattr = "{}{}{}".format(getattr(v, attr, model.type), separator, i)
-    while db.session.query(model).\
-            filter(getattr(model, attr) == nattr).count():
-      i += 1
-      nattr = "{}{}{}".format(getattr(v, attr, model.type), separator, i)
-    setattr(v, attr, nattr)
-    db.session.add(v)
-    db.session.flush()
+  """Add a numeric suffix to all but the first row with the same value."""
+  rename_duplicates(db.session.connection(), model.__table__, attr, separator)
   db.session.commit()
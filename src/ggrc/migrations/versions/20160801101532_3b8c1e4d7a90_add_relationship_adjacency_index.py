@@ -0,0 +1,77 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""
+Add relationship adjacency index
+
+Create Date: 2016-08-01 10:15:32.418605
+"""
+
+# disable Invalid constant name pylint warning for mandatory Alembic variables.
+# pylint: disable=invalid-name
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '3b8c1e4d7a90'
+down_revision = '24296c08e80'
+
+
+SOURCES = [
+    ("relationship", "relationships",
+     "source_type", "source_id", "destination_type", "destination_id",
+     "1 = 1"),
+    ("owner", "object_owners",
+     "'Person'", "person_id", "ownable_type", "ownable_id",
+     "1 = 1"),
+    ("object_person", "object_people",
+     "'Person'", "person_id", "personable_type", "personable_id",
+     "1 = 1"),
+    ("custom_attribute", "custom_attribute_values",
+     "attributable_type", "attributable_id",
+     "attribute_value", "attribute_object_id",
+     "attribute_object_id IS NOT NULL"),
+]
+
+
+def upgrade():
+  """Upgrade database schema and/or data, creating a new revision."""
+  op.create_table(
+      'relationship_adjacency',
+      sa.Column('via', sa.String(length=32), nullable=False),
+      sa.Column('via_id', sa.Integer(), nullable=False,
+                autoincrement=False),
+      sa.Column('object_type', sa.String(length=250), nullable=False),
+      sa.Column('object_id', sa.Integer(), nullable=False,
+                autoincrement=False),
+      sa.Column('related_type', sa.String(length=250), nullable=False),
+      sa.Column('related_id', sa.Integer(), nullable=False),
+      sa.PrimaryKeyConstraint('via', 'via_id', 'object_type', 'object_id'),
+  )
+  op.create_index(
+      'ix_relationship_adjacency_related', 'relationship_adjacency',
+      ['related_type', 'object_type', 'related_id', 'object_id'],
+      unique=False)
+
+  for via, table, left_type, left_id, right_type, right_id, where in SOURCES:
+    for from_type, from_id, to_type, to_id in [
+        (left_type, left_id, right_type, right_id),
+        (right_type, right_id, left_type, left_id),
+    ]:
+      op.execute("""
+          INSERT IGNORE INTO relationship_adjacency (
+              via, via_id, object_type, object_id, related_type, related_id
+          )
+          SELECT '{via}', id, {from_type}, {from_id}, {to_type}, {to_id}
+          FROM {table}
+          WHERE {where}
+      """.format(via=via, table=table, where=where,
+                 from_type=from_type, from_id=from_id,
+                 to_type=to_type, to_id=to_id))
+
+
+def downgrade():
+  """Downgrade database schema and/or data back to the previous revision."""
+  op.drop_table('relationship_adjacency')
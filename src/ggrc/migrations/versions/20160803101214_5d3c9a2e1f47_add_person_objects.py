@@ -0,0 +1,225 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""
+Add person objects
+
+Create Date: 2016-08-03 10:12:14.902511
+"""
+
+# disable Invalid constant name pylint warning for mandatory Alembic variables.
+# pylint: disable=invalid-name
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '5d3c9a2e1f47'
+down_revision = '3b8c1e4d7a90'
+
+
+# Tables with contact columns, the type of their rows and their columns.
+CONTACT_TABLES = [
+    ("access_groups", "'AccessGroup'", ("contact_id", "secondary_contact_id")),
+    ("assessments", "'Assessment'", ("contact_id", "secondary_contact_id")),
+    ("audits", "'Audit'", ("contact_id", "secondary_contact_id")),
+    ("controls", "'Control'", ("contact_id", "secondary_contact_id",
+                               "principal_assessor_id",
+                               "secondary_assessor_id")),
+    ("data_assets", "'DataAsset'", ("contact_id", "secondary_contact_id")),
+    ("directives", "meta_kind", ("contact_id", "secondary_contact_id")),
+    ("facilities", "'Facility'", ("contact_id", "secondary_contact_id")),
+    ("markets", "'Market'", ("contact_id", "secondary_contact_id")),
+    ("objectives", "'Objective'", ("contact_id", "secondary_contact_id")),
+    ("org_groups", "'OrgGroup'", ("contact_id", "secondary_contact_id")),
+    ("vendors", "'Vendor'", ("contact_id", "secondary_contact_id")),
+    ("products", "'Product'", ("contact_id", "secondary_contact_id")),
+    ("programs", "'Program'", ("contact_id", "secondary_contact_id")),
+    ("projects", "'Project'", ("contact_id", "secondary_contact_id")),
+    ("sections", "'Section'", ("contact_id", "secondary_contact_id")),
+    ("clauses", "'Clause'", ("contact_id", "secondary_contact_id")),
+    ("systems", "CASE WHEN is_biz_process THEN 'Process' ELSE 'System' END",
+     ("contact_id", "secondary_contact_id")),
+    ("issues", "'Issue'", ("contact_id", "secondary_contact_id")),
+    ("risks", "'Risk'", ("contact_id", "secondary_contact_id")),
+    ("threats", "'Threat'", ("contact_id", "secondary_contact_id")),
+    ("task_groups", "'TaskGroup'", ("contact_id", "secondary_contact_id")),
+    ("task_group_tasks", "'TaskGroupTask'",
+     ("contact_id", "secondary_contact_id")),
+    ("cycles", "'Cycle'", ("contact_id", "secondary_contact_id")),
+    ("cycle_task_groups", "'CycleTaskGroup'",
+     ("contact_id", "secondary_contact_id")),
+    ("cycle_task_group_object_tasks", "'CycleTaskGroupObjectTask'",
+     ("contact_id", "secondary_contact_id")),
+]
+
+# Tables of objects people get a role in through their context.
+CONTEXT_TABLES = [
+    ("programs", "Program"),
+    ("audits", "Audit"),
+    ("workflows", "Workflow"),
+]
+
+# Roles of people whose related objects include objects mapped to programs.
+PROGRAM_ROLES = "'ProgramEditor', 'ProgramOwner', 'ProgramReader'"
+
+# Program ids and people with a program role, directly or implied.
+PROGRAM_PEOPLE = """
+    SELECT p.id AS program_id, ur.person_id
+    FROM programs AS p
+    JOIN context_implications AS ci ON p.context_id = ci.{program_context}
+    JOIN user_roles AS ur ON ur.context_id = ci.context_id
+    JOIN roles AS r ON r.id = ur.role_id AND r.name IN ({roles})
+"""
+
+# Assigned objects and assignees of AssigneeType relationships.
+ASSIGNED = """
+    SELECT
+        CASE WHEN rel1.destination_type = 'Person'
+            THEN rel1.destination_id ELSE rel1.source_id END AS person_id,
+        CASE WHEN rel1.destination_type = 'Person'
+            THEN rel1.source_type ELSE rel1.destination_type END AS type,
+        CASE WHEN rel1.destination_type = 'Person'
+            THEN rel1.source_id ELSE rel1.destination_id END AS id,
+        rel1.destination_type
+    FROM relationships AS rel1
+    JOIN relationship_attrs AS attrs ON
+        attrs.relationship_id = rel1.id AND
+        attrs.attr_name = 'AssigneeType'
+"""
+
+
+def _insert(source, query):
+  """Insert (person_id, object_type, object_id) rows of a query."""
+  op.execute("""
+      INSERT IGNORE INTO person_objects (
+          person_id, source, object_type, object_id
+      )
+      SELECT person_id, '{source}', object_type, object_id
+      FROM ({query}) AS person_objects_rows
+      WHERE person_id IS NOT NULL AND
+            object_type IS NOT NULL AND
+            object_id IS NOT NULL
+  """.format(source=source, query=query))
+
+
+def _insert_mapped():
+  _insert("mapped", """
+      SELECT person_id, personable_type AS object_type,
+             personable_id AS object_id
+      FROM object_people
+  """)
+
+
+def _insert_owned(tables):
+  """Insert owned objects, contacts, role objects and mapped objects."""
+  _insert("owned", """
+      SELECT person_id, ownable_type AS object_type, ownable_id AS object_id
+      FROM object_owners
+  """)
+  _insert("owned", """
+      SELECT attribute_object_id AS person_id,
+             attributable_type AS object_type,
+             attributable_id AS object_id
+      FROM custom_attribute_values
+      WHERE attribute_value = 'Person'
+  """)
+  for this, other in (("source", "destination"), ("destination", "source")):
+    _insert("owned", """
+        SELECT {this}_id AS person_id, {other}_type AS object_type,
+               {other}_id AS object_id
+        FROM relationships
+        WHERE {this}_type = 'Person'
+    """.format(this=this, other=other))
+  for table, type_ in CONTEXT_TABLES:
+    if table not in tables:
+      continue
+    _insert("owned", """
+        SELECT ur.person_id, '{type_}' AS object_type, t.id AS object_id
+        FROM {table} AS t
+        JOIN user_roles AS ur ON ur.context_id = t.context_id
+    """.format(table=table, type_=type_))
+  for table, type_, columns in CONTACT_TABLES:
+    if table not in tables:
+      continue
+    for column in columns:
+      _insert("owned", """
+          SELECT {column} AS person_id, {type_} AS object_type,
+                 id AS object_id
+          FROM {table}
+      """.format(table=table, type_=type_, column=column))
+
+
+def _insert_related():
+  """Insert objects related to programs and assignables of people."""
+  program_people = " UNION ".join(
+      PROGRAM_PEOPLE.format(program_context=program_context,
+                            roles=PROGRAM_ROLES)
+      for program_context in ("source_context_id", "context_id"))
+  for side in ("source", "destination"):
+    _insert("related", """
+        SELECT pp.person_id,
+            CASE WHEN rl.destination_type = 'Program'
+                THEN rl.source_type ELSE rl.destination_type END
+                AS object_type,
+            CASE WHEN rl.destination_type = 'Program'
+                THEN rl.source_id ELSE rl.destination_id END AS object_id
+        FROM relationships AS rl
+        JOIN ({program_people}) AS pp ON
+            rl.{side}_type = 'Program' AND rl.{side}_id = pp.program_id
+    """.format(program_people=program_people, side=side))
+    _insert("related", """
+        SELECT pp.person_id, 'Relationship' AS object_type,
+               rl.id AS object_id
+        FROM relationships AS rl
+        JOIN ({program_people}) AS pp ON
+            rl.{side}_type = 'Program' AND rl.{side}_id = pp.program_id
+    """.format(program_people=program_people, side=side))
+
+  _insert("related", """
+      SELECT person_id, type AS object_type, id AS object_id
+      FROM ({assigned}) AS assigned
+  """.format(assigned=ASSIGNED))
+  for side in ("source", "destination"):
+    _insert("related", """
+        SELECT assigned.person_id,
+            CASE WHEN rel2.destination_type = assigned.destination_type
+                THEN rel2.source_type ELSE rel2.destination_type END
+                AS object_type,
+            CASE WHEN rel2.destination_type = assigned.destination_type
+                THEN rel2.source_id ELSE rel2.destination_id END
+                AS object_id
+        FROM ({assigned}) AS assigned
+        JOIN relationships AS rel2 ON
+            rel2.{side}_type = assigned.type AND
+            rel2.{side}_id = assigned.id
+    """.format(assigned=ASSIGNED, side=side))
+
+
+def upgrade():
+  """Upgrade database schema and/or data, creating a new revision."""
+  op.create_table(
+      'person_objects',
+      sa.Column('person_id', sa.Integer(), nullable=False,
+                autoincrement=False),
+      sa.Column('object_type', sa.String(length=250), nullable=False),
+      sa.Column('object_id', sa.Integer(), nullable=False,
+                autoincrement=False),
+      sa.Column('source', sa.String(length=16), nullable=False),
+      sa.PrimaryKeyConstraint(
+          'person_id', 'object_type', 'object_id', 'source'),
+  )
+  op.create_index(
+      'ix_person_objects_object', 'person_objects',
+      ['object_type', 'object_id'], unique=False)
+
+  tables = set(sa.inspect(op.get_bind()).get_table_names())
+  _insert_mapped()
+  _insert_owned(tables)
+  _insert_related()
+
+
+def downgrade():
+  """Downgrade database schema and/or data back to the previous revision."""
+  op.drop_table('person_objects')
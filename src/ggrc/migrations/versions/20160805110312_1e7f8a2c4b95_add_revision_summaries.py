@@ -0,0 +1,43 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""
+Add revision summaries
+
+Create Date: 2016-08-05 11:03:12.418265
+"""
+
+# disable Invalid constant name pylint warning for mandatory Alembic variables.
+# pylint: disable=invalid-name
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '1e7f8a2c4b95'
+down_revision = '5d3c9a2e1f47'
+
+
+def upgrade():
+  """Upgrade database schema and/or data, creating a new revision."""
+  op.add_column('revisions',
+                sa.Column('title', sa.String(length=250), nullable=True))
+  op.add_column('revisions',
+                sa.Column('changed_fields', sa.Text(), nullable=True))
+  op.create_index('ix_revisions_created_at', 'revisions', ['created_at'],
+                  unique=False)
+  op.create_index('ix_revisions_feed_person', 'revisions',
+                  ['modified_by_id', 'created_at'], unique=False)
+  op.create_index('ix_revisions_feed_resource', 'revisions',
+                  ['resource_type', 'resource_id', 'created_at'],
+                  unique=False)
+
+
+def downgrade():
+  """Downgrade database schema and/or data back to the previous revision."""
+  op.drop_index('ix_revisions_feed_resource', table_name='revisions')
+  op.drop_index('ix_revisions_feed_person', table_name='revisions')
+  op.drop_index('ix_revisions_created_at', table_name='revisions')
+  op.drop_column('revisions', 'changed_fields')
+  op.drop_column('revisions', 'title')
@@ -0,0 +1,72 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""
+Store custom attribute values of comments
+
+Create Date: 2016-08-08 09:34:15.284613
+"""
+
+# disable Invalid constant name pylint warning for mandatory Alembic variables.
+# pylint: disable=invalid-name
+
+import json
+
+import sqlalchemy as sa
+from sqlalchemy.sql import column
+from sqlalchemy.sql import table
+
+from alembic import op
+
+from ggrc.migrations.utils.batches import iter_id_batches
+
+# revision identifiers, used by Alembic.
+revision = '4a9d2c7e5b18'
+down_revision = '1e7f8a2c4b95'
+
+
+comments_table = table(
+    'comments',
+    column('id', sa.Integer),
+    column('revision_id', sa.Integer),
+    column('custom_attribute_stored_value', sa.Text),
+)
+
+revisions_table = table(
+    'revisions',
+    column('id', sa.Integer),
+    column('content', sa.Text),
+)
+
+
+def upgrade():
+  """Upgrade database schema and/or data, creating a new revision."""
+  op.add_column('comments', sa.Column('custom_attribute_stored_value',
+                                      sa.Text(), nullable=True))
+
+  connection = op.get_bind()
+  update = comments_table.update().where(
+      comments_table.c.id == sa.bindparam('_id')
+  ).values(custom_attribute_stored_value=sa.bindparam('_value'))
+  for low, high in iter_id_batches(
+          connection, comments_table, batch_size=1000,
+          where=comments_table.c.revision_id.isnot(None)):
+    rows = connection.execute(
+        sa.select([comments_table.c.id, revisions_table.c.content])
+        .select_from(comments_table.join(
+            revisions_table,
+            revisions_table.c.id == comments_table.c.revision_id))
+        .where(comments_table.c.id > low)
+        .where(comments_table.c.id <= high))
+    values = []
+    for id_, content in rows:
+      value = json.loads(content).get('attribute_value')
+      if value is not None:
+        values.append({'_id': id_, '_value': value})
+    if values:
+      connection.execute(update, values)
+
+
+def downgrade():
+  """Downgrade database schema and/or data back to the previous revision."""
+  op.drop_column('comments', 'custom_attribute_stored_value')
@@ -1,6 +1,21 @@
 # Copyright (C) 2016 Google Inc.
 # Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
 
+from sqlalchemy import inspect
+
+
+def changed_fields(obj):
+  """Get sorted names of attributes changed on obj since it was loaded.
+
+  Only attributes with pending history are inspected and no SQL is emitted,
+  so this is cheap enough to run for every dirty object of a flush.
+  """
+  state = inspect(obj)
+  return sorted(key for key in state.committed_state
+                if key in state.attrs and
+                state.attrs[key].history.has_changes())
+
+
 class Cache:
   """
   Tracks modified objects in the session distinguished by
@@ -24,6 +39,7 @@ class Cache:
     for o in dirty - set(self.new) - set(self.deleted):
       if hasattr(o, 'log_json'):
         self.dirty[o] = o.log_json()
+        self.changes.setdefault(o, set()).update(changed_fields(o))
 
   def update_after_flush(self, session, flush_context):
     """
@@ -43,10 +59,12 @@ class Cache:
     self.new = {}
     self.dirty = {}
     self.deleted = {}
+    self.changes = {}
 
   def copy(self):
     copied_cache = Cache()
     copied_cache.new = dict(self.new)
     copied_cache.dirty = dict(self.dirty)
     copied_cache.deleted = dict(self.deleted)
+    copied_cache.changes = dict(self.changes)
     return copied_cache
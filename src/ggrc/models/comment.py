@@ -3,10 +3,13 @@
 
 """Module containing comment model and comment related mixins."""
 
+from sqlalchemy import event
 from sqlalchemy import orm
 from sqlalchemy.orm import validates
+from sqlalchemy.orm.session import Session
 
 from ggrc import db
+from ggrc.models import touched
 from ggrc.models.computed_property import computed_property
 from ggrc.models.deferred import deferred
 from ggrc.models.revision import Revision
@@ -99,6 +102,12 @@ class Comment(Relatable, Described, Documentable, Ownable, Base, db.Model):
       'CustomAttributeDefinition',
       uselist=False,
   )
+  # Value of the custom attribute stored when the comment is linked to the
+  # revision, so that comments can be shown without loading revisions.
+  custom_attribute_stored_value = deferred(
+      db.Column(db.Text, nullable=True), 'Comment')
+
+  _LINK_CA_REVISION = "link_custom_attribute_revision"
 
   # REST properties
   _publish_attrs = [
@@ -119,7 +128,6 @@ class Comment(Relatable, Described, Documentable, Ownable, Base, db.Model):
   def eager_query(cls):
     query = super(Comment, cls).eager_query()
     return query.options(
-        orm.joinedload('revision'),
         orm.joinedload('custom_attribute_definition')
            .undefer_group('CustomAttributeDefinition_complete'),
     )
@@ -127,10 +135,14 @@ class Comment(Relatable, Described, Documentable, Ownable, Base, db.Model):
   @computed_property
   def custom_attribute_revision(self):
     """Get the historical value of the relevant CA value."""
-    if not self.revision:
+    if self.revision_id is None:
       return None
-    revision = self.revision.content
-    cav_stored_value = revision['attribute_value']
+    cav_stored_value = self.custom_attribute_stored_value
+    if cav_stored_value is None:
+      # Comments linked before the value was stored with them.
+      if not self.revision:
+        return None
+      cav_stored_value = self.revision.content['attribute_value']
     cad = self.custom_attribute_definition
     return {
         'custom_attribute': {
@@ -141,23 +153,68 @@ class Comment(Relatable, Described, Documentable, Ownable, Base, db.Model):
     }
 
   def custom_attribute_revision_upd(self, value):
-    """Create a Comment-CA mapping with current CA value stored."""
+    """Create a Comment-CA mapping with current CA value stored.
+
+    The revision of the CA value is looked up before the next flush, together
+    with the revisions of all other comments linked in the same session.
+    """
     ca_revision_dict = value.get('custom_attribute_revision_upd')
     if not ca_revision_dict:
       return
     ca_val_dict = self._get_ca_value(ca_revision_dict)
 
-    ca_val_id = ca_val_dict['id']
-    ca_val_revision = Revision.query.filter_by(
-        resource_type='CustomAttributeValue',
-        resource_id=ca_val_id,
-        action='created',
-    ).one()
+    # pylint: disable=attribute-defined-outside-init
+    self._custom_attribute_value_id = int(ca_val_dict['id'])
+    touched.add(self._LINK_CA_REVISION, self)
 
-    self.revision_id = ca_val_revision.id
-    self.custom_attribute_definition_id = ca_val_revision.content.get(
-        'custom_attribute_id',
-    )
+  @classmethod
+  def link_custom_attribute_revisions(cls, comments, session=None):
+    """Link comments to the revisions of their CA values with one query.
+
+    Args:
+      comments: comments with the id of a CA value set by
+        custom_attribute_revision_upd.
+      session: session to run the query in, db.session by default.
+    """
+    comments = [comment for comment in comments
+                if getattr(comment, "_custom_attribute_value_id", None)]
+    if not comments:
+      return
+    session = session or db.session
+    ca_val_ids = {comment._custom_attribute_value_id for comment in comments}
+    revisions = {}
+    for revision in session.query(
+        Revision.id, Revision.resource_id, Revision.content
+    ).filter(
+        Revision.resource_type == 'CustomAttributeValue',
+        Revision.resource_id.in_(ca_val_ids),
+        Revision.action == 'created',
+    ).order_by(Revision.id):
+      revisions.setdefault(revision.resource_id, revision)
+
+    for comment in comments:
+      ca_val_id = comment._custom_attribute_value_id
+      revision = revisions.get(ca_val_id)
+      if revision is None:
+        raise ValueError("No revision found for custom attribute value {}"
+                         .format(ca_val_id))
+      comment.revision_id = revision.id
+      comment.custom_attribute_definition_id = revision.content.get(
+          'custom_attribute_id',
+      )
+      comment.custom_attribute_stored_value = revision.content.get(
+          'attribute_value',
+      )
+      del comment._custom_attribute_value_id
+
+  @classmethod
+  def link_revisions_before_flush(cls, session, flush_context, instances):
+    """Link comments marked by custom_attribute_revision_upd."""
+    # pylint: disable=unused-argument
+    comments = [comment for comment in touched.pop(session,
+                                                   cls._LINK_CA_REVISION)
+                if comment in session]
+    cls.link_custom_attribute_revisions(comments, session)
 
   @staticmethod
   def _get_ca_value(ca_revision_dict):
@@ -171,3 +228,6 @@ class Comment(Relatable, Described, Documentable, Ownable, Base, db.Model):
       raise ValueError("CA value id expected under 'id': {}"
                        .format(ca_val_dict))
     return ca_val_dict
+
+
+event.listen(Session, 'before_flush', Comment.link_revisions_before_flush)
@@ -5,11 +5,13 @@
 
 from ggrc.models.hooks import assessment
 from ggrc.models.hooks import comment
+from ggrc.models.hooks import relationship_adjacency
 
 
 ALL_HOOKS = [
     assessment,
     comment,
+    relationship_adjacency,
 ]
 
 
@@ -0,0 +1,15 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Hooks that keep the relationship adjacency index up to date."""
+
+from sqlalchemy import event
+from sqlalchemy.orm.session import Session
+
+from ggrc.models import relationship_adjacency
+
+
+def init_hook():
+  """Initialize all hooks"""
+  event.listen(Session, 'after_flush',
+               relationship_adjacency.update_index_after_flush)
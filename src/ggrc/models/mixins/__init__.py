@@ -17,6 +17,7 @@ color
 # documentatio, are reported as false positives by pylint.
 
 from uuid import uuid1
+import collections
 import datetime
 
 from flask import current_app
@@ -29,6 +30,7 @@ from sqlalchemy.orm.session import Session
 
 from ggrc import db
 from ggrc.models import reflection
+from ggrc.models import touched
 from ggrc.models.computed_property import computed_property
 from ggrc.models.deferred import deferred
 from ggrc.models.inflector import ModelInflectorDescriptor
@@ -494,6 +496,9 @@ class Slugged(Base):
       )
     return ()
 
+  # Key of new instances whose placeholder slug has to be replaced
+  _REPLACE_SLUG = "replace_slug"
+
   # REST properties
   _publish_attrs = ['slug']
   _fulltext_attrs = ['slug']
@@ -523,6 +528,27 @@ class Slugged(Base):
       _id += INCREMENT
       obj.slug = "{0}-{1}".format(cls.generate_slug_prefix_for(obj), _id)
 
+  @classmethod
+  def generate_slugs_for(cls, objects):
+    """Generate slugs for many objects with one lookup per class.
+
+    Objects whose default slug is already taken fall back to
+    generate_slug_for.
+    """
+    by_class = collections.defaultdict(list)
+    for obj in objects:
+      by_class[obj.__class__].append(obj)
+    with db.session.no_autoflush:
+      for model, instances in by_class.iteritems():
+        for obj in instances:
+          obj.slug = "{0}-{1}".format(model.generate_slug_prefix_for(obj),
+                                      obj.id)
+        taken = {slug for slug, in db.session.query(model.slug).filter(
+            model.slug.in_([obj.slug for obj in instances]))}
+        for obj in instances:
+          if obj.slug in taken:
+            model.generate_slug_for(obj)
+
   @classmethod
   def generate_slug_prefix_for(cls, obj):
     return obj.__class__.__name__.upper()
@@ -535,17 +561,15 @@ class Slugged(Base):
     for o in session.new:
       if isinstance(o, Slugged) and (o.slug is None or o.slug == ''):
         o.slug = str(uuid1())
-        o._replace_slug = True
+        touched.add(cls._REPLACE_SLUG, o, session)
 
   @classmethod
   def ensure_slug_after_flush_postexec(cls, session, flush_context):
     """Replace the placeholder slug with a real slug that will be set on the
     next flush/commit.
     """
-    for o in session.identity_map.values():
-      if isinstance(o, Slugged) and hasattr(o, '_replace_slug'):
-        o.generate_slug_for(o)
-        delattr(o, '_replace_slug')
+    cls.generate_slugs_for([o for o in touched.pop(session, cls._REPLACE_SLUG)
+                            if o in session])
 
 event.listen(Session, 'before_flush', Slugged.ensure_slug_before_flush)
 event.listen(
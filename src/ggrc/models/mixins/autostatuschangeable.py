@@ -11,6 +11,7 @@ from sqlalchemy.orm.session import Session
 
 from ggrc import db
 from ggrc.models import relationship
+from ggrc.models import touched
 from ggrc.models import object_document
 from ggrc.services import common
 from ggrc.services import signals
@@ -28,6 +29,9 @@ class AutoStatusChangeable(object):
   __lazy_init__ = True
   _tracked_attrs = set()
 
+  # Key of instances whose status has to be reset on the next flush
+  _NEED_STATUS_RESET = "need_status_reset"
+
   FIRST_CLASS_EDIT = ({statusable.Statusable.START_STATE} |
                       statusable.Statusable.END_STATES)
   ASSIGNABLE_EDIT = statusable.Statusable.END_STATES
@@ -111,8 +115,8 @@ class AutoStatusChangeable(object):
 
     Performs check whether object received first class edit (ordinary edit)
     that should transition object to PROGRESS_STATE from either: START_STATE
-    or one of END_STATES and sets obj._need_status_reset to True if the state
-    transition is needed.
+    or one of END_STATES and records the object for a status reset on the next
+    flush if the state transition is needed.
 
     Args:
       model: (db.Model class) Class from which to read FIRST_CLASS_EDIT
@@ -123,25 +127,23 @@ class AutoStatusChangeable(object):
       method: (string) HTTP method used that triggered signal
     """
 
-    # pylint: disable=unused-argument,protected-access
+    # pylint: disable=unused-argument
 
     if obj.status in model.FIRST_CLASS_EDIT:
-      obj._need_status_reset = True
+      touched.add(cls._NEED_STATUS_RESET, obj)
 
   @classmethod
   def adjust_status_before_flush(cls, session, flush_context, instances):
-    """Reset status of AutoStatusChangeable objects with _need_status_reset.
+    """Reset status of AutoStatusChangeable objects recorded for a reset.
 
     Is registered to listen for 'before_flush' events on a later stage.
     """
 
     # pylint: disable=unused-argument
 
-    for obj in session.identity_map.values():
-      if (isinstance(obj, AutoStatusChangeable) and
-              getattr(obj, '_need_status_reset', False)):
+    for obj in touched.pop(session, cls._NEED_STATUS_RESET):
+      if obj in session:
         cls.adjust_status(type(obj), obj)
-        delattr(obj, '_need_status_reset')
 
   @classmethod
   def handle_person_edit(cls, model, obj, rel, method):
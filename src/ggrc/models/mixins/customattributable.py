@@ -219,7 +219,9 @@ class CustomAttributable(object):
     This code should only be used for custom attribute definitions until
     setter for that is updated.
     """
+    from ggrc.fulltext.counts_cache import invalidate_after_commit
     from ggrc.fulltext.mysql import MysqlRecordProperty
+    from ggrc.models import relationship_adjacency
     from ggrc.models.custom_attribute_value import CustomAttributeValue
     from ggrc.services import signals
 
@@ -274,11 +276,15 @@ class CustomAttributable(object):
                   MysqlRecordProperty.type == self.__class__.__name__,
                   MysqlRecordProperty.property.in_(ftrp_properties)))\
           .delete(synchronize_session='fetch')
+      invalidate_after_commit(db.session())
 
-      # 3) Delete the list of custom attribute values
+      # 3) Delete the list of custom attribute values and the adjacency
+      #    index entries of those that were object mappings
       db.session.query(CustomAttributeValue)\
           .filter(CustomAttributeValue.id.in_(attr_value_ids))\
           .delete(synchronize_session='fetch')
+      relationship_adjacency.delete_edges(
+          db.session.connection(), "custom_attribute", attr_value_ids)
 
       db.session.commit()
 
@@ -56,7 +56,7 @@ class ValidateOnComplete(object):
     query = super(ValidateOnComplete, cls).eager_query()
     return query.options(
         orm.subqueryload('_related_comments')
-           .joinedload('revision'),
+           .undefer_group('Comment_complete'),
     )
 
   def _get_custom_attributes_comments(self):
@@ -116,8 +116,7 @@ class ValidateOnComplete(object):
       self._definition_value_map = {int(cav.custom_attribute_id): cav
                                     for cav in self.custom_attribute_values}
       self._ca_comment_map = {
-          int(comment.revision
-              .content['custom_attribute_id']): comment
+          comment.custom_attribute_definition_id: comment
           for comment in comments
       }
       for cad in self.custom_attribute_definitions:
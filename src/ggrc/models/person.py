@@ -2,7 +2,12 @@
 # Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
 
 import re
+
+from flask import has_request_context
+from flask import request
+from sqlalchemy import event
 from sqlalchemy.orm import validates
+from sqlalchemy.orm.session import Session
 
 from ggrc import db
 from ggrc import settings
@@ -146,8 +151,53 @@ class Person(CustomAttributable, CustomAttributeMapable, HasOwnContext,
     """
     # FIXME: This method should be in `ggrc_basic_permissions`, since it
     #   depends on `Role` and `UserRole` objects
+    if self.id is None:
+      return self.system_wide_role_from(
+          self.email, [user_role.role.name for user_role in self.user_roles])
+    return self.system_wide_roles([self])[self.id]
+
+  @classmethod
+  def system_wide_roles(cls, people):
+    """Get system wide roles of many people with a single query.
+
+    The roles are cached for the current request and dropped when any role
+    assignment is flushed.
+
+    Args:
+      people: Person objects with ids.
+
+    Returns:
+      dict with the system wide role of each person id.
+    """
+    from ggrc_basic_permissions.models import Role, UserRole
+    cache = _get_role_cache()
+    people = {person.id: person for person in people
+              if person.id not in cache}
+    if people:
+      role_names = {person_id: [] for person_id in people}
+      rows = db.session.query(UserRole.person_id, Role.name).join(
+          Role, Role.id == UserRole.role_id
+      ).filter(UserRole.person_id.in_(people.keys()))
+      for person_id, role_name in rows:
+        role_names[person_id].append(role_name)
+      for person_id, person in people.iteritems():
+        cache[person_id] = cls.system_wide_role_from(
+            person.email, role_names[person_id])
+    return cache
+
+  @classmethod
+  def prefetch_for_publish(cls, people):
+    cls.system_wide_roles(people)
+
+  @staticmethod
+  def system_wide_role_from(email, role_names):
+    """Get the system wide role of a person from the names of their roles.
 
-    if self.email in getattr(settings, "BOOTSTRAP_ADMIN_USERS", []):
+    Args:
+      email: email of the person.
+      role_names: names of all roles assigned to the person.
+    """
+    if email in getattr(settings, "BOOTSTRAP_ADMIN_USERS", []):
       return u"Superuser"
 
     role_hierarchy = {
@@ -156,11 +206,7 @@ class Person(CustomAttributable, CustomAttributeMapable, HasOwnContext,
         u'Reader': 2,
         u'Creator': 3,
     }
-    unique_roles = set([
-        user_role.role.name
-        for user_role in self.user_roles
-        if user_role.role.name in role_hierarchy
-    ])
+    unique_roles = set(name for name in role_names if name in role_hierarchy)
     if len(unique_roles) == 0:
       return u"No Access"
     else:
@@ -169,3 +215,24 @@ class Person(CustomAttributable, CustomAttributeMapable, HasOwnContext,
       sorted_roles = sorted(unique_roles,
                             key=lambda x: role_hierarchy.get(x, -1))
       return sorted_roles[0]
+
+
+def _get_role_cache():
+  """Get the system wide roles cache of the current request."""
+  if not has_request_context():
+    return {}
+  if not hasattr(request, "system_wide_roles"):
+    request.system_wide_roles = {}
+  return request.system_wide_roles
+
+
+def _clear_role_cache(session, _):
+  """Drop cached system wide roles when role assignments change."""
+  if not has_request_context() or not hasattr(request, "system_wide_roles"):
+    return
+  for obj in session.new | session.dirty | session.deleted:
+    if obj.__class__.__name__ == "UserRole":
+      request.system_wide_roles = {}
+      return
+
+event.listen(Session, "after_flush", _clear_role_cache)
@@ -0,0 +1,301 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Materialized adjacency index for generic object mappings.
+
+Every mapping row that links two arbitrary objects (relationships, object
+owners, object people and mapping custom attribute values) is stored here
+twice, once for each direction. This turns the "which objects of type X are
+related to these objects of type Y" question into a single indexed lookup
+instead of a union of subqueries over all mapping tables.
+
+The index is maintained write-through from the session flush hooks and from
+the few places that write mapping rows with raw SQL. It can be rebuilt from
+scratch with `rebuild`.
+"""
+
+import collections
+
+from sqlalchemy import and_
+from sqlalchemy import literal
+from sqlalchemy import tuple_
+from sqlalchemy.orm import attributes
+from sqlalchemy.sql.expression import select
+
+from ggrc import db
+from ggrc.models.custom_attribute_value import CustomAttributeValue
+from ggrc.models.object_owner import ObjectOwner
+from ggrc.models.object_person import ObjectPerson
+from ggrc.models.relationship import Relationship
+
+
+class RelationshipAdjacency(db.Model):
+  """Directed edge between two objects.
+
+  `via` names the mapping table the edge comes from and `via_id` is the id of
+  the row in that table, so that edges can be removed together with the row
+  that created them.
+  """
+  # pylint: disable=too-few-public-methods
+
+  __tablename__ = 'relationship_adjacency'
+
+  via = db.Column(db.String(32), primary_key=True)
+  via_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+  object_type = db.Column(db.String(250), primary_key=True)
+  object_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+  related_type = db.Column(db.String(250), nullable=False)
+  related_id = db.Column(db.Integer, nullable=False)
+
+  __table_args__ = (
+      db.Index('ix_relationship_adjacency_related',
+               'related_type', 'object_type', 'related_id', 'object_id'),
+  )
+
+
+Edge = collections.namedtuple(
+    "Edge", ["via", "via_id", "object_type", "object_id",
+             "related_type", "related_id"])
+
+
+class AdjacencySource(object):
+  """Description of a mapping table that feeds the adjacency index.
+
+  Attributes:
+    via: short name stored in the `via` column of the index.
+    model: mapping model class.
+    left: (type column name, id column name) of the first mapped object. A
+      type prefixed with "=" is a constant type name instead of a column.
+    right: (type column name, id column name) of the second mapped object.
+    condition: optional filter with `check` (for column values) and `clause`
+      (for the table) methods that selects the rows representing a mapping.
+  """
+
+  def __init__(self, via, model, left, right, condition=None):
+    self.via = via
+    self.model = model
+    self.left = left
+    self.right = right
+    self.condition = condition
+
+  def _side(self, values, side):
+    type_attr, id_attr = side
+    if type_attr.startswith("="):
+      return type_attr[1:], values[id_attr]
+    return values[type_attr], values[id_attr]
+
+  def _columns(self):
+    names = {self.left[1], self.right[1]}
+    names.update(attr for attr, _ in (self.left, self.right)
+                 if not attr.startswith("="))
+    return names
+
+  def applies_to(self, values):
+    """Check whether a row with given column values is a mapping."""
+    if self.condition is not None and not self.condition.check(values):
+      return False
+    return all(values.get(name) is not None for name in self._columns())
+
+  def edges(self, via_id, values):
+    """Get both directed edges for a mapping row."""
+    if not self.applies_to(values):
+      return []
+    left_type, left_id = self._side(values, self.left)
+    right_type, right_id = self._side(values, self.right)
+    return [
+        Edge(self.via, via_id, left_type, int(left_id),
+             right_type, int(right_id)),
+        Edge(self.via, via_id, right_type, int(right_id),
+             left_type, int(left_id)),
+    ]
+
+  def current_values(self, obj):
+    return {name: getattr(obj, name) for name in self._columns()}
+
+  def _select_side(self, from_side, to_side):
+    table = self.model.__table__
+
+    def type_column(side):
+      if side[0].startswith("="):
+        return literal(side[0][1:])
+      return table.c[side[0]]
+
+    query = select([
+        literal(self.via),
+        table.c.id,
+        type_column(from_side),
+        table.c[from_side[1]],
+        type_column(to_side),
+        table.c[to_side[1]],
+    ])
+    if self.condition is not None:
+      query = query.where(self.condition.clause(table))
+    return query
+
+  def selects(self):
+    """Get INSERT ... SELECT sources for both edge directions."""
+    return [self._select_side(self.left, self.right),
+            self._select_side(self.right, self.left)]
+
+
+class ObjectMappingCondition(object):
+  """Filter for custom attribute values that map to an object."""
+
+  @staticmethod
+  def check(values):
+    return values.get("attribute_object_id") is not None
+
+  @staticmethod
+  def clause(table):
+    return table.c.attribute_object_id.isnot(None)
+
+
+SOURCES = [
+    AdjacencySource(
+        "relationship", Relationship,
+        ("source_type", "source_id"),
+        ("destination_type", "destination_id")),
+    AdjacencySource(
+        "owner", ObjectOwner,
+        ("=Person", "person_id"),
+        ("ownable_type", "ownable_id")),
+    AdjacencySource(
+        "object_person", ObjectPerson,
+        ("=Person", "person_id"),
+        ("personable_type", "personable_id")),
+    AdjacencySource(
+        "custom_attribute", CustomAttributeValue,
+        ("attributable_type", "attributable_id"),
+        ("attribute_value", "attribute_object_id"),
+        condition=ObjectMappingCondition),
+]
+
+SOURCES_BY_MODEL = {source.model: source for source in SOURCES}
+
+
+def get_related_ids_query(object_type, related_type, related_ids):
+  """Get query for ids of object_type objects mapped to related objects."""
+  return db.session.query(RelationshipAdjacency.object_id).filter(and_(
+      RelationshipAdjacency.related_type == related_type,
+      RelationshipAdjacency.object_type == object_type,
+      RelationshipAdjacency.related_id.in_(related_ids),
+  ))
+
+
+def get_related_objects_query(related_type, related_id, types=None,
+                              via=None):
+  """Get query for (type, id) pairs of objects mapped to the given object."""
+  query = db.session.query(
+      RelationshipAdjacency.object_type,
+      RelationshipAdjacency.object_id,
+  ).filter(
+      RelationshipAdjacency.related_type == related_type,
+      RelationshipAdjacency.related_id == related_id,
+  )
+  if types is not None:
+    query = query.filter(RelationshipAdjacency.object_type.in_(types))
+  if via is not None:
+    query = query.filter(RelationshipAdjacency.via == via)
+  return query
+
+
+def insert_edges(connection, edges):
+  """Insert edges into the index, ignoring the ones that already exist."""
+  rows = [edge._asdict() for edge in set(edges)]
+  if not rows:
+    return
+  inserter = RelationshipAdjacency.__table__.insert().prefix_with("IGNORE")
+  connection.execute(inserter, rows)
+
+
+def delete_edges(connection, via, via_ids):
+  """Remove all edges created by the given mapping rows."""
+  via_ids = [via_id for via_id in via_ids if via_id is not None]
+  if not via_ids:
+    return
+  table = RelationshipAdjacency.__table__
+  connection.execute(table.delete().where(and_(
+      table.c.via == via,
+      table.c.via_id.in_(via_ids),
+  )))
+
+
+def index_relationship_pairs(connection, pairs):
+  """Index relationships created with raw SQL.
+
+  Args:
+    connection: connection to use for the queries.
+    pairs: iterable of ((src_type, src_id), (dst_type, dst_id)) tuples.
+  """
+  pairs = [(src_type, src_id, dst_type, dst_id)
+           for (src_type, src_id), (dst_type, dst_id) in pairs]
+  if not pairs:
+    return
+  table = Relationship.__table__
+  rows = connection.execute(select([
+      table.c.id, table.c.source_type, table.c.source_id,
+      table.c.destination_type, table.c.destination_id,
+  ]).where(tuple_(
+      table.c.source_type, table.c.source_id,
+      table.c.destination_type, table.c.destination_id,
+  ).in_(pairs)))
+  source = SOURCES_BY_MODEL[Relationship]
+  edges = []
+  for row in rows:
+    edges.extend(source.edges(row.id, dict(row.items())))
+  insert_edges(connection, edges)
+
+
+def _previous_values(source, obj):
+  """Get column values an instance had before the current flush."""
+  values = {}
+  for name in source._columns():  # pylint: disable=protected-access
+    history = attributes.get_history(obj, name)
+    if history.deleted:
+      values[name] = history.deleted[0]
+    elif history.unchanged:
+      values[name] = history.unchanged[0]
+    else:
+      values[name] = getattr(obj, name)
+  return values
+
+
+def update_index_after_flush(session, _):
+  """Write all mapping changes of the current flush to the index."""
+  deleted = collections.defaultdict(set)
+  edges = []
+  for obj in session.new:
+    source = SOURCES_BY_MODEL.get(type(obj))
+    if source is not None:
+      edges.extend(source.edges(obj.id, source.current_values(obj)))
+  for obj in session.dirty:
+    source = SOURCES_BY_MODEL.get(type(obj))
+    if source is None or not session.is_modified(obj):
+      continue
+    if _previous_values(source, obj) == source.current_values(obj):
+      continue
+    deleted[source.via].add(obj.id)
+    edges.extend(source.edges(obj.id, source.current_values(obj)))
+  for obj in session.deleted:
+    source = SOURCES_BY_MODEL.get(type(obj))
+    if source is not None:
+      deleted[source.via].add(obj.id)
+  if not deleted and not edges:
+    return
+  connection = session.connection()
+  for via, via_ids in deleted.iteritems():
+    delete_edges(connection, via, via_ids)
+  insert_edges(connection, edges)
+
+
+def rebuild():
+  """Recreate the whole adjacency index from the mapping tables."""
+  table = RelationshipAdjacency.__table__
+  columns = ["via", "via_id", "object_type", "object_id",
+             "related_type", "related_id"]
+  db.session.execute(table.delete())
+  for source in SOURCES:
+    for query in source.selects():
+      db.session.execute(
+          table.insert().prefix_with("IGNORE").from_select(columns, query))
+  db.session.commit()
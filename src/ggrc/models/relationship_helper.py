@@ -1,7 +1,6 @@
 # Copyright (C) 2016 Google Inc.
 # Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
 
-from sqlalchemy import and_
 from sqlalchemy import sql
 
 from ggrc import db
@@ -9,6 +8,7 @@ from ggrc.extensions import get_extension_modules
 from ggrc import models
 from ggrc.models import Audit
 from ggrc.models import Request
+from ggrc.models import relationship_adjacency
 from ggrc.models.relationship import Relationship
 from ggrc.models import all_models
 
@@ -134,17 +134,25 @@ class RelationshipHelper(object):
 
   @classmethod
   def get_special_mappings(cls, object_type, related_type, related_ids):
+    """Get queries for mappings that are not in the adjacency index.
+
+    Mappings stored in relationships, object owners, object people and
+    mapping custom attribute values are served from the adjacency index, see
+    `get_adjacency_mappings`.
+    """
     return [
         cls.audit_request(object_type, related_type, related_ids),
-        cls.person_object(object_type, related_type, related_ids),
-        cls.person_ownable(object_type, related_type, related_ids),
         cls.person_withcontact(object_type, related_type, related_ids),
         cls.program_audit(object_type, related_type, related_ids),
         cls.program_risk_assessment(object_type, related_type, related_ids),
         cls.task_group_object(object_type, related_type, related_ids),
-        cls.custom_attribute_mapping(object_type, related_type, related_ids),
     ]
 
+  @classmethod
+  def get_adjacency_mappings(cls, object_type, related_type, related_ids):
+    return [relationship_adjacency.get_related_ids_query(
+        object_type, related_type, related_ids)]
+
   @classmethod
   def get_extension_mappings(cls, object_type, related_type, related_ids):
     queries = []
@@ -180,22 +188,8 @@ class RelationshipHelper(object):
     if not related_ids:
       return db.session.query(Relationship.source_id).filter(sql.false())
 
-    destination_ids = db.session.query(Relationship.destination_id).filter(
-        and_(
-            Relationship.destination_type == object_type,
-            Relationship.source_type == related_type,
-            Relationship.source_id.in_(related_ids),
-        )
-    )
-    source_ids = db.session.query(Relationship.source_id).filter(
-        and_(
-            Relationship.source_type == object_type,
-            Relationship.destination_type == related_type,
-            Relationship.destination_id.in_(related_ids),
-        )
-    )
-
-    queries = [destination_ids, source_ids]
+    queries = cls.get_adjacency_mappings(
+        object_type, related_type, related_ids)
     queries.extend(cls.get_extension_mappings(
         object_type, related_type, related_ids))
     queries.extend(cls.get_special_mappings(
@@ -21,6 +21,11 @@ class Revision(Base, db.Model):
                      nullable=False)
   content = db.Column(JsonType, nullable=False)
 
+  # Compact summary of the change, computed when the revision is written so
+  # that the activity feed does not need to load the content snapshot.
+  title = db.Column(db.String, nullable=True)
+  changed_fields = db.Column(JsonType, nullable=True)
+
   source_type = db.Column(db.String, nullable=True)
   source_id = db.Column(db.Integer, nullable=True)
   destination_type = db.Column(db.String, nullable=True)
@@ -34,6 +39,10 @@ class Revision(Base, db.Model):
         db.Index("fk_revisions_source", "source_type", "source_id"),
         db.Index("fk_revisions_destination",
                  "destination_type", "destination_id"),
+        db.Index("ix_revisions_created_at", "created_at"),
+        db.Index("ix_revisions_feed_person", "modified_by_id", "created_at"),
+        db.Index("ix_revisions_feed_resource",
+                 "resource_type", "resource_id", "created_at"),
     )
 
   _publish_attrs = [
@@ -46,8 +55,15 @@ class Revision(Base, db.Model):
       'action',
       'content',
       'description',
+      'title',
+      'changed_fields',
   ]
 
+  TITLE_LENGTH = 250
+
+  # Attributes set on every change that are left out of changed_fields.
+  IGNORED_FIELDS = frozenset(["updated_at", "modified_by", "modified_by_id"])
+
   @classmethod
   def eager_query(cls):
     from sqlalchemy import orm
@@ -58,12 +74,16 @@ class Revision(Base, db.Model):
         orm.subqueryload('event'),  # used in description
     )
 
-  def __init__(self, obj, modified_by_id, action, content):
+  def __init__(self, obj, modified_by_id, action, content,
+               changed_fields=None):
     self.resource_id = obj.id
     self.modified_by_id = modified_by_id
     self.resource_type = str(obj.__class__.__name__)
     self.action = action
     self.content = content
+    self.title = (content.get("display_name") or "")[:self.TITLE_LENGTH]
+    if changed_fields is not None:
+      self.changed_fields = sorted(set(changed_fields) - self.IGNORED_FIELDS)
 
     for attr in ["source_type",
                  "source_id",
@@ -0,0 +1,46 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Registry of instances that flush hooks have to process.
+
+Flush hooks used to find the instances marked by mixins by scanning the
+whole session identity map, so every flush cost time proportional to the
+number of loaded objects. Mixins now record the instances they mark in the
+session info under a key of their own, and the hooks pop only those.
+
+Instances are held with weak references, so marking an instance does not
+keep it alive after the session releases it.
+"""
+
+import weakref
+
+from sqlalchemy.orm import object_session
+
+from ggrc import db
+
+
+_INFO_KEY = "ggrc_touched_instances"
+
+
+def _registry(session):
+  return session.info.setdefault(_INFO_KEY, {})
+
+
+def add(key, obj, session=None):
+  """Record an instance for the flush hooks that use the key.
+
+  Args:
+    key: name of the hook or mixin that will process the instance.
+    obj: instance to record.
+    session: session of the instance, its own or the current session by
+      default.
+  """
+  if session is None:
+    session = object_session(obj) or db.session()
+  _registry(session).setdefault(key, weakref.WeakSet()).add(obj)
+
+
+def pop(session, key):
+  """Get and forget all instances recorded for the key."""
+  instances = _registry(session).pop(key, None)
+  return list(instances) if instances else []
@@ -39,6 +39,7 @@ from ggrc.models.exceptions import ValidationError, translate_message
 from ggrc.rbac import permissions, context_query_filter
 from .attribute_query import AttributeQueryBuilder
 from ggrc.models.background_task import BackgroundTask, create_task
+from ggrc.services import fragments
 from ggrc import settings
 
 
@@ -322,7 +323,8 @@ def log_event(session, obj=None, current_user_id=None, flush=True):
     current_user_id = get_current_user_id()
   cache = get_cache()
   for o in cache.dirty:
-    revision = Revision(o, current_user_id, 'modified', o.log_json())
+    revision = Revision(o, current_user_id, 'modified', o.log_json(),
+                        cache.changes.get(o, ()))
     revisions.append(revision)
   for o in cache.deleted:
     revision = Revision(o, current_user_id, 'deleted', o.log_json())
@@ -626,6 +628,8 @@ class Resource(ModelView):
   By default will only support the `application/json` content-type.
   """
 
+  MAX_CHUNK_SIZE = 1000
+
   signals = Namespace()
   model_posted = signals.signal(
       "Model POSTed",
@@ -839,7 +843,8 @@ class Resource(ModelView):
           'Required attribute "{0}" not found'.format(
               root_attribute), 400, []))
     with benchmark("Deserialize object"):
-      self.json_update(obj, src)
+      with ggrc.builder.json.prefetched_references([src]):
+        self.json_update(obj, src)
     obj.modified_by_id = get_current_user_id()
     db.session.add(obj)
     with benchmark("Send PUTed event"):
@@ -971,6 +976,11 @@ class Resource(ModelView):
     database_objs = {}
     if len(database_matches) > 0:
       database_objs = self.get_resources_from_database(matches)
+      if getattr(settings, 'MEMCACHE_JSON_FRAGMENTS', False):
+        with benchmark("Encode resources"):
+          database_objs = {
+              match: fragments.make_entry(obj)
+              for match, obj in database_objs.iteritems()}
       if self.has_cache():
         with benchmark("Add resources to cache"):
           self.add_resources_to_cache(database_objs)
@@ -1010,13 +1020,23 @@ class Resource(ModelView):
             'context_id': m[2]
         } for m in matches]
 
+      elif self.use_json_fragments():
+        cache_objs, database_objs = self.get_matched_resources(matches)
+        with benchmark("Collect readable fragments"):
+          body = self.build_collection_body(
+              matches, cache_objs, database_objs, extras)
+        cache_op = 'Hit' if len(cache_objs) > 0 else 'Miss'
+        with benchmark("Make response"):
+          return self.json_fragments_response(
+              body, self.collection_last_modified(), cache_op=cache_op)
+
       else:
         cache_objs, database_objs = self.get_matched_resources(matches)
         objs = {}
         objs.update(cache_objs)
         objs.update(database_objs)
 
-        objs = [objs[m] for m in matches if m in objs]
+        objs = [fragments.to_resource(objs[m]) for m in matches if m in objs]
         with benchmark("Filter resources based on permissions"):
           objs = filter_resource(objs)
 
@@ -1041,8 +1061,51 @@ class Resource(ModelView):
         return self.json_success_response(
             collection, self.collection_last_modified(), cache_op=cache_op)
 
+  def use_json_fragments(self):
+    """Check if collection responses are built from cached JSON fragments.
+
+    Custom field selection needs the decoded resources, so it always uses
+    the regular path.
+    """
+    return (self.has_cache() and
+            getattr(settings, 'MEMCACHE_JSON_FRAGMENTS', False) and
+            '__fields' not in request.args)
+
+  def build_collection_body(self, matches, cache_objs, database_objs,
+                            extras=None):
+    """Build a collection body from fragments of readable resources.
+
+    Resources that are not completely readable by the current user are
+    decoded, filtered with filter_resource and encoded again.
+    """
+    user_permissions = permissions.permissions_for(get_current_user())
+    is_creator = _is_creator()
+    parts = []
+    for match in matches:
+      value = cache_objs.get(match, database_objs.get(match))
+      if value is None:
+        continue
+      entry = fragments.to_entry(value)
+      fragment = fragments.readable_fragment(
+          entry, user_permissions, is_creator)
+      if fragment is None:
+        resource = filter_resource(
+            fragments.to_resource(entry), user_permissions=user_permissions)
+        if resource is None:
+          continue
+        fragment = as_json(resource)
+      parts.append(fragment)
+    table_plural = self.model._inflector.table_plural
+    return fragments.CollectionBody(
+        '{0}_collection'.format(table_plural), table_plural,
+        self.url_for_preserving_querystring(), parts, extras)
+
   def get_resources_from_cache(self, matches):
-    """Get resources from cache for specified matches"""
+    """Get resources from cache for specified matches
+
+    Values are resource dicts or, with MEMCACHE_JSON_FRAGMENTS enabled,
+    fragment entries made by ggrc.services.fragments.make_entry.
+    """
     resources = {}
     # Disable caching for background tasks
     # Setting background task status circumvents our memcache
@@ -1088,8 +1151,12 @@ class Resource(ModelView):
       slice_keys = [
           slice_key for slice_key in slice_keys
           if key_blockers[slice_key] not in result]
-      memcache_client.add_multi(
-          {key: key_objs[key] for key in slice_keys})
+      if getattr(settings, 'MEMCACHE_JSON_FRAGMENTS', False):
+        memcache_client.add_multi(
+            {key: fragments.to_entry(key_objs[key]) for key in slice_keys})
+      else:
+        memcache_client.add_multi(
+            {key: key_objs[key] for key in slice_keys})
 
   def json_create(self, obj, src):
     ggrc.builder.json.create(obj, src)
@@ -1210,7 +1277,8 @@ class Resource(ModelView):
         db.session.expunge_all()
         raise Forbidden()
 
-  def collection_post_loop(self, body, res, no_result, running_async):
+  def collection_post_loop(self, body, res, no_result, running_async,
+                           committed=None):
     """Handle all posted objects.
 
     Args:
@@ -1218,22 +1286,27 @@ class Resource(ModelView):
       res: List that will get responses appended to it.
       no_result: Flag for suppressing results.
       running_async: Flag for async jobs.
+      committed: Optional list that gets the objects appended to it once they
+          are committed.
     """
 
     with benchmark("Generate objects"):
       objects = []
-      for wrapped_src in body:
-        src = self._unwrap_collection_post_src(wrapped_src)
-        obj = self._get_model_instance(src, body)
-        with benchmark("Deserialize object"):
-          self.json_create(obj, src)
-        with benchmark("Send model POSTed event"):
-          self.model_posted.send(obj.__class__, obj=obj, src=src, service=self)
-        with benchmark("Update custom attribute values"):
-          set_ids_for_new_custom_attributes(obj)
-
-        obj.modified_by = get_current_user()
-        objects.append(obj)
+      srcs = [self._unwrap_collection_post_src(wrapped_src)
+              for wrapped_src in body]
+      with ggrc.builder.json.prefetched_references(srcs):
+        for src in srcs:
+          obj = self._get_model_instance(src, body)
+          with benchmark("Deserialize object"):
+            self.json_create(obj, src)
+          with benchmark("Send model POSTed event"):
+            self.model_posted.send(obj.__class__, obj=obj, src=src,
+                                   service=self)
+          with benchmark("Update custom attribute values"):
+            set_ids_for_new_custom_attributes(obj)
+
+          obj.modified_by = get_current_user()
+          objects.append(obj)
 
     with benchmark("Send collection POSTed event"):
       self.collection_posted.send(obj.__class__, objects=objects)
@@ -1254,6 +1327,8 @@ class Resource(ModelView):
           self.request, modified_objects, CACHE_EXPIRY_COLLECTION)
     with benchmark("Commit collection"):
       db.session.commit()
+    if committed is not None:
+      committed.extend(objects)
     with benchmark("Update index"):
       update_index(db.session, modified_objects)
     with benchmark("Update memcache after commit for collection POST"):
@@ -1272,6 +1347,99 @@ class Resource(ModelView):
         object_for_json = {} if no_result else self.object_for_json(obj)
         res.append((201, object_for_json))
 
+  def _committed_object_json(self, obj, no_result):
+    """Serialize a created object, or get its stub if that fails."""
+    if no_result:
+      return {}
+    try:
+      return self.object_for_json(obj)
+    except Exception as e:  # pylint: disable=broad-except
+      current_app.logger.warn("Serializing a posted object failed:")
+      current_app.logger.exception(e)
+      return {self.model._inflector.table_singular: {
+          "id": obj.id, "type": obj.__class__.__name__}}
+
+  def collection_post_transaction(self, body, no_result, running_async,
+                                  committed=None):
+    """Post all objects in one transaction.
+
+    Returns:
+      List of (status, body) tuples, one for each object, or a single error if
+      the transaction was rolled back.
+    """
+    res = []
+    try:
+      self.collection_post_loop(body, res, no_result, running_async,
+                                committed)
+    except (IntegrityError, ValidationError, ValueError) as e:
+      res = [self._make_error_from_exception(e)]
+      db.session.rollback()
+    except Exception as e:
+      res = [(getattr(e, "code", 500), e.message)]
+      current_app.logger.warn("Collection POST commit failed:")
+      current_app.logger.exception(e)
+      db.session.rollback()
+    return res
+
+  def collection_post_chunk(self, chunk, no_result, running_async):
+    """Post a chunk of objects in one transaction.
+
+    Once the objects of the chunk are committed, failures of the remaining
+    steps do not turn into errors that would get the objects posted again,
+    and the objects are returned as created.
+
+    Returns:
+      List of (status, body) tuples, one for each object, or a single error if
+      the transaction was rolled back.
+    """
+    committed = []
+    res = self.collection_post_transaction(chunk, no_result, running_async,
+                                           committed)
+    if committed and any(not 200 <= status < 300 for status, _ in res):
+      res = [(201, self._committed_object_json(obj, no_result))
+             for obj in committed]
+    return res
+
+  def get_chunk_size(self):
+    """Get the chunk size of a chunked collection POST, None if not chunked.
+
+    Chunked posting is requested with the `__chunk_size` argument.
+    """
+    if '__chunk_size' not in request.args:
+      return None
+    try:
+      chunk_size = int(request.args['__chunk_size'])
+    except ValueError:
+      raise BadRequest("__chunk_size must be a number")
+    return max(1, min(chunk_size, self.MAX_CHUNK_SIZE))
+
+  def collection_post_chunks(self, body, chunk_size, no_result,
+                             running_async):
+    """Post objects in chunks that are committed one by one.
+
+    Event logging, memcache and index updates are done for each chunk, so
+    memory use and row locks do not grow with the size of the body. Objects
+    of a chunk that fails are posted again one at a time, so that only the
+    bad objects are not created.
+
+    Returns:
+      List of (status, body) tuples, one for each object.
+    """
+    res = []
+    for start in range(0, len(body), chunk_size):
+      chunk = body[start:start + chunk_size]
+      with benchmark("collection post > chunk: {}".format(start)):
+        chunk_res = self.collection_post_chunk(
+            chunk, no_result, running_async)
+      if len(chunk) > 1 and len(chunk_res) != len(chunk):
+        with benchmark("collection post > retry chunk one by one"):
+          chunk_res = []
+          for wrapped_src in chunk:
+            chunk_res.extend(self.collection_post_chunk(
+                [wrapped_src], no_result, running_async))
+      res.extend(chunk_res)
+    return res
+
   @staticmethod
   def _make_error_from_exception(exc):
     """Return a 400-code with the exception message."""
@@ -1284,6 +1452,7 @@ class Resource(ModelView):
       if self.request.mimetype != 'application/json':
         return current_app.make_response((
             'Content-Type must be application/json', 415, []))
+      chunk_size = self.get_chunk_size()
 
       running_async = False
       if 'X-GGRC-BackgroundTask' in request.headers:
@@ -1308,18 +1477,13 @@ class Resource(ModelView):
       wrap = isinstance(body, dict)
       if wrap:
         body = [body]
-      res = []
       with benchmark("collection post > body loop: {}".format(len(body))):
-        try:
-          self.collection_post_loop(body, res, no_result, running_async)
-        except (IntegrityError, ValidationError, ValueError) as e:
-          res.append(self._make_error_from_exception(e))
-          db.session.rollback()
-        except Exception as e:
-          res.append((getattr(e, "code", 500), e.message))
-          current_app.logger.warn("Collection POST commit failed:")
-          current_app.logger.exception(e)
-          db.session.rollback()
+        if chunk_size and not wrap:
+          res = self.collection_post_chunks(body, chunk_size, no_result,
+                                            running_async)
+        else:
+          res = self.collection_post_transaction(body, no_result,
+                                                 running_async)
       with benchmark("collection post > calculate response statuses"):
         headers = {"Content-Type": "application/json"}
         errors = []
@@ -1334,7 +1498,10 @@ class Resource(ModelView):
             if not 200 <= res_status < 300:
               errors.append((res_status, body))
           if len(errors) > 0:
-            status = errors[0][0]
+            # Chunks without errors are committed, the statuses of all
+            # objects are in the response body.
+            status = 207 if chunk_size and len(errors) < len(res) \
+                else errors[0][0]
             headers[
                 "X-Flash-Error"] = ' || '.join((error for _, error in errors))
           else:
@@ -1431,6 +1598,9 @@ class Resource(ModelView):
       query = model.eager_query()
       # We force the query here so that we can benchmark it
       objs = query.filter(model.id.in_(ids.keys())).all()
+    if hasattr(model, "prefetch_for_publish"):
+      with benchmark("Prefetch computed properties"):
+        model.prefetch_for_publish(objs)
     with benchmark("Publish objects"):
       resources = {}
       includes = self.get_properties_to_include(request.args.get('__include'))
@@ -1488,6 +1658,20 @@ class Resource(ModelView):
     return current_app.make_response(
         (self.as_json(response_object), status, headers))
 
+  def json_fragments_response(self, body, last_modified, cache_op=None):
+    """Make a streamed response from a fragments.CollectionBody."""
+    body_etag = body.etag()
+    if self.request.headers.get('If-None-Match') == body_etag:
+      return current_app.make_response(('', 304, [('Etag', body_etag)]))
+    headers = [
+        ('Last-Modified', self.http_timestamp(last_modified)),
+        ('Etag', body_etag),
+        ('Content-Type', 'application/json'),
+    ]
+    if cache_op:
+      headers.append(('X-GGRC-Cache', cache_op))
+    return current_app.response_class(iter(body), 200, headers)
+
   def getval(self, src, attr, *args):
     if args:
       return src.get(unicode(attr), *args)
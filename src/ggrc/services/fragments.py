@@ -0,0 +1,119 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Pre-encoded JSON fragments of published resources.
+
+With MEMCACHE_JSON_FRAGMENTS enabled, published resources are stored in
+memcache as ready-made JSON strings instead of dicts. Collection responses
+are then built by joining the fragments, without decoding and encoding them
+again.
+
+Every entry also keeps the (type, id, context id) of the resource and of all
+nested resources that filter_resource would check. When the current user can
+read all of them, the fragment is sent as is. Otherwise, the fragment is
+decoded and filtered the usual way.
+"""
+
+import hashlib
+import json
+
+from ggrc.utils import as_json
+
+
+FRAGMENT_KEY = "__json__"
+CHECKS_KEY = "__checks__"
+
+# Types that filter_resource checks with special rules for creators.
+CREATOR_CHECKED_TYPES = frozenset(["Relationship", "Revision"])
+
+
+def _context_id(resource):
+  """Get the context id of a resource the same way filter_resource does."""
+  if "context" in resource:
+    if resource["context"] is None:
+      return None
+    return resource["context"]["id"]
+  return resource.get("context_id")
+
+
+def get_checks(resource):
+  """Get read checks for a resource and all its nested resources."""
+  checks = [(resource["type"], resource.get("id"), _context_id(resource))]
+  for key, value in resource.iteritems():
+    if key != "context" and isinstance(value, dict) and "type" in value:
+      checks.extend(get_checks(value))
+  return checks
+
+
+def make_entry(resource):
+  """Make a cache entry holding the encoded resource."""
+  return {
+      "selfLink": resource.get("selfLink"),
+      FRAGMENT_KEY: as_json(resource),
+      CHECKS_KEY: get_checks(resource),
+  }
+
+
+def is_entry(value):
+  return isinstance(value, dict) and FRAGMENT_KEY in value
+
+
+def to_resource(value):
+  """Get the resource dict from a cache entry or a resource dict."""
+  if is_entry(value):
+    return json.loads(value[FRAGMENT_KEY])
+  return value
+
+
+def to_entry(value):
+  """Get a cache entry from a cache entry or a resource dict."""
+  if is_entry(value):
+    return value
+  return make_entry(value)
+
+
+def readable_fragment(entry, user_permissions, is_creator):
+  """Get the fragment of an entry if all of it is readable, or None.
+
+  None means that the resource has to be filtered with filter_resource.
+  """
+  for type_, id_, context_id in entry[CHECKS_KEY]:
+    if is_creator and type_ in CREATOR_CHECKED_TYPES:
+      return None
+    if not user_permissions.is_allowed_read(type_, id_, context_id):
+      return None
+  return entry[FRAGMENT_KEY]
+
+
+class CollectionBody(object):
+  """JSON body of a collection response built from resource fragments.
+
+  The body has the same structure as build_collection_representation. It is
+  produced in chunks, so it can be streamed without joining all fragments
+  into one string.
+  """
+
+  def __init__(self, collection_name, table_plural, self_link, fragments,
+               extras=None):
+    head = ["{", as_json(collection_name), ": {",
+            '"selfLink": ', as_json(self_link), ", "]
+    for key, value in sorted((extras or {}).iteritems()):
+      head.extend([as_json(key), ": ", as_json(value), ", "])
+    head.extend([as_json(table_plural), ": ["])
+    self.head = "".join(head)
+    self.fragments = fragments
+    self.tail = "]}}"
+
+  def __iter__(self):
+    yield self.head
+    for i, fragment in enumerate(self.fragments):
+      if i:
+        yield ", "
+      yield fragment
+    yield self.tail
+
+  def etag(self):
+    sha = hashlib.sha1()
+    for chunk in self:
+      sha.update(chunk)
+    return '"{0}"'.format(sha.hexdigest())
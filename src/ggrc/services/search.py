@@ -1,15 +1,13 @@
 # Copyright (C) 2016 Google Inc.
 # Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
 
+import collections
 import json
 
 from flask import request, current_app
 
-import ggrc.models.relationship
-
 from ggrc.fulltext import get_indexer
 from ggrc.utils import GrcEncoder, url_for, benchmark
-from ggrc import db
 
 
 def search():
@@ -39,6 +37,22 @@ def search():
 
   relevant_objects = request.args.get('relevant_objects', None)
 
+  limit = request.args.get('__limit')
+  cursors = request.args.get('__cursor', '')
+  try:
+    limit = int(limit) if limit else None
+    # Parse t1:5,t2:10 into dict {t1:5,t2:10}
+    cursors = {k: int(v) for k, v in
+               (x.split(':') for x in cursors.split(',') if x)}
+  except ValueError:
+    return current_app.make_response((
+        'Query parameters "__limit" and "__cursor" must contain numbers.',
+        400,
+        [('Content-Type', 'text/plain')],
+    ))
+  if limit is not None and limit < 1:
+    limit = 1
+
   if extra_params:
     # Parse t1:a=b,c=d;t2:e=f into dict {t1:{a:b,c:d},t2:{e:f}}
     extra_params = {
@@ -65,11 +79,11 @@ def search():
     return do_counts(terms, types, contact_id, extra_params, extra_columns)
   if should_group_by_type:
     return group_by_type_search(terms, types, contact_id, extra_params,
-                                relevant_objects)
+                                relevant_objects, limit, cursors)
   return basic_search(
       terms, types,
       permission_type, permission_model,
-      contact_id, extra_params, relevant_objects
+      contact_id, extra_params, relevant_objects, limit, cursors
   )
 
 
@@ -99,69 +113,64 @@ def do_counts(terms, types=None, contact_id=None,
   ))
 
 
-def _build_relevant_filter(types, relevant_objects):
-  if relevant_objects is None:
-    relevant_objects = []
-  filters = []
-  for relevant_type, relevant_id in relevant_objects:
-    relationship = ggrc.models.relationship.Relationship
-    src_query = db.session.query(
-        relationship.source_type, relationship.source_id
-    ).filter(
-        relationship.source_type.in_(types) | (types is None),
-        relationship.destination_type == relevant_type,
-        relationship.destination_id == relevant_id
-    )
-    dst_query = db.session.query(
-        relationship.destination_type, relationship.destination_id
-    ).filter(
-        relationship.destination_type.in_(types) | (types is None),
-        relationship.source_type == relevant_type,
-        relationship.source_id == relevant_id
-    )
-    filters.append(set(src_query.union(dst_query)))
-
-  def check(result_pair):
-    return all(result_pair in bucket for bucket in filters)
-
-  return check
-
-
 def do_search(terms, list_for_type, types=None, permission_type='read',
               permission_model=None, contact_id=None, extra_params=None,
-              relevant_objects=None):
+              relevant_objects=None, limit=None, cursors=None):
+  """Add search results to lists for their types.
+
+  Returns:
+    dict with the cursor for the next page of each type that has more than
+    limit results.
+  """
   indexer = get_indexer()
   with benchmark("Search"):
     results = indexer.search(
         terms, types=types, permission_type=permission_type,
         permission_model=permission_model, contact_id=contact_id,
-        extra_params=extra_params
+        extra_params=extra_params, relevant_objects=relevant_objects,
+        limit=limit, cursors=cursors
     )
 
-  related_filter = _build_relevant_filter(types, relevant_objects)
+  if limit is not None:
+    results = sorted(results, key=lambda result: (result.type, result.key))
+
   seen_results = {}
+  type_counts = collections.Counter()
+  last_ids = {}
+  next_cursors = {}
 
   for result in results:
     id = result.key
     model_type = result.type
     result_pair = (model_type, id)
-    if result_pair not in seen_results and related_filter(result_pair):
-      seen_results[result_pair] = True
-      entries_list = list_for_type(model_type)
-      entries_list.append({
-          'id': id,
-          'type': model_type,
-          'href': url_for(model_type, id=id),
-      })
-
-
-def make_search_result(entries):
+    if result_pair in seen_results:
+      continue
+    if limit is not None and type_counts[model_type] >= limit:
+      # The indexer returns one extra result of a type if there are more
+      next_cursors[model_type] = last_ids[model_type]
+      continue
+    seen_results[result_pair] = True
+    type_counts[model_type] += 1
+    last_ids[model_type] = id
+    entries_list = list_for_type(model_type)
+    entries_list.append({
+        'id': id,
+        'type': model_type,
+        'href': url_for(model_type, id=id),
+    })
+  return next_cursors
+
+
+def make_search_result(entries, cursors=None):
+  results = {
+      'selfLink': request.url,
+      'entries': entries,
+  }
+  if cursors is not None:
+    results['cursors'] = cursors
   return current_app.make_response((
       json.dumps({
-          'results': {
-              'selfLink': request.url,
-              'entries': entries,
-          }
+          'results': results
       }, cls=GrcEncoder),
       200,
       [('Content-Type', 'application/json')],
@@ -170,24 +179,30 @@ def make_search_result(entries):
 
 def basic_search(terms, types=None,
                  permission_type='read', permission_model=None,
-                 contact_id=None, extra_params=None, relevant_objects=None):
+                 contact_id=None, extra_params=None, relevant_objects=None,
+                 limit=None, cursors=None):
   entries = []
 
   def list_for_type(_):
     return entries
 
-  do_search(terms, list_for_type, types, permission_type, permission_model,
-            contact_id, extra_params, relevant_objects)
-  return make_search_result(entries)
+  next_cursors = do_search(
+      terms, list_for_type, types, permission_type, permission_model,
+      contact_id, extra_params, relevant_objects, limit, cursors)
+  return make_search_result(
+      entries, next_cursors if limit is not None else None)
 
 
 def group_by_type_search(terms, types=None, contact_id=None, extra_params={},
-                         relevant_objects=None):
+                         relevant_objects=None, limit=None, cursors=None):
   entries = {}
 
   def list_for_type(t):
     return entries[t] if t in entries else entries.setdefault(t, [])
 
-  do_search(terms, list_for_type, types, contact_id=contact_id,
-            extra_params=extra_params, relevant_objects=relevant_objects)
-  return make_search_result(entries)
+  next_cursors = do_search(
+      terms, list_for_type, types, contact_id=contact_id,
+      extra_params=extra_params, relevant_objects=relevant_objects,
+      limit=limit, cursors=cursors)
+  return make_search_result(
+      entries, next_cursors if limit is not None else None)
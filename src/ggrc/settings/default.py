@@ -46,12 +46,28 @@ SQLALCHEMY_DATABASE_URI = os.environ.get('GGRC_DATABASE_URI', '')
 SECRET_KEY = os.environ.get('GGRC_SECRET_KEY', 'Replace-with-something-secret')
 
 MEMCACHE_MECHANISM = True
+# Store published resources in memcache as encoded JSON and build collection
+# responses from them without encoding them again.
+MEMCACHE_JSON_FRAGMENTS = False
+
+# Seconds for which fulltext search counts are cached per user and search
+# parameters. Zero disables the cache.
+FULLTEXT_COUNTS_CACHE_TIMEOUT = 30
+
+# Log repeated queries and lazy loads with the stacks that issued them for
+# every request. Slow, meant for tests and staging.
+SQLALCHEMY_AUDIT_QUERIES = False
 
 # AppEngine Email
 APPENGINE_EMAIL = os.environ.get('APPENGINE_EMAIL', '')
 
 CALENDAR_MECHANISM = False
 
+# Years for which workflow cycle calculators precompute workdays. Dates
+# outside of this range are still supported, but adjusted more slowly.
+WORKFLOW_CALENDAR_FIRST_YEAR = 2010
+WORKFLOW_CALENDAR_LAST_YEAR = 2040
+
 MAX_INSTANCES = os.environ.get('MAX_INSTANCES', '3')
 
 exports = ['VERSION', 'MAX_INSTANCES']
@@ -39,17 +39,25 @@ def as_json(obj, **kwargs):
   return json.dumps(obj, cls=GrcEncoder, **kwargs)
 
 
+# Model name -> URL prefix of its REST service or object view, built once
+# all services and views are registered. The tables are replaced as a whole
+# and never modified in place.
+_SERVICE_URL_PREFIXES = {}
+_VIEW_URL_PREFIXES = {}
+
+
+def _model_type(obj):
+  if type(obj) is str or type(obj) is unicode:  # noqa
+    return obj
+  return obj.__class__.__name__
+
+
 def service_for(obj):
   module = sys.modules['ggrc.services']
-  if type(obj) is str or type(obj) is unicode:  # noqa
-    model_type = obj
-  else:
-    model_type = obj.__class__.__name__
-  return getattr(module, model_type, None)
+  return getattr(module, _model_type(obj), None)
 
 
-def url_for(obj, id=None):
-  service = service_for(obj)
+def _url_for(service, obj, id=None):
   if service is None:
     return None
   if not hasattr(service, 'url_for'):
@@ -59,24 +67,51 @@ def url_for(obj, id=None):
   return service.url_for(obj)
 
 
+def _url_from_prefixes(prefixes, lookup, obj, id=None):
+  """Build an object URL from a prefix table, or with the lookup function."""
+  model_type = _model_type(obj)
+  prefix = prefixes.get(model_type)
+  if prefix is None or (id is None and model_type is obj):
+    return _url_for(lookup(obj), obj, id=id)
+  if id is None:
+    id = obj.id
+  return prefix + '/' + str(id)
+
+
+def url_for(obj, id=None):
+  return _url_from_prefixes(_SERVICE_URL_PREFIXES, service_for, obj, id=id)
+
+
 def view_service_for(obj):
   module = sys.modules['ggrc.views']
-  if type(obj) is str or type(obj) is unicode:  # noqa
-    model_type = obj
-  else:
-    model_type = obj.__class__.__name__
-  return getattr(module, model_type, None)
+  return getattr(module, _model_type(obj), None)
 
 
 def view_url_for(obj, id=None):
-  service = view_service_for(obj)
-  if service is None:
-    return None
-  if not hasattr(service, 'url_for'):
-    return None
-  if id is not None:
-    return service.url_for(id=id)
-  return service.url_for(obj)
+  return _url_from_prefixes(_VIEW_URL_PREFIXES, view_service_for, obj, id=id)
+
+
+def _build_url_prefixes(lookup, model_names):
+  prefixes = {}
+  for model_name in model_names:
+    service = lookup(model_name)
+    if service is not None and hasattr(service, 'base_url_for'):
+      prefixes[model_name] = service.base_url_for()
+  return prefixes
+
+
+def init_url_prefixes(app_):
+  """Precompute URL prefixes of services and views of all models.
+
+  Must be called after all services and views are registered.
+  """
+  # pylint: disable=global-statement
+  global _SERVICE_URL_PREFIXES, _VIEW_URL_PREFIXES
+  from ggrc.models import all_models
+  model_names = [model.__name__ for model in all_models.all_models]
+  with app_.test_request_context():
+    _SERVICE_URL_PREFIXES = _build_url_prefixes(service_for, model_names)
+    _VIEW_URL_PREFIXES = _build_url_prefixes(view_service_for, model_names)
 
 
 def encoded_dict(in_dict):
@@ -0,0 +1,185 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Detection of repeated queries and lazy loads.
+
+QueryAuditor extends QueryCounter with a fingerprint of every statement, the
+application stack that issued it and the relationship that was lazy loaded,
+if any. Statements with the same fingerprint differ only in their parameters,
+so many of them in one request usually mean a query in a loop (N+1).
+
+The audit is opt-in because collecting stacks is slow. With the
+SQLALCHEMY_AUDIT_QUERIES setting enabled, every request is audited and
+repeated statements and lazy loads are logged. Tests can add their own
+request handlers, see test/integration/query_budget.py.
+"""
+
+import collections
+import os
+import re
+import sys
+import traceback
+
+from flask import g
+from flask import request
+
+from ggrc.utils import QueryCounter
+
+
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAMETER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+_THIS_FILE = os.path.splitext(os.path.abspath(__file__))[0]
+_SRC_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(_THIS_FILE)))
+
+STACK_DEPTH = 8
+
+_handlers = []
+
+
+def fingerprint(statement):
+  """Get the statement with all literals and parameters replaced by "?".
+
+  Parameter lists of any length, as used with IN, are replaced by "(?+)".
+  """
+  statement = _STRING.sub("?", statement)
+  statement = _NUMBER.sub("?", statement)
+  statement = statement.replace("%s", "?")
+  statement = _PARAMETER_LIST.sub("(?+)", statement)
+  return _WHITESPACE.sub(" ", statement).strip()
+
+
+def _app_stack():
+  """Get the innermost application frames of the current stack."""
+  frames = []
+  for frame in traceback.extract_stack():
+    filename = os.path.abspath(frame[0])
+    if (filename.startswith(_SRC_ROOT) and
+            os.path.splitext(filename)[0] != _THIS_FILE):
+      frames.append(frame)
+  return tuple(frames[-STACK_DEPTH:])
+
+
+def _lazy_load():
+  """Get (model name, attribute) of the relationship being lazy loaded."""
+  frame = sys._getframe()  # pylint: disable=protected-access
+  while frame is not None:
+    code = frame.f_code
+    if (code.co_name == "_load_for_state" and
+            code.co_filename.endswith(("strategies.py", "strategies.pyc"))):
+      loader = frame.f_locals.get("self")
+      state = frame.f_locals.get("state")
+      if loader is not None and state is not None:
+        return (state.class_.__name__, loader.key)
+    frame = frame.f_back
+  return None
+
+
+Statement = collections.namedtuple(
+    "Statement", ["statement", "parameters", "fingerprint", "stack",
+                  "lazy_load"])
+
+
+class QueryAuditor(QueryCounter):
+  """Context manager for recording and auditing sqlalchemy queries.
+
+  Usage:
+    with QueryAuditor() as auditor:
+      ...
+    for shape, statements in auditor.repeated().items():
+      ...
+  """
+
+  def __init__(self):
+    super(QueryAuditor, self).__init__()
+    self.statements = []
+    count_query = self.listener
+
+    def after_cursor_execute(*args):
+      count_query(*args)
+      statement, parameters = args[2], args[3]
+      self.statements.append(Statement(
+          statement,
+          parameters,
+          fingerprint(statement),
+          _app_stack(),
+          _lazy_load(),
+      ))
+
+    self.listener = after_cursor_execute
+
+  def repeated(self, threshold=2):
+    """Get statements grouped by fingerprint that repeat threshold times."""
+    groups = collections.OrderedDict()
+    for statement in self.statements:
+      groups.setdefault(statement.fingerprint, []).append(statement)
+    return collections.OrderedDict(
+        (shape, statements) for shape, statements in groups.iteritems()
+        if len(statements) >= threshold)
+
+  def lazy_loads(self):
+    """Get the number of lazy loads of each (model name, attribute)."""
+    return collections.Counter(statement.lazy_load
+                               for statement in self.statements
+                               if statement.lazy_load is not None)
+
+  def report(self, threshold=2):
+    """Get a readable report of repeated statements and lazy loads."""
+    lines = ["{} queries".format(self.get)]
+    for shape, statements in self.repeated(threshold).iteritems():
+      lines.append("{} times: {}".format(len(statements), shape))
+      lines.extend("    {}:{} in {}".format(*frame[:3])
+                   for frame in statements[0].stack)
+    for (model, attr), count in self.lazy_loads().most_common():
+      lines.append("{} lazy loads of {}.{}, missing from eager_query?".format(
+          count, model, attr))
+    return "\n".join(lines)
+
+
+def add_handler(handler):
+  """Add a function called with (endpoint, auditor) after every request.
+
+  The endpoint is the request method and the url rule, for example
+  "GET /api/controls".
+  """
+  _handlers.append(handler)
+
+
+def remove_handler(handler):
+  _handlers.remove(handler)
+
+
+def _endpoint():
+  rule = request.url_rule.rule if request.url_rule else request.path
+  return "{} {}".format(request.method, rule)
+
+
+def init_app(app_):
+  """Audit all requests of the app and pass the results to the handlers."""
+  if getattr(app_, "_query_audit", False):
+    return
+  app_._query_audit = True  # pylint: disable=protected-access
+
+  @app_.before_request
+  def start_query_audit():  # pylint: disable=unused-variable
+    g.query_auditor = QueryAuditor().__enter__()
+
+  @app_.teardown_request
+  def finish_query_audit(_):  # pylint: disable=unused-variable
+    auditor = getattr(g, "query_auditor", None)
+    if auditor is None:
+      return
+    auditor.__exit__(None, None, None)
+    endpoint = _endpoint()
+    for handler in _handlers:
+      handler(endpoint, auditor)
+
+
+def log_handler(app_):
+  """Get a handler that logs requests with repeated queries or lazy loads."""
+  def log_report(endpoint, auditor):
+    if auditor.repeated() or auditor.lazy_loads():
+      app_.logger.warning("Query audit for %s\n%s", endpoint, auditor.report())
+  return log_report
@@ -5,11 +5,9 @@
 Handle non-RESTful views, e.g. routes which return HTML rather than JSON
 """
 
-import collections
 import json
 
 from flask import flash
-from flask import g
 from flask import render_template
 from flask import url_for
 from werkzeug.exceptions import Forbidden
@@ -18,24 +16,23 @@ from ggrc import models
 from ggrc import settings
 from ggrc.app import app
 from ggrc.app import db
-from ggrc.builder.json import publish
-from ggrc.builder.json import publish_representation
-from ggrc.converters import get_importables, get_exportables
 from ggrc.extensions import get_extension_modules
 from ggrc.fulltext import get_indexer
+from ggrc.fulltext import person_objects
 from ggrc.fulltext.recordbuilder import fts_record_for
 from ggrc.fulltext.recordbuilder import model_is_indexed
-from ggrc.login import get_current_user
 from ggrc.login import login_required
 from ggrc.models import all_models
+from ggrc.models import relationship_adjacency
 from ggrc.models.background_task import create_task
 from ggrc.models.background_task import make_task_response
 from ggrc.models.background_task import queued_task
-from ggrc.models.reflection import AttributeInfo
 from ggrc.rbac import permissions
-from ggrc.services.common import as_json
-from ggrc.services.common import inclusion_filter
 from ggrc.services import query as services_query
+from ggrc.views import activity_feed
+from ggrc.views import assessment_generation
+from ggrc.views import attribute_catalog
+from ggrc.views import bootstrap
 from ggrc.views import converters
 from ggrc.views import cron
 from ggrc.views import filters
@@ -88,82 +85,70 @@ def do_reindex():
       db.session.commit()
 
 
+@app.route("/_background_tasks/rebuild_relationship_adjacency",
+           methods=["POST"])
+@queued_task
+def rebuild_relationship_adjacency(_):
+  """
+  Web hook to rebuild the relationship adjacency index
+  """
+
+  with benchmark("Rebuild relationship adjacency index"):
+    relationship_adjacency.rebuild()
+
+  return app.make_response((
+      'success', 200, [('Content-Type', 'text/html')]))
+
+
+@app.route("/_background_tasks/check_person_objects", methods=["POST"])
+@queued_task
+def check_person_objects(_):
+  """
+  Web hook to check and repair the objects stored for search by person
+  """
+
+  with benchmark("Check person objects"):
+    report = person_objects.check_consistency(repair=True)
+
+  summary = {
+      person_id: {"missing": len(missing), "extra": len(extra)}
+      for person_id, (missing, extra) in report.iteritems()
+  }
+  return app.make_response((
+      json.dumps(summary), 200, [('Content-Type', 'application/json')]))
+
+
 def get_permissions_json():
   """Get all permissions for current user"""
-  with benchmark("Get permission JSON"):
-    permissions.permissions_for(permissions.get_user())
-    return json.dumps(getattr(g, '_request_permissions', None))
+  return bootstrap.get_part_json("permissions")
 
 
 def get_config_json():
   """Get public app config"""
-  with benchmark("Get config JSON"):
-    public_config = dict(app.config.public_config)
-    for extension_module in get_extension_modules():
-      if hasattr(extension_module, 'get_public_config'):
-        public_config.update(
-            extension_module.get_public_config(get_current_user()))
-    return json.dumps(public_config)
+  return bootstrap.get_part_json("config")
 
 
 def get_full_user_json():
   """Get the full current user"""
-  with benchmark("Get full user JSON"):
-    from ggrc.models.person import Person
-    current_user = get_current_user()
-    person = Person.eager_query().filter_by(id=current_user.id).one()
-    result = publish_representation(publish(person, (), inclusion_filter))
-    return as_json(result)
+  return bootstrap.get_part_json("full_user")
 
 
 def get_current_user_json():
   """Get current user"""
-  with benchmark("Get current user JSON"):
-    person = get_current_user()
-    return as_json({
-        "id": person.id,
-        "company": person.company,
-        "email": person.email,
-        "language": person.language,
-        "name": person.name,
-        "system_wide_role": person.system_wide_role,
-    })
+  return bootstrap.get_part_json("current_user")
 
 
 def get_attributes_json():
   """Get a list of all custom attribute definitions"""
-  with benchmark("Get attributes JSON"):
-    attrs = models.CustomAttributeDefinition.eager_query().filter(
-        models.CustomAttributeDefinition.definition_id.is_(None)
-    )
-    published = []
-    for attr in attrs:
-      published.append(publish(attr))
-    published = publish_representation(published)
-    return as_json(published)
-
-
-def get_import_types(export_only=False):
-  types = get_exportables if export_only else get_importables
-  data = []
-  for model in set(types().values()):
-    data.append({
-        "model_singular": model.__name__,
-        "title_plural": model._inflector.title_plural
-    })
-  data.sort()
-  response_json = json.dumps(data)
-  return response_json
+  return bootstrap.get_part_json("custom_attributes")
 
 
 def get_export_definitions():
-  with benchmark("Get export definitions"):
-    return get_import_types(export_only=True)
+  return bootstrap.get_part_json("export_definitions")
 
 
 def get_import_definitions():
-  with benchmark("Get import definitions"):
-    return get_import_types(export_only=False)
+  return bootstrap.get_part_json("import_definitions")
 
 
 def get_all_attributes_json(load_custom_attributes=False):
@@ -172,19 +157,9 @@ def get_all_attributes_json(load_custom_attributes=False):
   This exports all attributes related to a given model, including custom
   attributes and mapping attributes, that are used in csv import and export.
   """
-  with benchmark('Loading all attributes JSON'):
-    published = {}
-    ca_cache = collections.defaultdict(list)
-    if load_custom_attributes:
-      definitions = models.CustomAttributeDefinition.eager_query().group_by(
-          models.CustomAttributeDefinition.title,
-          models.CustomAttributeDefinition.definition_type)
-      for attr in definitions:
-        ca_cache[attr.definition_type].append(attr)
-    for model in all_models.all_models:
-      published[model.__name__] = \
-          AttributeInfo.get_attr_definitions_array(model, ca_cache=ca_cache)
-    return as_json(published)
+  if load_custom_attributes:
+    return bootstrap.get_part_json("all_attributes_with_custom")
+  return bootstrap.get_part_json("all_attributes")
 
 
 @app.context_processor
@@ -201,6 +176,7 @@ def base_context():
       all_attributes_json=get_all_attributes_json,
       import_definitions=get_import_definitions,
       export_definitions=get_export_definitions,
+      bootstrap_scripts=bootstrap.bootstrap_scripts,
   )
 
 
@@ -265,6 +241,36 @@ def admin_reindex():
                          [('Content-Type', 'text/html')])))
 
 
+@app.route("/admin/rebuild_relationship_adjacency", methods=["POST"])
+@login_required
+def admin_rebuild_relationship_adjacency():
+  """Calls a webhook that rebuilds the relationship adjacency index
+  """
+  if not permissions.is_allowed_read("/admin", None, 1):
+    raise Forbidden()
+  task_queue = create_task("rebuild_relationship_adjacency",
+                           url_for(rebuild_relationship_adjacency.__name__),
+                           rebuild_relationship_adjacency)
+  return task_queue.make_response(
+      app.make_response(("scheduled %s" % task_queue.name, 200,
+                         [('Content-Type', 'text/html')])))
+
+
+@app.route("/admin/check_person_objects", methods=["POST"])
+@login_required
+def admin_check_person_objects():
+  """Calls a webhook that checks and repairs the person objects table
+  """
+  if not permissions.is_allowed_read("/admin", None, 1):
+    raise Forbidden()
+  task_queue = create_task("check_person_objects",
+                           url_for(check_person_objects.__name__),
+                           check_person_objects)
+  return task_queue.make_response(
+      app.make_response(("scheduled %s" % task_queue.name, 200,
+                         [('Content-Type', 'text/html')])))
+
+
 @app.route("/admin")
 @login_required
 def admin():
@@ -342,6 +348,10 @@ def init_extra_views(app_):
   This should be used for any views that might use extension modules.
   """
   mockups.init_mockup_views()
+  attribute_catalog.init_attribute_catalog_views(app_)
+  bootstrap.init_bootstrap_views(app_)
+  activity_feed.init_activity_feed_views(app_)
+  assessment_generation.init_assessment_generation_views(app_)
   filters.init_filter_views()
   converters.init_converter_views()
   cron.init_cron_views(app_)
@@ -0,0 +1,183 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Paged activity feed built from revision summaries.
+
+The events service publishes every revision of an event with its full content
+snapshot, which is far more than needed to show who changed what. Revisions
+now get a title and the names of changed fields when they are written, and
+/activity_feed serves only those, newest first.
+
+Pages are addressed by a cursor holding the creation time and id of the last
+revision of the previous page, so getting a page is an index range scan on
+created_at, optionally prefixed by the person or the object, regardless of
+how deep the page is. Supported arguments:
+
+  object_type, object_id: revisions of one object.
+  person_id: revisions made by one person.
+  since, until: creation time range, any format dateutil understands.
+  cursor: next_cursor of the previous page.
+  limit: page size, at most MAX_LIMIT.
+"""
+
+import base64
+
+from dateutil import parser
+from flask import current_app
+from flask import request
+from sqlalchemy import and_
+from sqlalchemy import or_
+from werkzeug.exceptions import BadRequest
+
+from ggrc import db
+from ggrc.login import login_required
+from ggrc.models.event import Event
+from ggrc.models.person import Person
+from ggrc.models.revision import Revision
+from ggrc.rbac import context_query_filter
+from ggrc.rbac import permissions
+from ggrc.services.common import as_json
+
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+FEED_COLUMNS = (
+    Revision.id,
+    Revision.created_at,
+    Revision.modified_by_id,
+    Revision.resource_type,
+    Revision.resource_id,
+    Revision.action,
+    Revision.title,
+    Revision.changed_fields,
+)
+
+
+def encode_cursor(created_at, id_):
+  return base64.urlsafe_b64encode("{}|{}".format(created_at.isoformat(), id_))
+
+
+def decode_cursor(cursor):
+  """Get (created_at, id) of a cursor."""
+  try:
+    created_at, id_ = base64.urlsafe_b64decode(str(cursor)).split("|")
+    return parser.parse(created_at), int(id_)
+  except (TypeError, ValueError):
+    raise BadRequest("Invalid cursor")
+
+
+def _int_arg(args, name, default=None):
+  if name not in args:
+    return default
+  try:
+    return int(args[name])
+  except ValueError:
+    raise BadRequest("{} must be a number".format(name))
+
+
+def _date_arg(args, name):
+  if name not in args:
+    return None
+  try:
+    return parser.parse(args[name])
+  except (TypeError, ValueError):
+    raise BadRequest("{} must be a date".format(name))
+
+
+def feed_query(args):
+  """Get the query for a page of revision summaries.
+
+  Args:
+    args: dict of feed arguments, see the module docstring.
+
+  Returns:
+    (query, page size) where the query gets FEED_COLUMNS rows, newest first,
+    with one row more than the page size to tell whether there is a next
+    page.
+  """
+  query = db.session.query(*FEED_COLUMNS)
+  contexts = permissions.read_contexts_for("Event")
+  if contexts is not None:
+    query = query.join(Event, Event.id == Revision.event_id).filter(
+        context_query_filter(Event.context_id, contexts))
+
+  object_type = args.get("object_type")
+  if object_type:
+    object_id = _int_arg(args, "object_id")
+    if object_id is None:
+      raise BadRequest("object_type requires object_id")
+    query = query.filter(and_(
+        Revision.resource_type == object_type,
+        Revision.resource_id == object_id,
+    ))
+  person_id = _int_arg(args, "person_id")
+  if person_id is not None:
+    query = query.filter(Revision.modified_by_id == person_id)
+  since = _date_arg(args, "since")
+  if since is not None:
+    query = query.filter(Revision.created_at >= since)
+  until = _date_arg(args, "until")
+  if until is not None:
+    query = query.filter(Revision.created_at < until)
+  if args.get("cursor"):
+    created_at, id_ = decode_cursor(args["cursor"])
+    query = query.filter(or_(
+        Revision.created_at < created_at,
+        and_(Revision.created_at == created_at, Revision.id < id_),
+    ))
+
+  limit = max(1, min(_int_arg(args, "limit", DEFAULT_LIMIT), MAX_LIMIT))
+  return query.order_by(
+      Revision.created_at.desc(), Revision.id.desc()).limit(limit + 1), limit
+
+
+def _actors(person_ids):
+  """Get stubs of people who made the changes, with one query."""
+  if not person_ids:
+    return {}
+  return {
+      id_: {"id": id_, "type": "Person", "name": name, "email": email}
+      for id_, name, email in db.session.query(
+          Person.id, Person.name, Person.email
+      ).filter(Person.id.in_(person_ids))
+  }
+
+
+def get_feed(args):
+  """Get a page of the activity feed.
+
+  Returns:
+    dict with the list of items and the cursor of the next page, which is
+    None on the last page.
+  """
+  query, limit = feed_query(args)
+  rows = query.all()
+  next_cursor = None
+  if len(rows) > limit:
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+  actors = _actors({row.modified_by_id for row in rows
+                    if row.modified_by_id is not None})
+  items = [{
+      "id": row.id,
+      "created_at": row.created_at,
+      "actor": actors.get(row.modified_by_id),
+      "object": {"type": row.resource_type, "id": row.resource_id},
+      "action": row.action,
+      "title": row.title,
+      "changed_fields": row.changed_fields,
+  } for row in rows]
+  return {"items": items, "next_cursor": next_cursor}
+
+
+def activity_feed_view():
+  return current_app.make_response((
+      as_json(get_feed(request.args)), 200,
+      [("Content-Type", "application/json")]))
+
+
+def init_activity_feed_views(app):
+  app.add_url_rule(
+      "/activity_feed", "activity_feed",
+      view_func=login_required(activity_feed_view))
@@ -0,0 +1,40 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Endpoint for generating assessments of an audit in bulk.
+
+POST /api/assessments/generate with a body such as
+
+  {
+    "audit": {"type": "Audit", "id": 1},
+    "template": {"type": "AssessmentTemplate", "id": 2},
+    "objects": [{"type": "Control", "id": 3}, ...]
+  }
+
+generates one assessment per object and answers with a list of results in
+the order of the objects. The template is optional.
+"""
+
+from flask import current_app
+from flask import request
+
+from ggrc.assessment_generator import generate_assessments
+from ggrc.login import login_required
+from ggrc.services.common import as_json
+
+
+def generate_assessments_view():
+  """Generate assessments and report a result for every object."""
+  if request.mimetype != "application/json":
+    return current_app.make_response((
+        "Content-Type must be application/json", 415, []))
+  results = generate_assessments(request.json)
+  return current_app.make_response((
+      as_json({"results": results}), 200,
+      [("Content-Type", "application/json")]))
+
+
+def init_assessment_generation_views(app):
+  app.add_url_rule(
+      "/api/assessments/generate", "generate_assessments",
+      view_func=login_required(generate_assessments_view), methods=["POST"])
@@ -0,0 +1,169 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Versioned catalog of serialized attribute definitions.
+
+Every HTML page embeds the attribute definitions of all models and all global
+custom attribute definitions, and the import/export pages additionally embed
+attribute definitions including custom attributes. Building them means
+reflecting on every model and publishing every custom attribute definition,
+so the serialized JSON is kept in a per-process catalog instead.
+
+The catalog version is computed from the set of models and from the count,
+highest id and latest update of custom attribute definition rows, so changes
+made by other processes are picked up with one cheap aggregate query per
+request. Custom attribute definition changes made through the API drop the
+catalog right away.
+
+Catalog entries are also served by /attribute_catalog/<name> with an ETag
+derived from the version, so clients can cache them.
+"""
+
+import hashlib
+import threading
+
+from flask import current_app
+from flask import g
+from flask import request
+from sqlalchemy import func
+
+from ggrc import db
+from ggrc import models
+from ggrc.builder.json import publish
+from ggrc.builder.json import publish_representation
+from ggrc.login import login_required
+from ggrc.models import all_models
+from ggrc.models.reflection import AttributeInfo
+from ggrc.services.common import Resource
+from ggrc.services.common import as_json
+from ggrc.utils import benchmark
+
+
+def build_custom_attributes():
+  """Get a list of all global custom attribute definitions"""
+  attrs = models.CustomAttributeDefinition.eager_query().filter(
+      models.CustomAttributeDefinition.definition_id.is_(None)
+  )
+  published = publish_representation([publish(attr) for attr in attrs])
+  return as_json(published)
+
+
+def build_all_attributes(load_custom_attributes=False):
+  """Get a list of all attribute definitions of all models
+
+  This exports all attributes related to a given model, including custom
+  attributes and mapping attributes, that are used in csv import and export.
+  """
+  published = {}
+  ca_cache = {}
+  if load_custom_attributes:
+    definitions = models.CustomAttributeDefinition.eager_query().group_by(
+        models.CustomAttributeDefinition.title,
+        models.CustomAttributeDefinition.definition_type)
+    for attr in definitions:
+      ca_cache.setdefault(attr.definition_type, []).append(attr)
+  for model in all_models.all_models:
+    published[model.__name__] = \
+        AttributeInfo.get_attr_definitions_array(model, ca_cache=ca_cache)
+  return as_json(published)
+
+
+BUILDERS = {
+    "custom_attributes": build_custom_attributes,
+    "all_attributes": build_all_attributes,
+    "all_attributes_with_custom": lambda: build_all_attributes(True),
+}
+
+
+class AttributeCatalog(object):
+  """Serialized attribute definitions for the current catalog version."""
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._version = None
+    self._entries = {}
+
+  @staticmethod
+  def _compute_version():
+    cad = models.CustomAttributeDefinition
+    row = db.session.query(
+        func.count(cad.id),
+        func.max(cad.id),
+        func.max(cad.updated_at),
+    ).one()
+    model_names = sorted(model.__name__ for model in all_models.all_models)
+    return hashlib.sha1(repr((tuple(row), model_names))).hexdigest()
+
+  def version(self):
+    """Get the current catalog version, computed once per request."""
+    version = getattr(g, "attribute_catalog_version", None)
+    if version is None:
+      version = g.attribute_catalog_version = self._compute_version()
+    return version
+
+  def get(self, name):
+    """Get (version, serialized JSON) of a catalog entry."""
+    version = self.version()
+    with self._lock:
+      if version != self._version:
+        self._version = version
+        self._entries = {}
+      entry = self._entries.get(name)
+    if entry is None:
+      with benchmark("Build attribute catalog entry: {}".format(name)):
+        entry = BUILDERS[name]()
+      with self._lock:
+        if self._version == version:
+          self._entries[name] = entry
+    return version, entry
+
+  def etag(self, name):
+    return '"{}"'.format(hashlib.sha1(self.version() + name).hexdigest())
+
+  def invalidate(self):
+    """Drop all entries built in this process."""
+    with self._lock:
+      self._version = None
+      self._entries = {}
+    if hasattr(g, "attribute_catalog_version"):
+      del g.attribute_catalog_version
+
+
+CATALOG = AttributeCatalog()
+
+
+def get_catalog_json(name):
+  return CATALOG.get(name)[1]
+
+
+def catalog_view(name):
+  """Serve a catalog entry with an ETag."""
+  if name not in BUILDERS:
+    return current_app.make_response(("", 404, []))
+  etag = CATALOG.etag(name)
+  headers = [("Etag", etag), ("Cache-Control", "private, no-cache")]
+  if request.headers.get("If-None-Match") == etag:
+    return current_app.make_response(("", 304, headers))
+  return current_app.make_response((
+      get_catalog_json(name), 200,
+      headers + [("Content-Type", "application/json")]))
+
+
+def _invalidate_catalog(sender, obj=None, src=None, service=None):
+  # pylint: disable=unused-argument
+  CATALOG.invalidate()
+
+
+def init_attribute_catalog_views(app):
+  """Add the catalog url rule and invalidation listeners.
+
+  Args:
+    app: current flask app.
+  """
+  app.add_url_rule(
+      "/attribute_catalog/<name>", "attribute_catalog",
+      view_func=login_required(catalog_view))
+  for signal in (Resource.model_posted, Resource.model_put,
+                 Resource.model_deleted):
+    signal.connect(_invalidate_catalog,
+                   sender=models.CustomAttributeDefinition, weak=False)
@@ -0,0 +1,345 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Cached page bootstrap parts.
+
+Every HTML page used to embed the permissions, config and current user, the
+attribute definitions and the import/export definitions, and the dashboard
+embedded the full current user too. All of these were rebuilt and sent again
+on every page load.
+
+Pages now load them as separate scripts from /bootstrap/<name>.js?v=<hash>,
+where the hash is the SHA-1 of the serialized part. A part is served with its
+hash as a strong ETag, and with a long max-age when the requested version is
+the current one, so navigating between pages reuses the browser cache.
+/bootstrap lists the current hash and url of every part.
+
+Parts are cached on the server as well:
+  - attribute definitions come from the attribute catalog, and their hashes
+    are kept for the current catalog version,
+  - import and export definitions only depend on the models and are built
+    once per process,
+  - the full user is kept per user and rebuilt when the person, their
+    permissions, any of their mappings or person custom attribute
+    definitions change,
+  - permissions, config and the current user are cheap and built per request.
+"""
+
+import collections
+import hashlib
+import json
+import threading
+
+from flask import current_app
+from flask import g
+from flask import request
+from flask import url_for
+from sqlalchemy import and_
+from sqlalchemy import func
+from sqlalchemy import or_
+from sqlalchemy import select
+
+from ggrc import db
+from ggrc import models
+from ggrc.builder.json import publish
+from ggrc.builder.json import publish_representation
+from ggrc.converters import get_exportables
+from ggrc.converters import get_importables
+from ggrc.extensions import get_extension_modules
+from ggrc.login import get_current_user
+from ggrc.login import login_required
+from ggrc.rbac import permissions
+from ggrc.services.common import as_json
+from ggrc.services.common import inclusion_filter
+from ggrc.utils import benchmark
+from ggrc.views import attribute_catalog
+
+
+# Full users of at most this many people are kept in each process.
+MAX_CACHED_USERS = 1000
+
+# Versioned part urls never change content, so they can be kept for a year.
+VERSIONED_MAX_AGE = 365 * 24 * 60 * 60
+
+# Javascript variables the part scripts assign.
+TARGETS = collections.OrderedDict([
+    ("permissions", "GGRC.permissions"),
+    ("current_user", "GGRC.current_user"),
+    ("config", "GGRC.config"),
+    ("full_user", "GGRC.full_user"),
+    ("custom_attributes", "GGRC.custom_attr_defs"),
+    ("all_attributes", "GGRC.model_attr_defs"),
+    ("all_attributes_with_custom", "GGRC.model_attr_defs"),
+    ("import_definitions", "GGRC.Bootstrap.importable"),
+    ("export_definitions", "GGRC.Bootstrap.exportable"),
+])
+
+CATALOG_PARTS = ("custom_attributes", "all_attributes",
+                 "all_attributes_with_custom")
+
+
+def _digest(content):
+  if isinstance(content, unicode):
+    content = content.encode("utf-8")
+  return hashlib.sha1(content).hexdigest()
+
+
+def build_permissions_json():
+  """Get all permissions for current user"""
+  permissions.permissions_for(permissions.get_user())
+  return json.dumps(getattr(g, '_request_permissions', None))
+
+
+def build_config_json():
+  """Get public app config"""
+  public_config = dict(current_app.config.public_config)
+  for extension_module in get_extension_modules():
+    if hasattr(extension_module, 'get_public_config'):
+      public_config.update(
+          extension_module.get_public_config(get_current_user()))
+  return json.dumps(public_config)
+
+
+def build_current_user_json():
+  """Get current user"""
+  person = get_current_user()
+  return as_json({
+      "id": person.id,
+      "company": person.company,
+      "email": person.email,
+      "language": person.language,
+      "name": person.name,
+      "system_wide_role": person.system_wide_role,
+  })
+
+
+def build_full_user_json(person_id):
+  """Get the full user"""
+  person = models.Person.eager_query().filter_by(id=person_id).one()
+  result = publish_representation(publish(person, (), inclusion_filter))
+  return as_json(result)
+
+
+def build_import_types(export_only=False):
+  types = get_exportables if export_only else get_importables
+  data = []
+  for model in set(types().values()):
+    data.append({
+        "model_singular": model.__name__,
+        "title_plural": model._inflector.title_plural
+    })
+  data.sort()
+  return json.dumps(data)
+
+
+class FullUserCache(object):
+  """Published full users, with the version they were built for."""
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._entries = collections.OrderedDict()
+
+  @staticmethod
+  def _aggregates(model, *criteria):
+    table = model.__table__
+    return [
+        select([func.count()]).where(and_(*criteria)).as_scalar(),
+        select([func.max(table.c.updated_at)]).where(
+            and_(*criteria)).as_scalar(),
+    ]
+
+  @classmethod
+  def _compute_version(cls, person_id):
+    """Get the version of everything a published person contains.
+
+    Role changes are covered by the permissions of the user, everything else
+    by the latest update and the count of the person, its mappings and the
+    person custom attribute definitions.
+    """
+    person = models.Person.__table__
+    object_person = models.ObjectPerson.__table__
+    relationship = models.Relationship.__table__
+    value = models.CustomAttributeValue.__table__
+    definition = models.CustomAttributeDefinition.__table__
+    columns = [select([person.c.updated_at]).where(
+        person.c.id == person_id).as_scalar()]
+    columns.extend(cls._aggregates(
+        models.ObjectPerson, object_person.c.person_id == person_id))
+    columns.extend(cls._aggregates(models.Relationship, or_(
+        and_(relationship.c.source_type == "Person",
+             relationship.c.source_id == person_id),
+        and_(relationship.c.destination_type == "Person",
+             relationship.c.destination_id == person_id),
+    )))
+    columns.extend(cls._aggregates(
+        models.CustomAttributeValue,
+        value.c.attributable_type == "Person",
+        value.c.attributable_id == person_id))
+    # Definitions of person custom attributes are published with the person.
+    columns.extend(cls._aggregates(
+        models.CustomAttributeDefinition,
+        definition.c.definition_type == "person"))
+    row = db.session.execute(select(columns)).first()
+    return _digest(repr((tuple(row), get_part("permissions")[0])))
+
+  def get(self, person_id):
+    """Get (hash, serialized JSON) of the full user."""
+    version = self._compute_version(person_id)
+    with self._lock:
+      entry = self._entries.get(person_id)
+    if entry is not None and entry[0] == version:
+      return entry[1:]
+    with benchmark("Build full user JSON"):
+      content = build_full_user_json(person_id)
+    entry = (version, _digest(content), content)
+    with self._lock:
+      self._entries.pop(person_id, None)
+      self._entries[person_id] = entry
+      while len(self._entries) > MAX_CACHED_USERS:
+        self._entries.popitem(last=False)
+    return entry[1:]
+
+  def invalidate(self):
+    """Drop all full users built in this process."""
+    with self._lock:
+      self._entries = collections.OrderedDict()
+
+
+class GlobalParts(object):
+  """Hashes of catalog parts and fully built process wide parts."""
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._catalog_version = None
+    self._catalog_hashes = {}
+    self._static = {}
+
+  def catalog_part(self, name):
+    version, content = attribute_catalog.CATALOG.get(name)
+    with self._lock:
+      if version != self._catalog_version:
+        self._catalog_version = version
+        self._catalog_hashes = {}
+      digest = self._catalog_hashes.get(name)
+    if digest is None:
+      digest = _digest(content)
+      with self._lock:
+        if self._catalog_version == version:
+          self._catalog_hashes[name] = digest
+    return digest, content
+
+  def static_part(self, name, builder):
+    with self._lock:
+      entry = self._static.get(name)
+    if entry is None:
+      content = builder()
+      entry = (_digest(content), content)
+      with self._lock:
+        self._static[name] = entry
+    return entry
+
+
+FULL_USERS = FullUserCache()
+GLOBAL_PARTS = GlobalParts()
+
+PER_REQUEST_BUILDERS = {
+    "permissions": build_permissions_json,
+    "current_user": build_current_user_json,
+    "config": build_config_json,
+}
+
+STATIC_BUILDERS = {
+    "import_definitions": build_import_types,
+    "export_definitions": lambda: build_import_types(export_only=True),
+}
+
+
+def _build_part(name):
+  if name in PER_REQUEST_BUILDERS:
+    content = PER_REQUEST_BUILDERS[name]()
+    return _digest(content), content
+  if name == "full_user":
+    return FULL_USERS.get(get_current_user().id)
+  if name in CATALOG_PARTS:
+    return GLOBAL_PARTS.catalog_part(name)
+  return GLOBAL_PARTS.static_part(name, STATIC_BUILDERS[name])
+
+
+def get_part(name):
+  """Get (hash, serialized JSON) of a part, built once per request."""
+  parts = getattr(g, "bootstrap_parts", None)
+  if parts is None:
+    parts = g.bootstrap_parts = {}
+  if name not in parts:
+    with benchmark("Get bootstrap part: {}".format(name)):
+      parts[name] = _build_part(name)
+  return parts[name]
+
+
+def get_part_json(name):
+  return get_part(name)[1]
+
+
+def part_url(name):
+  return url_for("bootstrap_part", name=name + ".js", v=get_part(name)[0])
+
+
+def bootstrap_scripts(*names):
+  """Get script tags that load the given parts into the page."""
+  return u"\n".join(
+      u'<script type="text/javascript" src="{}"></script>'.format(
+          part_url(name))
+      for name in names)
+
+
+def _cached_response(etag, versioned, content, content_type):
+  """Make a response with a strong ETag, or a 304 if the client has it."""
+  max_age = "max-age={}".format(VERSIONED_MAX_AGE) if versioned \
+      else "no-cache"
+  headers = [("Etag", etag), ("Cache-Control", "private, " + max_age)]
+  if request.headers.get("If-None-Match") == etag:
+    return current_app.make_response(("", 304, headers))
+  return current_app.make_response((
+      content, 200, headers + [("Content-Type", content_type)]))
+
+
+def part_view(name):
+  """Serve a part as JSON or, with a .js suffix, as a script."""
+  script = name.endswith(".js")
+  if script:
+    name = name[:-len(".js")]
+  if name not in TARGETS:
+    return current_app.make_response(("", 404, []))
+  digest, content = get_part(name)
+  versioned = request.args.get("v") == digest
+  if script:
+    return _cached_response(
+        '"{}.js"'.format(digest), versioned,
+        u"{} = {};\n".format(TARGETS[name], content),
+        "application/javascript")
+  return _cached_response('"{}"'.format(digest), versioned, content,
+                          "application/json")
+
+
+def manifest_view():
+  """List the hash and url of every part."""
+  manifest = collections.OrderedDict(
+      (name, {"hash": get_part(name)[0], "url": part_url(name)})
+      for name in TARGETS)
+  content = json.dumps(manifest)
+  return _cached_response('"{}"'.format(_digest(content)), False, content,
+                          "application/json")
+
+
+def init_bootstrap_views(app):
+  """Add the bootstrap url rules.
+
+  Args:
+    app: current flask app.
+  """
+  app.add_url_rule(
+      "/bootstrap", "bootstrap",
+      view_func=login_required(manifest_view))
+  app.add_url_rule(
+      "/bootstrap/<name>", "bootstrap_part",
+      view_func=login_required(part_view))
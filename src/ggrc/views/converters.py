@@ -16,7 +16,7 @@ from werkzeug.exceptions import BadRequest
 from ggrc.app import app
 from ggrc.converters.base import Converter
 from ggrc.converters.import_helper import generate_csv_string
-from ggrc.converters.import_helper import read_csv_file
+from ggrc.converters.import_helper import iter_csv_file
 from ggrc.converters.query_helper import BadQueryException
 from ggrc.converters.query_helper import QueryHelper
 from ggrc.login import login_required
@@ -86,7 +86,7 @@ def parse_import_request():
   }
   check_required_headers(required_headers)
   csv_file = check_import_file()
-  csv_data = read_csv_file(csv_file)
+  csv_data = iter_csv_file(csv_file)
   dry_run = request.headers["X-test-only"] == "true"
   return dry_run, csv_data
 
@@ -948,9 +948,15 @@ def handle_resource_deleted(sender, obj=None, service=None):
      and obj.context.related_object_id \
      and obj.id == obj.context.related_object_id \
      and obj.__class__.__name__ == obj.context.related_object_type:
+    # pylint: disable=cyclic-import
+    from ggrc.fulltext import person_objects
+    person_ids = [row[0] for row in db.session.query(UserRole.person_id)
+                  .filter(UserRole.context_id == obj.context_id)]
     db.session.query(UserRole) \
         .filter(UserRole.context_id == obj.context_id) \
         .delete()
+    # The bulk delete skips the flush hooks, so update people explicitly.
+    person_objects.update_people(db.session.connection(), person_ids)
     db.session.query(ContextImplication) \
         .filter(
             or_(ContextImplication.context_id == obj.context_id,
@@ -3,15 +3,12 @@
 """Handlers columns dealing with user roles."""
 
 
-from sqlalchemy import and_
-
 from ggrc import db
 from ggrc.converters import errors
 from ggrc.converters.handlers.handlers import UserColumnHandler
 from ggrc.login import get_current_user
-from ggrc.models import Context
 from ggrc.models import Person
-from ggrc_basic_permissions.models import Role
+from ggrc_basic_permissions.converters.role_registry import RoleRegistry
 from ggrc_basic_permissions.models import UserRole
 
 
@@ -19,8 +16,16 @@ class ObjectRoleColumnHandler(UserColumnHandler):
   """Basic User role handler"""
 
   role = -1
+  role_name = None
   owner_columns = ("program_owner")
 
+  def __init__(self, row_converter, key, **options):
+    self.registry = RoleRegistry.for_row(row_converter)
+    if self.role_name is not None:
+      self.role = self.registry.role(self.role_name)
+    super(ObjectRoleColumnHandler, self).__init__(
+        row_converter, key, **options)
+
   def parse_item(self):
     """Parse new line separated list of emails
 
@@ -40,18 +45,26 @@ class ObjectRoleColumnHandler(UserColumnHandler):
   def set_obj_attr(self):
     pass
 
+  def _block_context_ids(self):
+    return [obj.context_id
+            for obj in self.registry.block_objects(self.row_converter)]
+
+  def get_role_assignments(self):
+    """Get assignments of the handled role in the object context."""
+    assignments = self.registry.context_assignments(
+        self.row_converter.obj.context_id, self._block_context_ids())
+    return [assignment for assignment in assignments
+            if assignment.role_id == self.role.id]
+
   def get_value(self):
-    user_role_ids = db.session.query(UserRole.person_id).filter_by(
-        role=self.role,
-        context_id=self.row_converter.obj.context_id)
-    users = Person.query.filter(Person.id.in_(user_role_ids))
-    emails = [user.email for user in users]
+    emails = []
+    for assignment in self.get_role_assignments():
+      if assignment.email not in emails:
+        emails.append(assignment.email)
     return "\n".join(emails)
 
   def remove_current_roles(self):
-    UserRole.query.filter_by(
-        role=self.role,
-        context_id=self.row_converter.obj.context_id).delete()
+    self.registry.remove(self.get_role_assignments())
 
   def insert_object(self):
     if self.dry_run or not self.value:
@@ -64,69 +77,48 @@ class ObjectRoleColumnHandler(UserColumnHandler):
           person=owner
       )
       db.session.add(user_role)
+      self.registry.add(user_role)
     self.dry_run = True
 
 
 class ProgramOwnerColumnHandler(ObjectRoleColumnHandler):
-
-  def __init__(self, row_converter, key, **options):
-    self.role = Role.query.filter_by(name="ProgramOwner").one()
-    super(ProgramOwnerColumnHandler, self).__init__(
-        row_converter, key, **options)
+  role_name = "ProgramOwner"
 
 
 class ProgramEditorColumnHandler(ObjectRoleColumnHandler):
-
-  def __init__(self, row_converter, key, **options):
-    self.role = Role.query.filter_by(name="ProgramEditor").one()
-    super(ProgramEditorColumnHandler, self).__init__(
-        row_converter, key, **options)
+  role_name = "ProgramEditor"
 
 
 class ProgramReaderColumnHandler(ObjectRoleColumnHandler):
-
-  def __init__(self, row_converter, key, **options):
-    self.role = Role.query.filter_by(name="ProgramReader").one()
-    super(ProgramReaderColumnHandler, self).__init__(
-        row_converter, key, **options)
+  role_name = "ProgramReader"
 
 
 class WorkflowOwnerColumnHandler(ObjectRoleColumnHandler):
-
-  def __init__(self, row_converter, key, **options):
-    self.role = Role.query.filter_by(name="WorkflowOwner").one()
-    super(WorkflowOwnerColumnHandler, self).__init__(
-        row_converter, key, **options)
+  role_name = "WorkflowOwner"
 
 
 class WorkflowMemberColumnHandler(ObjectRoleColumnHandler):
-
-  def __init__(self, row_converter, key, **options):
-    self.role = Role.query.filter_by(name="WorkflowMember").one()
-    super(WorkflowMemberColumnHandler, self).__init__(
-        row_converter, key, **options)
+  role_name = "WorkflowMember"
 
 
 class AuditAuditorColumnHandler(ObjectRoleColumnHandler):
+  role_name = "Auditor"
 
   def __init__(self, row_converter, key, **options):
-    self.role = Role.query.filter_by(name="Auditor").one()
-    self.reader = Role.query.filter_by(name="ProgramReader").one()
     super(AuditAuditorColumnHandler, self).__init__(
         row_converter, key, **options)
+    self.reader = self.registry.role("ProgramReader")
 
   def insert_object(self):
     if self.dry_run or not self.value:
       return
     super(AuditAuditorColumnHandler, self).insert_object()
-    user_roles = set(map(lambda ur: ur.person_id, self.get_program_roles()))
     context = self.row_converter.obj.program.context
+    user_roles = set(assignment.person_id
+                     for assignment in self.get_program_roles())
     for auditor in self.value:
       # Check if the role already exists in the database or in the session:
-      if auditor.id in user_roles or any(o for o in db.session.new if
-                                         isinstance(o, UserRole) and
-                                         o.context.id == context.id and
-                                         o.person.id == auditor.id):
+      if auditor.id in user_roles:
         continue
       user_role = UserRole(
           role=self.reader,
@@ -134,11 +126,18 @@ class AuditAuditorColumnHandler(ObjectRoleColumnHandler):
           person=auditor
       )
       db.session.add(user_role)
+      self.registry.add(user_role)
+      user_roles.add(auditor.id)
 
   def get_program_roles(self):
-    context_id = self.row_converter.obj.program.context.id
-    return db.session.query(UserRole).filter(
-        UserRole.context_id == context_id).all()
+    """Get all role assignments in the program context of the audit."""
+    program_context_ids = [
+        obj.program.context.id
+        for obj in self.registry.block_objects(self.row_converter)
+        if obj.program is not None and obj.program.context is not None
+    ]
+    return self.registry.context_assignments(
+        self.row_converter.obj.program.context.id, program_context_ids)
 
 
 class UserRoleColumnHandler(UserColumnHandler):
@@ -154,24 +153,38 @@ class UserRoleColumnHandler(UserColumnHandler):
       "Administrator",
   ]
 
+  def __init__(self, row_converter, key, **options):
+    self.registry = RoleRegistry.for_row(row_converter)
+    super(UserRoleColumnHandler, self).__init__(
+        row_converter, key, **options)
+
   def parse_item(self):
     value = self.raw_value.lower()
     name = self._role_map.get(value, value)
-    return Role.query.filter_by(name=name).first()
+    return self.registry.role(name)
 
   def set_obj_attr(self):
     pass
 
+  def get_person_roles(self):
+    """Get role assignments of the person in all contexts."""
+    person_ids = [
+        obj.id for obj in self.registry.block_objects(self.row_converter)]
+    return self.registry.person_assignments(
+        self.row_converter.obj.id, person_ids)
+
   def get_value(self):
-    return self.row_converter.obj.system_wide_role
+    person = self.row_converter.obj
+    if person.id is None:
+      return person.system_wide_role
+    return Person.system_wide_role_from(
+        person.email,
+        [assignment.role_name for assignment in self.get_person_roles()])
 
   def remove_current_roles(self):
-    allowed_role_ids = db.session.query(Role.id).filter(
-        Role.name.in_(self._allowed_roles))
-    UserRole.query.filter(and_(
-        UserRole.role_id.in_(allowed_role_ids),
-        UserRole.person_id == self.row_converter.obj.id)
-    ).delete(synchronize_session="fetch")
+    self.registry.remove(
+        assignment for assignment in self.get_person_roles()
+        if assignment.role_name in self._allowed_roles)
 
   def insert_object(self):
     if self.dry_run or not self.value:
@@ -179,13 +192,14 @@ class UserRoleColumnHandler(UserColumnHandler):
     self.remove_current_roles()
     context = None
     if self.value.name == "Administrator":
-      context = Context.query.filter_by(name="System Administration").first()
+      context = self.registry.admin_context()
     user_role = UserRole(
         role=self.value,
         person=self.row_converter.obj,
         context=context,
     )
     db.session.add(user_role)
+    self.registry.add(user_role)
     self.dry_run = True
 
 COLUMN_HANDLERS = {
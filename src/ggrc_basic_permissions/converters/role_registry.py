@@ -0,0 +1,132 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Roles and role assignments shared by column handlers of one import.
+
+Column handlers are created for every row of an import or export. Instead of
+looking up roles and role assignments in every handler, the registry loads
+all roles once and prefetches the assignments for all objects of a block
+with a single query the first time one of them is needed. Assignments added
+or removed by the handlers are recorded in the registry, so it stays valid
+for the rest of the import.
+"""
+
+import collections
+
+from ggrc import db
+from ggrc.models import Context
+from ggrc.models import Person
+from ggrc_basic_permissions.models import Role
+from ggrc_basic_permissions.models import UserRole
+
+
+Assignment = collections.namedtuple(
+    "Assignment", ["id", "role_id", "role_name", "person_id", "email"])
+
+
+class RoleRegistry(object):
+  """Role lookups for all handlers of a converter."""
+
+  def __init__(self):
+    self._roles = None
+    self._admin_context = None
+    self._by_context = {}
+    self._by_person = {}
+
+  @classmethod
+  def for_row(cls, row_converter):
+    """Get the registry shared by all rows of the row's converter."""
+    shared_state = row_converter.block_converter.converter.shared_state
+    if cls not in shared_state:
+      shared_state[cls] = cls()
+    return shared_state[cls]
+
+  @staticmethod
+  def block_objects(row_converter):
+    """Get objects of all rows in the block of the row."""
+    return [row.obj for row in row_converter.block_converter.row_converters
+            if row.obj is not None]
+
+  def role(self, name):
+    """Get a role by its case insensitive name, or None."""
+    if self._roles is None:
+      self._roles = {role.name.lower(): role for role in Role.query}
+    return self._roles.get(name.lower())
+
+  def admin_context(self):
+    if self._admin_context is None:
+      self._admin_context = Context.query.filter_by(
+          name="System Administration").first()
+    return self._admin_context
+
+  @staticmethod
+  def _load(condition):
+    rows = db.session.query(
+        UserRole.id,
+        UserRole.role_id,
+        Role.name,
+        UserRole.person_id,
+        Person.email,
+        UserRole.context_id,
+    ).join(Role, Role.id == UserRole.role_id).join(
+        Person, Person.id == UserRole.person_id
+    ).filter(condition).order_by(Person.id)
+    return [(row[-1], Assignment(*row[:-1])) for row in rows]
+
+  def context_assignments(self, context_id, prefetch_ids=()):
+    """Get role assignments in a context.
+
+    Args:
+      context_id: id of the context.
+      prefetch_ids: ids of other contexts that will likely be needed, loaded
+        together with context_id if they have not been loaded yet.
+    """
+    if context_id is None:
+      return []
+    if context_id not in self._by_context:
+      ids = {id_ for id_ in prefetch_ids if id_ is not None}
+      ids.add(context_id)
+      ids.difference_update(self._by_context)
+      for id_ in ids:
+        self._by_context[id_] = []
+      for id_, assignment in self._load(UserRole.context_id.in_(ids)):
+        self._by_context[id_].append(assignment)
+    return self._by_context[context_id]
+
+  def person_assignments(self, person_id, prefetch_ids=()):
+    """Get role assignments of a person in all contexts."""
+    if person_id is None:
+      return []
+    if person_id not in self._by_person:
+      ids = {id_ for id_ in prefetch_ids if id_ is not None}
+      ids.add(person_id)
+      ids.difference_update(self._by_person)
+      for id_ in ids:
+        self._by_person[id_] = []
+      for _, assignment in self._load(UserRole.person_id.in_(ids)):
+        self._by_person[assignment.person_id].append(assignment)
+    return self._by_person[person_id]
+
+  def add(self, user_role):
+    """Record a new role assignment added to the session."""
+    assignment = Assignment(None, user_role.role.id, user_role.role.name,
+                            user_role.person.id, user_role.person.email)
+    context_id = user_role.context.id if user_role.context else None
+    if context_id in self._by_context:
+      self._by_context[context_id].append(assignment)
+    if assignment.person_id in self._by_person:
+      self._by_person[assignment.person_id].append(assignment)
+
+  def remove(self, assignments):
+    """Delete role assignments and forget them."""
+    assignments = list(assignments)
+    ids = [assignment.id for assignment in assignments
+           if assignment.id is not None]
+    if ids:
+      UserRole.query.filter(UserRole.id.in_(ids)).delete(
+          synchronize_session="fetch")
+    removed = set(assignments)
+    for cache in (self._by_context, self._by_person):
+      for key, cached in cache.iteritems():
+        cache[key] = [assignment for assignment in cached
+                      if assignment not in removed]
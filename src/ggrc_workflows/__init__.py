@@ -3,22 +3,26 @@
 
 from datetime import datetime, date
 from flask import Blueprint
-from sqlalchemy import inspect, and_, orm
+from sqlalchemy import event, inspect, and_, orm
+from sqlalchemy.orm.session import Session
 
 from ggrc import db
 from ggrc.login import get_current_user
 from ggrc.models import all_models
 from ggrc.models.relationship import Relationship
-from ggrc.rbac.permissions import is_allowed_update
 from ggrc.services.common import Resource
 from ggrc.services.registry import service
 from ggrc_workflows import models, notification
+from ggrc_workflows.models import object_workflow_state
+from ggrc_workflows.models import person_task_count
 from ggrc_workflows.models import relationship_helper
 from ggrc_workflows.models import WORKFLOW_OBJECT_TYPES
 from ggrc_workflows.converters import IMPORTABLE, EXPORTABLE
 from ggrc_workflows.converters.handlers import COLUMN_HANDLERS
+from ggrc_workflows import status_propagation
 from ggrc_workflows.services.common import Signals
 from ggrc_workflows.services import workflow_cycle_calculator
+from ggrc_workflows.workflow_cloner import WorkflowCloner
 from ggrc_workflows.roles import (
     WorkflowOwner, WorkflowMember, BasicWorkflowReader, WorkflowBasicReader
 )
@@ -46,6 +50,7 @@ for type_ in WORKFLOW_OBJECT_TYPES:
       models.workflow.WorkflowState,
   ) + model.__bases__
   model.late_init_task_groupable()
+  model.late_init_workflow_state()
 
 
 def get_public_config(current_user):  # noqa
@@ -226,8 +231,23 @@ def _create_cycle_task(task_group_task, cycle, cycle_task_group,
   return cycle_task_group_object_task
 
 
+def _map_cycle_task(cycle_task, task_group_object, relationships=None):
+  """Map a cycle task to a task group object.
+
+  If a relationships list is given, the (cycle task, object type, object id)
+  triple is appended to it and the caller is responsible for inserting the
+  relationship once the cycle task has an id.
+  """
+  if relationships is not None:
+    relationships.append((cycle_task, task_group_object.object_type,
+                          task_group_object.object_id))
+  else:
+    db.session.add(Relationship(source=cycle_task,
+                                destination=task_group_object.object))
+
+
 def create_old_style_cycle(cycle, task_group, cycle_task_group, current_user,
-                           base_date):
+                           base_date, relationships=None):
   """ This function preserves the old style of creating cycles, so each object
   gets its own task assigned to it.
   """
@@ -238,17 +258,27 @@ def create_old_style_cycle(cycle, task_group, cycle_task_group, current_user,
           current_user, base_date)
 
   for task_group_object in task_group.task_group_objects:
-    object_ = task_group_object.object
     for task_group_task in task_group.task_group_tasks:
       cycle_task_group_object_task = _create_cycle_task(
           task_group_task, cycle, cycle_task_group,
           current_user, base_date)
-      db.session.add(Relationship(source=cycle_task_group_object_task,
-                                  destination=object_))
+      _map_cycle_task(cycle_task_group_object_task, task_group_object,
+                      relationships)
 
 
-def build_cycle(cycle, current_user=None, base_date=None):
-  """Build a cycle with it's child objects"""
+def build_cycle(cycle, current_user=None, base_date=None,
+                relationships=None):
+  """Build a cycle with it's child objects
+
+  Args:
+    cycle: Cycle object to populate.
+    current_user: Person that will be set as the creator of cycle objects.
+      Defaults to the workflow owner.
+    base_date: Date from which cycle task dates are calculated.
+    relationships: Optional list for collecting cycle task to object
+      mappings instead of adding Relationship objects to the session. Used
+      for inserting all mappings of many cycles at once.
+  """
 
   if not base_date:
     base_date = date.today()
@@ -288,16 +318,15 @@ def build_cycle(cycle, current_user=None, base_date=None):
     # gets its own cycle task
     if workflow.is_old_workflow:
       create_old_style_cycle(cycle, task_group, cycle_task_group, current_user,
-                             base_date)
+                             base_date, relationships)
     else:
       for task_group_task in task_group.task_group_tasks:
         cycle_task_group_object_task = _create_cycle_task(
             task_group_task, cycle, cycle_task_group, current_user, base_date)
 
         for task_group_object in task_group.task_group_objects:
-          object_ = task_group_object.object
-          db.session.add(Relationship(source=cycle_task_group_object_task,
-                                      destination=object_))
+          _map_cycle_task(cycle_task_group_object_task, task_group_object,
+                          relationships)
 
   update_cycle_dates(cycle)
 
@@ -308,98 +337,14 @@ def build_cycle(cycle, current_user=None, base_date=None):
       old_status=None
   )
 
-# 'InProgress' states propagate via these links
-_cycle_task_parent_attr = {
-    models.CycleTaskGroupObjectTask: ['cycle_task_group'],
-    models.CycleTaskGroup: ['cycle']
-}
-
-# 'Finished' and 'Verified' states are determined via these links
-_cycle_task_children_attr = {
-    models.CycleTaskGroup: ['cycle_task_group_tasks'],
-    models.Cycle: ['cycle_task_groups']
-}
-
-
 def update_cycle_task_child_state(obj):
+  """Propagate obj's status to its children"""
+  status_propagation.propagate_status(obj, down=True)
 
-  status_order = (None, 'Assigned', 'InProgress',
-                  'Declined', 'Finished', 'Verified')
-  status = obj.status
-  children_attrs = _cycle_task_children_attr.get(type(obj), [])
-  for children_attr in children_attrs:
-    if children_attr:
-      children = getattr(obj, children_attr, None)
-      for child in children:
-        if status == 'Declined' or \
-           status_order.index(status) > status_order.index(child.status):
-          if is_allowed_update(child.__class__.__name__,
-                               child.id, child.context.id):
-            old_status = child.status
-            child.status = status
-            db.session.add(child)
-            Signals.status_change.send(
-                child.__class__,
-                obj=child,
-                new_status=child.status,
-                old_status=old_status
-            )
-          update_cycle_task_child_state(child)
-
-
-def update_cycle_task_parent_state(obj):  # noqa
-  """Propagate changes to obj's parents"""
 
-  if not is_allowed_update(obj.__class__.__name__,
-                           obj.id, obj.context.id):
-    return
-
-  def update_parent(parent, old_status, new_status):
-    """Update a parent element and emit a signal about the change"""
-    parent.status = new_status
-    db.session.add(parent)
-    Signals.status_change.send(
-        parent.__class__,
-        obj=parent,
-        old_status=old_status,
-        new_status=new_status,
-    )
-    update_cycle_task_parent_state(parent)
-
-  parent_attrs = _cycle_task_parent_attr.get(type(obj), [])
-  for parent_attr in parent_attrs:
-    if not parent_attr:
-      continue
-
-    parent = getattr(obj, parent_attr, None)
-    old_status = parent.status
-    if not parent:
-      continue
-
-    # Don't propagate changes to CycleTaskGroup if it's a part of backlog wf
-    if isinstance(parent, models.CycleTaskGroup) \
-       and parent.cycle.workflow.kind == "Backlog":
-      continue
-
-    # If any child is `InProgress`, then parent should be `InProgress`
-    if obj.status in {"InProgress", "Declined"} and old_status != "InProgress":
-      new_status = "InProgress"
-      update_parent(parent, old_status, new_status)
-    # If all children are `Finished` or `Verified`, then parent should be same
-    elif obj.status in {"Finished", "Verified", "Assigned"}:
-      children_attrs = _cycle_task_children_attr.get(type(parent), [])
-      for children_attr in children_attrs:
-        children = getattr(parent, children_attr, None)
-        if not children:
-          continue
-
-        children_statues = [c.status for c in children]
-        unique_statuses = set(children_statues)
-        for status in ["Verified", "Finished", "Assigned"]:
-          # Check if all elements match a certain state
-          if children_statues[0] == status and len(unique_statuses) == 1:
-            new_status = status
-            update_parent(parent, old_status, new_status)
+def update_cycle_task_parent_state(obj):
+  """Propagate changes to obj's parents"""
+  status_propagation.propagate_status(obj, up=True)
 
 
 def ensure_assignee_is_workflow_member(workflow, assignee):
@@ -449,18 +394,21 @@ def handle_task_group_task_put(sender, obj=None, src=None, service=None):  # noq
   if any(getattr(inspect(obj).attrs, attr).history.has_changes()
          for attr in workflow_modifying_attrs):
     db.session.add(obj)
+    workflow_cycle_calculator.invalidate_schedule(obj.task_group.workflow)
     update_workflow_state(obj.task_group.workflow)
 
 
 @Resource.model_posted.connect_via(models.TaskGroupTask)
 def handle_task_group_task_post(sender, obj=None, src=None, service=None):  # noqa pylint: disable=unused-argument
   ensure_assignee_is_workflow_member(obj.task_group.workflow, obj.contact)
+  workflow_cycle_calculator.invalidate_schedule(obj.task_group.workflow)
   update_workflow_state(obj.task_group.workflow)
 
 
 @Resource.model_deleted.connect_via(models.TaskGroupTask)
 def handle_task_group_task_delete(sender, obj=None, src=None, service=None):  # noqa pylint: disable=unused-argument
   db.session.flush()
+  workflow_cycle_calculator.invalidate_schedule(obj.task_group.workflow)
   update_workflow_state(obj.task_group.workflow)
 
 
@@ -482,12 +430,16 @@ def handle_task_group_post(sender, obj=None, src=None, service=None):  # noqa py
     source_task_group.copy(
         obj,
         clone_people=src.get('clone_people', False),
-        clone_tasks=src.get('clone_tasks', False),
-        clone_objects=src.get('clone_objects', False)
     )
 
     db.session.add(obj)
     db.session.flush()
+    WorkflowCloner(
+        obj.context_id,
+        clone_people=src.get('clone_people', False),
+        clone_tasks=src.get('clone_tasks', False),
+        clone_objects=src.get('clone_objects', False),
+    ).clone_task_group_contents(source_task_group, obj)
 
     obj.title = source_task_group.title + ' (copy ' + str(obj.id) + ')'
 
@@ -588,8 +540,7 @@ def handle_cycle_task_group_object_task_post(
 def handle_cycle_task_group_put(
         sender, obj=None, src=None, service=None):  # noqa pylint: disable=unused-argument
   if inspect(obj).attrs.status.history.has_changes():
-    update_cycle_task_parent_state(obj)
-    update_cycle_task_child_state(obj)
+    status_propagation.propagate_status(obj, up=True, down=True)
 
 
 def update_workflow_state(workflow):
@@ -684,6 +635,26 @@ def handle_cycle_status_change(sender, obj=None, new_status=None,  # noqa pylint
       update_workflow_state(obj.workflow)
 
 
+@Signals.status_changes.connect
+def handle_propagated_status_changes(sender, changes=None):  # noqa pylint: disable=unused-argument
+  """Deactivate cycles that became Verified through status propagation.
+
+  Task dates are written together with the propagated statuses, but workflow
+  states of mapped objects and task counts of assignees have to be updated
+  here because bulk updates are not seen by the flush hooks.
+  """
+  task_ids = [change.obj.id for change in changes
+              if isinstance(change.obj, models.CycleTaskGroupObjectTask)]
+  object_workflow_state.update_task_states(db.session.connection(), task_ids)
+  person_task_count.update_task_counts(db.session.connection(), task_ids)
+  for change in changes:
+    if isinstance(change.obj, models.Cycle) and \
+       change.new_status == "Verified":
+      change.obj.is_current = False
+      db.session.add(change.obj)
+      update_workflow_state(change.obj.workflow)
+
+
 @Signals.status_change.connect_via(models.CycleTaskGroupObjectTask)
 def handle_cycle_task_status_change(sender, obj=None, new_status=None,  # noqa pylint: disable=unused-argument
                                     old_status=None):  # noqa pylint: disable=unused-argument
@@ -837,53 +808,26 @@ def add_public_workflow_context_implication(context, check_exists=False):
   ))
 
 
+event.listen(Session, 'after_flush',
+             object_workflow_state.update_states_after_flush)
+event.listen(Session, 'after_flush',
+             person_task_count.update_counts_after_flush)
+
+
 def init_extra_views(app):
   from . import views
   views.init_extra_views(app)
 
 
 def start_recurring_cycles():
-  # Get all workflows that should start a new cycle today
-  # The next_cycle_start_date is precomputed and stored when a cycle is created
-  today = date.today()
-  workflows = db.session.query(models.Workflow)\
-      .filter(
-      models.Workflow.next_cycle_start_date == today,
-      models.Workflow.recurrences == True  # noqa
-  ).all()
-
-  # For each workflow, start and save a new cycle.
-  for workflow in workflows:
-    cycle = models.Cycle()
-    cycle.workflow = workflow
-    cycle.calculator = workflow_cycle_calculator.get_cycle_calculator(workflow)
-    cycle.context = workflow.context
-    # We can do this because we selected only workflows with
-    # next_cycle_start_date = today
-    cycle.start_date = date.today()
-
-    # Flag the cycle to be saved
-    db.session.add(cycle)
+  """Start new cycles for all recurring workflows that are due today."""
+  from ggrc_workflows import cycle_generator
+  cycle_generator.start_recurring_cycles()
 
-    if workflow.non_adjusted_next_cycle_start_date:
-      base_date = workflow.non_adjusted_next_cycle_start_date
-    else:
-      base_date = date.today()
-
-    # Create the cycle (including all child objects)
-    build_cycle(cycle, base_date=base_date)
 
-    # Update the workflow next_cycle_start_date to push it ahead based on the
-    # frequency.
-    adjust_next_cycle_start_date(cycle.calculator, workflow, move_forward=True)
-
-    db.session.add(workflow)
-
-    notification.handle_workflow_modify(None, workflow)
-    notification.handle_cycle_created(None, obj=cycle)
-
-  db.session.commit()
-  db.session.flush()
+def reconcile_task_counts():
+  """Repair stored open task counts that differ from the cycle tasks."""
+  person_task_count.reconcile()
 
 
 def get_cycles(workflow):
@@ -1037,5 +981,5 @@ contributed_importables = IMPORTABLE
 contributed_exportables = EXPORTABLE
 contributed_column_handlers = COLUMN_HANDLERS
 contributed_get_ids_related_to = relationship_helper.get_ids_related_to
-CONTRIBUTED_CRON_JOBS = [start_recurring_cycles]
+CONTRIBUTED_CRON_JOBS = [start_recurring_cycles, reconcile_task_counts]
 NOTIFICATION_LISTENERS = [notification.register_listeners]
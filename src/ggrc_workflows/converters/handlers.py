@@ -12,7 +12,7 @@ from ggrc.converters import errors
 from ggrc.converters.handlers import boolean
 from ggrc.converters.handlers import handlers
 from ggrc.converters.handlers import multi_object
-from ggrc_basic_permissions import models as bp_models
+from ggrc_basic_permissions.converters.role_registry import RoleRegistry
 from ggrc_workflows import models as wf_models
 
 
@@ -244,22 +244,49 @@ class TaskTypeColumnHandler(handlers.ColumnHandler):
 
 class WorkflowPersonColumnHandler(handlers.UserColumnHandler):
 
+  def __init__(self, row_converter, key, **options):
+    self.registry = RoleRegistry.for_row(row_converter)
+    super(WorkflowPersonColumnHandler, self).__init__(
+        row_converter, key, **options)
+
   def parse_item(self):
     return self.get_users_list()
 
   def set_obj_attr(self):
     pass
 
+  def get_workflow_people(self):
+    """Get (person id, email) of people of all workflows in the block."""
+    shared_state = self.row_converter.block_converter.converter.shared_state
+    cache = shared_state.setdefault(WorkflowPersonColumnHandler, {})
+    workflow_id = self.row_converter.obj.id
+    if workflow_id not in cache:
+      ids = set(obj.id for obj in self.registry.block_objects(
+          self.row_converter) if obj.id is not None)
+      ids.add(workflow_id)
+      ids.difference_update(cache)
+      for id_ in ids:
+        cache[id_] = []
+      if ids:
+        rows = db.session.query(
+            wf_models.WorkflowPerson.workflow_id,
+            models.Person.id,
+            models.Person.email,
+        ).join(models.Person).filter(
+            wf_models.WorkflowPerson.workflow_id.in_(ids))
+        for id_, person_id, email in rows:
+          cache[id_].append((person_id, email))
+    return cache[workflow_id]
+
   def get_value(self):
-    workflow_person = db.session.query(wf_models.WorkflowPerson.person_id)\
-        .filter_by(workflow_id=self.row_converter.obj.id,)
-    workflow_roles = db.session.query(bp_models.UserRole.person_id)\
-        .filter_by(context_id=self.row_converter.obj.context_id)
-    users = models.Person.query.filter(
-        models.Person.id.in_(workflow_person) &
-        models.Person.id.notin_(workflow_roles)
-    )
-    emails = [user.email for user in users]
+    context_ids = [obj.context_id
+                   for obj in self.registry.block_objects(self.row_converter)]
+    role_person_ids = set(
+        assignment.person_id
+        for assignment in self.registry.context_assignments(
+            self.row_converter.obj.context_id, context_ids))
+    emails = [email for person_id, email in self.get_workflow_people()
+              if person_id not in role_person_ids]
     return "\n".join(emails)
 
   def remove_current_people(self):
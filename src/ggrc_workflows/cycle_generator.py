@@ -0,0 +1,195 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Bulk generation of cycles for recurring workflows.
+
+The nightly cron job starts a new cycle for every recurring workflow whose
+next cycle start date is today. Workflows are processed in chunks and every
+chunk is committed in its own transaction:
+
+  - due workflows are loaded with their owners, task groups, tasks and
+    objects in a few queries,
+  - cycles, cycle task groups and cycle tasks are built from the preloaded
+    objects without further lookups,
+  - cycle task to object relationships and notifications for all cycles of
+    the chunk are written with multi-row inserts, and workflow states of the
+    mapped objects are updated once per chunk.
+
+Each workflow is built inside a savepoint, so a failing workflow is rolled
+back without affecting the rest of its chunk. The next cycle start date of a
+workflow is moved forward in the same transaction that creates its cycle,
+so running the job again only picks up workflows that were not processed.
+"""
+
+from datetime import date
+from datetime import datetime
+from logging import getLogger
+
+from sqlalchemy import orm
+
+import ggrc_workflows
+from ggrc import db
+from ggrc.fulltext import person_objects
+from ggrc.models import relationship_adjacency
+from ggrc.models.relationship import Relationship
+from ggrc.utils import benchmark
+from ggrc_workflows import models
+from ggrc_workflows import notification
+from ggrc_workflows.models import object_workflow_state
+from ggrc_workflows.services import workflow_cycle_calculator
+
+
+# pylint: disable=invalid-name
+logger = getLogger(__name__)
+
+CHUNK_SIZE = 50
+
+
+class CycleGenerationError(Exception):
+  """Raised when cycles could not be started for some workflows."""
+
+  def __init__(self, workflow_ids):
+    super(CycleGenerationError, self).__init__(
+        "Failed to start cycles for workflows: {}".format(
+            ", ".join(str(id_) for id_ in workflow_ids)))
+    self.workflow_ids = workflow_ids
+
+
+def get_due_workflow_ids(today):
+  """Get ids of recurring workflows that should start a new cycle today.
+
+  The next_cycle_start_date is precomputed and stored when a cycle is created.
+  """
+  query = db.session.query(models.Workflow.id).filter(
+      models.Workflow.next_cycle_start_date == today,
+      models.Workflow.recurrences == True  # noqa
+  ).order_by(models.Workflow.id)
+  return [workflow_id for workflow_id, in query]
+
+
+def load_workflows(workflow_ids):
+  """Load workflows with everything needed for building their cycles."""
+  task_groups = orm.subqueryload("task_groups")
+  user_roles = orm.joinedload("context").subqueryload("user_roles")
+  return models.Workflow.query.options(
+      orm.undefer_group("Workflow"),
+      user_roles.joinedload("role"),
+      user_roles.joinedload("person"),
+      task_groups.joinedload("contact"),
+      task_groups.subqueryload("task_group_tasks").joinedload("contact"),
+      task_groups.subqueryload("task_group_objects"),
+      orm.subqueryload("cycles").subqueryload(
+          "cycle_task_group_object_tasks").load_only("id"),
+  ).filter(
+      models.Workflow.id.in_(workflow_ids)
+  ).order_by(models.Workflow.id).all()
+
+
+def start_recurring_cycles():
+  """Start a new cycle for all recurring workflows that are due today.
+
+  Raises:
+    CycleGenerationError: if cycles could not be started for some workflows.
+      All other workflows are still processed and committed.
+  """
+  today = date.today()
+  workflow_ids = get_due_workflow_ids(today)
+  failed = []
+  for start in range(0, len(workflow_ids), CHUNK_SIZE):
+    chunk = workflow_ids[start:start + CHUNK_SIZE]
+    with benchmark("Start recurring cycles: {} workflows".format(len(chunk))):
+      try:
+        failed.extend(_start_chunk(chunk, today))
+        db.session.commit()
+      except Exception:  # pylint: disable=broad-except
+        logger.exception("Failed to start cycles for workflows %s", chunk)
+        db.session.rollback()
+        failed.extend(chunk)
+  if failed:
+    raise CycleGenerationError(failed)
+
+
+def _start_chunk(workflow_ids, today):
+  """Start cycles for a chunk of workflows.
+
+  Returns:
+    list of ids of workflows whose cycles could not be built.
+  """
+  failed = []
+  cycles = []
+  relationships = []
+  for workflow in load_workflows(workflow_ids):
+    workflow_relationships = []
+    savepoint = db.session.begin_nested()
+    try:
+      cycle = _build_workflow_cycle(workflow, today, workflow_relationships)
+      db.session.flush()
+      savepoint.commit()
+    except Exception:  # pylint: disable=broad-except
+      logger.exception("Failed to start a cycle for workflow %s", workflow.id)
+      savepoint.rollback()
+      failed.append(workflow.id)
+      continue
+    cycles.append(cycle)
+    relationships.extend(workflow_relationships)
+
+  _insert_relationships(relationships)
+  object_workflow_state.update_cycle_states(
+      db.session.connection(), [new_cycle.id for new_cycle in cycles])
+  with benchmark("Start recurring cycles: notifications"):
+    notification.handle_workflows_modify([new_cycle.workflow
+                                         for new_cycle in cycles])
+    notification.handle_cycles_created(cycles)
+  return failed
+
+
+def _build_workflow_cycle(workflow, today, relationships):
+  """Build a new cycle for a workflow and move its next cycle start date."""
+  cycle = models.Cycle()
+  cycle.workflow = workflow
+  cycle.calculator = workflow_cycle_calculator.get_cycle_calculator(workflow)
+  cycle.context = workflow.context
+  # We can do this because we selected only workflows with
+  # next_cycle_start_date = today
+  cycle.start_date = today
+  db.session.add(cycle)
+
+  base_date = workflow.non_adjusted_next_cycle_start_date or today
+  ggrc_workflows.build_cycle(cycle, base_date=base_date,
+                             relationships=relationships)
+
+  # Update the workflow next_cycle_start_date to push it ahead based on the
+  # frequency.
+  ggrc_workflows.adjust_next_cycle_start_date(
+      cycle.calculator, workflow, move_forward=True)
+  db.session.add(workflow)
+  return cycle
+
+
+def _insert_relationships(relationships):
+  """Insert cycle task to object relationships with a single statement.
+
+  Args:
+    relationships: list of (cycle task, object type, object id) triples.
+  """
+  if not relationships:
+    return
+  now = datetime.now()
+  db.session.execute(Relationship.__table__.insert().values([{
+      "created_at": now,
+      "updated_at": now,
+      "modified_by_id": cycle_task.modified_by_id,
+      "context_id": None,
+      "source_type": cycle_task.type,
+      "source_id": cycle_task.id,
+      "destination_type": object_type,
+      "destination_id": object_id,
+  } for cycle_task, object_type, object_id in relationships]))
+  # Raw inserts bypass the session flush hooks, so the adjacency index has to
+  # be updated explicitly.
+  pairs = [((cycle_task.type, cycle_task.id), (object_type, object_id))
+           for cycle_task, object_type, object_id in relationships]
+  relationship_adjacency.index_relationship_pairs(
+      db.session.connection(), pairs)
+  person_objects.update_for_relationship_pairs(
+      db.session.connection(), pairs)
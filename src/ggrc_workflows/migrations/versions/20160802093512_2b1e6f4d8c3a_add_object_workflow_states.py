@@ -0,0 +1,93 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""
+Add object workflow states
+
+Create Date: 2016-08-02 09:35:12.517361
+"""
+
+# disable Invalid constant name pylint warning for mandatory Alembic variables.
+# pylint: disable=invalid-name
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '2b1e6f4d8c3a'
+down_revision = '4cb78ab9a321'
+
+
+OBJECT_TYPES = [
+    "Program", "Vendor", "OrgGroup",
+    "Assessment", "Request",
+    "Regulation", "Standard", "Policy", "Contract",
+    "Objective", "Control", "Section", "Clause",
+    "System", "Process",
+    "DataAsset", "Facility", "Market", "Product", "Project", "Issue",
+    "AccessGroup", "Risk", "RiskObject", "Threat",
+]
+
+
+def upgrade():
+  """Upgrade database schema and/or data, creating a new revision."""
+  op.create_table(
+      'object_workflow_states',
+      sa.Column('object_type', sa.String(length=250), nullable=False),
+      sa.Column('object_id', sa.Integer(), nullable=False,
+                autoincrement=False),
+      sa.Column('state', sa.String(length=250), nullable=True),
+      sa.Column('overdue_date', sa.Date(), nullable=True),
+      sa.PrimaryKeyConstraint('object_type', 'object_id'),
+  )
+
+  # The state rules match WorkflowState._get_state, where tasks without a
+  # status count as assigned.
+  op.execute("""
+      INSERT INTO object_workflow_states (
+          object_type, object_id, state, overdue_date
+      )
+      SELECT
+          object_type,
+          object_id,
+          CASE
+              WHEN SUM(status = 'Verified') = COUNT(*) THEN 'Verified'
+              WHEN SUM(status = 'Finished') = COUNT(*) THEN 'Finished'
+              WHEN SUM(status IN ('InProgress', 'Assigned', 'Declined')
+                       OR status IS NULL) = 0 THEN 'Finished'
+              WHEN SUM(status IN ('InProgress', 'Declined',
+                                  'Finished', 'Verified')) > 0
+                   THEN 'InProgress'
+              WHEN SUM(status = 'Assigned' OR status IS NULL) > 0
+                   THEN 'Assigned'
+              ELSE NULL
+          END,
+          MIN(CASE WHEN status != 'Verified' OR status IS NULL
+                   THEN end_date END)
+      FROM (
+          SELECT DISTINCT m.object_type, m.object_id,
+                 t.id, t.status, t.end_date
+          FROM (
+              SELECT destination_type AS object_type,
+                     destination_id AS object_id,
+                     source_id AS task_id
+              FROM relationships
+              WHERE source_type = 'CycleTaskGroupObjectTask'
+              UNION ALL
+              SELECT source_type, source_id, destination_id
+              FROM relationships
+              WHERE destination_type = 'CycleTaskGroupObjectTask'
+          ) AS m
+          JOIN cycle_task_group_object_tasks AS t ON t.id = m.task_id
+          JOIN cycles AS c ON c.id = t.cycle_id
+          WHERE c.is_current = 1 AND m.object_type IN ({types})
+      ) AS tasks
+      GROUP BY object_type, object_id
+  """.format(types=", ".join("'{}'".format(type_)
+                             for type_ in OBJECT_TYPES)))
+
+
+def downgrade():
+  """Downgrade database schema and/or data back to the previous revision."""
+  op.drop_table('object_workflow_states')
@@ -0,0 +1,45 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""
+Add person task counts
+
+Create Date: 2016-08-05 14:30:27.615038
+"""
+
+# disable Invalid constant name pylint warning for mandatory Alembic variables.
+# pylint: disable=invalid-name
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '6c2e9d1b7f34'
+down_revision = '2b1e6f4d8c3a'
+
+
+def upgrade():
+  """Upgrade database schema and/or data, creating a new revision."""
+  op.create_table(
+      'person_task_counts',
+      sa.Column('person_id', sa.Integer(), nullable=False,
+                autoincrement=False),
+      sa.Column('open_tasks', sa.Integer(), nullable=False),
+      sa.PrimaryKeyConstraint('person_id'),
+  )
+  op.execute("""
+      INSERT INTO person_task_counts (person_id, open_tasks)
+      SELECT t.contact_id, COUNT(*)
+      FROM cycle_task_group_object_tasks AS t
+      JOIN cycles AS c ON c.id = t.cycle_id
+      WHERE c.is_current = 1
+        AND t.status IN ('Assigned', 'InProgress', 'Finished', 'Declined')
+        AND t.contact_id IS NOT NULL
+      GROUP BY t.contact_id
+  """)
+
+
+def downgrade():
+  """Downgrade database schema and/or data back to the previous revision."""
+  op.drop_table('person_task_counts')
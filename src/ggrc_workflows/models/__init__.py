@@ -14,6 +14,8 @@ from .cycle import Cycle
 from .cycle_task_entry import CycleTaskEntry
 from .cycle_task_group import CycleTaskGroup
 from .cycle_task_group_object_task import CycleTaskGroupObjectTask
+from .object_workflow_state import ObjectWorkflowState
+from .person_task_count import PersonTaskCount
 
 
 register_model(TaskGroup)
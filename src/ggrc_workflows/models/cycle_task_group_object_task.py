@@ -211,17 +211,3 @@ class CycleTaskable(object):
                     for r in self.related_destinations
                     if r.CycleTaskGroupObjectTask_destination is not None]
     return sources + destinations
-
-  @classmethod
-  def eager_query(cls):
-    query = super(CycleTaskable, cls).eager_query()
-    return query.options(
-        orm.subqueryload('related_sources')
-           .joinedload('CycleTaskGroupObjectTask_source')
-           .undefer_group('CycleTaskGroupObjectTask_complete')
-           .joinedload('cycle'),
-        orm.subqueryload('related_destinations')
-           .joinedload('CycleTaskGroupObjectTask_destination')
-           .undefer_group('CycleTaskGroupObjectTask_complete')
-           .joinedload('cycle')
-    )
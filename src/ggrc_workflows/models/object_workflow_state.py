@@ -0,0 +1,239 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Materialized workflow state of objects mapped to cycle tasks.
+
+The workflow state of an object is derived from the statuses and end dates
+of all cycle tasks in current cycles that are mapped to the object. Instead
+of loading those tasks for every object that is read, the state is stored
+in the object_workflow_states table, keyed by object type and id.
+
+A row stores the state that the tasks are in together with the earliest end
+date of the tasks that are not verified yet, so that the "Overdue" state can
+be determined on read without having to update the table every day.
+
+Rows are written by an after_flush session hook, explicitly after raw SQL
+writes of cycle tasks, task mappings or statuses, and can be rebuilt from
+scratch with `rebuild`.
+"""
+
+import collections
+from datetime import date
+
+from sqlalchemy import select
+from sqlalchemy import tuple_
+from sqlalchemy import union_all
+from sqlalchemy.orm import attributes
+
+from ggrc import db
+from ggrc.models.relationship import Relationship
+from ggrc_workflows.models.cycle import Cycle
+from ggrc_workflows.models.cycle_task_group_object_task import \
+    CycleTaskGroupObjectTask
+from ggrc_workflows.models.workflow import WorkflowState
+
+
+TASK_TYPE = "CycleTaskGroupObjectTask"
+
+CHUNK_SIZE = 500
+
+
+class ObjectWorkflowState(db.Model):
+  """Workflow state of a single object."""
+  # pylint: disable=too-few-public-methods
+
+  __tablename__ = "object_workflow_states"
+
+  object_type = db.Column(db.String(250), primary_key=True)
+  object_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+  state = db.Column(db.String(250))
+  overdue_date = db.Column(db.Date)
+
+  def current_state(self, today=None):
+    """Get the workflow state of the object for the given day."""
+    today = today or date.today()
+    if self.overdue_date is not None and self.overdue_date <= today:
+      return "Overdue"
+    return self.state
+
+
+def _object_types():
+  # Imported here because WORKFLOW_OBJECT_TYPES is defined after all models
+  # are imported.
+  from ggrc_workflows.models import WORKFLOW_OBJECT_TYPES
+  return WORKFLOW_OBJECT_TYPES
+
+
+def _task_objects(task_ids=None, object_keys=None):
+  """Get a selectable of (object_type, object_id, task_id) task mappings.
+
+  Args:
+    task_ids: optional list or select of cycle task ids to filter by.
+    object_keys: optional list of (type, id) of objects to filter by.
+  """
+  table = Relationship.__table__
+  selects = []
+  for task_side, object_side in [("source", "destination"),
+                                 ("destination", "source")]:
+    object_type = table.c[object_side + "_type"]
+    object_id = table.c[object_side + "_id"]
+    task_id = table.c[task_side + "_id"]
+    query = select([
+        object_type.label("object_type"),
+        object_id.label("object_id"),
+        task_id.label("task_id"),
+    ]).where(
+        table.c[task_side + "_type"] == TASK_TYPE
+    ).where(
+        object_type.in_(_object_types())
+    )
+    if task_ids is not None:
+      query = query.where(task_id.in_(task_ids))
+    if object_keys is not None:
+      query = query.where(tuple_(object_type, object_id).in_(object_keys))
+    selects.append(query)
+  return union_all(*selects).alias("task_objects")
+
+
+def get_task_object_keys(connection, task_ids):
+  """Get (type, id) of all objects mapped to the given cycle tasks.
+
+  Args:
+    connection: connection to use for the query.
+    task_ids: list or select of cycle task ids.
+  """
+  if isinstance(task_ids, (list, set, tuple)) and not task_ids:
+    return set()
+  mapped = _task_objects(task_ids=task_ids)
+  query = select([mapped.c.object_type, mapped.c.object_id])
+  return {(row.object_type, row.object_id)
+          for row in connection.execute(query)}
+
+
+def get_cycle_object_keys(connection, cycle_ids):
+  """Get (type, id) of all objects mapped to tasks of the given cycles."""
+  if not cycle_ids:
+    return set()
+  tasks = CycleTaskGroupObjectTask.__table__
+  return get_task_object_keys(connection, select([tasks.c.id]).where(
+      tasks.c.cycle_id.in_(cycle_ids)))
+
+
+def compute_states(connection, object_keys=None):
+  """Compute workflow state rows from current cycle tasks.
+
+  Args:
+    connection: connection to use for the queries.
+    object_keys: list of (type, id) of objects to compute the states for. All
+      objects mapped to current cycle tasks are used if not set.
+  Returns:
+    list of dicts with object_workflow_states column values.
+  """
+  mapped = _task_objects(object_keys=object_keys)
+  tasks = CycleTaskGroupObjectTask.__table__
+  cycles = Cycle.__table__
+  query = select([
+      mapped.c.object_type,
+      mapped.c.object_id,
+      tasks.c.id,
+      tasks.c.status,
+      tasks.c.end_date,
+  ]).select_from(
+      mapped.join(tasks, tasks.c.id == mapped.c.task_id)
+            .join(cycles, cycles.c.id == tasks.c.cycle_id)
+  ).where(
+      cycles.c.is_current == True  # noqa # pylint: disable=singleton-comparison
+  )
+  object_tasks = collections.defaultdict(dict)
+  for row in connection.execute(query):
+    object_tasks[(row.object_type, row.object_id)][row.id] = row
+
+  rows = []
+  for (object_type, object_id), tasks_by_id in object_tasks.iteritems():
+    current_tasks = tasks_by_id.values()
+    end_dates = [task.end_date for task in current_tasks
+                 if task.status != "Verified" and task.end_date is not None]
+    rows.append({
+        "object_type": object_type,
+        "object_id": object_id,
+        "state": WorkflowState._get_state(current_tasks),
+        "overdue_date": min(end_dates) if end_dates else None,
+    })
+  return rows
+
+
+def update_states(connection, object_keys):
+  """Recompute stored workflow states of the given objects."""
+  object_keys = list(set(object_keys))
+  table = ObjectWorkflowState.__table__
+  for start in range(0, len(object_keys), CHUNK_SIZE):
+    chunk = object_keys[start:start + CHUNK_SIZE]
+    connection.execute(table.delete().where(
+        tuple_(table.c.object_type, table.c.object_id).in_(chunk)))
+    rows = compute_states(connection, chunk)
+    if rows:
+      connection.execute(table.insert(), rows)
+
+
+def update_task_states(connection, task_ids):
+  """Recompute workflow states of objects mapped to the given cycle tasks."""
+  update_states(connection, get_task_object_keys(connection, task_ids))
+
+
+def update_cycle_states(connection, cycle_ids):
+  """Recompute workflow states of objects mapped to tasks of given cycles."""
+  update_states(connection, get_cycle_object_keys(connection, cycle_ids))
+
+
+def _has_changes(obj, names):
+  return any(attributes.get_history(obj, name).has_changes()
+             for name in names)
+
+
+def _relationship_object_key(relationship):
+  """Get (type, id) of the object a cycle task relationship maps to."""
+  if relationship.source_type == TASK_TYPE:
+    return relationship.destination_type, relationship.destination_id
+  if relationship.destination_type == TASK_TYPE:
+    return relationship.source_type, relationship.source_id
+  return None
+
+
+def update_states_after_flush(session, _):
+  """Update workflow states affected by the current flush."""
+  task_ids = set()
+  cycle_ids = set()
+  object_keys = set()
+  for obj in session.new:
+    if isinstance(obj, CycleTaskGroupObjectTask):
+      task_ids.add(obj.id)
+    elif isinstance(obj, Relationship):
+      object_keys.add(_relationship_object_key(obj))
+  for obj in session.dirty:
+    if isinstance(obj, CycleTaskGroupObjectTask) and \
+       _has_changes(obj, ("status", "end_date", "cycle_id")):
+      task_ids.add(obj.id)
+    elif isinstance(obj, Cycle) and _has_changes(obj, ("is_current",)):
+      cycle_ids.add(obj.id)
+  for obj in session.deleted:
+    if isinstance(obj, Relationship):
+      object_keys.add(_relationship_object_key(obj))
+  object_keys = {key for key in object_keys
+                 if key is not None and key[0] in _object_types()}
+  if not (task_ids or cycle_ids or object_keys):
+    return
+
+  connection = session.connection()
+  object_keys.update(get_task_object_keys(connection, list(task_ids)))
+  object_keys.update(get_cycle_object_keys(connection, list(cycle_ids)))
+  update_states(connection, object_keys)
+
+
+def rebuild():
+  """Recreate all stored workflow states from current cycle tasks."""
+  table = ObjectWorkflowState.__table__
+  db.session.execute(table.delete())
+  rows = compute_states(db.session.connection())
+  for start in range(0, len(rows), CHUNK_SIZE):
+    db.session.execute(table.insert(), rows[start:start + CHUNK_SIZE])
+  db.session.commit()
@@ -0,0 +1,191 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Stored count of open cycle tasks of each person.
+
+Every HTML page shows the number of open tasks of the current user, which
+used to be a join count of cycle tasks against cycles on every render. The
+count is now stored per person in the person_task_counts table. Counts are
+upserted, people whose tasks were counted get a row even without open tasks,
+and people without a row have no open tasks.
+
+Counts of affected people are recomputed by an after_flush session hook when
+cycle tasks are created, deleted, change status, assignee or cycle, or when
+cycles stop or start being current. Writes that bypass the session must call
+update_counts, update_task_counts or update_cycle_counts. check_consistency
+compares stored counts with computed ones and runs nightly with repair.
+"""
+
+from sqlalchemy import func
+from sqlalchemy import select
+from sqlalchemy import text
+from sqlalchemy.orm import attributes
+
+from ggrc import db
+from ggrc_workflows.models.cycle import Cycle
+from ggrc_workflows.models.cycle_task_group_object_task import \
+    CycleTaskGroupObjectTask
+
+
+OPEN_STATUSES = ("Assigned", "InProgress", "Finished", "Declined")
+
+CHUNK_SIZE = 500
+
+
+class PersonTaskCount(db.Model):
+  """Number of open tasks of a person in current cycles."""
+  # pylint: disable=too-few-public-methods
+
+  __tablename__ = "person_task_counts"
+
+  person_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+  open_tasks = db.Column(db.Integer, nullable=False, default=0)
+
+
+def get_count(person_id):
+  """Get the number of open tasks of a person, reading a single row."""
+  count = db.session.query(PersonTaskCount.open_tasks).filter(
+      PersonTaskCount.person_id == person_id).scalar()
+  return count or 0
+
+
+def compute_counts(connection, person_ids=None):
+  """Count open tasks in current cycles.
+
+  Args:
+    connection: connection to use for the query.
+    person_ids: list of people to count the tasks of, all people if not set.
+  Returns:
+    dict of counts by person id, without people with no open tasks.
+  """
+  tasks = CycleTaskGroupObjectTask.__table__
+  cycles = Cycle.__table__
+  query = select([
+      tasks.c.contact_id,
+      func.count(),
+  ]).select_from(
+      tasks.join(cycles, cycles.c.id == tasks.c.cycle_id)
+  ).where(
+      cycles.c.is_current == True  # noqa # pylint: disable=singleton-comparison
+  ).where(
+      tasks.c.status.in_(OPEN_STATUSES)
+  ).where(
+      tasks.c.contact_id.isnot(None)
+  ).group_by(tasks.c.contact_id)
+  if person_ids is not None:
+    query = query.where(tasks.c.contact_id.in_(person_ids))
+  return dict(connection.execute(query).fetchall())
+
+
+UPSERT = text("""
+    INSERT INTO person_task_counts (person_id, open_tasks)
+    VALUES (:person_id, :open_tasks)
+    ON DUPLICATE KEY UPDATE open_tasks = VALUES(open_tasks)
+""")
+
+
+def update_counts(connection, person_ids):
+  """Recompute stored counts of the given people.
+
+  Rows are upserted instead of deleted and inserted again, so concurrent
+  flushes for the same people only lock their rows and not the gaps around
+  them. People without open tasks get an explicit 0.
+  """
+  person_ids = sorted(set(pid for pid in person_ids if pid is not None))
+  for start in range(0, len(person_ids), CHUNK_SIZE):
+    chunk = person_ids[start:start + CHUNK_SIZE]
+    counts = compute_counts(connection, chunk)
+    connection.execute(UPSERT, [
+        {"person_id": person_id, "open_tasks": counts.get(person_id, 0)}
+        for person_id in chunk
+    ])
+
+
+def update_task_counts(connection, task_ids):
+  """Recompute counts of assignees of the given cycle tasks."""
+  if not task_ids:
+    return
+  tasks = CycleTaskGroupObjectTask.__table__
+  update_counts(connection, [row[0] for row in connection.execute(
+      select([tasks.c.contact_id]).where(tasks.c.id.in_(task_ids)).distinct())])
+
+
+def update_cycle_counts(connection, cycle_ids):
+  """Recompute counts of assignees of tasks in the given cycles."""
+  if not cycle_ids:
+    return
+  tasks = CycleTaskGroupObjectTask.__table__
+  update_counts(connection, [row[0] for row in connection.execute(
+      select([tasks.c.contact_id]).where(
+          tasks.c.cycle_id.in_(cycle_ids)).distinct())])
+
+
+def _values(obj, name):
+  """Get current and previous values of an attribute during a flush."""
+  history = attributes.get_history(obj, name)
+  return set(history.added or ()) | set(history.deleted or ()) | \
+      set(history.unchanged or ())
+
+
+def _has_changes(obj, names):
+  return any(attributes.get_history(obj, name).has_changes()
+             for name in names)
+
+
+def update_counts_after_flush(session, _):
+  """Update counts of people affected by the current flush."""
+  person_ids = set()
+  cycle_ids = set()
+  for obj in session.new:
+    if isinstance(obj, CycleTaskGroupObjectTask):
+      person_ids.add(obj.contact_id)
+  for obj in session.dirty:
+    if isinstance(obj, CycleTaskGroupObjectTask) and \
+       _has_changes(obj, ("status", "contact_id", "cycle_id")):
+      person_ids.update(_values(obj, "contact_id"))
+    elif isinstance(obj, Cycle) and _has_changes(obj, ("is_current",)):
+      cycle_ids.add(obj.id)
+  for obj in session.deleted:
+    if isinstance(obj, CycleTaskGroupObjectTask):
+      person_ids.update(_values(obj, "contact_id"))
+  person_ids.discard(None)
+  if not (person_ids or cycle_ids):
+    return
+
+  connection = session.connection()
+  if cycle_ids:
+    tasks = CycleTaskGroupObjectTask.__table__
+    person_ids.update(row[0] for row in connection.execute(
+        select([tasks.c.contact_id]).where(
+            tasks.c.cycle_id.in_(cycle_ids)).distinct()))
+  update_counts(connection, person_ids)
+
+
+def check_consistency(repair=False):
+  """Compare stored counts with counts computed from cycle tasks.
+
+  Args:
+    repair: store the computed counts of people with differences.
+
+  Returns:
+    dict of (expected count, stored count) for each person with differences.
+  """
+  connection = db.session.connection()
+  table = PersonTaskCount.__table__
+  stored = dict(connection.execute(
+      select([table.c.person_id, table.c.open_tasks])).fetchall())
+  expected = compute_counts(connection)
+  report = {}
+  for person_id in set(stored) | set(expected):
+    if stored.get(person_id, 0) != expected.get(person_id, 0):
+      report[person_id] = (expected.get(person_id, 0),
+                           stored.get(person_id, 0))
+  if repair and report:
+    update_counts(connection, report.keys())
+    db.session.commit()
+  return report
+
+
+def reconcile():
+  """Repair stored counts that differ from the cycle tasks."""
+  return check_consistency(repair=True)
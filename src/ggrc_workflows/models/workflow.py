@@ -15,7 +15,6 @@ from sqlalchemy import orm
 from ggrc import db
 from ggrc.fulltext import get_indexer
 from ggrc.fulltext.recordbuilder import fts_record_for
-from ggrc.login import get_current_user
 from ggrc.models import mixins
 from ggrc.models import reflection
 from ggrc.models.associationproxy import association_proxy
@@ -208,24 +207,20 @@ class Workflow(mixins.CustomAttributable, HasOwnContext, mixins.Timeboxed,
 
   def copy_task_groups(self, target, **kwargs):
     """Copy all task groups and tasks mapped to this workflow.
-    """
-    for task_group in self.task_groups:
-      obj = task_group.copy(
-          workflow=target,
-          context=target.context,
-          clone_people=kwargs.get("clone_people", False),
-          clone_objects=kwargs.get("clone_objects", False),
-          modified_by=get_current_user(),
-      )
-      target.task_groups.append(obj)
-
-      if kwargs.get("clone_tasks"):
-        task_group.copy_tasks(
-            obj,
-            clone_people=kwargs.get("clone_people", False),
-            clone_objects=kwargs.get("clone_objects", True)
-        )
 
+    Task groups, tasks and task group objects are copied with one statement
+    per level, see ggrc_workflows.workflow_cloner.
+    """
+    from ggrc_workflows.workflow_cloner import WorkflowCloner
+    # The context of a new target workflow gets its id on flush.
+    db.session.flush()
+    cloner = WorkflowCloner(
+        target.context_id,
+        clone_people=kwargs.get("clone_people", False),
+        clone_tasks=kwargs.get("clone_tasks", False),
+        clone_objects=kwargs.get("clone_objects", False),
+    )
+    cloner.clone_task_groups(self.id, target.id)
     return target
 
   @classmethod
@@ -307,13 +302,30 @@ class WorkflowState(object):
   """Object state mixin.
 
   This is a mixin for adding workflow_state to all objects that can be mapped
-  to workflow tasks.
+  to workflow tasks. The state is read from the materialized
+  object_workflow_states table.
   """
 
   _publish_attrs = [reflection.PublishOnly('workflow_state')]
   _update_attrs = []
   _stub_attrs = []
 
+  @classmethod
+  def late_init_workflow_state(cls):
+    joinstr = 'and_(foreign(ObjectWorkflowState.object_id) == {type}.id, '\
+              'foreign(ObjectWorkflowState.object_type) == "{type}")'
+    cls._workflow_state = db.relationship(
+        'ObjectWorkflowState',
+        primaryjoin=joinstr.format(type=cls.__name__),
+        uselist=False,
+        viewonly=True,
+    )
+
+  @classmethod
+  def eager_query(cls):
+    query = super(WorkflowState, cls).eager_query()
+    return query.options(orm.joinedload('_workflow_state'))
+
   @classmethod
   def _get_state(cls, current_tasks):
     """Get overall state of a group of tasks.
@@ -415,4 +427,7 @@ class WorkflowState(object):
 
   @computed_property
   def workflow_state(self):
-    return WorkflowState.get_object_state(self.cycle_task_group_object_tasks)
+    # pylint: disable=no-member
+    if self._workflow_state is None:
+      return None
+    return self._workflow_state.current_state()
@@ -20,6 +20,9 @@ from .notification_handler import (
     handle_cycle_created,
     handle_cycle_modify,
     handle_cycle_task_status_change,
+    handle_cycle_task_status_changes,
+    handle_workflows_modify,
+    handle_cycles_created,
 )
 
 
@@ -63,6 +66,14 @@ def register_listeners():
           sender, obj=None, new_status=None, old_status=None):
     handle_cycle_task_status_change(obj, new_status, old_status)
 
+  @Signals.status_changes.connect
+  def cycle_task_status_changes_listener(sender, changes=None):
+    task_changes = [change for change in changes
+                    if isinstance(change.obj, CycleTaskGroupObjectTask)]
+    handle_cycle_task_status_changes(
+        [change.obj for change in task_changes],
+        [change.new_status for change in task_changes])
+
 """
 All notifications handle the following structure:
 
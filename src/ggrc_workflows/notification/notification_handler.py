@@ -13,11 +13,14 @@ exposed functions
     handle_cycle_created,
     handle_cycle_modify,
     handle_cycle_task_status_change,
+    handle_workflows_modify,
+    handle_cycles_created,
 """
 
 from sqlalchemy import and_
 from sqlalchemy import or_
 from sqlalchemy import inspect
+from sqlalchemy import tuple_
 from datetime import timedelta
 from datetime import datetime
 from datetime import date
@@ -176,6 +179,39 @@ def handle_cycle_task_status_change(obj, new_status, old_status):
     db.session.flush()
 
 
+def handle_cycle_task_status_changes(tasks, new_statuses):
+  """Handle status changes of many cycle tasks at once.
+
+  Batched version of handle_cycle_task_status_change used for statuses set by
+  status propagation.
+
+  Args:
+    tasks: list of cycle tasks whose status has changed.
+    new_statuses: list of new statuses of the tasks.
+  """
+  declined = [task for task, status in zip(tasks, new_statuses)
+              if status == "Declined"]
+  verified = [task for task, status in zip(tasks, new_statuses)
+              if status == "Verified"]
+  if declined:
+    notif_type = get_notification_type("cycle_task_declined")
+    insert_notifications([new_notif_row(task, notif_type, date.today())
+                          for task in declined])
+  if verified:
+    keys = {(task.type, task.id) for task in verified}
+    Notification.query.filter(and_(
+        tuple_(Notification.object_type, Notification.object_id).in_(keys),
+        Notification.sent_at == None,  # noqa
+    )).delete(synchronize_session="fetch")
+
+    notif_type = get_notification_type("all_cycle_tasks_completed")
+    cycles = {task.cycle_task_group.cycle for task in verified}
+    for cycle in cycles:
+      if check_all_cycle_tasks_finished(cycle):
+        add_notif(cycle, notif_type)
+    db.session.flush()
+
+
 def handle_cycle_task_group_object_task_put(obj):
   if inspect(obj).attrs.contact.history.has_changes():
     add_cycle_task_reassigned_notification(obj)
@@ -211,6 +247,117 @@ def handle_cycle_created(sender, obj=None, src=None, service=None,
       add_cycle_task_notifications(task, notification_type)
 
 
+def handle_workflows_modify(workflows):
+  """Add notifications for many modified workflows at once.
+
+  This has the same effect as calling handle_workflow_modify for each of the
+  workflows, but pending notifications are looked up with a single query and
+  new notifications are inserted with a single statement.
+  """
+  workflows = [workflow for workflow in workflows
+               if workflow.status == "Active" and
+               workflow.frequency != "one_time"]
+  tasks = {workflow: [task for task_group in workflow.task_groups
+                      for task in task_group.task_group_tasks]
+           for workflow in workflows}
+  pending = get_pending_notification_keys(
+      workflows + [task for wf_tasks in tasks.values() for task in wf_tasks])
+  notif_types = get_notification_types()
+  notifications = []
+  for workflow in workflows:
+    if not workflow.next_cycle_start_date:
+      workflow.next_cycle_start_date = date.today()
+    notif_type = notif_types.get(
+        "{}_workflow_starts_in".format(workflow.frequency))
+    if (workflow.type, workflow.id) not in pending:
+      send_on = (workflow.next_cycle_start_date -
+                 timedelta(notif_type.advance_notice))
+      notifications.append(new_notif_row(workflow, notif_type, send_on))
+      notif_type = notif_types.get("cycle_start_failed")
+      notifications.append(new_notif_row(
+          workflow, notif_type, workflow.next_cycle_start_date + timedelta(1)))
+    if not notif_type:
+      continue
+    for task in tasks[workflow]:
+      if (task.type, task.id) not in pending:
+        send_on = (workflow.next_cycle_start_date -
+                   timedelta(notif_type.advance_notice))
+        notifications.append(new_notif_row(task, notif_type, send_on))
+  insert_notifications(notifications)
+
+
+def handle_cycles_created(cycles, manually=False):
+  """Add notifications for many new cycles at once.
+
+  This is the bulk version of handle_cycle_created. Cycles and their tasks
+  must already be flushed.
+  """
+  pending = get_pending_notification_keys(cycles)
+  notif_types = get_notification_types()
+  notif_type = notif_types.get(
+      "manual_cycle_created" if manually else "cycle_created")
+  due_today_type = notif_types.get("cycle_task_due_today")
+  today = date.today()
+  notifications = []
+  for cycle in cycles:
+    if (cycle.type, cycle.id) not in pending:
+      notifications.append(new_notif_row(cycle, notif_type, today))
+    due_in_type = notif_types.get(
+        "{}_cycle_task_due_in".format(cycle.workflow.frequency))
+    for cycle_task_group in cycle.cycle_task_groups:
+      for task in cycle_task_group.cycle_task_group_tasks:
+        notifications.append(new_notif_row(task, notif_type, today))
+        if task.status == "Verified" or not cycle.is_current:
+          continue
+        for due_type in (due_in_type, due_today_type):
+          send_on = task.end_date - timedelta(due_type.advance_notice)
+          notifications.append(new_notif_row(task, due_type, send_on))
+  insert_notifications(notifications)
+
+
+def get_pending_notification_keys(objects):
+  """Get (type, id) keys of objects that have unsent notifications."""
+  keys = {(obj.type, obj.id) for obj in objects}
+  if not keys:
+    return set()
+  rows = db.session.query(
+      Notification.object_type, Notification.object_id
+  ).filter(and_(
+      tuple_(Notification.object_type, Notification.object_id).in_(keys),
+      Notification.sent_at == None,  # noqa
+  )).distinct()
+  return {(object_type, object_id) for object_type, object_id in rows}
+
+
+def get_notification_types():
+  """Get all notification types by name."""
+  return {notif_type.name: notif_type
+          for notif_type in db.session.query(NotificationType)}
+
+
+def new_notif_row(obj, notif_type, send_on):
+  """Get column values for a notification inserted by insert_notifications.
+  """
+  return {
+      "object_id": obj.id,
+      "object_type": obj.type,
+      "notification_type_id": notif_type.id,
+      "send_on": send_on,
+      "force_notifications": False,
+  }
+
+
+def insert_notifications(rows):
+  """Insert notifications with a single multi-row statement."""
+  if not rows:
+    return
+  now = datetime.now()
+  for row in rows:
+    row["created_at"] = now
+    row["updated_at"] = now
+  db.session.execute(Notification.__table__.insert().values(rows))
+
+
 def get_notification(obj):
   # maybe we shouldn't return different thigs here.
   result = Notification.query.filter(
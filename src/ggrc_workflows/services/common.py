@@ -12,6 +12,14 @@ class Signals():
     attribute
     """)
 
+  status_changes = signals.signal(
+      'Statuses Changed',
+      """
+    This is used to signal any listeners of status changes made by status
+    propagation in a cycle. It is sent once per propagation with a list of
+    StatusChange(obj, old_status, new_status) tuples.
+    """)
+
   workflow_cycle_start = signals.signal(
       'Workflow Cycle Started ',
       """
@@ -3,6 +3,8 @@
 
 from ggrc_workflows.services.workflow_cycle_calculator import \
     annually_cycle_calculator
+from ggrc_workflows.services.workflow_cycle_calculator import \
+    cycle_calculator
 from ggrc_workflows.services.workflow_cycle_calculator import \
     monthly_cycle_calculator
 from ggrc_workflows.services.workflow_cycle_calculator import \
@@ -30,3 +32,8 @@ def get_cycle_calculator(workflow, base_date=None):
       "annually": annually_cycle_calculator.AnnuallyCycleCalculator
   }
   return calculators[workflow.frequency](workflow, base_date)
+
+
+def invalidate_schedule(workflow):
+  """Drop memoized task schedules of a workflow after its tasks changed."""
+  cycle_calculator.SCHEDULE_CACHE.invalidate(workflow.id)
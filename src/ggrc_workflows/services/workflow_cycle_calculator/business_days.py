@@ -0,0 +1,134 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Precomputed business day calendar used by cycle calculators.
+
+Checking a date against a holidays object and walking backwards day by day is
+slow when it is done for every task of thousands of workflows. The calendar
+precomputes, for every day in a range of years, the closest workday on or
+before that day and the number of workdays up to that day, which turns the
+"previous workday" and "n-th workday" questions into list lookups.
+
+Dates outside of the precomputed range are still handled, by walking the
+days one by one.
+"""
+
+import datetime
+
+from ggrc import settings
+
+
+class BusinessDayCalendar(object):
+  """Calendar of workdays for a range of years.
+
+  Attributes:
+    holidays: Object supporting the 'in' operation for dates on which events
+              won't happen.
+    first_year: First year of the precomputed range.
+    last_year: Last year of the precomputed range (inclusive).
+  """
+
+  def __init__(self, holidays, first_year, last_year):
+    self.holidays = holidays
+    self.first_year = first_year
+    self.last_year = last_year
+    self._first = datetime.date(first_year, 1, 1).toordinal()
+    self._last = datetime.date(last_year, 12, 31).toordinal()
+
+    # _previous[i] is the ordinal of the closest workday on or before day i,
+    # _rank[i] is the number of workdays up to and including day i and
+    # _workdays[r - 1] is the ordinal of the workday with rank r.
+    self._previous = []
+    self._rank = []
+    self._workdays = []
+    previous = None
+    for ordinal in xrange(self._first, self._last + 1):
+      if self._is_work_day(datetime.date.fromordinal(ordinal)):
+        previous = ordinal
+        self._workdays.append(ordinal)
+      self._previous.append(previous)
+      self._rank.append(len(self._workdays))
+
+  def _is_work_day(self, ddate):
+    return ddate.isoweekday() < 6 and ddate not in self.holidays
+
+  def _in_range(self, ddate):
+    return self._first <= ddate.toordinal() <= self._last
+
+  def is_work_day(self, ddate):
+    """Check whether ddate is a workday."""
+    if self._in_range(ddate):
+      ordinal = ddate.toordinal()
+      return self._previous[ordinal - self._first] == ordinal
+    return self._is_work_day(ddate)
+
+  def previous_work_day(self, ddate):
+    """Get the closest workday on or before ddate.
+
+    Args:
+      ddate: datetime.date object.
+    Returns:
+      datetime.date: ddate if it is a workday, otherwise the first workday
+        before it.
+    """
+    if self._in_range(ddate):
+      previous = self._previous[ddate.toordinal() - self._first]
+      if previous is not None:
+        return datetime.date.fromordinal(previous)
+    while not self._is_work_day(ddate):
+      ddate = ddate - datetime.timedelta(days=1)
+    return ddate
+
+  def nth_work_day(self, ddate, n):
+    """Get the n-th workday counting from ddate.
+
+    The first workday on or after ddate is the 1st one. Negative values count
+    backwards, with the first workday on or before ddate being the -1st one.
+
+    Args:
+      ddate: datetime.date object.
+      n: non-zero integer.
+    Returns:
+      datetime.date: The requested workday.
+    """
+    if n == 0:
+      raise ValueError("Workdays are counted from 1 or -1.")
+    if self._in_range(ddate):
+      index = ddate.toordinal() - self._first
+      rank = self._rank[index]
+      if n > 0:
+        on_ddate = self._previous[index] == ddate.toordinal()
+        position = rank + n - (1 if on_ddate else 0)
+      else:
+        position = rank + n + 1
+      if 1 <= position <= len(self._workdays):
+        return datetime.date.fromordinal(self._workdays[position - 1])
+    step = datetime.timedelta(days=1 if n > 0 else -1)
+    remaining = abs(n)
+    while True:
+      if self._is_work_day(ddate):
+        remaining -= 1
+        if remaining == 0:
+          return ddate
+      ddate = ddate + step
+
+
+_CALENDARS = {}
+
+
+def get_calendar(holidays):
+  """Get the shared calendar for a holidays object.
+
+  Calendars are built on first use and cover the years between
+  WORKFLOW_CALENDAR_FIRST_YEAR and WORKFLOW_CALENDAR_LAST_YEAR settings.
+  """
+  key = id(holidays)
+  calendar = _CALENDARS.get(key)
+  if calendar is None or calendar.holidays is not holidays:
+    calendar = BusinessDayCalendar(
+        holidays,
+        settings.WORKFLOW_CALENDAR_FIRST_YEAR,
+        settings.WORKFLOW_CALENDAR_LAST_YEAR,
+    )
+    _CALENDARS[key] = calendar
+  return calendar
@@ -7,6 +7,7 @@
 import abc
 import datetime
 
+from ggrc_workflows.services.workflow_cycle_calculator import business_days
 from ggrc_workflows.services.workflow_cycle_calculator import google_holidays
 
 # pylint: disable=invalid-name
@@ -17,6 +18,49 @@ def NotImplementedProperty():
   raise NotImplementedError
 
 
+class ScheduleCache(object):
+  """Memoized task order and task date ranges of workflows.
+
+  Entries are keyed by the calculator class, the workflow id, the base date
+  and a signature of all scheduling attributes of the workflow's tasks, so
+  a stale entry is never used even if a task was changed in another
+  process. Entries of a workflow are also dropped explicitly when its tasks
+  change, to keep the cache small.
+  """
+
+  MAX_SIZE = 10000
+
+  def __init__(self):
+    self._entries = {}
+
+  @staticmethod
+  def signature(tasks):
+    return tuple(sorted(
+        (task.id, task.relative_start_month, task.relative_start_day,
+         task.relative_end_month, task.relative_end_day,
+         task.start_date, task.end_date)
+        for task in tasks))
+
+  def get(self, key):
+    return self._entries.get(key)
+
+  def set(self, key, value):
+    if len(self._entries) >= self.MAX_SIZE:
+      self._entries.clear()
+    self._entries[key] = value
+
+  def invalidate(self, workflow_id=None):
+    """Drop entries of a workflow, or all entries if no id is given."""
+    if workflow_id is None:
+      self._entries.clear()
+      return
+    for key in [key for key in self._entries if key[1] == workflow_id]:
+      del self._entries[key]
+
+
+SCHEDULE_CACHE = ScheduleCache()
+
+
 class CycleCalculator(object):
   """Cycle calculation for all workflow frequencies with the exception of
   one-time workflows.
@@ -85,15 +129,53 @@ class CycleCalculator(object):
     """
     self.workflow = workflow
     self.holidays = holidays
+    self.calendar = business_days.get_calendar(holidays)
     self.tasks = [
         task for task_group in self.workflow.task_groups
         for task in task_group.task_group_tasks]
+    self._signature = ScheduleCache.signature(self.tasks)
+    self._cacheable = bool(
+        self.workflow.id and all(task.id for task in self.tasks))
+
+    order = None
+    if self._cacheable:
+      order = SCHEDULE_CACHE.get(self._cache_key("order"))
+    if order is None:
+      self.sort_tasks()
+      if self._cacheable:
+        SCHEDULE_CACHE.set(self._cache_key("order"),
+                           [task.id for task in self.tasks])
+    else:
+      position = {task_id: index for index, task_id in enumerate(order)}
+      self.tasks.sort(key=lambda t: position[t.id])
 
-    self.sort_tasks()
+  def _cache_key(self, base_date):
+    return (self.__class__, self.workflow.id, base_date, self._signature,
+            id(self.holidays))
 
   def sort_tasks(self):
     self.tasks.sort(key=lambda t: self.get_relative_start(t))  # noqa #pylint: disable=unnecessary-lambda
 
+  def reify_task(self, task, base_date):
+    """Get the reified_tasks entry for a single task."""
+    raise NotImplementedError("Not implemented reify_task")
+
+  def reify_tasks(self, base_date):
+    """Calculate reified_tasks for all tasks, memoized in SCHEDULE_CACHE.
+
+    Unsaved tasks have no id yet, so the result is only cached if all tasks
+    have been saved.
+    """
+    key = self._cache_key(base_date)
+    reified_tasks = SCHEDULE_CACHE.get(key) if self._cacheable else None
+    if reified_tasks is None:
+      reified_tasks = {task.id: self.reify_task(task, base_date)
+                       for task in self.tasks}
+      if self._cacheable:
+        SCHEDULE_CACHE.set(key, reified_tasks)
+    return {task_id: dict(values)
+            for task_id, values in reified_tasks.iteritems()}
+
   def is_work_day(self, ddate):
     """Check whether specific ddate is workday or if it's a holiday/weekend.
 
@@ -102,21 +184,26 @@ class CycleCalculator(object):
     Returns:
       Boolean: True if it's workday otherwise false.
     """
-    return ddate.isoweekday() < 6 and ddate not in self.holidays
+    return self.calendar.is_work_day(ddate)
 
   def adjust_date(self, ddate):
     """Adjust date if it's not a work day.
 
-    Calculates the first workday by going backwards by either subtracting
-    appropriate number of days (if ddate is during weekend) or subtracting
-    by one day if it's a holiday. In case we still aren't on a workday we
-    repeat the process recursively until we find the first workday.
+    Dates are looked up in the precomputed business day calendar. Datetime
+    objects and dates outside of its range are adjusted by going backwards
+    by either subtracting appropriate number of days (if ddate is during
+    weekend) or subtracting by one day if it's a holiday. In case we still
+    aren't on a workday we repeat the process recursively until we find the
+    first workday.
 
     Args:
       date: datetime object
     Returns:
       datetime.date: First available workday.
     """
+    if type(ddate) is datetime.date:  # pylint: disable=unidiomatic-typecheck
+      return self.calendar.previous_work_day(ddate)
+
     # Short path
     if self.is_work_day(ddate):
       return ddate
@@ -191,8 +278,23 @@ class CycleCalculator(object):
     return min(tasks_start_dates), max(tasks_end_dates)
 
   def task_date_range(self, task, base_date=None):
+    """Get adjusted start and end date of a task, memoized per base date."""
+    if not base_date:
+      base_date = datetime.date.today()
+    ranges = None
+    if self._cacheable:
+      key = self._cache_key(("task_date_range", base_date))
+      ranges = SCHEDULE_CACHE.get(key)
+      if ranges is None:
+        ranges = {}
+        SCHEDULE_CACHE.set(key, ranges)
+      if task.id in ranges:
+        return ranges[task.id]
     start_date, end_date = self.non_adjusted_task_date_range(task, base_date)
-    return self.adjust_date(start_date), self.adjust_date(end_date)
+    result = self.adjust_date(start_date), self.adjust_date(end_date)
+    if ranges is not None:
+      ranges[task.id] = result
+    return result
 
   def non_adjusted_task_date_range(self,
                                    task, base_date=None, initialisation=False):
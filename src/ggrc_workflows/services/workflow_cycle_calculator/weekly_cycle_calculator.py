@@ -22,16 +22,17 @@ class WeeklyCycleCalculator(cycle_calculator.CycleCalculator):
 
     super(WeeklyCycleCalculator, self).__init__(workflow)
 
-    self.reified_tasks = {}
-    for task in self.tasks:
-      start_date, end_date = self.non_adjusted_task_date_range(
-          task, base_date, initialisation=True)
-      self.reified_tasks[task.id] = {
-          'start_date': start_date,
-          'end_date': end_date,
-          'relative_start': task.relative_start_day,
-          'relative_end': task.relative_end_day
-      }
+    self.reified_tasks = self.reify_tasks(base_date)
+
+  def reify_task(self, task, base_date):
+    start_date, end_date = self.non_adjusted_task_date_range(
+        task, base_date=base_date, initialisation=True)
+    return {
+        'start_date': start_date,
+        'end_date': end_date,
+        'relative_start': task.relative_start_day,
+        'relative_end': task.relative_end_day
+    }
 
   @staticmethod
   def get_relative_start(task):
@@ -0,0 +1,232 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Status propagation for cycle task hierarchies.
+
+A status change of a cycle task is propagated up to its cycle task group and
+cycle, and a status set on a cycle task group is pushed down to its tasks.
+Instead of walking the hierarchy recursively with lazy loads and sending a
+signal for every touched object, propagation:
+
+  - loads the whole cycle tree with a single query,
+  - computes the new statuses in memory, bottom-up for parents and top-down
+    for children,
+  - writes them with one UPDATE statement per model and status,
+  - sends one `Signals.status_changes` event with the list of all changes.
+
+Bulk updates bypass the session, so the written values are set as committed
+values on the loaded instances and the instances are added to the request
+cache, which keeps revisions, the fulltext index and memcache up to date.
+"""
+
+import collections
+from datetime import datetime
+
+from sqlalchemy import orm
+from sqlalchemy.orm import attributes
+
+from ggrc import db
+from ggrc.rbac.permissions import is_allowed_update
+from ggrc.services.common import get_cache
+from ggrc_workflows import models
+from ggrc_workflows.services.common import Signals
+
+
+STATUS_ORDER = (None, 'Assigned', 'InProgress',
+                'Declined', 'Finished', 'Verified')
+
+# Statuses that are copied to the parent when all children have them.
+UNIFORM_STATUSES = ("Verified", "Finished", "Assigned")
+
+StatusChange = collections.namedtuple(
+    "StatusChange", ["obj", "old_status", "new_status"])
+
+
+def _get_parent(obj):
+  if isinstance(obj, models.CycleTaskGroupObjectTask):
+    return obj.cycle_task_group
+  if isinstance(obj, models.CycleTaskGroup):
+    return obj.cycle
+  return None
+
+
+def _get_children(obj):
+  if isinstance(obj, models.Cycle):
+    return obj.cycle_task_groups
+  if isinstance(obj, models.CycleTaskGroup):
+    return obj.cycle_task_group_tasks
+  return []
+
+
+def _get_cycle(obj):
+  if isinstance(obj, models.Cycle):
+    return obj
+  return getattr(obj, "cycle", None)
+
+
+def load_cycle_tree(cycle_id):
+  """Load a cycle with its workflow, task groups and tasks in one query."""
+  return models.Cycle.query.options(
+      orm.joinedload("workflow").undefer("kind"),
+      orm.joinedload("cycle_task_groups").joinedload(
+          "cycle_task_group_tasks"),
+  ).filter(models.Cycle.id == cycle_id).one()
+
+
+def _status_values(model, status, now):
+  """Get column values written together with a new status."""
+  values = {"status": status, "updated_at": now}
+  if model is models.CycleTaskGroupObjectTask:
+    if status == "Verified":
+      values["verified_date"] = now
+    elif status == "Finished":
+      values["finished_date"] = now
+      values["verified_date"] = None
+    else:
+      values["finished_date"] = None
+      values["verified_date"] = None
+  return values
+
+
+class StatusPropagation(object):
+  """Status changes computed for a single cycle tree.
+
+  New statuses are only kept in memory until `apply` is called, so that the
+  rules always see the statuses that the objects will end up with.
+  """
+
+  def __init__(self):
+    self.old_statuses = {}
+    self.new_statuses = collections.OrderedDict()
+    self._allowed = {}
+
+  def status(self, obj):
+    return self.new_statuses.get(obj, obj.status)
+
+  def is_allowed(self, obj):
+    if obj not in self._allowed:
+      self._allowed[obj] = is_allowed_update(
+          obj.__class__.__name__, obj.id, obj.context_id)
+    return self._allowed[obj]
+
+  def set_status(self, obj, status):
+    self.old_statuses.setdefault(obj, obj.status)
+    self.new_statuses[obj] = status
+
+  def parent_status(self, child, parent):
+    """Get the new status of parent caused by child, or None."""
+    child_status = self.status(child)
+    # If any child is `InProgress`, then parent should be `InProgress`
+    if child_status in {"InProgress", "Declined"}:
+      if self.status(parent) != "InProgress":
+        return "InProgress"
+      return None
+    # If all children are `Finished` or `Verified`, then parent should be same
+    if child_status in UNIFORM_STATUSES:
+      statuses = {self.status(c) for c in _get_children(parent)}
+      if len(statuses) == 1:
+        status = statuses.pop()
+        if status in UNIFORM_STATUSES:
+          return status
+    return None
+
+  def propagate_up(self, obj):
+    """Update statuses of all ancestors of obj."""
+    while self.is_allowed(obj):
+      parent = _get_parent(obj)
+      if parent is None:
+        return
+      # Don't propagate changes to CycleTaskGroup if it's a part of backlog wf
+      if isinstance(parent, models.CycleTaskGroup) and \
+         parent.cycle.workflow.kind == "Backlog":
+        return
+      new_status = self.parent_status(obj, parent)
+      if new_status is None:
+        return
+      self.set_status(parent, new_status)
+      obj = parent
+
+  def propagate_down(self, obj):
+    """Push the status of obj down to all of its descendants."""
+    stack = [obj]
+    while stack:
+      node = stack.pop()
+      status = self.status(node)
+      for child in _get_children(node):
+        child_status = self.status(child)
+        if status == "Declined" or \
+           STATUS_ORDER.index(status) > STATUS_ORDER.index(child_status):
+          if self.is_allowed(child):
+            self.set_status(child, status)
+        stack.append(child)
+
+  def changes(self):
+    return [StatusChange(obj, self.old_statuses[obj], new_status)
+            for obj, new_status in self.new_statuses.iteritems()
+            if new_status != self.old_statuses[obj]]
+
+  def apply(self):
+    """Write all computed statuses and send the aggregated change event.
+
+    Returns:
+      list of StatusChange tuples for all objects whose status changed.
+    """
+    changes = self.changes()
+    if not changes:
+      return changes
+    now = datetime.now()
+    groups = collections.defaultdict(list)
+    for change in changes:
+      groups[(type(change.obj), change.new_status)].append(change.obj)
+
+    cache = get_cache()
+    for (model, status), objs in groups.iteritems():
+      values = _status_values(model, status, now)
+      # Objects with unflushed status changes are updated through the session
+      # so that the bulk update does not get overwritten by the next flush.
+      pending = {obj for obj in objs if obj.id is None or
+                 attributes.get_history(obj, "status").has_changes()}
+      bulk = [obj for obj in objs if obj not in pending]
+      for obj in pending:
+        for name, value in values.iteritems():
+          setattr(obj, name, value)
+        db.session.add(obj)
+      if bulk:
+        table = model.__table__
+        db.session.execute(table.update().where(
+            table.c.id.in_([obj.id for obj in bulk])
+        ).values(**values))
+      # Like in session flushes, the update time is not a changed field.
+      changed = set(values) - {"updated_at"}
+      for obj in bulk:
+        for name, value in values.iteritems():
+          attributes.set_committed_value(obj, name, value)
+        if cache is not None and obj not in cache.new:
+          cache.dirty[obj] = obj.log_json()
+          cache.changes.setdefault(obj, set()).update(changed)
+
+    Signals.status_changes.send(models.Cycle, changes=changes)
+    return changes
+
+
+def propagate_status(obj, up=False, down=False):
+  """Propagate the status of a cycle, cycle task group or cycle task.
+
+  Args:
+    obj: object whose status has changed.
+    up: update statuses of obj's ancestors.
+    down: update statuses of obj's descendants.
+  Returns:
+    list of StatusChange tuples for all objects whose status changed.
+  """
+  cycle = _get_cycle(obj)
+  if cycle is None:
+    return []
+  if cycle.id is not None:
+    load_cycle_tree(cycle.id)
+  propagation = StatusPropagation()
+  if up:
+    propagation.propagate_up(obj)
+  if down:
+    propagation.propagate_down(obj)
+  return propagation.apply()
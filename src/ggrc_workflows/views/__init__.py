@@ -4,31 +4,43 @@
 """Ggrc workflow module views."""
 
 from datetime import date
+from flask import json
 from flask import redirect
 from flask import render_template
 from flask import url_for
+from werkzeug.exceptions import Forbidden
 
 from ggrc import db
 from ggrc.app import app
 from ggrc.login import login_required
 from ggrc.login import get_current_user
+from ggrc.models.background_task import create_task
+from ggrc.models.background_task import queued_task
+from ggrc.rbac import permissions
 from ggrc.utils import benchmark
 from ggrc.views.cron import run_job
 
 from ggrc_workflows import start_recurring_cycles
-from ggrc_workflows.models import Cycle
-from ggrc_workflows.models import CycleTaskGroupObjectTask
 from ggrc_workflows.models import Workflow
+from ggrc_workflows.models import object_workflow_state
+from ggrc_workflows.models import person_task_count
 
 
 def get_user_task_count():
-  with benchmark("Get user task count RAW"):
-    current_user = get_current_user()
-    return CycleTaskGroupObjectTask.query.join(Cycle).filter(
-        CycleTaskGroupObjectTask.contact_id == current_user.id,
-        CycleTaskGroupObjectTask.status.in_(
-            ["Assigned", "InProgress", "Finished", "Declined"]),
-        Cycle.is_current == True).count()  # noqa # pylint: disable=singleton-comparison
+  with benchmark("Get user task count"):
+    return person_task_count.get_count(get_current_user().id)
+
+
+def person_task_count_view(person_id):
+  """Get the number of open cycle tasks of a person."""
+  if not permissions.is_allowed_read("Person", person_id, None):
+    raise Forbidden()
+  return app.make_response((
+      json.dumps({
+          "person_id": person_id,
+          "open_tasks": person_task_count.get_count(person_id),
+      }),
+      200, [("Content-Type", "application/json")]))
 
 
 @app.context_processor
@@ -98,6 +110,28 @@ def start_unstarted_cycles():
   return redirect(url_for('unstarted_cycles'))
 
 
+@queued_task
+def rebuild_workflow_states(_):
+  """Web hook to rebuild the stored workflow states of mapped objects."""
+  with benchmark("Rebuild object workflow states"):
+    object_workflow_state.rebuild()
+
+  return app.make_response((
+      'success', 200, [('Content-Type', 'text/html')]))
+
+
+def admin_rebuild_workflow_states():
+  """Calls a webhook that rebuilds the stored workflow states."""
+  if not permissions.is_allowed_read("/admin", None, 1):
+    raise Forbidden()
+  task_queue = create_task("rebuild_workflow_states",
+                           url_for(rebuild_workflow_states.__name__),
+                           rebuild_workflow_states)
+  return task_queue.make_response(
+      app.make_response(("scheduled %s" % task_queue.name, 200,
+                         [('Content-Type', 'text/html')])))
+
+
 def init_extra_views(app_):
   """Init all views neede for ggrc_workflows module.
 
@@ -114,3 +148,14 @@ def init_extra_views(app_):
   app_.add_url_rule(
       "/admin/ensure_backlog_workflow_exists",
       view_func=Workflow.ensure_backlog_workflow_exists)
+  app_.add_url_rule(
+      "/_background_tasks/rebuild_workflow_states",
+      view_func=rebuild_workflow_states,
+      methods=["POST"])
+  app_.add_url_rule(
+      "/admin/rebuild_workflow_states",
+      view_func=login_required(admin_rebuild_workflow_states),
+      methods=["POST"])
+  app_.add_url_rule(
+      "/api/people/<int:person_id>/task_count",
+      view_func=login_required(person_task_count_view))
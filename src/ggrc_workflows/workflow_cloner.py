@@ -0,0 +1,310 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Set based cloning of workflow task groups.
+
+Cloning a workflow used to copy every task group, task and task group object
+through the ORM, one instance at a time. WorkflowCloner copies each level
+with a single INSERT ... SELECT:
+
+  - task groups of the source workflow are copied into the target workflow,
+  - ids of the copied task groups are matched with ids of their sources in a
+    temporary table, through a placeholder slug that holds the source id,
+  - tasks and task group objects are copied by joining their task groups
+    with that table,
+  - placeholder slugs are replaced with generated ones,
+  - person objects of the contacts of copied rows are updated.
+
+The clone options are the same as for the ORM copies: clone_people keeps the
+assignees, clone_tasks and clone_objects copy tasks and mapped objects of
+task groups.
+
+Copied rows are loaded back with a few queries and added to the new objects
+of the request cache, so they get revisions and fulltext records as if they
+were created through the session.
+"""
+
+import collections
+import uuid
+
+import sqlalchemy as sa
+from sqlalchemy import bindparam
+from sqlalchemy import func
+from sqlalchemy import literal
+from sqlalchemy import orm
+from sqlalchemy import select
+
+from ggrc import db
+from ggrc.fulltext import person_objects
+from ggrc.login import get_current_user_id
+from ggrc.services.common import get_cache
+from ggrc_workflows.models.task_group import TaskGroup
+from ggrc_workflows.models.task_group_object import TaskGroupObject
+from ggrc_workflows.models.task_group_task import TaskGroupTask
+
+
+# Generated slugs that are taken are retried with the id increased by this
+# much, the same as in Slugged.generate_slug_for.
+SLUG_INCREMENT = 1000
+
+_metadata = sa.MetaData()
+
+task_group_ids = sa.Table(
+    "task_group_clone_ids", _metadata,
+    sa.Column("old_id", sa.Integer(), primary_key=True, autoincrement=False),
+    sa.Column("new_id", sa.Integer(), nullable=False),
+    prefixes=["TEMPORARY"],
+)
+
+
+class WorkflowCloner(object):
+  """Copy task groups with their tasks and objects level by level."""
+
+  def __init__(self, context_id, clone_people=False, clone_tasks=False,
+               clone_objects=False):
+    self.connection = db.session.connection()
+    self.user_id = get_current_user_id()
+    self.context_id = context_id
+    self.clone_people = clone_people
+    self.clone_tasks = clone_tasks
+    self.clone_objects = clone_objects
+    self.token = u"clone-{}-".format(uuid.uuid4().hex)
+
+  def clone_task_groups(self, source_workflow_id, target_workflow_id):
+    """Copy all task groups of a workflow into another workflow.
+
+    Returns:
+      list of ids of the new task groups.
+    """
+    db.session.flush()
+    self._create_id_map()
+    try:
+      self._insert_task_groups(source_workflow_id, target_workflow_id)
+      self._map_task_group_ids(target_workflow_id)
+      new_ids = self._clone_contents()
+    finally:
+      self._drop_id_map()
+    self._register_new_objects(new_ids, task_groups=True)
+    return new_ids
+
+  def clone_task_group_contents(self, source, target):
+    """Copy tasks and objects of a task group into an existing task group.
+
+    Args:
+      source: task group to copy from.
+      target: flushed task group to copy into.
+    """
+    db.session.flush()
+    self._create_id_map()
+    try:
+      self.connection.execute(
+          task_group_ids.insert().values(old_id=source.id, new_id=target.id))
+      self._clone_contents()
+    finally:
+      self._drop_id_map()
+    db.session.expire(target, ["task_group_tasks", "task_group_objects"])
+    self._register_new_objects([target.id])
+
+  def _create_id_map(self):
+    self._drop_id_map()
+    task_group_ids.create(self.connection)
+
+  def _drop_id_map(self):
+    # Only DROP TEMPORARY TABLE leaves the current transaction open.
+    self.connection.execute(sa.text(
+        "DROP TEMPORARY TABLE IF EXISTS {}".format(task_group_ids.name)))
+
+  def _placeholder_slug(self, id_column):
+    return func.concat(self.token, id_column)
+
+  def _insert_task_groups(self, source_workflow_id, target_workflow_id):
+    table = TaskGroup.__table__
+    columns = collections.OrderedDict([
+        ("workflow_id", literal(target_workflow_id)),
+        ("title", table.c.title),
+        ("description", table.c.description),
+        ("sort_index", table.c.sort_index),
+        ("context_id", literal(self.context_id)),
+        ("modified_by_id", literal(self.user_id)),
+        ("slug", self._placeholder_slug(table.c.id)),
+        ("created_at", func.now()),
+        ("updated_at", func.now()),
+    ])
+    if self.clone_people:
+      columns["contact_id"] = table.c.contact_id
+    self.connection.execute(table.insert().from_select(
+        columns.keys(),
+        select(columns.values()).where(
+            table.c.workflow_id == source_workflow_id
+        ).order_by(table.c.id)))
+
+  def _map_task_group_ids(self, target_workflow_id):
+    """Match new task groups with their sources by placeholder slugs."""
+    table = TaskGroup.__table__
+    new = table.alias("new_task_groups")
+    old = table.alias("old_task_groups")
+    self.connection.execute(task_group_ids.insert().from_select(
+        ["old_id", "new_id"],
+        select([old.c.id, new.c.id]).select_from(
+            new.join(old, new.c.slug == self._placeholder_slug(old.c.id))
+        ).where(
+            new.c.workflow_id == target_workflow_id
+        ).where(
+            new.c.slug.like(self.token + u"%")
+        )))
+
+  def _clone_contents(self):
+    """Copy tasks and objects of all mapped task groups.
+
+    Returns:
+      list of ids of the target task groups.
+    """
+    if self.clone_tasks:
+      self._insert_tasks()
+    if self.clone_objects:
+      self._insert_objects()
+    self._assign_slugs(TaskGroup)
+    self._assign_slugs(TaskGroupTask)
+    self._update_person_objects()
+    return [new_id for new_id, in self.connection.execute(
+        select([task_group_ids.c.new_id]).order_by(task_group_ids.c.new_id))]
+
+  def _update_person_objects(self):
+    """Update objects of contacts of the copied task groups and tasks.
+
+    Rows inserted with raw SQL skip the flush hooks that keep the person
+    objects table up to date.
+    """
+    task_groups = TaskGroup.__table__
+    tasks = TaskGroupTask.__table__
+    contact_ids = set()
+    for query in (
+        select([task_groups.c.contact_id]).where(
+            task_groups.c.id == task_group_ids.c.new_id),
+        select([tasks.c.contact_id]).where(
+            tasks.c.task_group_id == task_group_ids.c.new_id),
+    ):
+      contact_ids.update(contact_id for contact_id, in self.connection.execute(
+          query.distinct()))
+    person_objects.update_people(self.connection, contact_ids)
+
+  def _insert_tasks(self):
+    table = TaskGroupTask.__table__
+    contact = table.c.contact_id if self.clone_people else \
+        literal(self.user_id)
+    columns = collections.OrderedDict([
+        ("task_group_id", task_group_ids.c.new_id),
+        ("title", table.c.title),
+        ("description", table.c.description),
+        ("sort_index", table.c.sort_index),
+        ("relative_start_month", table.c.relative_start_month),
+        ("relative_start_day", table.c.relative_start_day),
+        ("relative_end_month", table.c.relative_end_month),
+        ("relative_end_day", table.c.relative_end_day),
+        ("start_date", table.c.start_date),
+        ("end_date", table.c.end_date),
+        ("contact_id", contact),
+        ("task_type", table.c.task_type),
+        ("response_options", table.c.response_options),
+        ("object_approval", literal(False)),
+        ("context_id", literal(self.context_id)),
+        ("modified_by_id", literal(self.user_id)),
+        ("slug", self._placeholder_slug(table.c.id)),
+        ("created_at", func.now()),
+        ("updated_at", func.now()),
+    ])
+    self.connection.execute(table.insert().from_select(
+        columns.keys(),
+        select(columns.values()).select_from(
+            table.join(task_group_ids,
+                       task_group_ids.c.old_id == table.c.task_group_id)
+        ).order_by(table.c.id)))
+
+  def _insert_objects(self):
+    table = TaskGroupObject.__table__
+    columns = collections.OrderedDict([
+        ("task_group_id", task_group_ids.c.new_id),
+        ("object_id", table.c.object_id),
+        ("object_type", table.c.object_type),
+        ("status", literal(TaskGroupObject.default_status())),
+        ("context_id", literal(self.context_id)),
+        ("modified_by_id", literal(self.user_id)),
+        ("created_at", func.now()),
+        ("updated_at", func.now()),
+    ])
+    self.connection.execute(table.insert().from_select(
+        columns.keys(),
+        select(columns.values()).select_from(
+            table.join(task_group_ids,
+                       task_group_ids.c.old_id == table.c.task_group_id)
+        ).order_by(table.c.id)))
+
+  def _assign_slugs(self, model):
+    """Replace placeholder slugs of a model with generated ones."""
+    table = model.__table__
+    ids = [id_ for id_, in self.connection.execute(
+        select([table.c.id]).where(table.c.slug.like(self.token + u"%")))]
+    if not ids:
+      return
+    # The prefix only depends on the class of the object.
+    prefix = model.generate_slug_prefix_for(model())
+    slugs = {id_: u"{}-{}".format(prefix, id_) for id_ in ids}
+    taken = {slug for slug, in self.connection.execute(
+        select([table.c.slug]).where(table.c.slug.in_(slugs.values())))}
+    defaults = set(slugs.values())
+    for id_ in ids:
+      slug, suffix = slugs[id_], id_
+      # Retried slugs must not be the default slug of another copied row.
+      while slug in taken or (suffix != id_ and slug in defaults):
+        suffix += SLUG_INCREMENT
+        slug = u"{}-{}".format(prefix, suffix)
+        if self.connection.execute(select([func.count()]).where(
+                table.c.slug == slug)).scalar():
+          taken.add(slug)
+      taken.add(slug)
+      slugs[id_] = slug
+    self.connection.execute(
+        table.update().where(table.c.id == bindparam("_id")).values(
+            slug=bindparam("_slug")),
+        [{"_id": id_, "_slug": new_slug}
+         for id_, new_slug in slugs.iteritems()])
+
+  @staticmethod
+  def _register_new_objects(task_group_ids_, task_groups=False):
+    """Add copied rows to new objects of the request cache.
+
+    Args:
+      task_group_ids_: ids of task groups the rows were copied into.
+      task_groups: register the task groups too, when they were copied.
+    """
+    cache = get_cache()
+    if cache is None or not task_group_ids_:
+      return
+    objects = []
+    types = [type_ for type_, in db.session.query(
+        TaskGroupObject.object_type
+    ).filter(
+        TaskGroupObject.task_group_id.in_(task_group_ids_)
+    ).distinct()]
+    for type_ in types:
+      # Load mapped objects with their mappings, so that serializing the
+      # mappings does not load them one by one.
+      query = TaskGroupObject.query.filter(
+          TaskGroupObject.task_group_id.in_(task_group_ids_),
+          TaskGroupObject.object_type == type_,
+      )
+      attr = "{}_object".format(type_)
+      if hasattr(TaskGroupObject, attr):
+        query = query.options(orm.joinedload(attr))
+      objects.extend(query)
+    objects.extend(TaskGroupTask.query.options(
+        orm.undefer_group("TaskGroupTask_complete"),
+    ).filter(TaskGroupTask.task_group_id.in_(task_group_ids_)))
+    if task_groups:
+      objects.extend(TaskGroup.query.options(
+          orm.undefer_group("TaskGroup_complete"),
+          orm.subqueryload("task_group_tasks"),
+          orm.subqueryload("task_group_objects"),
+      ).filter(TaskGroup.id.in_(task_group_ids_)))
+    for obj in objects:
+      cache.new[obj] = obj.log_json()
@@ -0,0 +1,94 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""
+ Benchmark for automapping generation on a dense mapping graph
+
+ Generates a program with many regulations and objectives and posts 1,000
+ program-regulation relationships in one collection request, which makes the
+ automapper expand all of them together, and checks that the number of
+ queries stays bounded.
+
+ This module is not picked up by the default test run. Run it explicitly:
+
+   nosetests integration/ggrc/automapper/benchmark_automapper.py -s
+"""
+
+import time
+from datetime import datetime
+
+from ggrc import db
+from ggrc.models import all_models
+from ggrc.models import relationship_adjacency
+from ggrc.utils import QueryCounter
+from integration.ggrc import TestCase
+from integration.ggrc.api_helper import Api
+
+
+REGULATIONS = 1000
+OBJECTIVES_PER_REGULATION = 2
+
+# Queries of the bulk POST may not grow with the number of mappings.
+MAX_QUERIES = 200
+
+
+class BenchmarkAutomapper(TestCase):
+  """Benchmark bulk relationship POST with automappings."""
+
+  @staticmethod
+  def _insert(model, rows):
+    db.session.execute(model.__table__.insert(), rows)
+    return [obj.id for obj in db.session.query(model.id)]
+
+  def setUp(self):
+    super(BenchmarkAutomapper, self).setUp()
+    self.api = Api()
+    now = datetime.now()
+    common = {"created_at": now, "updated_at": now, "modified_by_id": None}
+    self.program = all_models.Program(title="benchmark program", slug="BP-1")
+    db.session.add(self.program)
+    db.session.commit()
+    self.regulation_ids = self._insert(all_models.Regulation, [
+        dict(common, title="regulation {}".format(i), slug="BR-{}".format(i),
+             meta_kind="Regulation")
+        for i in range(REGULATIONS)
+    ])
+    self.objective_ids = self._insert(all_models.Objective, [
+        dict(common, title="objective {}".format(i), slug="BO-{}".format(i))
+        for i in range(REGULATIONS * OBJECTIVES_PER_REGULATION)
+    ])
+    # objectives are already mapped to regulations, the benchmark maps the
+    # regulations to the program which implies program-objective mappings
+    relationships = []
+    for i, regulation_id in enumerate(self.regulation_ids):
+      start = i * OBJECTIVES_PER_REGULATION
+      for objective_id in self.objective_ids[
+              start:start + OBJECTIVES_PER_REGULATION]:
+        relationships.append(dict(
+            common, source_type="Regulation", source_id=regulation_id,
+            destination_type="Objective", destination_id=objective_id))
+    db.session.execute(all_models.Relationship.__table__.insert(),
+                       relationships)
+    db.session.commit()
+    relationship_adjacency.rebuild()
+
+  def test_bulk_relationship_post(self):
+    """Time a collection POST that implies many mappings."""
+    data = [{
+        "relationship": {
+            "source": {"id": self.program.id, "type": "Program"},
+            "destination": {"id": regulation_id, "type": "Regulation"},
+            "context": None,
+        },
+    } for regulation_id in self.regulation_ids]
+    start = time.time()
+    with QueryCounter() as counter:
+      response = self.api.post(all_models.Relationship, data)
+    duration = time.time() - start
+    self.assert200(response)
+    implied = all_models.Relationship.query.filter(
+        all_models.Relationship.automapping_id.isnot(None)).count()
+    self.assertEqual(implied, REGULATIONS * OBJECTIVES_PER_REGULATION)
+    print "bulk POST of {} mappings: {:.4f}s, {} queries, {} implied".format(
+        len(data), duration, counter.get, implied)
+    self.assertLess(counter.get, MAX_QUERIES)
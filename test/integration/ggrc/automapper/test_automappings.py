@@ -392,3 +392,28 @@ class TestAutomappings(integration.ggrc.TestCase):
     self.assert_mapping(audit_new, regulation)
     self.assert_mapping(audit_new, section)
     self.assert_mapping(audit_new, program, missing=True)
+
+  def test_bulk_mapping_post(self):
+    """Mappings posted in one collection request are expanded together."""
+    program = self.create_object(models.Program, {
+        'title': make_name('Program')
+    })
+    regulation = self.create_object(models.Regulation, {
+        'title': make_name('Test PD Regulation')
+    })
+    objectives = [self.create_object(models.Objective, {
+        'title': make_name('Objective')
+    }) for _ in range(3)]
+    data = [{
+        'relationship': {
+            'source': {'id': src.id, 'type': src.type},
+            'destination': {'id': dst.id, 'type': dst.type},
+            'context': None,
+        },
+    } for src, dst in [(program, regulation)] +
+        [(regulation, objective) for objective in objectives]]
+    response = self.api.post(models.Relationship, data)
+    self.assert200(response)
+    for objective in objectives:
+      self.assert_mapping(program, objective)
+    self.assert_mapping(objectives[0], objectives[1], missing=True)
@@ -0,0 +1,40 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Tests for importing and removing object people."""
+
+from ggrc.fulltext import person_objects
+from ggrc.models import all_models
+from ggrc.models.relationship_adjacency import RelationshipAdjacency
+from integration.ggrc.converters import TestCase
+
+
+class TestObjectPeople(TestCase):
+  """Unmapped people are removed from the derived indexes."""
+
+  def setUp(self):
+    TestCase.setUp(self)
+    self.client.get("/login")
+
+  @staticmethod
+  def _program():
+    return all_models.Program.query.filter_by(slug="prog-people").one()
+
+  def _indexed_people(self):
+    return {edge.related_id for edge in RelationshipAdjacency.query.filter_by(
+        via="object_person", object_type="Program",
+        object_id=self._program().id)}
+
+  def test_unmap_person(self):
+    """Unmapping a person removes their adjacency edges and objects."""
+    self.import_file("program_map_person.csv")
+    person = all_models.Person.query.filter_by(
+        email="user@example.com").one()
+    self.assertEqual(self._indexed_people(), {person.id})
+    mapped = (person_objects.MAPPED, "Program", self._program().id)
+    self.assertIn(mapped, person_objects.get_stored(person.id))
+
+    self.import_file("program_unmap_person.csv")
+    self.assertEqual(all_models.ObjectPerson.query.count(), 0)
+    self.assertEqual(self._indexed_people(), set())
+    self.assertNotIn(mapped, person_objects.get_stored(person.id))
@@ -0,0 +1,114 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Tests for the objects people own or are assigned to."""
+
+from ggrc import db
+from ggrc.fulltext import person_objects
+from ggrc.models import all_models
+from ggrc.utils import QueryCounter
+from integration.ggrc import TestCase
+from integration.ggrc.api_helper import Api
+from integration.ggrc.generator import ObjectGenerator
+from integration.ggrc.models import factories
+
+
+class TestPersonObjects(TestCase):
+  """Rows are kept up to date by the flush hooks."""
+
+  def setUp(self):
+    super(TestPersonObjects, self).setUp()
+    self.person = factories.PersonFactory(
+        email=factories.random_string() + "@example.com")
+    self.control = factories.ControlFactory()
+
+  def _stored(self, person_id=None):
+    return {(source, type_, id_) for source, type_, id_
+            in person_objects.get_stored(person_id or self.person.id)}
+
+  def test_owner(self):
+    """Owned objects are stored and removed with the owner mapping."""
+    owner = all_models.ObjectOwner(
+        person=self.person,
+        ownable_id=self.control.id,
+        ownable_type="Control",
+    )
+    db.session.add(owner)
+    db.session.commit()
+    self.assertIn((person_objects.OWNED, "Control", self.control.id),
+                  self._stored())
+
+    db.session.delete(owner)
+    db.session.commit()
+    self.assertNotIn((person_objects.OWNED, "Control", self.control.id),
+                     self._stored())
+
+  def test_contact(self):
+    """Contacts of objects are stored when the contact changes."""
+    self.control.contact = self.person
+    db.session.commit()
+    self.assertIn((person_objects.OWNED, "Control", self.control.id),
+                  self._stored())
+
+  def test_unchanged_contact(self):
+    """Edits that do not change people do not write rows."""
+    self.control.contact = self.person
+    db.session.commit()
+    control = all_models.Control.query.get(self.control.id)
+    control.title = "renamed control"
+    with QueryCounter() as counter:
+      db.session.commit()
+    self.assertEqual(
+        [query for query in counter.queries if "person_objects" in query], [])
+    self.assertIn((person_objects.OWNED, "Control", self.control.id),
+                  self._stored())
+
+  def test_relationship(self):
+    """Objects mapped to the person are stored."""
+    factories.RelationshipFactory(source=self.person, destination=self.control)
+    self.assertIn((person_objects.OWNED, "Control", self.control.id),
+                  self._stored())
+
+  def test_deleted_program(self):
+    """Objects related to a deleted program are removed for its people."""
+    generator = ObjectGenerator()
+    _, program = generator.generate_object(all_models.Program)
+    generator.generate_relationship(program, self.control)
+    owner = all_models.Person.query.filter_by(
+        email="user@example.com").one()
+    related = (person_objects.RELATED, "Control", self.control.id)
+    self.assertIn(related, self._stored(owner.id))
+
+    response = Api().delete(all_models.Program.query.get(program.id))
+    self.assert200(response)
+    self.assertNotIn(related, self._stored(owner.id))
+    self.assertEqual(person_objects.check_consistency([owner.id]), {})
+
+  def test_program_mapping(self):
+    """Objects mapped to a program are related to its people."""
+    generator = ObjectGenerator()
+    _, program = generator.generate_object(all_models.Program)
+    _, relationship = generator.generate_relationship(program, self.control)
+    owner = all_models.Person.query.filter_by(
+        email="user@example.com").one()
+    related = (person_objects.RELATED, "Control", self.control.id)
+    self.assertIn(related, self._stored(owner.id))
+    self.assertIn(
+        (person_objects.RELATED, "Relationship", relationship.id),
+        self._stored(owner.id))
+
+    response = Api().delete(
+        all_models.Relationship.query.get(relationship.id))
+    self.assert200(response)
+    self.assertNotIn(related, self._stored(owner.id))
+    self.assertEqual(person_objects.check_consistency([owner.id]), {})
+
+  def test_consistency(self):
+    """Stored rows match the rows computed from the mappings."""
+    factories.RelationshipFactory(source=self.person, destination=self.control)
+    self.assertEqual(person_objects.check_consistency([self.person.id]), {})
+
+    db.session.execute(person_objects.PersonObject.__table__.delete())
+    report = person_objects.check_consistency([self.person.id], repair=True)
+    self.assertIn(self.person.id, report)
+    self.assertEqual(person_objects.check_consistency([self.person.id]), {})
@@ -0,0 +1,148 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""
+ Benchmark for batched data migration helpers
+
+ Generates a table of GGRC_BENCHMARK_MIGRATION_ROWS rows, 1M by default,
+ where one row in a hundred has a duplicate title, and compares:
+
+ * a single UPDATE of the whole table with batched_update, reporting the
+   total time and the longest batch, which bounds how long row locks are
+   held;
+ * the previous row by row resolve_duplicates with rename_duplicates. The
+   row by row version runs a count query for every duplicate and takes hours
+   on the full table, so it is only run on the first
+   GGRC_BENCHMARK_MIGRATION_LEGACY_ROWS rows, 20000 by default.
+
+ This module is not picked up by the default test run. Run it explicitly:
+
+   nosetests integration/ggrc/migrations/benchmark_batches.py -s
+"""
+
+import os
+import time
+
+import sqlalchemy as sa
+from sqlalchemy import and_
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import aliased
+
+from ggrc import db
+from ggrc.migrations.utils import batches
+from integration.ggrc import TestCase
+
+
+ROWS = int(os.environ.get("GGRC_BENCHMARK_MIGRATION_ROWS", 1000000))
+LEGACY_ROWS = int(os.environ.get("GGRC_BENCHMARK_MIGRATION_LEGACY_ROWS",
+                                 20000))
+DUPLICATE_EVERY = 100
+INSERT_CHUNK = 10000
+
+Base = declarative_base()
+
+
+class BenchmarkRow(Base):
+  """Mapped class for the row by row duplicate resolution."""
+  # pylint: disable=too-few-public-methods
+
+  __tablename__ = "benchmark_batches"
+
+  type = "BenchmarkRow"
+  id = sa.Column(sa.Integer(), primary_key=True)
+  title = sa.Column(sa.String(length=250), index=True)
+  flag = sa.Column(sa.Integer(), nullable=False, default=0)
+
+
+table = BenchmarkRow.__table__
+
+
+def legacy_resolve_duplicates(model, attr, separator=u"-"):
+  """Row by row duplicate resolution used before rename_duplicates."""
+  v0, v1 = aliased(model, name="v0"), aliased(model, name="v1")
+  query = db.session.query(v0).join(v1, and_(
+      getattr(v0, attr) == getattr(v1, attr),
+      v0.id > v1.id
+  ))
+  for v in query:
+    i = 1
+    nattr = "{}{}{}".format(getattr(v, attr, model.type), separator, i)
+    while db.session.query(model).\
+            filter(getattr(model, attr) == nattr).count():
+      i += 1
+      nattr = "{}{}{}".format(getattr(v, attr, model.type), separator, i)
+    setattr(v, attr, nattr)
+    db.session.add(v)
+    db.session.flush()
+  db.session.commit()
+
+
+def _fill(connection, rows):
+  """Insert rows, every DUPLICATE_EVERY-th one repeats the previous title."""
+  connection.execute(table.delete())
+  for start in range(1, rows + 1, INSERT_CHUNK):
+    connection.execute(table.insert(), [
+        {"id": i,
+         "title": "title {}".format(i - 1 if i % DUPLICATE_EVERY == 0 else i),
+         "flag": 0}
+        for i in range(start, min(start + INSERT_CHUNK, rows + 1))
+    ])
+
+
+def _timed(function, *args, **kwargs):
+  start = time.time()
+  result = function(*args, **kwargs)
+  return time.time() - start, result
+
+
+class BenchmarkBatches(TestCase):
+  """Compare whole table and batched data migrations."""
+
+  def setUp(self):
+    super(BenchmarkBatches, self).setUp()
+    table.create(db.engine, checkfirst=True)
+    self.connection = db.engine.connect()
+
+  def tearDown(self):
+    self.connection.close()
+    table.drop(db.engine, checkfirst=True)
+    batches.checkpoints.drop(db.engine, checkfirst=True)
+    super(BenchmarkBatches, self).tearDown()
+
+  def test_update(self):
+    """Print times of a whole table and a batched update."""
+    _fill(self.connection, ROWS)
+    print "\n{} rows".format(ROWS)
+
+    elapsed, _ = _timed(self.connection.execute,
+                        table.update().values(flag=1))
+    print "  single update:  {:8.2f}s, one lock for all rows".format(elapsed)
+
+    batch_starts = []
+
+    def statement(id_range):
+      batch_starts.append(time.time())
+      return table.update().where(id_range).values(flag=2)
+
+    elapsed, _ = _timed(batches.run_batched, self.connection, table,
+                        statement, checkpoint="benchmark")
+    steps = [b - a for a, b in zip(batch_starts, batch_starts[1:])]
+    print "  batched update: {:8.2f}s, longest batch {:.2f}s".format(
+        elapsed, max(steps) if steps else elapsed)
+
+  def test_resolve_duplicates(self):
+    """Print times of row by row and set based duplicate renames."""
+    _fill(self.connection, LEGACY_ROWS)
+    elapsed, _ = _timed(legacy_resolve_duplicates, BenchmarkRow, "title")
+    print "\n{} rows".format(LEGACY_ROWS)
+    print "  row by row: {:8.2f}s".format(elapsed)
+    _fill(self.connection, LEGACY_ROWS)
+    elapsed, _ = _timed(batches.rename_duplicates, self.connection, table,
+                        "title")
+    print "  set based:  {:8.2f}s".format(elapsed)
+
+    _fill(self.connection, ROWS)
+    elapsed, renamed = _timed(batches.rename_duplicates, self.connection,
+                              table, "title")
+    print "{} rows".format(ROWS)
+    print "  set based:  {:8.2f}s, {} renamed".format(elapsed, renamed)
@@ -0,0 +1,116 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Tests for batched data migration helpers."""
+
+import sqlalchemy as sa
+
+from ggrc import db
+from ggrc.migrations.utils import batches
+from integration.ggrc import TestCase
+
+
+_metadata = sa.MetaData()
+
+source = sa.Table(
+    "test_batches_source", _metadata,
+    sa.Column("id", sa.Integer(), primary_key=True),
+    sa.Column("title", sa.String(length=250)),
+    sa.Column("flag", sa.Integer()),
+)
+
+target = sa.Table(
+    "test_batches_target", _metadata,
+    sa.Column("id", sa.Integer(), primary_key=True),
+    sa.Column("title", sa.String(length=250)),
+)
+
+
+class TestBatches(TestCase):
+  """Batched updates, inserts and duplicate renames."""
+
+  ROWS = 25
+
+  def setUp(self):
+    super(TestBatches, self).setUp()
+    _metadata.create_all(db.engine)
+    self.connection = db.engine.connect()
+    self.connection.execute(source.insert(), [
+        {"id": i, "title": "title" if i % 3 else "title-1", "flag": 0}
+        for i in range(1, self.ROWS + 1)
+    ])
+
+  def tearDown(self):
+    self.connection.close()
+    _metadata.drop_all(db.engine)
+    batches.checkpoints.drop(db.engine, checkfirst=True)
+    super(TestBatches, self).tearDown()
+
+  def _flags(self):
+    return [row[0] for row in self.connection.execute(
+        sa.select([source.c.flag]).order_by(source.c.id))]
+
+  def test_batched_update(self):
+    """Only rows matching the where clause are updated."""
+    rows = batches.batched_update(self.connection, source, {"flag": 1},
+                                  where=source.c.id > 5, batch_size=7)
+    self.assertEqual(rows, self.ROWS - 5)
+    self.assertEqual(self._flags(), [0] * 5 + [1] * (self.ROWS - 5))
+
+  def test_resume_from_checkpoint(self):
+    """An interrupted migration continues after the last committed batch."""
+    statements = []
+
+    def failing_statement(id_range):
+      if len(statements) == 2:
+        raise RuntimeError("interrupted")
+      statements.append(id_range)
+      return source.update().where(id_range).values(flag=source.c.flag + 1)
+
+    with self.assertRaises(RuntimeError):
+      batches.run_batched(self.connection, source, failing_statement,
+                          batch_size=10, checkpoint="test")
+    self.assertEqual(batches.get_checkpoint(self.connection, "test"), 20)
+
+    rows = batches.batched_update(self.connection, source,
+                                  {"flag": source.c.flag + 1},
+                                  batch_size=10, checkpoint="test")
+    self.assertEqual(rows, 5)
+    # every row was updated exactly once and the checkpoint is done
+    self.assertEqual(self._flags(), [1] * self.ROWS)
+    self.assertEqual(batches.get_checkpoint(self.connection, "test"), 0)
+
+  def test_batched_insert_from_select(self):
+    """All selected rows are copied in batches."""
+    rows = batches.batched_insert_from_select(
+        self.connection, target, ["id", "title"],
+        sa.select([source.c.id, source.c.title]), source, batch_size=10)
+    self.assertEqual(rows, self.ROWS)
+    self.assertEqual(self.connection.execute(
+        sa.select([sa.func.count()]).select_from(target)).scalar(), self.ROWS)
+
+  def test_rename_duplicates(self):
+    """Duplicates get the lowest free suffix and existing names are kept."""
+    renamed = batches.rename_duplicates(self.connection, source, "title",
+                                        batch_size=4)
+    titles = [row[0] for row in self.connection.execute(
+        sa.select([source.c.title]).order_by(source.c.id))]
+    self.assertEqual(renamed, self.ROWS - 2)
+    self.assertEqual(len(set(titles)), self.ROWS)
+    self.assertEqual(titles[:4], ["title", "title-2", "title-1", "title-3"])
+    self.assertEqual(titles[5], "title-1-1")
+
+  def test_rename_duplicates_ignoring_case(self):
+    """Values are duplicates if they only differ in case or trailing spaces."""
+    self.connection.execute(source.delete())
+    self.connection.execute(source.insert(), [
+        {"id": 1, "title": "Abc"},
+        {"id": 2, "title": "abc"},
+        {"id": 3, "title": "ABC "},
+        {"id": 4, "title": "ABC-1"},
+    ])
+    renamed = batches.rename_duplicates(self.connection, source, "title")
+    titles = [row[0] for row in self.connection.execute(
+        sa.select([source.c.title]).order_by(source.c.id))]
+    self.assertEqual(renamed, 2)
+    self.assertEqual(titles, ["Abc", "abc-2", "ABC-3", "ABC-1"])
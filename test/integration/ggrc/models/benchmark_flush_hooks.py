@@ -0,0 +1,63 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""
+ Benchmark for small flushes in a session with many loaded instances
+
+ Loads many objectives into the session and then edits and flushes them one
+ at a time. Flush hooks only process the instances recorded for them, so the
+ cost of a flush should not depend on the number of loaded objects.
+
+ This module is not picked up by the default test run. Run it explicitly:
+
+   nosetests integration/ggrc/models/benchmark_flush_hooks.py -s
+"""
+
+import time
+from datetime import datetime
+
+from ggrc import db
+from ggrc.models import all_models
+from integration.ggrc import TestCase
+
+
+OBJECTS = 10000
+FLUSHES = 100
+
+
+class BenchmarkFlushHooks(TestCase):
+  """Benchmark flushes with a large identity map."""
+
+  def setUp(self):
+    super(BenchmarkFlushHooks, self).setUp()
+    now = datetime.now()
+    db.session.execute(all_models.Objective.__table__.insert(), [{
+        "title": "objective {}".format(i),
+        "slug": "BO-{}".format(i),
+        "created_at": now,
+        "updated_at": now,
+    } for i in range(OBJECTS)])
+    db.session.commit()
+
+  def _flushes(self, objects):
+    start = time.time()
+    for i, obj in enumerate(objects[:FLUSHES]):
+      obj.description = "flush {}".format(i)
+      db.session.flush()
+    return time.time() - start
+
+  def test_flushes(self):
+    """Time flushes with few and with all objectives loaded."""
+    few = all_models.Objective.query.limit(FLUSHES).all()
+    few_time = self._flushes(few)
+    db.session.rollback()
+
+    loaded = all_models.Objective.query.all()
+    self.assertEqual(len(loaded), OBJECTS)
+    loaded_time = self._flushes(loaded)
+    db.session.rollback()
+
+    print "\n{} flushes with {} objects loaded: {:.3f}s".format(
+        FLUSHES, FLUSHES, few_time)
+    print "{} flushes with {} objects loaded: {:.3f}s".format(
+        FLUSHES, OBJECTS, loaded_time)
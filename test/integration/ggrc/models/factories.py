@@ -80,6 +80,12 @@ class ControlFactory(ModelFactory, TitledFactory):
   notes = None
 
 
+class ObjectiveFactory(ModelFactory, TitledFactory):
+
+  class Meta:
+    model = models.Objective
+
+
 class AssessmentFactory(ModelFactory, TitledFactory):
 
   class Meta:
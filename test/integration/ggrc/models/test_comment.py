@@ -0,0 +1,85 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Tests for linking comments to custom attribute revisions."""
+
+from ggrc.models import all_models
+from ggrc.utils import QueryCounter
+from integration.ggrc import TestCase
+from integration.ggrc import generator
+from integration.ggrc.api_helper import Api
+
+
+GENERATOR = generator.ObjectGenerator()
+
+
+class TestCommentRevisionLinking(TestCase):
+  """Comments are linked to CA revisions with one query per flush."""
+
+  def setUp(self):
+    super(TestCommentRevisionLinking, self).setUp()
+    self.api = Api()
+    _, self.assessment = GENERATOR.generate_object(all_models.Assessment)
+    _, self.definition = GENERATOR.generate_custom_attribute(
+        attribute_type="Text",
+        definition_type="Assessment",
+        definition_id=self.assessment.id,
+    )
+    self.values = []
+    for index in range(3):
+      _, value = GENERATOR.generate_custom_attribute_value(
+          custom_attribute_id=self.definition.id,
+          attributable=self.assessment,
+          attribute_value="value {}".format(index),
+      )
+      self.values.append(value)
+
+  def _post_comments(self, count):
+    """Post comments and count lookups of CA value revisions."""
+    data = [{
+        "comment": {
+            "description": "comment {}".format(index),
+            "context": None,
+            "custom_attribute_revision_upd": {
+                "custom_attribute_value": {
+                    "id": self.values[index % len(self.values)].id,
+                },
+            },
+        },
+    } for index in range(count)]
+    with QueryCounter() as counter:
+      response = self.api.post(all_models.Comment, data)
+    self.assert200(response)
+    lookups = [query for query in counter.queries
+               if "FROM revisions" in query and
+               "revisions.resource_type" in query]
+    return len(lookups)
+
+  def test_collection_post_lookups(self):
+    """Revision lookups do not grow with posted comments."""
+    few_lookups = self._post_comments(2)
+    many_lookups = self._post_comments(9)
+    self.assertEqual(many_lookups, few_lookups)
+
+    comments = all_models.Comment.query.all()
+    self.assertEqual(len(comments), 11)
+    values = {value.id: value for value in self.values}
+    for comment in comments:
+      revision = comment.revision
+      self.assertEqual(revision.resource_type, "CustomAttributeValue")
+      self.assertEqual(comment.custom_attribute_definition_id,
+                       self.definition.id)
+      self.assertEqual(comment.custom_attribute_stored_value,
+                       values[revision.resource_id].attribute_value)
+
+  def test_eager_query_skips_revisions(self):
+    """Stored CA values are shown without loading revisions."""
+    self._post_comments(3)
+    with QueryCounter() as counter:
+      comments = all_models.Comment.eager_query().all()
+      stored = sorted(
+          comment.custom_attribute_revision["custom_attribute_stored_value"]
+          for comment in comments)
+    self.assertEqual(stored, ["value 0", "value 1", "value 2"])
+    self.assertFalse([query for query in counter.queries
+                      if "FROM revisions" in query])
@@ -0,0 +1,57 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Tests for system wide roles of people."""
+
+from ggrc.models import all_models
+from ggrc.utils import QueryCounter
+from ggrc_basic_permissions.models import Role
+from integration.ggrc import TestCase
+from integration.ggrc.api_helper import Api
+from integration.ggrc.models import factories
+from integration.ggrc_basic_permissions.models.factories import (
+    UserRoleFactory
+)
+
+
+class TestSystemWideRole(TestCase):
+  """System wide roles are resolved for many people at once."""
+
+  def setUp(self):
+    super(TestSystemWideRole, self).setUp()
+    self.api = Api()
+    self.roles = {role.name: role for role in Role.query}
+
+  def _add_people(self, count, role_name):
+    for _ in range(count):
+      person = factories.PersonFactory(
+          email=factories.random_string() + "@example.com")
+      UserRoleFactory(person=person, role=self.roles[role_name])
+
+  def _get_people(self):
+    with QueryCounter() as counter:
+      response = self.api.get_query(all_models.Person, "__sort=id")
+    self.assert200(response)
+    role_queries = [query for query in counter.queries if "roles" in query]
+    return response.json["people_collection"]["people"], len(role_queries)
+
+  def test_collection_queries(self):
+    """The number of role queries does not depend on the number of people."""
+    self._add_people(2, "Reader")
+    people, few_queries = self._get_people()
+    self.assertIn("Reader", {p["system_wide_role"] for p in people})
+
+    self._add_people(10, "Editor")
+    people, many_queries = self._get_people()
+    self.assertIn("Editor", {p["system_wide_role"] for p in people})
+    self.assertEqual(many_queries, few_queries)
+
+  def test_role_change(self):
+    """Cached roles are dropped when role assignments change."""
+    person = factories.PersonFactory(
+        email=factories.random_string() + "@example.com")
+    self.assertEqual(person.system_wide_role, "No Access")
+    UserRoleFactory(person=person, role=self.roles["Creator"])
+    self.assertEqual(person.system_wide_role, "Creator")
+    self.assertEqual(all_models.Person.system_wide_roles([person]),
+                     {person.id: "Creator"})
@@ -0,0 +1,81 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Tests for the relationship adjacency index."""
+
+from ggrc import db
+from ggrc.models import all_models
+from ggrc.models import relationship_adjacency
+from ggrc.models.relationship_helper import RelationshipHelper
+from integration.ggrc import TestCase
+from integration.ggrc.models import factories
+
+
+class TestRelationshipAdjacency(TestCase):
+  """Tests for maintaining and querying the adjacency index."""
+
+  def setUp(self):
+    super(TestRelationshipAdjacency, self).setUp()
+    self.control = factories.ControlFactory()
+    self.objectives = [factories.ObjectiveFactory() for _ in range(3)]
+    for objective in self.objectives[:2]:
+      factories.RelationshipFactory(source=self.control,
+                                    destination=objective)
+
+  def _related_objective_ids(self):
+    return {row[0] for row in RelationshipHelper.get_ids_related_to(
+        "Objective", "Control", [self.control.id])}
+
+  @staticmethod
+  def _edges():
+    return {
+        (row.via, row.object_type, row.object_id,
+         row.related_type, row.related_id)
+        for row in relationship_adjacency.RelationshipAdjacency.query
+    }
+
+  def test_index_written_on_create(self):
+    """Both directions of a new relationship are indexed."""
+    self.assertEqual(self._related_objective_ids(),
+                     {obj.id for obj in self.objectives[:2]})
+    controls = RelationshipHelper.get_ids_related_to(
+        "Control", "Objective", [self.objectives[0].id])
+    self.assertEqual({row[0] for row in controls}, {self.control.id})
+
+  def test_index_updated_on_delete(self):
+    """Deleting a relationship removes its edges."""
+    relationship = all_models.Relationship.find_related(
+        self.control, self.objectives[0])
+    db.session.delete(relationship)
+    db.session.commit()
+    self.assertEqual(self._related_objective_ids(), {self.objectives[1].id})
+
+  def test_index_updated_on_change(self):
+    """Changing relationship endpoints moves its edges."""
+    relationship = all_models.Relationship.find_related(
+        self.control, self.objectives[0])
+    relationship.destination = self.objectives[2]
+    db.session.commit()
+    self.assertEqual(self._related_objective_ids(),
+                     {self.objectives[1].id, self.objectives[2].id})
+
+  def test_owner_mappings(self):
+    """Object owners are indexed as Person mappings."""
+    person = factories.PersonFactory(email=factories.random_string() +
+                                     "@example.com")
+    db.session.add(all_models.ObjectOwner(
+        person=person,
+        ownable_id=self.control.id,
+        ownable_type="Control",
+    ))
+    db.session.commit()
+    people = RelationshipHelper.get_ids_related_to(
+        "Person", "Control", [self.control.id])
+    self.assertIn(person.id, {row[0] for row in people})
+
+  def test_rebuild(self):
+    """Rebuilding the index gives the same edges as write-through."""
+    edges = self._edges()
+    self.assertTrue(edges)
+    relationship_adjacency.rebuild()
+    self.assertEqual(self._edges(), edges)
@@ -0,0 +1,159 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""
+ Benchmark for /query requests with chained "relevant" filters
+
+ Generates a program with a large number of mapped controls and objectives
+ and runs a query chain Program -> Control -> Objective, comparing the
+ adjacency index lookup with the previous union of relationship and custom
+ attribute subqueries.
+
+ This module is not picked up by the default test run. Run it explicitly:
+
+   nosetests integration/ggrc/services/benchmark_relevant_query.py -s
+"""
+
+import time
+from datetime import datetime
+
+from flask import json
+from sqlalchemy import and_
+
+from ggrc import db
+from ggrc.models import all_models
+from ggrc.models import relationship_adjacency
+from ggrc.models.relationship_helper import RelationshipHelper
+from ggrc.utils import QueryCounter
+from integration.ggrc import TestCase
+
+
+CONTROLS = 2000
+OBJECTIVES_PER_CONTROL = 3
+ITERATIONS = 10
+
+
+def legacy_related_ids(object_type, related_type, related_ids):
+  """Union of mapping subqueries used before the adjacency index."""
+  rel = all_models.Relationship
+  cav = all_models.CustomAttributeValue
+  return db.session.query(rel.destination_id).filter(and_(
+      rel.destination_type == object_type,
+      rel.source_type == related_type,
+      rel.source_id.in_(related_ids),
+  )).union(db.session.query(rel.source_id).filter(and_(
+      rel.source_type == object_type,
+      rel.destination_type == related_type,
+      rel.destination_id.in_(related_ids),
+  ))).union(db.session.query(cav.attributable_id).filter(
+      (cav.attributable_type == object_type) &
+      (cav.attribute_value == related_type) &
+      cav.attribute_object_id.in_(related_ids)
+  )).union(db.session.query(cav.attribute_object_id).filter(
+      (cav.attribute_value == object_type) &
+      (cav.attributable_type == related_type) &
+      cav.attributable_id.in_(related_ids)
+  ))
+
+
+class BenchmarkRelevantQuery(TestCase):
+  """Benchmark chained relevant filters on a generated mapping graph."""
+
+  @staticmethod
+  def _insert(model, rows):
+    result = db.session.execute(model.__table__.insert(), rows)
+    return result
+
+  @classmethod
+  def _generate_data(cls):
+    now = datetime.now()
+    common = {"created_at": now, "updated_at": now, "modified_by_id": None}
+    program = all_models.Program(title="benchmark program", slug="BP-1")
+    db.session.add(program)
+    db.session.commit()
+    cls._insert(all_models.Control, [
+        dict(common, title="control {}".format(i), slug="BC-{}".format(i))
+        for i in range(CONTROLS)
+    ])
+    cls._insert(all_models.Objective, [
+        dict(common, title="objective {}".format(i), slug="BO-{}".format(i))
+        for i in range(CONTROLS * OBJECTIVES_PER_CONTROL)
+    ])
+    control_ids = [c.id for c in db.session.query(all_models.Control.id)]
+    objective_ids = [o.id for o in db.session.query(all_models.Objective.id)]
+    relationships = [
+        dict(common, source_type="Program", source_id=program.id,
+             destination_type="Control", destination_id=control_id)
+        for control_id in control_ids
+    ]
+    for i, control_id in enumerate(control_ids):
+      for objective_id in objective_ids[i * OBJECTIVES_PER_CONTROL:
+                                        (i + 1) * OBJECTIVES_PER_CONTROL]:
+        relationships.append(dict(
+            common, source_type="Objective", source_id=objective_id,
+            destination_type="Control", destination_id=control_id))
+    cls._insert(all_models.Relationship, relationships)
+    db.session.commit()
+    relationship_adjacency.rebuild()
+    return program
+
+  def setUp(self):
+    super(BenchmarkRelevantQuery, self).setUp()
+    self.program = self._generate_data()
+    self.client.get("/login")
+
+  def _post_query(self):
+    data = [{
+        "object_name": "Control",
+        "filters": {"expression": {
+            "op": {"name": "relevant"},
+            "object_name": "Program",
+            "ids": [self.program.id],
+        }},
+        "type": "ids",
+    }, {
+        "object_name": "Objective",
+        "filters": {"expression": {
+            "op": {"name": "relevant"},
+            "object_name": "__previous__",
+            "ids": ["0"],
+        }},
+        "type": "ids",
+    }]
+    response = self.client.post(
+        "/query", data=json.dumps(data),
+        headers={"Content-Type": "application/json"})
+    self.assert200(response)
+    return response
+
+  @staticmethod
+  def _time(function):
+    start = time.time()
+    for _ in range(ITERATIONS):
+      function()
+    return (time.time() - start) / ITERATIONS
+
+  def test_chained_relevant_query(self):
+    """Time /query with chained relevant filters."""
+    with QueryCounter() as counter:
+      self._post_query()
+    duration = self._time(self._post_query)
+    print "/query chained relevant: {:.4f}s, {} queries".format(
+        duration, counter.get)
+
+  def test_related_ids_lookup(self):
+    """Compare the adjacency lookup with the legacy union."""
+    control_ids = [
+        c.id for c in db.session.query(all_models.Control.id)]
+
+    def adjacency():
+      return RelationshipHelper.get_ids_related_to(
+          "Objective", "Control", control_ids).all()
+
+    def legacy():
+      return legacy_related_ids("Objective", "Control", control_ids).all()
+
+    self.assertEqual({row[0] for row in adjacency()},
+                     {row[0] for row in legacy()})
+    print "get_ids_related_to adjacency: {:.4f}s, legacy: {:.4f}s".format(
+        self._time(adjacency), self._time(legacy))
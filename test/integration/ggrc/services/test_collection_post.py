@@ -5,6 +5,8 @@
 
 import json
 
+from mock import patch
+
 from ggrc import db
 from ggrc import models
 from integration.ggrc import services
@@ -129,6 +131,98 @@ class TestCollectionPost(services.TestCase):
     self.assertEqual(
         0, len(response.json['test_model_collection']['test_model']))
 
+  def test_chunked_with_errors(self):
+    """Test chunked collection post commits all objects but the bad ones."""
+    data = json.dumps([
+        {'services_test_mock_model':
+            {'foo': 'bar1', 'code': 'f1', 'context': None}},
+        {'services_test_mock_model':
+            {'foo': 'bar1', 'code': 'f1', 'context': None}},
+        {'services_test_mock_model':
+            {'foo': 'bar2', 'code': 'f2', 'context': None}},
+        {'services_test_mock_model':
+            {'foo': 'bar3', 'code': 'f3', 'context': None}},
+        {'services_test_mock_model':
+            {'foo': 'bar4', 'code': 'f4', 'context': None}},
+    ])
+    self.client.get("/login")
+    response = self.client.post(
+        self.mock_url() + "?__chunk_size=2",
+        content_type='application/json',
+        data=data,
+        headers=self.headers(),
+    )
+
+    self.assertStatus(response, 207)
+    self.assertIn("X-Flash-Error", response.headers)
+    self.assertEqual([201, 400, 201, 201, 201],
+                     [i[0] for i in response.json])
+    response = self.client.get(self.mock_url(), headers=self.headers())
+    self.assert200(response)
+    self.assertEqual(
+        ['bar1', 'bar2', 'bar3', 'bar4'],
+        sorted(model['foo'] for model in
+               response.json['test_model_collection']['test_model']))
+
+  def test_chunk_fails_after_commit(self):
+    """Test committed chunks are not posted again when later steps fail."""
+    data = json.dumps([
+        {'services_test_mock_model':
+            {'foo': 'bar1', 'code': 'f1', 'context': None}},
+        {'services_test_mock_model':
+            {'foo': 'bar2', 'code': 'f2', 'context': None}},
+    ])
+    self.client.get("/login")
+    with patch("ggrc.services.common.update_index",
+               side_effect=Exception("index failure")):
+      response = self.client.post(
+          self.mock_url() + "?__chunk_size=2",
+          content_type='application/json',
+          data=data,
+          headers=self.headers(),
+      )
+
+    self.assert200(response)
+    self.assertEqual([201, 201], [i[0] for i in response.json])
+    response = self.client.get(self.mock_url(), headers=self.headers())
+    self.assert200(response)
+    self.assertEqual(
+        ['bar1', 'bar2'],
+        sorted(model['foo'] for model in
+               response.json['test_model_collection']['test_model']))
+
+  def test_fails_after_commit(self):
+    """Test failures after commit are errors of a collection post."""
+    data = json.dumps([
+        {'services_test_mock_model':
+            {'foo': 'bar1', 'code': 'f1', 'context': None}},
+    ])
+    self.client.get("/login")
+    with patch("ggrc.services.common.update_index",
+               side_effect=Exception("index failure")):
+      response = self.client.post(
+          self.mock_url(),
+          content_type='application/json',
+          data=data,
+          headers=self.headers(),
+      )
+
+    self.assertStatus(response, 500)
+    self.assertIn("X-Flash-Error", response.headers)
+
+  def test_bad_chunk_size(self):
+    """Test chunked collection post with invalid chunk size."""
+    data = json.dumps(
+        [{'services_test_mock_model': {'foo': 'bar', 'context': None}}])
+    self.client.get("/login")
+    response = self.client.post(
+        self.mock_url() + "?__chunk_size=many",
+        content_type='application/json',
+        data=data,
+        headers=self.headers(),
+    )
+    self.assert400(response)
+
   def test_post_bad_request(self):
     """Test collection post with invalid content."""
     response = self.client.post(
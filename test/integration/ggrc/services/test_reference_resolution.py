@@ -0,0 +1,100 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Tests for resolving references of posted objects."""
+
+from ggrc.models import all_models
+from ggrc.utils import QueryCounter
+from integration.ggrc import TestCase
+from integration.ggrc.api_helper import Api
+from integration.ggrc.models import factories
+
+
+# Single valued person links of a control.
+CONTACTS = ("contact", "secondary_contact", "principal_assessor",
+            "secondary_assessor")
+
+
+def _point_lookups(counter):
+  """Count queries that look up a single linked person."""
+  return len([query for query in counter.queries
+              if "FROM people" in query and "people.id = %s" in query and
+              "LIMIT" in query])
+
+
+class TestReferenceResolution(TestCase):
+  """References are loaded with one query per type, not one per link."""
+
+  def setUp(self):
+    super(TestReferenceResolution, self).setUp()
+    self.api = Api()
+    self.people = [
+        factories.PersonFactory(
+            email=factories.random_string() + "@example.com")
+        for _ in range(2)
+    ]
+
+  def _control(self):
+    return {
+        "control": {
+            "title": factories.random_string(),
+            "context": None,
+            "contact": {"id": self.people[0].id, "type": "Person"},
+            "secondary_contact": {"id": self.people[1].id, "type": "Person"},
+            "owners": [{"id": person.id, "type": "Person"}
+                       for person in self.people],
+        }
+    }
+
+  def _post_controls(self, count):
+    """Post controls and count point lookups of people."""
+    with QueryCounter() as counter:
+      response = self.api.post(all_models.Control,
+                               [self._control() for _ in range(count)])
+    self.assert200(response)
+    return _point_lookups(counter)
+
+  def test_collection_post_lookups(self):
+    """Lookups of referenced people do not grow with posted objects."""
+    few_lookups = self._post_controls(2)
+    many_lookups = self._post_controls(10)
+    self.assertEqual(many_lookups, few_lookups)
+
+    controls = all_models.Control.query.all()
+    self.assertEqual(len(controls), 12)
+    for control in controls:
+      self.assertEqual(control.contact_id, self.people[0].id)
+      self.assertEqual(control.secondary_contact_id, self.people[1].id)
+      self.assertEqual({owner.id for owner in control.owners},
+                       {person.id for person in self.people})
+
+  def _put_contacts(self, count):
+    """Put a control with count people links and count point lookups."""
+    people = [factories.PersonFactory(
+        email=factories.random_string() + "@example.com")
+        for _ in range(count)]
+    control = factories.ControlFactory()
+    response = self.api.get(all_models.Control, control.id)
+    self.assert200(response)
+    data = response.json
+    for attr, person in zip(CONTACTS, people):
+      data["control"][attr] = {"id": person.id, "type": "Person"}
+    headers = {
+        "If-Match": response.headers.get("Etag"),
+        "If-Unmodified-Since": response.headers.get("Last-Modified"),
+    }
+    with QueryCounter() as counter:
+      response = self.api.send_request(
+          self.api.tc.put, control, data, headers=headers,
+          api_link=self.api.api_link(control, control.id))
+    self.assert200(response)
+    control = all_models.Control.query.get(control.id)
+    for attr, person in zip(CONTACTS, people):
+      self.assertEqual(getattr(control, attr).id, person.id)
+    return _point_lookups(counter)
+
+  def test_put_lookups(self):
+    """Lookups of referenced people do not grow with links of a PUT."""
+    few_lookups = self._put_contacts(1)
+    many_lookups = self._put_contacts(len(CONTACTS))
+    self.assertEqual(many_lookups, few_lookups)
@@ -70,3 +70,25 @@ class TestResource(TestCase):
     entries = self.search("Control", relevant_objects=ids)
     self.assertEqual({entry["id"] for entry in entries},
                      {self.objects[2].id})
+
+  def test_search_pages(self):
+    """Test walking through search results with a cursor."""
+    ids = []
+    cursor = None
+    for _ in range(3):
+      query = "/search?q=&types=Control&__limit=2"
+      if cursor:
+        query += "&__cursor=Control:{}".format(cursor)
+      results = self.client.get(query).json["results"]
+      ids.extend(entry["id"] for entry in results["entries"])
+      cursor = results["cursors"].get("Control")
+    self.assertIsNone(cursor)
+    self.assertEqual(ids, sorted(obj.id for obj in self.objects))
+
+  def test_counts_invalidation(self):
+    """Test that cached counts change when objects are added."""
+    res, _ = self.api.search("Control", counts=True)
+    self.assertEqual(res.json["results"]["counts"]["Control"], 5)
+    self.object_generator.generate_object(Control)
+    res, _ = self.api.search("Control", counts=True)
+    self.assertEqual(res.json["results"]["counts"]["Control"], 6)
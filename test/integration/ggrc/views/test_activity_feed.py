@@ -0,0 +1,76 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Tests for the activity feed."""
+
+from ggrc.models import all_models
+from integration.ggrc import TestCase
+from integration.ggrc.api_helper import Api
+from integration.ggrc.generator import ObjectGenerator
+
+
+class TestActivityFeed(TestCase):
+  """The feed serves revision summaries page by page."""
+
+  URL = "/activity_feed"
+
+  def setUp(self):
+    TestCase.setUp(self)
+    self.api = Api()
+    self.generator = ObjectGenerator()
+    self.client.get("/login")
+    _, self.control = self.generator.generate_object(
+        all_models.Control, {"title": "feed control"})
+    control = all_models.Control.query.get(self.control.id)
+    self.api.modify_object(control, {"description": "new description"})
+
+  def _get(self, **args):
+    args.setdefault("object_type", "Control")
+    args.setdefault("object_id", self.control.id)
+    response = self.client.get(self.URL, query_string=args)
+    self.assert200(response)
+    return response.json
+
+  def test_object_feed(self):
+    """Revisions of an object have titles and changed fields."""
+    feed = self._get()
+    self.assertIsNone(feed["next_cursor"])
+    self.assertEqual([item["action"] for item in feed["items"]],
+                     ["modified", "created"])
+    modified, created = feed["items"]
+    self.assertEqual(modified["title"], "feed control")
+    self.assertIn("description", modified["changed_fields"])
+    self.assertNotIn("title", modified["changed_fields"])
+    self.assertIsNone(created["changed_fields"])
+    self.assertEqual(modified["object"],
+                     {"type": "Control", "id": self.control.id})
+    self.assertIsNotNone(modified["actor"]["email"])
+    self.assertNotIn("content", modified)
+
+  def test_pages(self):
+    """Cursors return the following pages without repeating items."""
+    first = self._get(limit=1)
+    self.assertEqual(len(first["items"]), 1)
+    self.assertIsNotNone(first["next_cursor"])
+    second = self._get(limit=1, cursor=first["next_cursor"])
+    self.assertEqual(len(second["items"]), 1)
+    self.assertIsNone(second["next_cursor"])
+    self.assertEqual(
+        [first["items"][0]["action"], second["items"][0]["action"]],
+        ["modified", "created"])
+
+  def test_filters(self):
+    """Feeds are filtered by person and time range."""
+    actor_id = self._get()["items"][0]["actor"]["id"]
+    self.assertEqual(len(self._get(person_id=actor_id)["items"]), 2)
+    self.assertEqual(self._get(person_id=actor_id + 1000)["items"], [])
+    self.assertEqual(self._get(until="2000-01-01")["items"], [])
+    self.assertEqual(len(self._get(since="2000-01-01")["items"]), 2)
+
+  def test_bad_arguments(self):
+    """Invalid arguments are rejected."""
+    response = self.client.get(self.URL, query_string={"cursor": "nope"})
+    self.assert400(response)
+    response = self.client.get(self.URL,
+                               query_string={"object_type": "Control"})
+    self.assert400(response)
@@ -0,0 +1,115 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Tests for bulk assessment generation."""
+
+import json
+
+from sqlalchemy import and_
+from sqlalchemy import or_
+
+from ggrc.models import all_models
+from ggrc.utils import QueryCounter
+from integration.ggrc import TestCase
+from integration.ggrc.models import factories
+
+
+class TestAssessmentGeneration(TestCase):
+  """Assessments of many objects are generated with one request."""
+
+  URL = "/api/assessments/generate"
+
+  def setUp(self):
+    super(TestAssessmentGeneration, self).setUp()
+    self.client.get("/login")
+    self.lead = factories.PersonFactory(
+        email=factories.random_string() + "@example.com")
+    self.audit = factories.AuditFactory(contact=self.lead)
+    self.template = factories.AssessmentTemplateFactory(
+        test_plan_procedure=True,
+        default_people={"assessors": "Object Owners",
+                        "verifiers": "Audit Lead"},
+    )
+    for title in ("first", "second"):
+      factories.CustomAttributeDefinitionFactory(
+          title=title,
+          definition_type="assessment_template",
+          definition_id=self.template.id,
+      )
+
+  def _generate(self, objects, audit_id=None):
+    data = {
+        "audit": {"type": "Audit", "id": audit_id or self.audit.id},
+        "template": {"type": "AssessmentTemplate", "id": self.template.id},
+        "objects": objects,
+    }
+    return self.client.post(self.URL, data=json.dumps(data),
+                            content_type="application/json",
+                            headers=[("X-Requested-By", "Unit Tests")])
+
+  def _controls(self, count):
+    return [{"type": "Control", "id": factories.ControlFactory(
+        test_plan="plan {}".format(index)).id} for index in range(count)]
+
+  def test_generate(self):
+    """Every object gets an assessment or an error."""
+    controls = self._controls(2)
+    response = self._generate(controls + [
+        {"type": "Control", "id": 0},
+        controls[0],
+    ])
+    self.assert200(response)
+    results = response.json["results"]
+    self.assertEqual([result["status"] for result in results],
+                     [201, 201, 404, 400])
+
+    for control, result in zip(controls, results):
+      assessment = all_models.Assessment.query.get(
+          result["assessment"]["id"])
+      control = all_models.Control.query.get(control["id"])
+      self.assertEqual(assessment.test_plan, control.test_plan)
+      self.assertEqual(assessment.title, u"{} assessment for {}".format(
+          control.title, self.audit.title))
+      self.assertTrue(assessment.slug.startswith("ASSESSMENT-"))
+      self.assertEqual(
+          sorted(cad.title for cad in assessment.custom_attribute_definitions),
+          ["first", "second"])
+      self.assertEqual(
+          {obj.type for obj in assessment.related_objects()},
+          {"Control", "Audit", "Person"})
+      assignees = {person.id: set(types)
+                   for person, types in assessment.assignees}
+      self.assertEqual(assignees[self.lead.id], {"Verifier"})
+      self.assertEqual(len(assignees), 2)
+
+      rel = all_models.Relationship
+      relationship_ids = [relationship.id for relationship in
+                          rel.query.filter(or_(
+                              and_(rel.source_type == assessment.type,
+                                   rel.source_id == assessment.id),
+                              and_(rel.destination_type == assessment.type,
+                                   rel.destination_id == assessment.id)))]
+      self.assertEqual(len(relationship_ids), 4)
+      revisions = all_models.Revision.query.filter(
+          all_models.Revision.resource_type == "Relationship",
+          all_models.Revision.resource_id.in_(relationship_ids))
+      self.assertEqual(revisions.count(), len(relationship_ids))
+
+  def test_lookups(self):
+    """Lookups of the audit, template and objects do not grow."""
+    def lookups(count):
+      controls = self._controls(count)
+      with QueryCounter() as counter:
+        response = self._generate(controls)
+      self.assert200(response)
+      return len([query for query in counter.queries
+                  if "FROM audits" in query or
+                  "FROM assessment_templates" in query or
+                  "FROM controls" in query])
+    self.assertEqual(lookups(2), lookups(8))
+    self.assertEqual(all_models.Assessment.query.count(), 10)
+
+  def test_missing_audit(self):
+    """Generating assessments of a missing audit fails as a whole."""
+    response = self._generate(self._controls(1), audit_id=-1)
+    self.assert404(response)
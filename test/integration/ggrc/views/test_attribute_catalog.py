@@ -0,0 +1,46 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Tests for the attribute definition catalog."""
+
+import json
+
+from integration.ggrc import TestCase
+from integration.ggrc.models import factories
+
+
+class TestAttributeCatalog(TestCase):
+  """Catalog entries are cached by version and served with ETags."""
+
+  URL = "/attribute_catalog/custom_attributes"
+
+  def setUp(self):
+    TestCase.setUp(self)
+    self.client.get("/login")
+
+  def test_etag(self):
+    """Unchanged entries are not sent again."""
+    response = self.client.get(self.URL)
+    self.assert200(response)
+    etag = response.headers["Etag"]
+
+    response = self.client.get(self.URL, headers={"If-None-Match": etag})
+    self.assertStatus(response, 304)
+
+  def test_new_definition(self):
+    """Adding a custom attribute definition changes the entry."""
+    response = self.client.get(self.URL)
+    etag = response.headers["Etag"]
+
+    factories.CustomAttributeDefinitionFactory(
+        title="catalog attribute", definition_type="control")
+
+    response = self.client.get(self.URL, headers={"If-None-Match": etag})
+    self.assert200(response)
+    self.assertNotEqual(response.headers["Etag"], etag)
+    titles = [attr["title"] for attr in json.loads(response.data)]
+    self.assertIn("catalog attribute", titles)
+
+  def test_unknown_entry(self):
+    response = self.client.get("/attribute_catalog/unknown")
+    self.assert404(response)
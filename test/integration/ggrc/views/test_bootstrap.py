@@ -0,0 +1,82 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Tests for the page bootstrap parts."""
+
+from datetime import timedelta
+
+from ggrc import db
+from ggrc.models import all_models
+from ggrc.utils import QueryCounter
+from ggrc.views import bootstrap
+from integration.ggrc import TestCase
+from integration.ggrc.models import factories
+
+
+class TestBootstrap(TestCase):
+  """Bootstrap parts are versioned by content and cached."""
+
+  def setUp(self):
+    TestCase.setUp(self)
+    bootstrap.FULL_USERS.invalidate()
+    self.client.get("/login")
+
+  def _manifest(self):
+    response = self.client.get("/bootstrap")
+    self.assert200(response)
+    return response.json
+
+  def test_versioned_part(self):
+    """Parts are served with their hash as ETag."""
+    part = self._manifest()["permissions"]
+    response = self.client.get(part["url"])
+    self.assert200(response)
+    self.assertTrue(response.data.startswith("GGRC.permissions = "))
+    self.assertEqual(response.headers["Etag"],
+                     '"{}.js"'.format(part["hash"]))
+    self.assertIn("max-age", response.headers["Cache-Control"])
+
+    response = self.client.get("/bootstrap/permissions")
+    self.assertEqual(response.headers["Etag"], '"{}"'.format(part["hash"]))
+    self.assertIn("no-cache", response.headers["Cache-Control"])
+    response = self.client.get(
+        "/bootstrap/permissions",
+        headers={"If-None-Match": response.headers["Etag"]})
+    self.assertStatus(response, 304)
+
+  def test_full_user(self):
+    """The full user is rebuilt only when the user changes."""
+    with QueryCounter() as building:
+      first = self._manifest()["full_user"]["hash"]
+    with QueryCounter() as cached:
+      self.assertEqual(self._manifest()["full_user"]["hash"], first)
+    self.assertLess(len(cached.queries), len(building.queries))
+
+    person = all_models.Person.query.filter_by(
+        email="user@example.com").one()
+    factories.RelationshipFactory(source=person,
+                                  destination=factories.ControlFactory())
+    self.assertNotEqual(self._manifest()["full_user"]["hash"], first)
+
+  def test_person_definitions(self):
+    """Changed person custom attribute definitions change the full user."""
+    definition = factories.CustomAttributeDefinitionFactory(
+        title="person attribute", definition_type="person")
+    first = self._manifest()["full_user"]["hash"]
+
+    definition = all_models.CustomAttributeDefinition.query.get(
+        definition.id)
+    definition.title = "renamed person attribute"
+    # Update times are stored in seconds, make sure the edit gets a new one.
+    definition.updated_at = definition.updated_at + timedelta(seconds=1)
+    db.session.commit()
+    second = self._manifest()["full_user"]["hash"]
+    self.assertNotEqual(second, first)
+
+    db.session.delete(definition)
+    db.session.commit()
+    self.assertNotIn(self._manifest()["full_user"]["hash"], (first, second))
+
+  def test_unknown_part(self):
+    response = self.client.get("/bootstrap/unknown")
+    self.assert404(response)
@@ -0,0 +1,98 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Tests for starting recurring cycles in bulk."""
+
+from freezegun import freeze_time
+from mock import patch
+
+from ggrc.models import Notification
+from ggrc.models import Relationship
+from ggrc_workflows import cycle_generator
+from ggrc_workflows import models
+from ggrc_workflows import start_recurring_cycles
+from integration.ggrc import TestCase
+from integration.ggrc.generator import ObjectGenerator
+from integration.ggrc_workflows.generator import WorkflowsGenerator
+
+
+class TestCycleGenerator(TestCase):
+  """Tests for the nightly cycle generation job."""
+
+  def setUp(self):
+    TestCase.setUp(self)
+    self.wf_generator = WorkflowsGenerator()
+    self.object_generator = ObjectGenerator()
+    self.random_objects = self.object_generator.generate_random_objects(2)
+    _, self.person = self.object_generator.generate_person(
+        user_role="Administrator")
+
+  def _create_workflow(self, title):
+    person = {"id": self.person.id, "type": "Person"}
+    with freeze_time("2015-04-01"):
+      _, workflow = self.wf_generator.generate_workflow({
+          "title": title,
+          "frequency": "monthly",
+          "owners": [person],
+          "task_groups": [{
+              "title": "task group",
+              "contact": person,
+              "task_group_tasks": [{
+                  "title": "task",
+                  "contact": person,
+                  "relative_start_day": 10,
+                  "relative_end_day": 20,
+              }],
+              "task_group_objects": self.random_objects,
+          }],
+      })
+      _, workflow = self.wf_generator.activate_workflow(workflow)
+    return models.Workflow.query.get(workflow.id)
+
+  def test_start_recurring_cycles(self):
+    """Cycles, task relationships and notifications are created."""
+    workflow = self._create_workflow("workflow")
+    start_date = workflow.next_cycle_start_date
+
+    with freeze_time(start_date):
+      start_recurring_cycles()
+
+    workflow = models.Workflow.query.get(workflow.id)
+    self.assertEqual(len(workflow.cycles), 1)
+    self.assertGreater(workflow.next_cycle_start_date, start_date)
+    cycle_task = workflow.cycles[0].cycle_task_group_object_tasks[0]
+    for obj in self.random_objects:
+      self.assertIsNotNone(Relationship.find_related(cycle_task, obj))
+    notifications = Notification.query.filter(
+        Notification.object_type == cycle_task.type,
+        Notification.object_id == cycle_task.id,
+    ).count()
+    self.assertGreater(notifications, 0)
+
+  def test_failed_workflow_is_restartable(self):
+    """A failing workflow does not block other workflows in the chunk."""
+    workflow_1 = self._create_workflow("workflow 1")
+    workflow_2 = self._create_workflow("workflow 2")
+    start_date = workflow_1.next_cycle_start_date
+    build = cycle_generator._build_workflow_cycle
+
+    def failing_build(workflow, *args):
+      if workflow.id == workflow_1.id:
+        raise ValueError("test failure")
+      return build(workflow, *args)
+
+    with freeze_time(start_date):
+      with patch.object(cycle_generator, "_build_workflow_cycle",
+                        side_effect=failing_build):
+        with self.assertRaises(cycle_generator.CycleGenerationError):
+          start_recurring_cycles()
+
+      self.assertEqual(
+          len(models.Workflow.query.get(workflow_1.id).cycles), 0)
+      self.assertEqual(
+          len(models.Workflow.query.get(workflow_2.id).cycles), 1)
+
+      start_recurring_cycles()
+
+    self.assertEqual(len(models.Workflow.query.get(workflow_1.id).cycles), 1)
+    self.assertEqual(len(models.Workflow.query.get(workflow_2.id).cycles), 1)
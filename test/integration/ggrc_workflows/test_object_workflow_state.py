@@ -0,0 +1,74 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Tests for stored workflow states of objects mapped to cycle tasks."""
+
+from freezegun import freeze_time
+
+from ggrc import db
+from ggrc.models import all_models
+from ggrc_workflows.models import Cycle
+from ggrc_workflows.models import CycleTaskGroupObjectTask
+from ggrc_workflows.models import ObjectWorkflowState
+from ggrc_workflows.models import Workflow
+from ggrc_workflows.models import object_workflow_state
+from integration.ggrc import TestCase
+from integration.ggrc.generator import ObjectGenerator
+from integration.ggrc_workflows.generator import WorkflowsGenerator
+
+
+class TestObjectWorkflowState(TestCase):
+  """Workflow states are kept up to date when cycles and tasks change."""
+
+  def setUp(self):
+    TestCase.setUp(self)
+    self.generator = WorkflowsGenerator()
+    self.object_generator = ObjectGenerator()
+    _, self.control = self.object_generator.generate_object(
+        all_models.Control)
+
+  def _get_state(self):
+    control = all_models.Control.eager_query().get(self.control.id)
+    return control.workflow_state
+
+  def _start_workflow(self):
+    _, workflow = self.generator.generate_workflow({
+        "title": "one time workflow",
+        "task_groups": [{
+            "title": "task group",
+            "task_group_tasks": [{
+                "title": "task",
+                "start_date": "2016-06-06",
+                "end_date": "2016-06-17",
+            }],
+            "task_group_objects": [self.control],
+        }],
+    })
+    self.generator.generate_cycle(workflow)
+    self.generator.activate_workflow(workflow)
+    return db.session.query(CycleTaskGroupObjectTask).join(Cycle).join(
+        Workflow).filter(Workflow.id == workflow.id).one()
+
+  def test_state_follows_tasks(self):
+    """State changes with cycle creation and task status changes."""
+    with freeze_time("2016-06-10"):
+      self.assertIsNone(self._get_state())
+      cycle_task = self._start_workflow()
+      self.assertEqual(self._get_state(), "Assigned")
+
+      self.generator.modify_object(cycle_task, {"status": "InProgress"})
+      self.assertEqual(self._get_state(), "InProgress")
+
+    with freeze_time("2016-06-20"):
+      self.assertEqual(self._get_state(), "Overdue")
+
+  def test_rebuild(self):
+    """Rebuilding recreates missing states."""
+    with freeze_time("2016-06-10"):
+      self._start_workflow()
+      db.session.query(ObjectWorkflowState).delete()
+      db.session.commit()
+      self.assertIsNone(self._get_state())
+
+      object_workflow_state.rebuild()
+      self.assertEqual(self._get_state(), "Assigned")
@@ -0,0 +1,86 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Tests for stored open task counts of people."""
+
+from freezegun import freeze_time
+
+from ggrc import db
+from ggrc_workflows.models import Cycle
+from ggrc_workflows.models import CycleTaskGroupObjectTask
+from ggrc_workflows.models import PersonTaskCount
+from ggrc_workflows.models import Workflow
+from ggrc_workflows.models import person_task_count
+from integration.ggrc import TestCase
+from integration.ggrc.generator import ObjectGenerator
+from integration.ggrc_workflows.generator import WorkflowsGenerator
+
+
+class TestPersonTaskCount(TestCase):
+  """Task counts are kept up to date when cycles and tasks change."""
+
+  def setUp(self):
+    TestCase.setUp(self)
+    self.generator = WorkflowsGenerator()
+    self.object_generator = ObjectGenerator()
+
+  def _start_workflow(self):
+    _, workflow = self.generator.generate_workflow({
+        "title": "one time workflow",
+        "task_groups": [{
+            "title": "task group",
+            "task_group_tasks": [{
+                "title": "task",
+                "start_date": "2016-06-06",
+                "end_date": "2016-06-17",
+            }],
+        }],
+    })
+    self.generator.generate_cycle(workflow)
+    self.generator.activate_workflow(workflow)
+    return db.session.query(CycleTaskGroupObjectTask).join(Cycle).join(
+        Workflow).filter(Workflow.id == workflow.id).one()
+
+  def test_count_follows_tasks(self):
+    """Counts change with task status and assignee changes."""
+    with freeze_time("2016-06-10"):
+      cycle_task = self._start_workflow()
+      assignee_id = cycle_task.contact_id
+      self.assertEqual(person_task_count.get_count(assignee_id), 1)
+
+      _, person = self.object_generator.generate_person(
+          user_role="gGRC Admin")
+      cycle_task = CycleTaskGroupObjectTask.query.get(cycle_task.id)
+      self.generator.modify_object(
+          cycle_task, {"contact": {"id": person.id, "type": "Person"}})
+      self.assertEqual(person_task_count.get_count(assignee_id), 0)
+      self.assertEqual(person_task_count.get_count(person.id), 1)
+      self.assertEqual(PersonTaskCount.query.get(assignee_id).open_tasks, 0)
+
+      cycle_task = CycleTaskGroupObjectTask.query.get(cycle_task.id)
+      self.generator.modify_object(cycle_task, {"status": "Verified"})
+      self.assertEqual(person_task_count.get_count(person.id), 0)
+
+  def test_reconcile(self):
+    """Reconciling repairs counts that differ from the tasks."""
+    with freeze_time("2016-06-10"):
+      cycle_task = self._start_workflow()
+      db.session.query(PersonTaskCount).delete()
+      db.session.commit()
+      self.assertEqual(person_task_count.get_count(cycle_task.contact_id), 0)
+
+      self.assertEqual(person_task_count.reconcile(),
+                       {cycle_task.contact_id: (1, 0)})
+      self.assertEqual(person_task_count.get_count(cycle_task.contact_id), 1)
+      self.assertEqual(person_task_count.check_consistency(), {})
+
+  def test_api(self):
+    """The count of a person is served by the API."""
+    with freeze_time("2016-06-10"):
+      cycle_task = self._start_workflow()
+      self.client.get("/login")
+      response = self.client.get(
+          "/api/people/{}/task_count".format(cycle_task.contact_id))
+      self.assert200(response)
+      self.assertEqual(response.json, {"person_id": cycle_task.contact_id,
+                                       "open_tasks": 1})
@@ -0,0 +1,103 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Tests for set based cloning of workflows and task groups."""
+
+from ggrc.fulltext import person_objects
+from ggrc.models import all_models
+from ggrc_workflows.models import TaskGroup
+from ggrc_workflows.models import Workflow
+from integration.ggrc import TestCase
+from integration.ggrc.generator import ObjectGenerator
+from integration.ggrc_workflows.generator import WorkflowsGenerator
+
+
+class TestWorkflowCloner(TestCase):
+  """Cloned workflows get copies of task groups, tasks and objects."""
+
+  def setUp(self):
+    TestCase.setUp(self)
+    self.generator = WorkflowsGenerator()
+    self.object_generator = ObjectGenerator()
+    _, self.control = self.object_generator.generate_object(
+        all_models.Control)
+    _, self.workflow = self.generator.generate_workflow({
+        "title": "source workflow",
+        "task_groups": [{
+            "title": "task group {}".format(index),
+            "task_group_tasks": [{"title": "task 1"}, {"title": "task 2"}],
+            "task_group_objects": [self.control],
+        } for index in range(2)],
+    })
+
+  def _clone(self, **options):
+    options["clone"] = self.workflow.id
+    _, workflow = self.generator.generate_workflow(options)
+    return Workflow.query.get(workflow.id)
+
+  def test_clone_all(self):
+    """Task groups are copied with their tasks, objects and people."""
+    clone = self._clone(clone_tasks=True, clone_objects=True,
+                        clone_people=True)
+    source = Workflow.query.get(self.workflow.id)
+    self.assertEqual(
+        sorted(task_group.title for task_group in clone.task_groups),
+        ["task group 0", "task group 1"])
+    source_ids = {task_group.id for task_group in source.task_groups}
+    for task_group in clone.task_groups:
+      self.assertNotIn(task_group.id, source_ids)
+      self.assertEqual(task_group.context_id, clone.context_id)
+      self.assertEqual(task_group.contact_id, 1)
+      self.assertTrue(task_group.slug.startswith("TASKGROUP-"))
+      self.assertEqual(
+          sorted(task.title for task in task_group.task_group_tasks),
+          ["task 1", "task 2"])
+      for task in task_group.task_group_tasks:
+        self.assertTrue(task.slug.startswith("TASK-"))
+        self.assertEqual(task.context_id, clone.context_id)
+      self.assertEqual(
+          [(tgo.object_type, tgo.object_id)
+           for tgo in task_group.task_group_objects],
+          [("Control", self.control.id)])
+
+    task_ids = [task.id for task_group in clone.task_groups
+                for task in task_group.task_group_tasks]
+    revisions = all_models.Revision.query.filter(
+        all_models.Revision.resource_type == "TaskGroupTask",
+        all_models.Revision.resource_id.in_(task_ids),
+        all_models.Revision.action == "created",
+    ).count()
+    self.assertEqual(revisions, len(task_ids))
+
+    owned = {(type_, id_) for source, type_, id_
+             in person_objects.get_stored(1)
+             if source == person_objects.OWNED}
+    for task_group in clone.task_groups:
+      self.assertIn(("TaskGroup", task_group.id), owned)
+    for task_id in task_ids:
+      self.assertIn(("TaskGroupTask", task_id), owned)
+
+  def test_clone_task_groups_only(self):
+    """Without options only task groups are copied, without assignees."""
+    clone = self._clone()
+    self.assertEqual(len(clone.task_groups), 2)
+    for task_group in clone.task_groups:
+      self.assertIsNone(task_group.contact_id)
+      self.assertEqual(task_group.task_group_tasks, [])
+      self.assertEqual(task_group.task_group_objects, [])
+
+  def test_clone_task_group(self):
+    """A cloned task group gets copies of tasks and objects."""
+    source = Workflow.query.get(self.workflow.id).task_groups[0]
+    _, task_group = self.generator.generate_task_group(self.workflow, {
+        "clone": source.id,
+        "clone_tasks": True,
+        "clone_objects": True,
+    })
+    task_group = TaskGroup.query.get(task_group.id)
+    self.assertEqual(task_group.title, "{} (copy {})".format(
+        source.title, task_group.id))
+    self.assertEqual(len(task_group.task_group_tasks), 2)
+    self.assertEqual(len(task_group.task_group_objects), 1)
+    self.assertEqual(
+        {task.contact_id for task in task_group.task_group_tasks}, {1})
@@ -0,0 +1,94 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""
+ Nose plugin that fails tests whose requests exceed a query budget
+
+ Every request made by a test is audited with ggrc.utils.query_audit. If the
+ number of queries of a request is over the budget of its endpoint, the test
+ fails with the audit report, which lists repeated statements with the stacks
+ that issued them and lazy loads missing from eager queries.
+
+ Budgets are given by a JSON file mapping endpoints to numbers of queries,
+ where an endpoint is the request method and the url rule:
+
+   {"GET /api/controls": 20, "POST /api/relationships": 60}
+
+ Endpoints missing from the file get the default budget, if one is set.
+ Plugins can not be added to nosetests without installing them, so run the
+ tests through this module from the test directory:
+
+   python -m integration.query_budget integration --with-query-budget \\
+       --query-budget-file=budget.json --query-budget-default=100
+"""
+
+from __future__ import absolute_import
+
+import json
+import sys
+
+import nose
+from nose.plugins import Plugin
+
+
+class QueryBudget(Plugin):
+  """Fail tests with requests that run more queries than their budget."""
+
+  name = "query-budget"
+
+  def __init__(self):
+    super(QueryBudget, self).__init__()
+    self.budgets = {}
+    self.default = None
+    self.violations = []
+
+  def options(self, parser, env):
+    super(QueryBudget, self).options(parser, env)
+    parser.add_option(
+        "--query-budget-file", dest="query_budget_file", default=None,
+        help="JSON file with the number of queries allowed per endpoint.")
+    parser.add_option(
+        "--query-budget-default", dest="query_budget_default", type="int",
+        default=None, help="Number of queries allowed for other endpoints.")
+
+  def configure(self, options, conf):
+    super(QueryBudget, self).configure(options, conf)
+    if not self.enabled:
+      return
+    if options.query_budget_file:
+      with open(options.query_budget_file) as budget_file:
+        self.budgets = json.load(budget_file)
+    self.default = options.query_budget_default
+
+  def begin(self):
+    # pylint: disable=no-self-use
+    from ggrc.app import app
+    from ggrc.utils import query_audit
+    query_audit.add_handler(self.check_request)
+    query_audit.init_app(app)
+
+  def check_request(self, endpoint, auditor):
+    budget = self.budgets.get(endpoint, self.default)
+    if budget is not None and auditor.get > budget:
+      self.violations.append((endpoint, budget, auditor.report()))
+
+  def prepareTestCase(self, test):
+    """Run the test and add a failure if any request was over budget."""
+    # pylint: disable=invalid-name
+    def run(result):
+      self.violations = []
+      test.test(result)
+      if not self.violations:
+        return
+      message = "\n\n".join(
+          "{} is over its budget of {} queries:\n{}".format(*violation)
+          for violation in self.violations)
+      try:
+        raise AssertionError(message)
+      except AssertionError:
+        result.addFailure(test, sys.exc_info())
+    return run
+
+
+if __name__ == "__main__":
+  nose.main(addplugins=[QueryBudget()])
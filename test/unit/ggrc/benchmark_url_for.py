@@ -0,0 +1,64 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""
+ Benchmark for object URL generation
+
+ Generates links for a collection of 1000 in-memory objects, once by looking
+ up services and building URLs through Flask routing, and once with the URL
+ prefix table built at app init.
+
+ This module is not picked up by the default test run. Run it explicitly:
+
+   nosetests unit/ggrc/benchmark_url_for.py -s
+"""
+
+import time
+import unittest
+
+from ggrc import app
+from ggrc import utils
+from ggrc.models import all_models
+
+
+OBJECTS = 1000
+ROUNDS = 10
+
+
+def old_url_for(obj):
+  """URL generation as it was done before the prefix table."""
+  service = utils.service_for(obj)
+  return service.url_for(obj)
+
+
+def link(url_for, obj):
+  return {"id": obj.id, "type": obj.type, "href": url_for(obj),
+          "context_id": obj.context_id}
+
+
+class BenchmarkUrlFor(unittest.TestCase):
+  """Benchmark links for a collection of objects."""
+
+  def setUp(self):
+    models = [all_models.Control, all_models.Person, all_models.Program,
+              all_models.Relationship, all_models.Audit]
+    self.objects = [models[i % len(models)](id=i, context_id=None)
+                    for i in range(OBJECTS)]
+
+  def _time(self, url_for):
+    """Get links and the best time out of all rounds."""
+    best = None
+    for _ in range(ROUNDS):
+      start = time.time()
+      links = [link(url_for, obj) for obj in self.objects]
+      elapsed = time.time() - start
+      best = elapsed if best is None else min(best, elapsed)
+    return links, best
+
+  def test_links(self):
+    with app.app.test_request_context():
+      old_links, old_time = self._time(old_url_for)
+      new_links, new_time = self._time(utils.url_for)
+    self.assertEqual(old_links, new_links)
+    print "{} links: routing {:.4f}s, prefix table {:.4f}s".format(
+        OBJECTS, old_time, new_time)
@@ -0,0 +1,98 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""
+ Memory benchmark for reading and splitting imported csv files
+
+ Generates csv files made of control blocks of BLOCK_ROWS rows and measures
+ the peak memory of reading and splitting them into blocks, once with the
+ whole file read into a list of rows and once with the streaming reader.
+ The streaming reader only holds one block at a time, so its peak should not
+ depend on the size of the file. Row converters of a block are still built
+ for the whole block, so this does not measure a full import.
+
+ The largest generated file has GGRC_BENCHMARK_CSV_MB megabytes, 200 by
+ default. This module is not picked up by the default test run. Run it
+ explicitly:
+
+   nosetests unit/ggrc/converters/benchmark_csv_ingest.py -s
+"""
+
+import csv
+import os
+import resource
+import tempfile
+import unittest
+
+from ggrc import app  # noqa - this is neede for imports to work
+from ggrc.converters import import_helper
+
+
+SIZE_MB = int(os.environ.get("GGRC_BENCHMARK_CSV_MB", 200))
+BLOCK_ROWS = 10000
+
+
+def _write_csv(path, size_mb):
+  """Write blocks of controls until the file has size_mb megabytes."""
+  with open(path, "wb") as csv_file:
+    writer = csv.writer(csv_file)
+    block = 0
+    while csv_file.tell() < size_mb * 1024 * 1024:
+      writer.writerow(["Object type", "", "", ""])
+      writer.writerow(["Control", "Code", "Title", "Description"])
+      for i in range(BLOCK_ROWS):
+        writer.writerow(["", "CONTROL-{}-{}".format(block, i),
+                         "control {} {}".format(block, i),
+                         "description of the control " * 4])
+      writer.writerow([])
+      block += 1
+
+
+def _read_all(path):
+  offsets, blocks = import_helper.split_array(
+      import_helper.read_csv_file(path))
+  return sum(len(block) for block in blocks), len(offsets)
+
+
+def _read_streaming(path):
+  rows = blocks = 0
+  for _, block in import_helper.iter_blocks(import_helper.iter_csv_file(path)):
+    rows += len(block)
+    blocks += 1
+  return rows, blocks
+
+
+def _peak_memory(function, path):
+  """Get peak memory increase in MB of running function in a child process."""
+  read_end, write_end = os.pipe()
+  pid = os.fork()
+  if pid == 0:
+    os.close(read_end)
+    start = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    function(path)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    os.write(write_end, str(peak - start))
+    os._exit(0)  # pylint: disable=protected-access
+  os.close(write_end)
+  result = os.read(read_end, 64)
+  os.close(read_end)
+  os.waitpid(pid, 0)
+  return int(result) / 1024.0
+
+
+class BenchmarkCsvIngest(unittest.TestCase):
+  """Compare peak memory of reading csv files of growing sizes."""
+
+  def test_memory(self):
+    """Print peak memory for files of a quarter and all of SIZE_MB."""
+    for size_mb in (SIZE_MB / 4, SIZE_MB):
+      handle, path = tempfile.mkstemp(suffix=".csv")
+      os.close(handle)
+      try:
+        _write_csv(path, size_mb)
+        print "\n{} MB file".format(size_mb)
+        print "  read all:  {:8.1f} MB".format(_peak_memory(_read_all, path))
+        print "  streaming: {:8.1f} MB".format(
+            _peak_memory(_read_streaming, path))
+      finally:
+        os.remove(path)
@@ -7,6 +7,9 @@
 import unittest
 import copy
 import random
+from StringIO import StringIO
+
+import mock
 
 from ggrc import app  # noqa - this is neede for imports to work
 from ggrc.converters import import_helper
@@ -109,6 +112,78 @@ class TestSplitArry(unittest.TestCase):
     self.assertEqual(offests[2], 9)
 
 
+  def test_iterator(self):
+    """Test splitting blocks from a generator of lines."""
+    test_data = [
+        ["hello", "world"],
+        ["", ""],
+        ["hello", "world"],
+    ]
+    blocks = import_helper.iter_blocks(line for line in test_data)
+    self.assertEqual(next(blocks), (0, test_data[:1]))
+    self.assertEqual(list(blocks), [(2, test_data[2:])])
+
+
+class TestExtractRelevantData(unittest.TestCase):
+  """Tests for splitting a block into headers and rows."""
+
+  def test_empty_columns(self):
+    """Empty columns and the object type column are removed."""
+    block = [
+        [u"Object type", u"", u"", u""],
+        [u"Control", u" Code ", u"", u"Title"],
+        [u"", u"c-1", u"", u" title 1 "],
+        [u"", u"c-2", u"", u""],
+    ]
+    headers, rows = import_helper.extract_relevant_data(block)
+    self.assertEqual(headers, [u"Code", u"Title"])
+    self.assertEqual(rows, [[u"c-1", u"title 1"], [u"c-2", u""]])
+
+  def test_short_rows(self):
+    """Rows are cut to the length of the shortest row."""
+    block = [
+        [u"Object type"],
+        [u"Control", u"Code", u"Title"],
+        [u"", u"c-1"],
+    ]
+    headers, rows = import_helper.extract_relevant_data(block)
+    self.assertEqual(headers, [u"Code"])
+    self.assertEqual(rows, [[u"c-1"]])
+
+
+class TestReadCsvFile(unittest.TestCase):
+  """Tests for reading csv files with different encodings."""
+
+  def test_utf_8(self):
+    csv_file = StringIO(u"a,\u0161\n\u010d,d\n".encode("utf-8"))
+    self.assertEqual(import_helper.read_csv_file(csv_file),
+                     [[u"a", u"\u0161"], [u"\u010d", u"d"]])
+
+  def test_encoding_from_prefix(self):
+    """The encoding is detected once and used for the whole file."""
+    text = u"caf\u00e9,cr\u00e8me br\u00fbl\u00e9e\n" * 20
+    csv_file = StringIO(text.encode("latin-1"))
+    with mock.patch("ggrc.converters.import_helper.chardet.detect",
+                    return_value={"encoding": "latin-1"}) as detect:
+      rows = list(import_helper.iter_csv_file(csv_file))
+    self.assertEqual(detect.call_count, 1)
+    self.assertEqual(rows,
+                     [[u"caf\u00e9", u"cr\u00e8me br\u00fbl\u00e9e"]] * 20)
+
+  @mock.patch("ggrc.converters.import_helper.ENCODING_PREFIX_SIZE", 16)
+  def test_utf_8_after_prefix(self):
+    """Lines are decoded as utf-8 first, whatever the prefix encoding."""
+    latin = u"caf\u00e9,cr\u00e8me\n".encode("latin-1")
+    utf_8 = u"\u0161,\u010d\n".encode("utf-8")
+    csv_file = StringIO(latin * 2 + utf_8)
+    with mock.patch("ggrc.converters.import_helper.chardet.detect",
+                    return_value={"encoding": "latin-1"}):
+      rows = list(import_helper.iter_csv_file(csv_file))
+    self.assertEqual(rows, [[u"caf\u00e9", u"cr\u00e8me"]] * 2 +
+                     [[u"\u0161", u"\u010d"]])
+
+
+
 class TestColumnOrder(unittest.TestCase):
 
   """Tests for colum order function.
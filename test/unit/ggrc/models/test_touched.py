@@ -0,0 +1,42 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Tests for the registry of instances touched in a session."""
+
+import unittest
+
+from sqlalchemy.orm import Session
+
+from ggrc.models import touched
+
+
+class Instance(object):
+  pass
+
+
+class TestTouched(unittest.TestCase):
+  """Instances are recorded per session and key."""
+
+  def setUp(self):
+    self.session = Session()
+
+  def test_pop(self):
+    """Popped instances are forgotten."""
+    obj = Instance()
+    touched.add("key", obj, self.session)
+    touched.add("key", obj, self.session)
+    self.assertEqual(touched.pop(self.session, "key"), [obj])
+    self.assertEqual(touched.pop(self.session, "key"), [])
+
+  def test_keys_and_sessions(self):
+    """Keys and sessions do not share instances."""
+    obj = Instance()
+    touched.add("key", obj, self.session)
+    self.assertEqual(touched.pop(self.session, "other"), [])
+    self.assertEqual(touched.pop(Session(), "key"), [])
+    self.assertEqual(touched.pop(self.session, "key"), [obj])
+
+  def test_weak_references(self):
+    """Released instances are dropped."""
+    touched.add("key", Instance(), self.session)
+    self.assertEqual(touched.pop(self.session, "key"), [])
@@ -0,0 +1,83 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Tests for pre-encoded JSON fragments of published resources."""
+
+import json
+import unittest
+
+from mock import MagicMock
+
+from ggrc.services import fragments
+
+
+class TestFragments(unittest.TestCase):
+  """Fragments are used as is only when everything in them is readable."""
+
+  def setUp(self):
+    self.resource = {
+        "type": "Control",
+        "id": 1,
+        "selfLink": "/api/controls/1",
+        "context": {"id": 3, "type": "Context"},
+        "owner": {"type": "Person", "id": 2, "context_id": None},
+        "title": u"control \u00e9",
+    }
+
+  def test_checks(self):
+    self.assertEqual(
+        sorted(fragments.get_checks(self.resource)),
+        [("Control", 1, 3), ("Person", 2, None)])
+
+  def test_round_trip(self):
+    entry = fragments.make_entry(self.resource)
+    self.assertTrue(fragments.is_entry(entry))
+    self.assertEqual(fragments.to_resource(entry), self.resource)
+    self.assertIs(fragments.to_entry(entry), entry)
+
+  def test_readable_fragment(self):
+    entry = fragments.make_entry(self.resource)
+    user_permissions = MagicMock()
+    user_permissions.is_allowed_read.return_value = True
+    self.assertEqual(
+        fragments.readable_fragment(entry, user_permissions, False),
+        entry[fragments.FRAGMENT_KEY])
+
+    user_permissions.is_allowed_read.side_effect = \
+        lambda type_, id_, context_id: type_ != "Person"
+    self.assertIsNone(
+        fragments.readable_fragment(entry, user_permissions, False))
+
+  def test_creator_relationships(self):
+    """Relationships of creators are always filtered."""
+    entry = fragments.make_entry({
+        "type": "Relationship", "id": 5, "context_id": None,
+        "source": {"type": "Control", "id": 1, "context_id": None},
+    })
+    user_permissions = MagicMock()
+    user_permissions.is_allowed_read.return_value = True
+    self.assertIsNone(
+        fragments.readable_fragment(entry, user_permissions, True))
+    self.assertIsNotNone(
+        fragments.readable_fragment(entry, user_permissions, False))
+
+  def test_collection_body(self):
+    parts = [fragments.make_entry(self.resource)[fragments.FRAGMENT_KEY],
+             json.dumps({"type": "Control", "id": 4})]
+    body = fragments.CollectionBody(
+        "controls_collection", "controls", "/api/controls", parts,
+        {"paging": {"count": 1}})
+    data = json.loads("".join(body))
+    collection = data["controls_collection"]
+    self.assertEqual(collection["selfLink"], "/api/controls")
+    self.assertEqual(collection["paging"], {"count": 1})
+    self.assertEqual(collection["controls"][0], self.resource)
+    self.assertEqual(collection["controls"][1]["id"], 4)
+    self.assertEqual(body.etag(), body.etag())
+
+  def test_empty_collection_body(self):
+    body = fragments.CollectionBody(
+        "controls_collection", "controls", "/api/controls", [])
+    self.assertEqual(json.loads("".join(body)),
+                     {"controls_collection": {"selfLink": "/api/controls",
+                                              "controls": []}})
@@ -0,0 +1,73 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Tests for the fulltext counts cache."""
+
+import unittest
+
+from freezegun import freeze_time
+from mock import Mock
+from mock import patch
+
+from ggrc.fulltext import counts_cache
+from ggrc.fulltext.counts_cache import CountsCache
+
+
+class TestCountsCache(unittest.TestCase):
+  """Counts are computed once per key until they expire."""
+
+  def setUp(self):
+    self.cache = CountsCache(timeout=30)
+    self.calls = 0
+
+  def compute(self):
+    self.calls += 1
+    return [("Control", self.calls, "")]
+
+  def test_key(self):
+    key = CountsCache.make_key(1, "a", ["Program", "Control"],
+                               extra_params={"Audit": {"status": "x"}})
+    self.assertEqual(
+        key, CountsCache.make_key(1, "a", ["Control", "Program"],
+                                  extra_params={"Audit": {"status": "x"}}))
+    self.assertNotEqual(key, CountsCache.make_key(2, "a", ["Control"]))
+    hash(key)
+
+  def test_expiry(self):
+    key = CountsCache.make_key(1, "a")
+    with freeze_time("2016-01-01 10:00:00"):
+      self.assertEqual(self.cache.get(key, self.compute)[0][1], 1)
+      self.assertEqual(self.cache.get(key, self.compute)[0][1], 1)
+    with freeze_time("2016-01-01 10:01:00"):
+      self.assertEqual(self.cache.get(key, self.compute)[0][1], 2)
+
+  def test_invalidate(self):
+    key = CountsCache.make_key(1, "a")
+    self.cache.get(key, self.compute)
+    self.cache.invalidate()
+    self.cache.get(key, self.compute)
+    self.assertEqual(self.calls, 2)
+
+  def test_disabled(self):
+    cache = CountsCache(timeout=0)
+    key = CountsCache.make_key(1, "a")
+    cache.get(key, self.compute)
+    cache.get(key, self.compute)
+    self.assertEqual(self.calls, 2)
+
+  def test_invalidate_after_commit(self):
+    """Counts are dropped when a transaction that changed the index ends."""
+    key = CountsCache.make_key(1, "a")
+    session = Mock(info={})
+    with patch.object(counts_cache, "COUNTS_CACHE", self.cache):
+      self.cache.get(key, self.compute)
+      counts_cache.invalidate_changed(session)
+      self.cache.get(key, self.compute)
+      self.assertEqual(self.calls, 1)
+
+      counts_cache.invalidate_after_commit(session)
+      self.cache.get(key, self.compute)
+      self.assertEqual(self.calls, 1)
+      counts_cache.invalidate_changed(session)
+      self.cache.get(key, self.compute)
+      self.assertEqual(self.calls, 2)
@@ -0,0 +1,86 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Tests for the query auditor."""
+
+import unittest
+
+import sqlalchemy
+from sqlalchemy import orm
+from sqlalchemy.ext.declarative import declarative_base
+
+from ggrc.utils import query_audit
+
+
+Base = declarative_base()  # pylint: disable=invalid-name
+
+
+class Parent(Base):  # pylint: disable=too-few-public-methods
+  __tablename__ = "parents"
+  id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True)
+  children = orm.relationship("Child")
+
+
+class Child(Base):  # pylint: disable=too-few-public-methods
+  __tablename__ = "children"
+  id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True)
+  parent_id = sqlalchemy.Column(sqlalchemy.ForeignKey("parents.id"))
+
+
+class TestFingerprint(unittest.TestCase):
+  """Statements differing only in parameters have the same fingerprint."""
+
+  def test_literals(self):
+    self.assertEqual(
+        query_audit.fingerprint("SELECT a FROM t WHERE b = 'x''y' AND c = 12"),
+        query_audit.fingerprint("SELECT a FROM t WHERE b = 'z' AND c = 3.5"),
+    )
+
+  def test_parameter_lists(self):
+    self.assertEqual(
+        query_audit.fingerprint("SELECT a FROM t WHERE b IN (%s, %s, %s)"),
+        "SELECT a FROM t WHERE b IN (?+)",
+    )
+
+  def test_identifiers(self):
+    self.assertEqual(
+        query_audit.fingerprint("SELECT anon_1.id  FROM\n  t1 AS anon_1"),
+        "SELECT anon_1.id FROM t1 AS anon_1",
+    )
+
+
+class TestQueryAuditor(unittest.TestCase):
+  """Repeated statements and lazy loads are recorded."""
+
+  def setUp(self):
+    engine = sqlalchemy.create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    engine.execute(Parent.__table__.insert(), [{"id": i} for i in range(3)])
+    engine.execute(Child.__table__.insert(),
+                   [{"parent_id": i} for i in range(3) for _ in range(2)])
+    self.session = orm.sessionmaker(bind=engine)()
+
+  def test_lazy_loads(self):
+    """Loading children of every parent is reported."""
+    with query_audit.QueryAuditor() as auditor:
+      for parent in self.session.query(Parent):
+        self.assertEqual(len(parent.children), 2)
+
+    self.assertEqual(auditor.get, 4)
+    self.assertEqual(auditor.lazy_loads(), {("Parent", "children"): 3})
+    repeated = auditor.repeated()
+    self.assertEqual([len(statements) for statements in repeated.values()],
+                     [3])
+    self.assertIn("3 lazy loads of Parent.children", auditor.report())
+
+  def test_eager_loads(self):
+    """Eager loaded relationships are not reported."""
+    with query_audit.QueryAuditor() as auditor:
+      parents = self.session.query(Parent).options(
+          orm.subqueryload(Parent.children))
+      for parent in parents:
+        self.assertEqual(len(parent.children), 2)
+
+    self.assertEqual(auditor.get, 2)
+    self.assertEqual(auditor.lazy_loads(), {})
+    self.assertEqual(auditor.repeated(), {})
@@ -0,0 +1,126 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""
+ Benchmark for workflow cycle calculators
+
+ Builds calculators of all five types for a large number of in-memory
+ workflows and computes next cycle start dates and task date ranges, once
+ with an empty schedule cache and once with a warm one. Date adjustment
+ with the precomputed business day calendar is compared with walking back
+ day by day.
+
+ This module is not picked up by the default test run. Run it explicitly:
+
+   nosetests unit/ggrc_workflows/services/benchmark_cycle_calculator.py -s
+"""
+
+import collections
+import datetime
+import random
+import time
+import unittest
+
+from ggrc import app  # noqa #pylint: disable=unused-import
+from ggrc_workflows.services import workflow_cycle_calculator
+from ggrc_workflows.services.workflow_cycle_calculator import cycle_calculator
+
+
+WORKFLOWS = 2000
+TASKS_PER_WORKFLOW = 10
+BASE_DATE = datetime.date(2016, 1, 4)
+
+Task = collections.namedtuple("Task", [
+    "id", "relative_start_month", "relative_start_day",
+    "relative_end_month", "relative_end_day", "start_date", "end_date",
+])
+TaskGroup = collections.namedtuple("TaskGroup", ["task_group_tasks"])
+Workflow = collections.namedtuple("Workflow", [
+    "id", "frequency", "task_groups"])
+
+
+def make_task(task_id, frequency):
+  """Create a task with random relative days valid for the frequency."""
+  start_month = end_month = None
+  start_date = end_date = None
+  if frequency == "weekly":
+    start_day, end_day = random.randint(1, 5), random.randint(1, 5)
+  elif frequency == "monthly":
+    start_day, end_day = random.randint(1, 28), random.randint(1, 28)
+  elif frequency == "quarterly":
+    start_month, end_month = random.randint(1, 3), random.randint(1, 3)
+    start_day, end_day = random.randint(1, 28), random.randint(1, 28)
+  elif frequency == "annually":
+    start_month, end_month = random.randint(1, 12), random.randint(1, 12)
+    start_day, end_day = random.randint(1, 28), random.randint(1, 28)
+  else:
+    start_day = end_day = None
+    start_date = BASE_DATE + datetime.timedelta(days=random.randint(0, 30))
+    end_date = start_date + datetime.timedelta(days=random.randint(0, 30))
+  return Task(task_id, start_month, start_day, end_month, end_day,
+              start_date, end_date)
+
+
+def make_workflows():
+  frequencies = ["one_time", "weekly", "monthly", "quarterly", "annually"]
+  workflows = []
+  for workflow_id in range(1, WORKFLOWS + 1):
+    frequency = frequencies[workflow_id % len(frequencies)]
+    tasks = [make_task(workflow_id * TASKS_PER_WORKFLOW + i, frequency)
+             for i in range(TASKS_PER_WORKFLOW)]
+    workflows.append(Workflow(workflow_id, frequency, [TaskGroup(tasks)]))
+  return workflows
+
+
+def walk_back(holidays, ddate):
+  """Date adjustment as it was done before the business day calendar."""
+  while ddate.isoweekday() > 5 or ddate in holidays:
+    ddate = ddate - datetime.timedelta(days=1)
+  return ddate
+
+
+class BenchmarkCycleCalculator(unittest.TestCase):
+  """Benchmark calculators for many workflows."""
+
+  def setUp(self):
+    random.seed(42)
+    self.workflows = make_workflows()
+
+  def _calculate(self):
+    for workflow in self.workflows:
+      calculator = workflow_cycle_calculator.get_cycle_calculator(
+          workflow, base_date=BASE_DATE)
+      calculator.workflow_date_range()
+      for task in calculator.tasks:
+        calculator.task_date_range(task, base_date=BASE_DATE)
+      calculator.next_cycle_start_date(base_date=BASE_DATE)
+
+  def test_calculators(self):
+    """Time calculators with a cold and a warm schedule cache."""
+    cycle_calculator.SCHEDULE_CACHE.invalidate()
+    start = time.time()
+    self._calculate()
+    cold = time.time() - start
+    start = time.time()
+    self._calculate()
+    warm = time.time() - start
+    print "{} workflows: cold cache {:.4f}s, warm cache {:.4f}s".format(
+        len(self.workflows), cold, warm)
+
+  def test_adjust_date(self):
+    """Compare calendar lookups with walking back day by day."""
+    holidays = cycle_calculator.CycleCalculator.HOLIDAYS
+    calculator = workflow_cycle_calculator.get_cycle_calculator(
+        self.workflows[1], base_date=BASE_DATE)
+    dates = [BASE_DATE + datetime.timedelta(days=i) for i in range(3650)]
+
+    start = time.time()
+    walked = [walk_back(holidays, ddate) for ddate in dates]
+    walk_time = time.time() - start
+    start = time.time()
+    adjusted = [calculator.adjust_date(ddate) for ddate in dates]
+    calendar_time = time.time() - start
+
+    self.assertEqual(walked, adjusted)
+    print "adjust {} dates: walking {:.4f}s, calendar {:.4f}s".format(
+        len(dates), walk_time, calendar_time)
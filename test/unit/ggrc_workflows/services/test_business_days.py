@@ -0,0 +1,74 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Tests for the precomputed business day calendar."""
+
+import datetime
+import unittest
+
+from ggrc import app  # noqa #pylint: disable=unused-import
+from ggrc_workflows.services.workflow_cycle_calculator import business_days
+from ggrc_workflows.services.workflow_cycle_calculator import google_holidays
+
+
+def walk_back(holidays, ddate):
+  """Reference implementation of finding the previous workday."""
+  while ddate.isoweekday() > 5 or ddate in holidays:
+    ddate = ddate - datetime.timedelta(days=1)
+  return ddate
+
+
+class TestBusinessDayCalendar(unittest.TestCase):
+  """Tests for BusinessDayCalendar."""
+
+  def setUp(self):
+    self.holidays = google_holidays.GoogleHolidays()
+    self.calendar = business_days.BusinessDayCalendar(
+        self.holidays, 2015, 2016)
+
+  def test_previous_work_day(self):
+    """Precomputed lookups match walking back day by day."""
+    ddate = datetime.date(2015, 1, 1)
+    while ddate.year < 2018:
+      self.assertEqual(self.calendar.previous_work_day(ddate),
+                       walk_back(self.holidays, ddate))
+      ddate += datetime.timedelta(days=1)
+
+  def test_holidays(self):
+    """Weekends and holidays are skipped."""
+    # Christmas 2015 is on Friday, 23rd and 24th are Google holidays.
+    self.assertEqual(
+        self.calendar.previous_work_day(datetime.date(2015, 12, 27)),
+        datetime.date(2015, 12, 22))
+    self.assertFalse(self.calendar.is_work_day(datetime.date(2015, 12, 24)))
+    self.assertTrue(self.calendar.is_work_day(datetime.date(2015, 12, 22)))
+
+  def test_first_day_of_range(self):
+    """Days before the first workday of the range are still adjusted."""
+    self.assertEqual(
+        self.calendar.previous_work_day(datetime.date(2015, 1, 1)),
+        datetime.date(2014, 12, 30))
+
+  def test_nth_work_day(self):
+    """N-th workday is counted on both sides of a date."""
+    friday = datetime.date(2015, 6, 19)
+    saturday = datetime.date(2015, 6, 20)
+    self.assertEqual(self.calendar.nth_work_day(friday, 1), friday)
+    self.assertEqual(self.calendar.nth_work_day(friday, 2),
+                     datetime.date(2015, 6, 22))
+    self.assertEqual(self.calendar.nth_work_day(saturday, 1),
+                     datetime.date(2015, 6, 22))
+    self.assertEqual(self.calendar.nth_work_day(saturday, -1), friday)
+    self.assertEqual(self.calendar.nth_work_day(friday, -2),
+                     datetime.date(2015, 6, 18))
+    with self.assertRaises(ValueError):
+      self.calendar.nth_work_day(friday, 0)
+
+  def test_outside_of_range(self):
+    """Dates outside of the precomputed range fall back to walking."""
+    self.assertEqual(
+        self.calendar.nth_work_day(datetime.date(2016, 12, 30), 2),
+        datetime.date(2017, 1, 3))
+    self.assertEqual(
+        self.calendar.previous_work_day(datetime.date(2017, 12, 25)),
+        datetime.date(2017, 12, 22))
@@ -0,0 +1,91 @@
+# Copyright (C) 2016 Google Inc.
+# Licensed under http://www.apache.org/licenses/LICENSE-2.0 <see LICENSE file>
+
+"""Tests for computing propagated cycle statuses."""
+
+import unittest
+
+from mock import MagicMock
+from mock import patch
+from sqlalchemy.orm import attributes
+
+from ggrc import app  # noqa #pylint: disable=unused-import
+from ggrc.models.cache import Cache
+from ggrc_workflows import models
+from ggrc_workflows.status_propagation import StatusPropagation
+
+
+def make_cycle(statuses, kind=None):
+  """Build an in-memory cycle with a task group for each list of statuses."""
+  workflow = models.Workflow(kind=kind)
+  cycle = models.Cycle(workflow=workflow, status="Assigned")
+  for group_statuses in statuses:
+    group = models.CycleTaskGroup(cycle=cycle, status="Assigned")
+    for status in group_statuses:
+      models.CycleTaskGroupObjectTask(cycle_task_group=group, status=status)
+  return cycle
+
+
+@patch("ggrc_workflows.status_propagation.is_allowed_update",
+       return_value=True)
+class TestStatusPropagation(unittest.TestCase):
+  """Tests for StatusPropagation rules."""
+
+  def test_in_progress_goes_up(self, _):
+    """A task in progress moves its group and cycle to InProgress."""
+    cycle = make_cycle([["Assigned", "Assigned"], ["Assigned"]])
+    task = cycle.cycle_task_groups[0].cycle_task_group_tasks[0]
+    task.status = "InProgress"
+    propagation = StatusPropagation()
+    propagation.propagate_up(task)
+    self.assertEqual(
+        {(change.obj, change.new_status) for change in propagation.changes()},
+        {(cycle.cycle_task_groups[0], "InProgress"), (cycle, "InProgress")})
+
+  def test_uniform_status_goes_up(self, _):
+    """Only groups with all tasks in the same status take that status."""
+    cycle = make_cycle([["Verified", "Verified"], ["Finished"]])
+    group = cycle.cycle_task_groups[0]
+    propagation = StatusPropagation()
+    propagation.propagate_up(group.cycle_task_group_tasks[0])
+    self.assertEqual(propagation.status(group), "Verified")
+    self.assertEqual(propagation.status(cycle), "Assigned")
+
+  def test_status_goes_down(self, _):
+    """Declining a group declines all of its tasks."""
+    cycle = make_cycle([["Finished", "Verified"]])
+    group = cycle.cycle_task_groups[0]
+    group.status = "Declined"
+    propagation = StatusPropagation()
+    propagation.propagate_down(group)
+    self.assertEqual(
+        [propagation.status(task) for task in group.cycle_task_group_tasks],
+        ["Declined", "Declined"])
+
+  def test_backlog_groups_are_skipped(self, _):
+    """Task statuses do not propagate in backlog workflows."""
+    cycle = make_cycle([["InProgress"]], kind="Backlog")
+    task = cycle.cycle_task_groups[0].cycle_task_group_tasks[0]
+    propagation = StatusPropagation()
+    propagation.propagate_up(task)
+    self.assertEqual(propagation.changes(), [])
+
+  @patch("ggrc_workflows.status_propagation.Signals")
+  @patch("ggrc_workflows.status_propagation.db")
+  @patch("ggrc_workflows.status_propagation.get_cache")
+  def test_bulk_changes_are_recorded(self, get_cache, *_):
+    """Bulk updated objects get their changed fields for revisions."""
+    cycle = make_cycle([["Assigned"]])
+    group = cycle.cycle_task_groups[0]
+    task = group.cycle_task_group_tasks[0]
+    for index, obj in enumerate((cycle, group, task), 1):
+      obj.id = index
+      attributes.set_committed_value(obj, "status", obj.status)
+    task.status = "InProgress"
+    cache = get_cache.return_value = Cache()
+    propagation = StatusPropagation()
+    propagation.propagate_up(task)
+    with patch.object(models.Cycle, "log_json", MagicMock()), \
+        patch.object(models.CycleTaskGroup, "log_json", MagicMock()):
+      propagation.apply()
+    self.assertEqual(cache.changes, {cycle: {"status"}, group: {"status"}})